@@ -1,6 +1,6 @@
 import numpy as np
 from fealpy.solver.petsc_solver import PETScSolver
-from scipy.sparse.linalg import spsolve
+from fealpy.solver import FactorizationCache
 import pyamg
 
 class ParabolicVEMSolver2d():
@@ -12,6 +12,7 @@ class ParabolicVEMSolver2d():
     def __init__(self, A, M, F=None, nupdate=0, method ='CN'):
         self.method = method
         self.solver = PETScSolver()
+        self.cache = FactorizationCache()
 
         self.A = A
         self.M = M
@@ -20,10 +21,14 @@ class ParabolicVEMSolver2d():
         self.nupdate = nupdate
 
     def get_current_left_matrix(self, dt):
-        M = self.M
-        S = self.A
-        F = self.F
-        return M + 0.5*dt*(S + F)
+        # 时间步长不变时左端矩阵不变, 只组装一次, 它的分解由 self.cache 复用
+        if getattr(self, 'dt', None) != dt:
+            M = self.M
+            S = self.A
+            F = self.F
+            self.dt = dt
+            self.left = (M + 0.5*dt*(S + F)).tocsc()
+        return self.left
 
     def get_current_right_vector(self, u0, dt):
         M = self.M
@@ -51,7 +56,7 @@ class ParabolicVEMSolver2d():
         A = self.get_current_left_matrix(dt)
         b = self.get_current_right_vector(data[:,current], dt)
         A, b = self.apply_boundary_condition(A, b)
-        data[:,current+1]=spsolve(A,b)
+        data[:,current+1]=self.cache.solve(A, b)
         #self.solver.solve(A, b, data[:,current+1])
 
     def correct_solve(self, data, timeline):
@@ -60,7 +65,7 @@ class ParabolicVEMSolver2d():
         A = self.get_current_left_matrix(dt)
         b = self.get_error_right_vector(data[-1], dt, data[2][:,current+1])
         A, b = self.apply_boundary_condition(A, b)
-        data[-1]=spsolve(A,b)
+        data[-1]=self.cache.solve(A, b)
         #self.solver.solve(A, b, data[-1])
 
     def output(self, data, nameflag, queue=None, stop=False):
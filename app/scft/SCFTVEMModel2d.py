@@ -87,7 +87,7 @@ class SCFTVEMModel2d():
         NC = self.mesh.number_of_cells()
         NV = self.mesh.number_of_vertices_of_cells()
         cell, cellLocation = self.mesh.entity('cell')
-        B = vemspace.matrix_B()
+        B = vemspace.matrix_B().toarray() # (smldof, len(cell))
 
         barycenter = vemspace.smspace.barycenter
         ldof = vemspace.smspace.number_of_local_dofs()
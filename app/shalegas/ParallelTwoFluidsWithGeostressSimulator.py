@@ -183,6 +183,45 @@ class ParallelTwoFluidsWithGeostressSimulator():
         if self.ctx.myid == 0:
             self.timeline.add_time(n)
 
+    def checkpoint_state(self, matrices=False):
+        """
+
+        Notes
+        -----
+        续算所需的最少的状态: 上一时刻和当前时刻的物理量, 时间层以及随机数
+        发生器的状态. matrices 为真时同时保存常数矩阵和向量. 物理量只在 0 号
+        进程上, 所以只在 0 号进程上调用.
+        """
+        state = {name: np.asarray(getattr(self, name)) for name in
+                ['v', 'p', 's', 'u', 'phi', 'cv', 'cp', 'cs', 'cu', 'cphi']}
+        state['timeline'] = self.timeline.checkpoint_state()
+        state['random'] = np.random.get_state()
+        if matrices:
+            for name in ['B', 'PU0', 'PU1', 'PU2', 'FU']:
+                if hasattr(self, name):
+                    state[name] = getattr(self, name)
+        return state
+
+    def restore_state(self, state):
+        """
+
+        Notes
+        -----
+        0 号进程给出 state, 其它进程给 None, 时间层的状态广播到所有进程.
+        """
+        if self.ctx.myid == 0:
+            for name in ['v', 'p', 's', 'u', 'phi', 'cv', 'cp', 'cs', 'cu', 'cphi']:
+                getattr(self, name)[:] = state[name]
+            np.random.set_state(state['random'])
+            for name in ['B', 'PU0', 'PU1', 'PU2', 'FU']:
+                if name in state:
+                    setattr(self, name, state[name])
+            tstate = state['timeline']
+        else:
+            tstate = None
+        tstate = self.ctx.comm.bcast(tstate, root=0)
+        self.timeline.restore_state(tstate)
+
 
     def pressure_coefficient(self):
 
@@ -879,13 +918,17 @@ class ParallelTwoFluidsWithGeostressSimulator():
 
 
 
-    def run(self, writer=None):
+    def run(self, writer=None, checkpointer=None, restart=False):
         """
 
         Notes
         -----
 
         计算所有时间层物理量。
+
+        checkpointer 是 fealpy.writer.Checkpointer 对象, 由 0 号进程每
+        checkpointer.interval 步保存一次检查点. restart 为真时从最新的检查点
+        继续计算.
         """
 
         args = self.args
@@ -893,6 +936,14 @@ class ParallelTwoFluidsWithGeostressSimulator():
         timeline = self.timeline
         dt = timeline.current_time_step_length()
 
+        if restart and (checkpointer is not None):
+            found = False
+            if self.ctx.myid == 0:
+                step, state = checkpointer.load()
+                found = state is not None
+            if self.ctx.comm.bcast(found, root=0):
+                self.restore_state(state if self.ctx.myid == 0 else None)
+
         if (self.ctx.myid == 0) and (writer is not None):
             n = timeline.current
             fname = args.output + str(n).zfill(10) + '.vtu'
@@ -906,6 +957,8 @@ class ParallelTwoFluidsWithGeostressSimulator():
 
             self.picard_iteration()
             timeline.current += 1
+            if (self.ctx.myid == 0) and (checkpointer is not None):
+                checkpointer(timeline.current, self.checkpoint_state)
             if timeline.current%args.step == 0:
                 if (self.ctx.myid == 0) and (writer is not None):
                     n = timeline.current
@@ -918,3 +971,6 @@ class ParallelTwoFluidsWithGeostressSimulator():
             fname = args.output + str(n).zfill(10) + '.vtu'
             self.update_mesh_data()
             writer(fname, self.mesh)
+
+        if (self.ctx.myid == 0) and (checkpointer is not None):
+            checkpointer.flush()
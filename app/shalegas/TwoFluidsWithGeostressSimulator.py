@@ -179,6 +179,33 @@ class TwoFluidsWithGeostressSimulator():
         """
         self.timeline.add_time(n)
 
+    def checkpoint_state(self, matrices=False):
+        """
+
+        Notes
+        -----
+        续算所需的最少的状态: 上一时刻和当前时刻的物理量, 时间层以及随机数
+        发生器的状态. matrices 为真时同时保存常数矩阵和向量.
+        """
+        state = {name: np.asarray(getattr(self, name)) for name in
+                ['v', 'p', 's', 'u', 'phi', 'cv', 'cp', 'cs', 'cu', 'cphi']}
+        state['timeline'] = self.timeline.checkpoint_state()
+        state['random'] = np.random.get_state()
+        if matrices:
+            for name in ['B', 'PU0', 'PU1', 'PU2', 'FU']:
+                if hasattr(self, name):
+                    state[name] = getattr(self, name)
+        return state
+
+    def restore_state(self, state):
+        for name in ['v', 'p', 's', 'u', 'phi', 'cv', 'cp', 'cs', 'cu', 'cphi']:
+            getattr(self, name)[:] = state[name]
+        self.timeline.restore_state(state['timeline'])
+        np.random.set_state(state['random'])
+        for name in ['B', 'PU0', 'PU1', 'PU2', 'FU']:
+            if name in state:
+                setattr(self, name, state[name])
+
 
     def pressure_coefficient(self):
 
@@ -944,13 +971,17 @@ class TwoFluidsWithGeostressSimulator():
 
 
 
-    def run(self, ctx=None, writer=None, queue=None):
+    def run(self, ctx=None, writer=None, queue=None, checkpointer=None,
+            restart=False):
         """
 
         Notes
         -----
 
         计算所有时间层物理量。
+
+        checkpointer 是 fealpy.writer.Checkpointer 对象, 每 checkpointer.interval
+        步保存一次检查点. restart 为真时从最新的检查点继续计算.
         """
 
         args = self.args
@@ -958,6 +989,11 @@ class TwoFluidsWithGeostressSimulator():
         timeline = self.timeline
         dt = timeline.current_time_step_length()
 
+        if restart and (checkpointer is not None):
+            step, state = checkpointer.load()
+            if state is not None:
+                self.restore_state(state)
+
         if queue is not None:
             n = timeline.current
             fname = args.output + str(n).zfill(10) + '.vtu'
@@ -976,6 +1012,8 @@ class TwoFluidsWithGeostressSimulator():
             print('当前时刻为第', ct, '天')
             self.picard_iteration(ctx=ctx)
             timeline.current += 1
+            if checkpointer is not None:
+                checkpointer(timeline.current, self.checkpoint_state)
             if timeline.current%args.step == 0:
                 if queue is not None:
                     n = timeline.current
@@ -1003,3 +1041,6 @@ class TwoFluidsWithGeostressSimulator():
             fname = args.output + str(n).zfill(10) + '.vtu'
             self.update_mesh_data()
             writer(fname, self.mesh)
+
+        if checkpointer is not None:
+            checkpointer.flush()
@@ -1,8 +1,9 @@
 
+import time
 import argparse
 import pickle
 
-from fealpy.writer import VTKMeshWriter
+from fealpy.writer import AsyncMeshWriter, Checkpointer
 
 from TwoFluidsWithGeostressSimulator import TwoFluidsWithGeostressSimulator
 
@@ -61,6 +62,14 @@ parser.add_argument('--save',
         default='run.pickle', type=str,
         help='程序结束时，用于保存模拟器状态的文件名，用于续算')
 
+parser.add_argument('--checkpoint',
+        default=0, type=int,
+        help='检查点的步数间隔，默认为 0 不保存检查点')
+
+parser.add_argument('--restart',
+        action='store_true',
+        help='从最新的检查点继续计算')
+
 parser.add_argument('--reload',
         default=[None, None], nargs=2,
         help='导入保存的运行环境，增加更多时间步, 如 --reload simulator.pickle 10，导入 simulator.pickle 文件，在原来的基础上多算 10 天')
@@ -91,8 +100,10 @@ if args.reload[0] is not None:
     #writer = VTKMeshWriter(simulation=simulator.run)
     #writer.run()
 
-    writer = VTKMeshWriter()
-    simulator.run(ctx=ctx, writer=writer)
+    with AsyncMeshWriter(simulator.mesh) as writer:
+        start = time.perf_counter()
+        simulator.run(ctx=ctx, writer=writer)
+        end = time.perf_counter()
 else:
 
     ctx = DMumpsContext()
@@ -104,10 +115,20 @@ else:
     mesh.fluid_relative_permeability_1 = oil 
 
     simulator = TwoFluidsWithGeostressSimulator(mesh, args)
-    writer = VTKMeshWriter(simulation=simulator.run, args=(ctx, None))
-    writer.run()
+    ckpt = None
+    if args.checkpoint > 0:
+        ckpt = Checkpointer(args.output + '_ckpt', interval=args.checkpoint)
+    # 输出在后台进程中进行, 几何只传一次, 每步只传变化了的数据
+    with AsyncMeshWriter(mesh) as writer:
+        start = time.perf_counter()
+        simulator.run(ctx=ctx, writer=writer, checkpointer=ckpt,
+                restart=args.restart)
+        end = time.perf_counter()
     ctx.destroy()
 
+print(writer)
+print('输出占模拟时间的比例: {:.2%}'.format(writer.time/(end - start)))
+
 # 保存程序终止状态，用于后续计算测试
 with open(args.save, 'wb') as f:
     pickle.dump(simulator, f, protocol=pickle.HIGHEST_PROTOCOL)
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+#
+"""
+分布式内存的 Poisson 方程有限元求解, 用来测试强可扩展性和弱可扩展性.
+
+强可扩展性 (问题规模固定):
+
+for k in 1 2 4 8 16 32; do
+    mpirun -n $k python3 ParallelPoissonFEM_example.py --n 256 --output strong.json
+done
+
+弱可扩展性 (每个进程上的规模固定, 网格剖分段数 n 按 sqrt(k) 或者 cbrt(k) 增长):
+
+for k in 1 2 4 8 16 32; do
+    mpirun -n $k python3 ParallelPoissonFEM_example.py --n 64 --scaling weak --output weak.json
+done
+
+每次运行在 0 号进程上打印一行结果, 给出 --output 时追加一条 json 记录.
+"""
+
+import argparse
+import json
+from timeit import default_timer as timer
+
+import numpy as np
+from mpi4py import MPI
+
+from fealpy.mesh import MeshFactory
+from fealpy.parallel import ParaFEMAssembler, ParaAlgorithm
+
+parser = argparse.ArgumentParser(description=
+        """
+        分布式内存的 Poisson 方程有限元求解
+        """)
+
+parser.add_argument('--dim', default=2, type=int,
+        help='问题的维数, 默认为 2')
+
+parser.add_argument('--p', default=1, type=int,
+        help='Lagrange 有限元的次数, 默认为 1')
+
+parser.add_argument('--n', default=64, type=int,
+        help='每个方向的剖分段数, 默认为 64')
+
+parser.add_argument('--scaling', default='strong', type=str,
+        help='strong 或者 weak, weak 时 n 随进程个数增长, 默认为 strong')
+
+parser.add_argument('--solver', default='cg', type=str,
+        help='cg 或者 gmres, 默认为 cg')
+
+parser.add_argument('--pc', default='amg', type=str,
+        help='块 Jacobi 预条件子的子块解法器: jacobi, ilu, lu 或者 amg, 默认为 amg')
+
+parser.add_argument('--tol', default=1e-8, type=float,
+        help='相对残量的容许误差, 默认为 1e-8')
+
+parser.add_argument('--output', default=None, type=str,
+        help='追加结果的 json 文件')
+
+args = parser.parse_args()
+
+comm = MPI.COMM_WORLD
+size = comm.Get_size()
+rank = comm.Get_rank()
+
+if args.dim == 2:
+    from fealpy.pde.poisson_2d import CosCosData as PDE
+    n = args.n if args.scaling == 'strong' else int(round(args.n*size**(1/2)))
+    pde = PDE()
+    mesh = MeshFactory().boxmesh2d(pde.domain(), nx=n, ny=n, meshtype='tri')
+else:
+    from fealpy.pde.poisson_3d import CosCosCosData as PDE
+    n = args.n if args.scaling == 'strong' else int(round(args.n*size**(1/3)))
+    pde = PDE()
+    mesh = MeshFactory().boxmesh3d([0, 1, 0, 1, 0, 1], nx=n, ny=n, nz=n,
+            meshtype='tet')
+
+times = {}
+
+comm.Barrier()
+start = timer()
+assembler = ParaFEMAssembler(comm, mesh, p=args.p)
+comm.Barrier()
+times['partition'] = timer() - start
+
+start = timer()
+A = assembler.stiff_matrix()
+F = assembler.source_vector(pde.source)
+A, F = assembler.apply_dirichlet_bc(A, F, pde.dirichlet)
+comm.Barrier()
+times['assembly'] = timer() - start
+
+start = timer()
+alg = ParaAlgorithm(A, assembler.commtop)
+M = alg.preconditioner(args.pc)
+comm.Barrier()
+times['setup'] = timer() - start
+
+start = timer()
+if args.solver == 'cg':
+    x, info = alg.cg(F, tol=args.tol, M=M)
+else:
+    x, info = alg.gmres(F, tol=args.tol, M=M)
+comm.Barrier()
+times['solve'] = timer() - start
+
+# 各个进程上用时的最大值
+times = {k: comm.allreduce(v, op=MPI.MAX) for k, v in times.items()}
+
+uh = assembler.gather(x)
+if rank == 0:
+    space = assembler.space
+    e = np.max(np.abs(uh - space.interpolation(pde.solution)))
+    result = {
+            'ranks': size,
+            'scaling': args.scaling,
+            'n': n,
+            'gdof': int(assembler.number_of_global_dofs()),
+            'solver': args.solver,
+            'pc': args.pc,
+            'niter': alg.niter,
+            'info': info,
+            'error': float(e),
+            'time': times,
+            }
+    print('ranks {:3d} gdof {:9d} iter {:4d} partition {:8.3f}s assembly {:8.3f}s setup {:8.3f}s solve {:8.3f}s error {:.3e}'.format(
+        size, result['gdof'], alg.niter, times['partition'],
+        times['assembly'], times['setup'], times['solve'], e))
+    if args.output is not None:
+        with open(args.output, 'a') as f:
+            f.write(json.dumps(result) + '\n')
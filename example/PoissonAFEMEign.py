@@ -14,7 +14,6 @@ from fealpy.pde.EigenvalueData3d import EigenSchrodinger3d
 
 from fealpy.fem import EllipticEignvalueFEMModel
 
-import transplant
 
 """
 几种计算最小特征值最小特征值方法的比较
@@ -75,8 +74,7 @@ if False:
             q=5,  # 积分精度
             resultdir=location,
             sigma=None,
-            multieigs=False,
-            matlab=False)
+            multieigs=False)
 
 if True:
     model = EllipticEignvalueFEMModel(
@@ -90,8 +88,7 @@ if True:
             q=5,  # 积分精度
             resultdir=location,
             sigma=100,
-            multieigs=False,
-            matlab=transplant.Matlab())
+            multieigs=False)
 
 #u0 = model.alg_0()
 #model.savesolution(u0, 'u0.mat')
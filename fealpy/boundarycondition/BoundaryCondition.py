@@ -2,6 +2,57 @@ import numpy as np
 from scipy.sparse import coo_matrix, csc_matrix, csr_matrix, spdiags, eye, bmat
 
 
+def eliminate_dirichlet_dof(A, isDDof, symmetric=True, copy=False):
+    """
+
+    Parameters
+    ----------
+    A : csr 或者 csc 格式的稀疏矩阵, 其它格式会先转换为 csr 格式
+    isDDof : 长度为 A.shape[0] 的逻辑数组, 标记 Dirichlet 自由度. 向量型问题
+        (dim > 1) 中自由度按分量排列, 用 np.tile(isDDof, dim) 即可
+    symmetric : True 表示同时把 Dirichlet 自由度对应的行和列置零, 保持矩阵
+        的对称性; False 只把行置零
+    copy : 是否在 A 的拷贝上操作, 默认直接修改 A 的 data
+
+    Notes
+    -----
+    把 Dirichlet 自由度对应的行 (和列) 置零, 对角元置为 1. 与 T@A@T + Tbd
+    相比不做稀疏矩阵乘法, 只根据 indptr 和 indices 生成非零元的掩码, 然后
+    原地修改 data, 矩阵的非零结构不变 (置零的元素保留为显式的零元).
+
+    用对称的方式处理时, 右端要先减去 A@x (x 在 Dirichlet 自由度上是边界值,
+    其它地方是零), 见 DirichletBC.apply. 只处理行时不需要修改其它的右端项.
+    """
+    if A.format not in {'csr', 'csc'}:
+        A = A.tocsr()
+    elif copy:
+        A = A.copy()
+    A.sum_duplicates()
+
+    N = A.shape[0]
+    major = np.repeat(np.arange(A.shape[A.format == 'csc']), np.diff(A.indptr))
+    minor = A.indices
+    row, col = (major, minor) if A.format == 'csr' else (minor, major)
+
+    flag = isDDof[row]
+    if symmetric:
+        flag |= isDDof[col]
+    A.data[flag] = 0.0
+
+    isDiag = (row == col) & isDDof[row]
+    A.data[isDiag] = 1.0
+
+    # 结构中没有对角元的 Dirichlet 自由度 (比如没有连接任何单元的点)
+    hasDiag = np.zeros(N, dtype=np.bool_)
+    hasDiag[row[isDiag]] = True
+    isMissing = isDDof & ~hasDiag
+    if np.any(isMissing):
+        idx, = np.nonzero(isMissing)
+        D = csr_matrix((np.ones(len(idx), dtype=A.dtype), (idx, idx)), shape=A.shape)
+        A = (A + D).asformat(A.format)
+    return A
+
+
 class DirichletBC():
     def __init__(self, space, gD, threshold=None):
         self.space = space
@@ -9,7 +60,20 @@ class DirichletBC():
         self.threshold = threshold
         self.bctype = 'Dirichlet'
 
-    def apply(self, A, F, uh=None, threshold=None):
+    def apply(self, A, F, uh=None, threshold=None, symmetric=True, copy=True):
+        """
+
+        Notes
+        -----
+        处理 Dirichlet 边界条件, 见 eliminate_dirichlet_dof. 默认返回新的矩
+        阵, A 不变 (调用者可能还要用原来的 A, 比如计算能量范数误差);
+        copy 为 False 且 A 是 csr 或者 csc 格式时直接在 A 上修改, 省去一次
+        拷贝.
+
+        symmetric 为 True 时把边界自由度的行和列都置零, 右端做一次提升
+        F -= A@x; 为 False 时只把行置零, 右端只需要把边界自由度上的值设为
+        边界值.
+        """
         space = self.space
         gD = self.gD
         threshold = self.threshold if threshold is None else threshold
@@ -23,16 +87,20 @@ class DirichletBC():
             isDDof = np.tile(isDDof, dim)
             F = F.T.flat
         x = uh.T.flat # 把 uh 按列展平
-        F -= A@x
-        bdIdx = np.zeros(A.shape[0], dtype=np.int)
-        bdIdx[isDDof] = 1
-        Tbd = spdiags(bdIdx, 0, A.shape[0], A.shape[0])
-        T = spdiags(1-bdIdx, 0, A.shape[0], A.shape[0])
-        A = T@A@T + Tbd
+        if symmetric:
+            F -= A@x
+        A = eliminate_dirichlet_dof(A, isDDof, symmetric=symmetric, copy=copy)
         F[isDDof] = x[isDDof]
         return A, F 
 
-    def apply_on_matrix(self, A):
+    def apply_on_matrix(self, A, threshold=None, symmetric=True, copy=True):
+        """
+
+        Notes
+        -----
+        只处理矩阵. 默认在 A 的拷贝上操作, 因为调用者一般还要用原来的 A 处理
+        右端 (见 apply_on_vector).
+        """
         space = self.space
         gdof = space.number_of_global_dofs()
         threshold = self.threshold if threshold is None else threshold
@@ -41,17 +109,19 @@ class DirichletBC():
         dim = A.shape[0]//gdof # 如果是向量型问题
         if dim > 1:
             isDDof = np.tile(isDDof, dim)
+        return eliminate_dirichlet_dof(A, isDDof, symmetric=symmetric, copy=copy)
 
-        bdIdx = np.zeros((A.shape[0], ), np.int)
-        bdIdx[isDDof] = 1
-        Tbd = spdiags(bdIdx, 0, A.shape[0], A.shape[0])
-        T = spdiags(1-bdIdx, 0, A.shape[0], A.shape[0])
-        A = T@A@T + Tbd
-        return A
+    def apply_on_vector(self, A, F, threshold=None):
+        """
 
-    def apply_on_vector(self, A, F):
+        Notes
+        -----
+        只处理右端, A 是没有处理边界条件的矩阵, 与 apply_on_matrix 对称的处
+        理方式配合使用.
+        """
         space = self.space
-        threshold = self.threshold
+        gD = self.gD
+        threshold = self.threshold if threshold is None else threshold
 
         gdof = space.number_of_global_dofs()
         dim = A.shape[0]//gdof
@@ -62,7 +132,7 @@ class DirichletBC():
             F = F.T.flat
         x = uh.T.flat # 把 uh 按列展平
         F -= A@x
-        F[isBdDof] = x[isBdDof] 
+        F[isDDof] = x[isDDof] 
         return F 
 
 class NeumannBC():
@@ -231,7 +301,7 @@ class BoundaryCondition():
                 np.add.at(b, (face2dof[idx], np.s_[:]), bb)
 
 
-    def apply_dirichlet_bc(self, A, b, uh, is_dirichlet_boundary=None):
+    def apply_dirichlet_bc(self, A, b, uh, is_dirichlet_boundary=None, copy=True):
         """
         apply the dirichlet boundary condition GD space.
 
@@ -252,6 +322,9 @@ class BoundaryCondition():
         The GD is the dimension of the problem space, and N is the number of
         dofs.
 
+        A is left unchanged and a new matrix is returned, unless copy is False,
+        in which case a csr or csc matrix A is modified in place.
+
         Examples
         --------
 
@@ -266,11 +339,7 @@ class BoundaryCondition():
             gdof = self.space.number_of_global_dofs()
             x = uh.T.flat # 把 uh 按列展平
             b -= A@x
-            bdIdx = np.zeros(dim*gdof, dtype=np.int)
-            bdIdx[isDDof] = 1
-            Tbd = spdiags(bdIdx, 0, dim*gdof, dim*gdof)
-            T = spdiags(1-bdIdx, 0, dim*gdof, dim*gdof)
-            A = T@A@T + Tbd
+            A = eliminate_dirichlet_dof(A, isDDof, copy=copy)
             b[isDDof] = x[isDDof]
             return A, b
 
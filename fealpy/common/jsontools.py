@@ -0,0 +1,21 @@
+import numpy as np
+
+
+def to_builtin(obj):
+    """
+
+    Notes
+    -----
+    json.dumps 的 default 函数, 把 numpy 的数据类型转化为 json 可以序列化的
+    python 数据类型, 其它不能序列化的对象 (比如求解器的参数) 转化为字符串,
+    保证写日志时不会因为某个字段出错.
+
+    Examples
+    --------
+    json.dumps(stats, default=to_builtin)
+    """
+    if isinstance(obj, np.generic):
+        return obj.item()
+    elif isinstance(obj, np.ndarray):
+        return obj.tolist()
+    return str(obj)
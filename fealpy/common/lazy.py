@@ -0,0 +1,75 @@
+"""
+
+Notes
+-----
+子包的延迟导入.
+
+子包的 __init__ 中不直接导入含有可选或者很重的依赖 (pyfftw, pyamg, vtk,
+matplotlib, petsc4py, ...) 的模块, 而是给出名字到模块的表, 通过模块级的
+__getattr__ (PEP 562) 在第一次使用这个名字的时候才导入对应的模块. 这样
+只需要网格的程序不用为这些依赖付出启动时间, 没有安装这些依赖也不影响其它
+功能, 缺少依赖的 ImportError 在真正使用的时候才抛出.
+
+Examples
+--------
+# fealpy/functionspace/__init__.py
+from ..common.lazy import lazy_import
+
+__getattr__, __dir__ = lazy_import(__name__, {
+    'FourierSpace': '.FourierSpace',
+    ...
+    })
+"""
+
+import sys
+import types
+import importlib
+
+
+class LazyModule(types.ModuleType):
+    """
+
+    Notes
+    -----
+    fealpy 中的模块和其中的类同名. 直接导入子模块 (例如
+    fealpy.functionspace.FourierSpace) 时, 导入系统会把子模块本身设为子包的
+    同名属性, 这样 from fealpy.functionspace import FourierSpace 得到的是模
+    块而不是类. 原来在 __init__ 中导入时, 类会覆盖掉这个属性; 延迟导入时由
+    这里的 __setattr__ 把它换成类.
+    """
+    def __setattr__(self, name, value):
+        table = self.__dict__.get('__lazy__', {})
+        if isinstance(value, types.ModuleType) and (name in table) \
+                and hasattr(value, name):
+            value = getattr(value, name)
+        super().__setattr__(name, value)
+
+
+def lazy_import(package, table):
+    """
+
+    Parameters
+    ----------
+    package : 子包的名字, 一般是 __name__
+    table : 名字到 (相对) 模块名的字典
+
+    Returns
+    -------
+    子包的 __getattr__ 和 __dir__
+    """
+    sys.modules[package].__class__ = LazyModule
+    sys.modules[package].__lazy__ = table
+
+    def __getattr__(name):
+        if name not in table:
+            raise AttributeError("module {!r} has no attribute {!r}".format(
+                package, name))
+        module = importlib.import_module(table[name], package)
+        value = getattr(module, name)
+        setattr(sys.modules[package], name, value) # 下一次不再经过 __getattr__
+        return value
+
+    def __dir__():
+        return sorted(set(vars(sys.modules[package])) | set(table))
+
+    return __getattr__, __dir__
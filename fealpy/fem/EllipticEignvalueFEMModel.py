@@ -1,21 +1,27 @@
 import numpy as np
 import matplotlib.pyplot as plt
 from scipy.sparse import eye, csr_matrix, bmat
-from scipy.sparse.linalg import spsolve, eigs, LinearOperator
+from scipy.sparse.linalg import spsolve
 import scipy.io as sio
-import pyamg
 from timeit import default_timer as timer
 from mpl_toolkits.mplot3d import Axes3D
 
 from fealpy.functionspace import LagrangeFiniteElementSpace
-from fealpy.solver.eigns import picard
+from fealpy.solver.eigns import picard, LOBPCGSolver
 from fealpy.quadrature import FEMeshIntegralAlg
 from fealpy.mesh.adaptive_tools import mark
 
 
 class EllipticEignvalueFEMModel:
     def __init__(self, pde, theta=0.2, maxit=50, step=0, maxdof=1e5, n=3, p=1, q=3,
-            sigma=None, multieigs=False, matlab=False, resultdir='~/'):
+            sigma=None, multieigs=False, resultdir='~/', **options):
+        """
+
+        Notes
+        -----
+        特征值问题和源问题都用 LOBPCGSolver 求解, AMG 预条件子按矩阵缓存,
+        options 传给 LOBPCGSolver (比如 tol, maxit).
+        """
         self.multieigs = multieigs
         self.sigma = sigma
         self.pde = pde
@@ -28,7 +34,7 @@ class EllipticEignvalueFEMModel:
         self.numrefine = n
         self.resultdir = resultdir
         self.picard = False
-        self.matlab = matlab
+        self.eigsolver = LOBPCGSolver(sigma=sigma, **options)
 
     def residual_estimate(self, uh):
         mesh = uh.space.mesh
@@ -89,52 +95,6 @@ class EllipticEignvalueFEMModel:
         M = space.mass_matrix()
         return M
 
-    def linear_operator(self, x):
-        y = self.M@x
-        z = self.ml.solve(y, tol=1e-12, accel='cg').reshape(-1)
-        return z
-
-    def eigs(self, k=50):
-        NN = self.A.shape[0]
-        P = LinearOperator((NN, NN), matvec=self.linear_operator)
-        vals, vecs = eigs(P, k=k)
-        print(1/vals.real)
-
-    def eig(self, A, M):
-        NN = A.shape[0]
-        self.M = M
-        if self.sigma is None:
-            self.ml = pyamg.ruge_stuben_solver(A)
-        else:
-            self.ml = pyamg.ruge_stuben_solver(A + self.sigma*M)
-        P = LinearOperator((NN, NN), matvec=self.linear_operator)
-        vals, vecs = eigs(P, k=1)
-        if self.sigma is None:
-            return vecs.reshape(-1).real, 1/vals.real[0]
-        else:
-            return vecs.reshape(-1).real, 1/vals.real[0] - self.sigma
-
-    def psolve(self, A, b, M):
-        if self.sigma is None:
-            self.ml = pyamg.ruge_stuben_solver(A)
-            return self.ml.solve(b, tol=1e-12, accel='cg').reshape((-1,))
-        else:
-            self.ml = pyamg.ruge_stuben_solver(A+self.sigma*M)
-            return self.ml.solve(b, tol=1e-12, accel='cg').reshape((-1,))
-
-    def deig(self, A, M):
-        vals, vecs = eigs(A, k=1, M=M, which='SM')
-        return vecs.reshape(-1).real, vals.real[0]
-
-    def msolve(self, A, b):
-        x = self.matlab.mldivide(A, b.reshape(-1, 1))
-        return x.reshape(-1)
-
-    def meigs(self, A, M):
-        u, d, flag = self.matlab._call('eigs', [A + 100*M, M, 1, 'SM'])
-        print("matlab eigs convergence:", flag)
-        return u.reshape(-1), d - 100
-
     def alg_0(self, maxit=None):
         """
         1. 最粗网格上求解最小特征特征值问题，得到最小特征值 d_H 和特征向量 u_H
@@ -171,7 +131,7 @@ class EllipticEignvalueFEMModel:
         if self.picard is True:
             uh[isFreeHDof], d = picard(A, M, np.ones(sum(isFreeHDof)), sigma=self.sigma)
         else:
-            uh[isFreeHDof], d = self.eig(A, M)
+            uh[isFreeHDof], d = self.eigsolver.eig(A, M)
 
         GD = mesh.geo_dimension()
         if (self.step > 0) and (0 in idx):
@@ -218,15 +178,13 @@ class EllipticEignvalueFEMModel:
             M = self.get_mass_matrix(space)
             isFreeDof = ~(space.boundary_dof())
             b = d*M@uh
-            if self.sigma is None:
-                ml = pyamg.ruge_stuben_solver(A[isFreeDof, :][:, isFreeDof].tocsr())
-                uh[isFreeDof] = ml.solve(b[isFreeDof], x0=uh[isFreeDof], tol=1e-12, accel='cg').reshape((-1,))
-            else:
-                K = A[isFreeDof, :][:, isFreeDof].tocsr() + self.sigma*M[isFreeDof, :][:, isFreeDof].tocsr()
+            if self.sigma is not None:
                 b += self.sigma*M@uh
-                ml = pyamg.ruge_stuben_solver(K)
-                uh[isFreeDof] = ml.solve(b[isFreeDof], x0=uh[isFreeDof], tol=1e-12, accel='cg').reshape(-1)
-                # uh[isFreeDof] = spsolve(A[isFreeDof, :][:, isFreeDof].tocsr(), b[isFreeDof])
+            uh[isFreeDof] = self.eigsolver.psolve(
+                    A[isFreeDof, :][:, isFreeDof].tocsr(),
+                    b[isFreeDof],
+                    M[isFreeDof, :][:, isFreeDof].tocsr(),
+                    x0=uh[isFreeDof])
             d = uh@A@uh/(uh@M@uh)
 
             if gdof > self.maxdof:
@@ -237,8 +195,8 @@ class EllipticEignvalueFEMModel:
         if self.multieigs is True:
             self.A = A[isFreeDof, :][:, isFreeDof].tocsr()
             self.M = M[isFreeDof, :][:, isFreeDof].tocsr()
-            self.ml = pyamg.ruge_stuben_solver(self.A)
-            self.eigs()
+            vals, _ = self.eigsolver.solve(self.A, self.M, k=50)
+            print(vals)
 
         end = timer()
         print("smallest eigns:", d, "with time: ", end - start)
@@ -293,10 +251,7 @@ class EllipticEignvalueFEMModel:
             A = A[isFreeDof, :][:, isFreeDof].tocsr()
             M = M[isFreeDof, :][:, isFreeDof].tocsr()
 
-            if self.matlab is False:
-                uh[isFreeDof], d = self.eig(A, M)
-            else:
-                uh[isFreeDof], d = self.meigs(A, M)
+            uh[isFreeDof], d = self.eigsolver.eig(A, M, x0=uh[isFreeDof])
 
             if i < maxit:
                 uh = space.function(array=uh)
@@ -343,8 +298,8 @@ class EllipticEignvalueFEMModel:
         if self.multieigs is True:
             self.A = A
             self.M = M
-            self.ml = pyamg.ruge_stuben_solver(self.A)
-            self.eigs()
+            vals, _ = self.eigsolver.solve(self.A, self.M, k=50)
+            print(vals)
 
         end = timer()
         print("smallest eigns:", d, "with time: ", end - start)
@@ -400,10 +355,7 @@ class EllipticEignvalueFEMModel:
             M = M[isFreeDof, :][:, isFreeDof].tocsr()
 
             uh = space.function()
-            if self.matlab is False:
-                uh[isFreeDof] = self.psolve(A, b[isFreeDof], M)
-            else:
-                uh[isFreeDof] = self.msolve(A, b[isFreeDof])
+            uh[isFreeDof] = self.eigsolver.psolve(A, b[isFreeDof], M)
 
 
             eta = self.residual_estimate(uh)
@@ -454,14 +406,11 @@ class EllipticEignvalueFEMModel:
         if self.multieigs is True:
             self.A = A
             self.M = M
-            self.ml = pyamg.ruge_stuben_solver(self.A)
-            self.eigs()
+            vals, _ = self.eigsolver.solve(self.A, self.M, k=50)
+            print(vals)
         else:
             uh = IM@uh
-            if self.matlab is False:
-                uh[isFreeDof], d = self.eig(A, M)
-            else:
-                uh[isFreeDof], d = self.meigs(A, M)
+            uh[isFreeDof], d = self.eigsolver.eig(A, M, x0=uh[isFreeDof])
             print("smallest eigns:", d)
             end = timer()
             print("with time: ", end - start)
@@ -501,10 +450,7 @@ class EllipticEignvalueFEMModel:
 
         A = AH[isFreeHDof, :][:, isFreeHDof].tocsr()
         M = MH[isFreeHDof, :][:, isFreeHDof].tocsr()
-        if self.matlab is False:
-            uH[isFreeHDof], d = self.eig(A, M)
-        else:
-            uH[isFreeHDof], d = self.meigs(A, M)
+        uH[isFreeHDof], d = self.eigsolver.eig(A, M, x0=uH[isFreeHDof])
 
         uh = space.function()
         uh[:] = uH
@@ -562,13 +508,10 @@ class EllipticEignvalueFEMModel:
             b = M@uH
 
             uh = space.function()
-            if self.matlab is False:
-                uh[isFreeDof] = self.psolve(
-                        A[isFreeDof, :][:, isFreeDof].tocsr(),
-                        b[isFreeDof],
-                        M[isFreeDof, :][:, isFreeDof].tocsr())
-            else:
-                uh[isFreeDof] = self.msolve(A[isFreeDof, :][:, isFreeDof].tocsr(), b[isFreeDof])
+            uh[isFreeDof] = self.eigsolver.psolve(
+                    A[isFreeDof, :][:, isFreeDof].tocsr(),
+                    b[isFreeDof],
+                    M[isFreeDof, :][:, isFreeDof].tocsr())
 
 
         # 3. 在最细网格上求解一次最小特征值问题 
@@ -599,13 +542,11 @@ class EllipticEignvalueFEMModel:
         if self.multieigs is True:
             self.A = Ah
             self.M = Mh
-            self.ml = pyamg.ruge_stuben_solver(self.A)
-            self.eigs()
+            vals, _ = self.eigsolver.solve(self.A, self.M, k=50)
+            print(vals)
         else:
-            if self.matlab is False:
-                uh[isFreeDof], d = self.eig(Ah, Mh)
-            else:
-                uh[isFreeDof], d = self.meigs(Ah, Mh)
+            # 延拓到最细网格上的粗网格特征向量做为初值
+            uh[isFreeDof], d = self.eigsolver.eig(Ah, Mh, x0=uH[isFreeDof])
             print("smallest eigns:", d)
             end = timer()
             print("with time: ", end - start)
@@ -624,15 +565,13 @@ class EllipticEignvalueFEMModel:
                 isFreeDof = np.r_[isFreeHDof, True]
 
                 u = np.zeros(len(isFreeDof))
+                u[-1] = 1.0 # 增加的基函数就是 uh, 做为初值
 
                 ## 求解特征值
                 A = AA[isFreeDof, :][:, isFreeDof].tocsr()
                 M = MM[isFreeDof, :][:, isFreeDof].tocsr()
 
-                if self.matlab is False:
-                    u[isFreeDof], d = self.eig(A, M)
-                else:
-                    u[isFreeDof], d = self.meigs(A, M)
+                u[isFreeDof], d = self.eigsolver.eig(A, M, x0=u[isFreeDof])
 
                 print("new smallest eigns:", d)
 
@@ -675,10 +614,7 @@ class EllipticEignvalueFEMModel:
         A = AH[isFreeHDof, :][:, isFreeHDof].tocsr()
         M = MH[isFreeHDof, :][:, isFreeHDof].tocsr()
 
-        if self.matlab is False:
-            uH[isFreeHDof], d = self.eig(A, M)
-        else:
-            uH[isFreeHDof], d = self.meigs(A, M)
+        uH[isFreeHDof], d = self.eigsolver.eig(A, M, x0=uH[isFreeHDof])
 
         uh = space.function()
         uh[:] = uH
@@ -733,13 +669,10 @@ class EllipticEignvalueFEMModel:
             b = M@uH
 
             uh = space.function()
-            if self.matlab is False:
-                uh[isFreeDof] = self.psolve(
-                        A[isFreeDof, :][:, isFreeDof].tocsr(),
-                        b[isFreeDof],
-                        M[isFreeDof, :][:, isFreeDof].tocsr())
-            else:
-                uh[isFreeDof] = self.msolve(A[isFreeDof, :][:, isFreeDof].tocsr(), b[isFreeDof])
+            uh[isFreeDof] = self.eigsolver.psolve(
+                    A[isFreeDof, :][:, isFreeDof].tocsr(),
+                    b[isFreeDof],
+                    M[isFreeDof, :][:, isFreeDof].tocsr())
             final = i+1
             if gdof > self.maxdof:
                 break
@@ -773,6 +706,7 @@ class EllipticEignvalueFEMModel:
         isFreeDof = np.r_[isFreeHDof, True]
 
         u = np.zeros(len(isFreeDof))
+        u[-1] = 1.0 # 增加的基函数就是 uh, 做为初值
 
         ## 求解特征值
         A = AA[isFreeDof, :][:, isFreeDof].tocsr()
@@ -781,13 +715,10 @@ class EllipticEignvalueFEMModel:
         if self.multieigs is True:
             self.A = A
             self.M = M
-            self.ml = pyamg.ruge_stuben_solver(self.A)
-            self.eigs()
+            vals, _ = self.eigsolver.solve(self.A, self.M, k=50)
+            print(vals)
         else:
-            if self.matlab is False:
-                u[isFreeDof], d = self.eig(A, M)
-            else:
-                u[isFreeDof], d = self.meigs(A, M)
+            u[isFreeDof], d = self.eigsolver.eig(A, M, x0=u[isFreeDof])
 
             print("smallest eigns:", d)
             end = timer()
@@ -833,10 +764,7 @@ class EllipticEignvalueFEMModel:
 
         A = AH[isFreeHDof, :][:, isFreeHDof].tocsr()
         M = MH[isFreeHDof, :][:, isFreeHDof].tocsr()
-        if self.matlab is False:
-            uH[isFreeHDof], d = self.eig(A, M)
-        else:
-            uH[isFreeHDof], d = self.meigs(A, M)
+        uH[isFreeHDof], d = self.eigsolver.eig(A, M, x0=uH[isFreeHDof])
 
         uh = space.function()
         uh[:] = uH
@@ -890,13 +818,10 @@ class EllipticEignvalueFEMModel:
             b = M@uH
 
             uh = space.function()
-            if self.matlab is False:
-                uh[isFreeDof] = self.psolve(
-                        A[isFreeDof, :][:, isFreeDof].tocsr(),
-                        b[isFreeDof],
-                        M[isFreeDof, :][:, isFreeDof].tocsr())
-            else:
-                uh[isFreeDof] = self.msolve(A[isFreeDof, :][:, isFreeDof].tocsr(), b[isFreeDof])
+            uh[isFreeDof] = self.eigsolver.psolve(
+                    A[isFreeDof, :][:, isFreeDof].tocsr(),
+                    b[isFreeDof],
+                    M[isFreeDof, :][:, isFreeDof].tocsr())
             final += 1
             if gdof > 4e+4:
                 break
@@ -915,10 +840,7 @@ class EllipticEignvalueFEMModel:
         A = AH[isFreeHDof, :][:, isFreeHDof].tocsr()
         M = MH[isFreeHDof, :][:, isFreeHDof].tocsr()
 
-        if self.matlab is False:
-            uH[isFreeHDof], d = self.eig(A, M)
-        else:
-            uH[isFreeHDof], d = self.meigs(A, M)
+        uH[isFreeHDof], d = self.eigsolver.eig(A, M, x0=uH[isFreeHDof])
 
         uh = space.function()
         uh[:] = uH
@@ -974,13 +896,10 @@ class EllipticEignvalueFEMModel:
             b = M@uH
 
             uh = space.function()
-            if self.matlab is False:
-                uh[isFreeDof] = self.psolve(
-                        A[isFreeDof, :][:, isFreeDof].tocsr(),
-                        b[isFreeDof],
-                        M[isFreeDof, :][:, isFreeDof].tocsr())
-            else:
-                uh[isFreeDof] = self.msolve(A[isFreeDof, :][:, isFreeDof].tocsr(), b[isFreeDof])
+            uh[isFreeDof] = self.eigsolver.psolve(
+                    A[isFreeDof, :][:, isFreeDof].tocsr(),
+                    b[isFreeDof],
+                    M[isFreeDof, :][:, isFreeDof].tocsr())
 
 
         # 3. 在最细网格上求解一次最小特征值问题 
@@ -1011,13 +930,11 @@ class EllipticEignvalueFEMModel:
         if self.multieigs is True:
             self.A = Ah
             self.M = Mh
-            self.ml = pyamg.ruge_stuben_solver(self.A)
-            self.eigs()
+            vals, _ = self.eigsolver.solve(self.A, self.M, k=50)
+            print(vals)
         else:
-            if self.matlab is False:
-                uh[isFreeDof], d = self.eig(Ah, Mh)
-            else:
-                uh[isFreeDof], d = self.meigs(Ah, Mh)
+            # 延拓到最细网格上的粗网格特征向量做为初值
+            uh[isFreeDof], d = self.eigsolver.eig(Ah, Mh, x0=uH[isFreeDof])
             print("smallest eigns:", d)
             end = timer()
             print("with time: ", end - start)
@@ -1061,10 +978,7 @@ class EllipticEignvalueFEMModel:
         A = AH[isFreeHDof, :][:, isFreeHDof].tocsr()
         M = MH[isFreeHDof, :][:, isFreeHDof].tocsr()
 
-        if self.matlab is False:
-            uH[isFreeHDof], d = self.eig(A, M)
-        else:
-            uH[isFreeHDof], d = self.meigs(A, M)
+        uH[isFreeHDof], d = self.eigsolver.eig(A, M, x0=uH[isFreeHDof])
 
         uh = space.function()
         uh[:] = uH
@@ -1120,13 +1034,10 @@ class EllipticEignvalueFEMModel:
             b = M@uH
 
             uh = space.function()
-            if self.matlab is False:
-                uh[isFreeDof] = self.psolve(
-                        A[isFreeDof, :][:, isFreeDof].tocsr(),
-                        b[isFreeDof],
-                        M[isFreeDof, :][:, isFreeDof].tocsr())
-            else:
-                uh[isFreeDof] = self.msolve(A[isFreeDof, :][:, isFreeDof].tocsr(), b[isFreeDof])
+            uh[isFreeDof] = self.eigsolver.psolve(
+                    A[isFreeDof, :][:, isFreeDof].tocsr(),
+                    b[isFreeDof],
+                    M[isFreeDof, :][:, isFreeDof].tocsr())
             final += 1
             if gdof > 4e+4:
                 break
@@ -1145,10 +1056,7 @@ class EllipticEignvalueFEMModel:
         A = AH[isFreeHDof, :][:, isFreeHDof].tocsr()
         M = MH[isFreeHDof, :][:, isFreeHDof].tocsr()
 
-        if self.matlab is False:
-            uH[isFreeHDof], d = self.eig(A, M)
-        else:
-            uH[isFreeHDof], d = self.meigs(A, M)
+        uH[isFreeHDof], d = self.eigsolver.eig(A, M, x0=uH[isFreeHDof])
 
         uh = space.function()
         uh[:] = uH
@@ -1199,13 +1107,10 @@ class EllipticEignvalueFEMModel:
             b = M@uH
 
             uh = space.function()
-            if self.matlab is False:
-                uh[isFreeDof] = self.psolve(
-                        A[isFreeDof, :][:, isFreeDof].tocsr(),
-                        b[isFreeDof],
-                        M[isFreeDof, :][:, isFreeDof].tocsr())
-            else:
-                uh[isFreeDof] = self.msolve(A[isFreeDof, :][:, isFreeDof].tocsr(), b[isFreeDof])
+            uh[isFreeDof] = self.eigsolver.psolve(
+                    A[isFreeDof, :][:, isFreeDof].tocsr(),
+                    b[isFreeDof],
+                    M[isFreeDof, :][:, isFreeDof].tocsr())
             final = i+1
             if gdof > self.maxdof:
                 break
@@ -1240,6 +1145,7 @@ class EllipticEignvalueFEMModel:
         isFreeDof = np.r_[isFreeHDof, True]
 
         u = np.zeros(len(isFreeDof))
+        u[-1] = 1.0 # 增加的基函数就是 uh, 做为初值
 
         ## 求解特征值
         A = AA[isFreeDof, :][:, isFreeDof].tocsr()
@@ -1248,13 +1154,10 @@ class EllipticEignvalueFEMModel:
         if self.multieigs is True:
             self.A = A
             self.M = M
-            self.ml = pyamg.ruge_stuben_solver(self.A)
-            self.eigs()
+            vals, _ = self.eigsolver.solve(self.A, self.M, k=50)
+            print(vals)
         else:
-            if self.matlab is False:
-                u[isFreeDof], d = self.eig(A, M)
-            else:
-                u[isFreeDof], d = self.meigs(A, M)
+            u[isFreeDof], d = self.eigsolver.eig(A, M, x0=u[isFreeDof])
 
             print("smallest eigns:", d)
             end = timer()
@@ -0,0 +1,314 @@
+import numpy as np
+from collections.abc import Sequence
+from scipy.sparse import csr_matrix
+
+
+class CellMatrices(Sequence):
+    """
+
+    Notes
+    -----
+    按单元分组存储的单元矩阵. stacks[k] 是第 k 组单元的矩阵组成的三维数组
+    (nc_k, m, n), 第 i 个单元的矩阵是 self[i], 即 stacks 中的一个视图, 这样
+    原来按单元逐个使用 (self.PI0[i], zip(self.PI1, ...)) 的程序不用修改.
+
+    layout 为 'cols' (例如 matrix_B, 第 i 个单元的矩阵是 (m, ldof_i)) 或者
+    'rows' (例如 matrix_D, (ldof_i, m)) 时, 所有组存在同一个一维数组 data
+    中, 第 i 个单元的块从 data[start[i]] 开始, 各组是 data 的视图. 这时可以
+    用 cell2dof 中的位置来设置和累加元素 (见 set 和 add), 不需要
+    (m, len(cell2dof)) 的稠密矩阵, toarray 给出原来的稠密矩阵.
+    """
+    def __init__(self, buckets, stacks, layout='cell', data=None, start=None):
+        self.buckets = buckets
+        self.stacks = stacks
+        self.layout = layout
+        self.data = data
+        self.start = start
+
+    def __len__(self):
+        return self.buckets.NC
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        return self.stacks[self.buckets.bucket[i]][self.buckets.index[i]]
+
+    def positions(self, loc, r):
+        """
+
+        Notes
+        -----
+        cell2dof 中的位置 loc 和另一个维数的编号 r 对应的元素在 data 中的位置,
+        loc 和 r 按 numpy 的规则广播.
+        """
+        buckets = self.buckets
+        i = buckets.dof2cell[loc]
+        j = loc - buckets.location[i]
+        m = self.stacks[0].shape[1 if self.layout == 'cols' else 2]
+        if self.layout == 'cols':
+            return self.start[i] + r*buckets.ldof[i] + j
+        else:
+            return self.start[i] + j*m + r
+
+    def set(self, loc, r, val):
+        """
+
+        Notes
+        -----
+        相当于稠密矩阵上的 B[r, loc] = val (layout 为 'cols') 或者
+        D[loc, r] = val (layout 为 'rows').
+        """
+        self.data[self.positions(loc, r)] = val
+
+    def add(self, loc, r, val, unique=False):
+        """
+
+        Notes
+        -----
+        相当于稠密矩阵上的 np.add.at(B, (r, loc), val), 重复的位置会累加.
+        这里先合并重复的位置再用 np.bincount 累加, 比 np.add.at 快得多.
+        unique 为 True 时调用者保证没有重复的位置, 直接用 +=.
+        """
+        pos, val = np.broadcast_arrays(self.positions(loc, r), val)
+        if unique:
+            self.data[pos] += val
+            return
+        pos, j = np.unique(pos, return_inverse=True)
+        self.data[pos] += np.bincount(j.flat, weights=val.flat, minlength=len(pos))
+
+    def toarray(self):
+        """
+
+        Notes
+        -----
+        layout 为 'cols' 时返回 (m, len(cell2dof)) 的稠密矩阵, 为 'rows' 时返
+        回 (len(cell2dof), m) 的稠密矩阵.
+        """
+        if self.layout == 'rows':
+            return self.buckets.scatter_rows(self.stacks)
+        elif self.layout == 'cols':
+            stacks = [a.swapaxes(-1, -2) for a in self.stacks]
+            return self.buckets.scatter_rows(stacks).T
+        else:
+            raise ValueError("We don't support toarray for the layout `{}`! ".format(self.layout))
+
+
+class CellBuckets():
+    """
+
+    Notes
+    -----
+    多边形网格上虚单元的单元矩阵的批量计算.
+
+    单元按局部自由度的个数分组 (对同一个空间, 就是按多边形的顶点个数分
+    组), 同一组的单元矩阵大小相同, 存成三维数组, 然后对整组用
+    np.linalg.solve 和 np.einsum 计算, 最后用一次 COO 构造组装整体矩阵.
+    组数是不同的顶点个数的个数, 一般只有几个, Python 循环的次数和单元个数
+    无关.
+
+    Parameters
+    ----------
+    location : 单元自由度的位置数组 cell2dofLocation, 第 i 个单元的自由度
+        是 cell2dof[location[i]:location[i+1]]
+
+    Examples
+    --------
+    buckets = CellBuckets(cell2dofLocation)
+    BB = buckets.cols(B) # 每组 (nc, smldof, ldof)
+    DD = buckets.rows(D) # 每组 (nc, ldof, smldof)
+    G = [np.einsum('cij, cjk->cik', b, d) for b, d in zip(BB, DD)]
+    """
+    def __init__(self, location):
+        location = np.asarray(location)
+        ldof = location[1:] - location[:-1]
+        NC = len(ldof)
+        self.NC = NC
+        self.location = location
+
+        order = np.argsort(ldof, kind='stable')
+        nums, start = np.unique(ldof[order], return_index=True)
+        self.cells = np.split(order, start[1:]) # 每组单元的编号
+        self.ldofs = list(nums) # 每组单元的局部自由度个数
+        self.dofs = [location[c, None] + np.arange(n) # 每组单元的自由度在 cell2dof 中的位置
+                for c, n in zip(self.cells, self.ldofs)]
+        self.ldof = ldof
+        self.dof2cell = np.repeat(np.arange(NC), ldof) # cell2dof 中每个位置所在的单元
+
+        self.bucket = np.zeros(NC, dtype=np.int_) # 每个单元所在的组
+        self.index = np.zeros(NC, dtype=np.int_) # 每个单元在组内的编号
+        for k, c in enumerate(self.cells):
+            self.bucket[c] = k
+            self.index[c] = np.arange(len(c))
+
+    def __len__(self):
+        return len(self.cells)
+
+    def zeros(self, m, layout='cols', dtype=np.float64):
+        """
+
+        Notes
+        -----
+        分配 layout 为 'cols' 或者 'rows' 的 CellMatrices, 第 i 个单元的块为
+        (m, ldof_i) 或者 (ldof_i, m), 所有的块存在一个一维数组中, 总的大小
+        和原来的稠密矩阵相同.
+        """
+        if layout not in {'cols', 'rows'}:
+            raise ValueError("We don't support the layout `{}`! ".format(layout))
+        size = [len(c)*m*n for c, n in zip(self.cells, self.ldofs)]
+        offset = np.r_[0, np.cumsum(size)]
+        data = np.zeros(offset[-1], dtype=dtype)
+        stacks = []
+        start = np.zeros(self.NC, dtype=np.int_)
+        for k, (c, n) in enumerate(zip(self.cells, self.ldofs)):
+            shape = (len(c), m, n) if layout == 'cols' else (len(c), n, m)
+            stacks.append(data[offset[k]:offset[k+1]].reshape(shape))
+            start[c] = offset[k] + np.arange(len(c))*m*n
+        return CellMatrices(self, stacks, layout=layout, data=data, start=start)
+
+    def rows(self, D):
+        """
+
+        Notes
+        -----
+        按 cell2dof 的位置排列行的矩阵 D (例如 matrix_D), 每组为
+        (nc, ldof, ...). D 是 layout 为 'rows' 的 CellMatrices 时直接返回
+        它的各组, 不复制.
+        """
+        if isinstance(D, CellMatrices) and D.layout == 'rows':
+            return D.stacks
+        return [D[idx] for idx in self.dofs]
+
+    def cols(self, B):
+        """
+
+        Notes
+        -----
+        按 cell2dof 的位置排列列的矩阵 B (例如 matrix_B), 每组为
+        (nc, m, ldof). B 是 layout 为 'cols' 的 CellMatrices 时直接返回它
+        的各组.
+        """
+        if isinstance(B, CellMatrices) and B.layout == 'cols':
+            return B.stacks
+        return [np.moveaxis(B[:, idx], 0, 1) for idx in self.dofs]
+
+    def cell(self, A):
+        """
+
+        Notes
+        -----
+        第一维是单元的数组 A, 或者按单元给出的矩阵列表 (例如原来的
+        PI0), 每组为 (nc, ...)
+        """
+        if isinstance(A, CellMatrices) and A.buckets is self:
+            return A.stacks
+        if isinstance(A, np.ndarray):
+            return [A[c] for c in self.cells]
+        return [np.array([A[i] for i in c]) for c in self.cells]
+
+    def matrices(self, stacks):
+        return CellMatrices(self, stacks)
+
+    def scatter(self, stacks, out=None):
+        """
+
+        Notes
+        -----
+        cell 的逆: 把各组的数组放回按单元排列的数组中.
+        """
+        if out is None:
+            shape = (self.NC, ) + stacks[0].shape[1:]
+            out = np.zeros(shape, dtype=stacks[0].dtype)
+        for c, a in zip(self.cells, stacks):
+            out[c] = a
+        return out
+
+    def scatter_rows(self, stacks, out=None):
+        """
+
+        Notes
+        -----
+        rows 的逆: 把各组 (nc, ldof, ...) 的数组放回按 cell2dof 的位置排列
+        的数组中.
+        """
+        if out is None:
+            shape = (self.location[-1], ) + stacks[0].shape[2:]
+            out = np.zeros(shape, dtype=stacks[0].dtype)
+        for idx, a in zip(self.dofs, stacks):
+            out[idx] = a
+        return out
+
+    def matvec(self, M, x, cell2dof):
+        """
+
+        Notes
+        -----
+        每个单元上计算 M[i]@x[cell2dof_i], 结果按单元排列, 形状为
+        (NC, m, ...).
+        """
+        M = self.cell(M)
+        y = [np.einsum('cij, cj...->ci...', m, x[cell2dof[idx]])
+                for m, idx in zip(M, self.dofs)]
+        return self.scatter(y)
+
+    def rows_dot(self, D, x):
+        """
+
+        Notes
+        -----
+        每个单元上计算 D_i@x[i], 其中 D_i 是 D 中第 i 个单元的行, 结果按
+        cell2dof 的位置排列, 例如把缩放单项式空间的系数 x (NC, smldof) 变成
+        虚单元的自由度.
+        """
+        y = [np.einsum('cij, cj...->ci...', d, a)
+                for d, a in zip(self.rows(D), self.cell(x))]
+        return self.scatter_rows(y)
+
+    def assemble(self, K, cell2dof, gdof, dtype=np.float64):
+        """
+
+        Notes
+        -----
+        用各组的单元矩阵 K (每组 (nc, ldof, ldof) 的列表或者 CellMatrices)
+        组装整体矩阵, 所有单元的行列号和值只拼接一次, 用一次 COO 构造.
+
+        cell2dof 是按 location 排列的一维数组, 也可以直接给出每组单元的全局
+        自由度编号 (每组 (nc, ldof) 的列表), 例如单元上还有内部自由度的情形.
+        """
+        if isinstance(K, CellMatrices):
+            K = K.stacks
+        I = []
+        J = []
+        val = []
+        for k, cd in zip(K, self.local_dofs(cell2dof)):
+            I.append(np.broadcast_to(cd[:, :, None], k.shape).flat)
+            J.append(np.broadcast_to(cd[:, None, :], k.shape).flat)
+            val.append(k.flat)
+        I = np.concatenate(I)
+        J = np.concatenate(J)
+        val = np.concatenate(val)
+        return csr_matrix((val, (I, J)), shape=(gdof, gdof), dtype=dtype)
+
+    def assemble_vector(self, b, cell2dof, gdof):
+        """
+
+        Notes
+        -----
+        用各组的单元向量 b (每组 (nc, ldof) 的列表) 组装整体向量, cell2dof
+        同 assemble.
+        """
+        I = np.concatenate([cd.flat for cd in self.local_dofs(cell2dof)])
+        val = np.concatenate([v.flat for v in b])
+        return np.bincount(I, weights=val, minlength=gdof)
+
+    def local_dofs(self, cell2dof):
+        """
+
+        Notes
+        -----
+        每组单元的全局自由度编号, 每组为 (nc, ldof).
+        """
+        if isinstance(cell2dof, list):
+            return cell2dof
+        return [cell2dof[idx] for idx in self.dofs]
@@ -7,6 +7,7 @@ from ..quadrature import GaussLobattoQuadrature
 from ..quadrature import GaussLegendreQuadrature
 from ..quadrature import PolygonMeshIntegralAlg
 from .ScaledMonomialSpace2d import ScaledMonomialSpace2d
+from .CellBuckets import CellBuckets
 
 
 class CVEMDof2d():
@@ -117,6 +118,20 @@ class CVEMDof2d():
             return ipoint
 
 
+def cyclic_matrix(N):
+    """
+
+    Notes
+    -----
+    N 边形的边界上的稳定化矩阵: 对角线为 2, 相邻的 (包括首尾) 两个顶点为 -1.
+    """
+    A = 2*np.eye(N)
+    idx = np.arange(N)
+    A[idx, idx-1] = -1
+    A[idx-1, idx] = -1
+    return A
+
+
 class ConformingVirtualElementSpace2d():
     def __init__(self, mesh, p=1, q=None, bc=None):
         """
@@ -129,6 +144,7 @@ class ConformingVirtualElementSpace2d():
         self.smspace = ScaledMonomialSpace2d(mesh, p, q=q, bc=bc)
         self.cellmeasure = self.smspace.cellmeasure
         self.dof = CVEMDof2d(mesh, p)
+        self.buckets = CellBuckets(self.dof.cell2dofLocation)
 
         self.H = self.smspace.matrix_H()
         self.D = self.matrix_D(self.H)
@@ -152,14 +168,13 @@ class ConformingVirtualElementSpace2d():
         p = self.p
         cell2dof, cell2dofLocation = self.dof.cell2dof, self.dof.cell2dofLocation
         if p == 1:
-            cd = np.hsplit(cell2dof, cell2dofLocation[1:-1])
-            f = lambda x: sum(uh[x[0]]*x[0, :])
-            val = sum(map(f, zip(cd, self.C)))
-            return val
+            # C 的第 0 行是 \int_K \Pi^\nabla \phi_i dx
+            val = self.buckets.matvec(self.C, uh, cell2dof)[:, 0]
+            return np.sum(val)
         else:
             NV = self.mesh.number_of_vertices_of_cells()
             idx =cell2dof[cell2dofLocation[0:-1]+NV*p]
-            val = np.sum(uh[idx]*self.area)
+            val = np.sum(uh[idx]*self.smspace.cellmeasure)
             return val
 
     def project_to_smspace(self, uh):
@@ -169,11 +184,9 @@ class ConformingVirtualElementSpace2d():
         dim = len(uh.shape)
         p = self.p
         cell2dof = self.dof.cell2dof
-        cell2dofLocation = self.dof.cell2dofLocation
-        cd = np.hsplit(cell2dof, cell2dofLocation[1:-1])
-        g = lambda x: x[0]@uh[x[1]]
         S = self.smspace.function(dim=dim)
-        S[:] = np.concatenate(list(map(g, zip(self.PI1, cd))))
+        val = self.buckets.matvec(self.PI1, uh, cell2dof)
+        S[:] = val.reshape((-1, ) + uh.shape[1:])
         return S
 
     def grad_recovery(self, uh):
@@ -198,14 +211,8 @@ class ConformingVirtualElementSpace2d():
         sy /= h.reshape(-1, 1)
 
         cell2dof, cell2dofLocation = self.dof.cell2dof, self.dof.cell2dofLocation
-        NC = len(cell2dofLocation) - 1
-        cd = np.hsplit(cell2dof, cell2dofLocation[1:-1])
-        DD = np.vsplit(self.D, cell2dofLocation[1:-1])
-
-        f1 = lambda x: x[0]@x[1]
-        sx = np.concatenate(list(map(f1, zip(DD, sx))))
-        sy = np.concatenate(list(map(f1, zip(DD, sy))))
-
+        sx = self.buckets.rows_dot(self.D, sx)
+        sy = self.buckets.rows_dot(self.D, sy)
 
         ldof = self.number_of_local_dofs()
         w = np.repeat(1/self.smspace.cellsize, ldof)
@@ -327,103 +334,63 @@ class ConformingVirtualElementSpace2d():
         return SS
 
     def stiff_matrix(self, cfun=None):
-        area = self.smspace.cellmeasure
-
-        def f(x):
-            x[0, :] = 0
-            return x
-
         p = self.p
-        G = self.G
-        D = self.D
-        PI1 = self.PI1
-
-        cell2dof, cell2dofLocation = self.cell_to_dof()
-        NC = len(cell2dofLocation) - 1
-        cd = np.hsplit(cell2dof, cell2dofLocation[1:-1])
-        DD = np.vsplit(D, cell2dofLocation[1:-1])
-
-        if p == 1:
-            tG = np.array([(0, 0, 0), (0, 1, 0), (0, 0, 1)])
-            if cfun is None:
-                def f1(x):
-                    M = np.eye(x[1].shape[1])
-                    M -= x[0]@x[1]
-                    N = x[1].shape[1]
-                    A = np.zeros((N, N))
-                    idx = np.arange(N)
-                    A[idx, idx] = 2
-                    A[idx[:-1], idx[1:]] = -1
-                    A[idx[1:], idx[:-1]] = -1
-                    A[0, -1] = -1
-                    A[-1, 0] = -1
-                    return x[1].T@tG@x[1] + M.T@A@M
-                #f1 = lambda x: x[1].T@tG@x[1] + (np.eye(x[1].shape[1]) - x[0]@x[1]).T@(np.eye(x[1].shape[1]) - x[0]@x[1])
-                K = list(map(f1, zip(DD, PI1)))
+        buckets = self.buckets
+        DD = buckets.rows(self.D)
+        PI1 = buckets.cell(self.PI1)
+
+        if cfun is not None:
+            cellbarycenter = self.smspace.cellbarycenter
+            k = buckets.cell(cfun(cellbarycenter))
+
+        K = []
+        for i, (D, PI) in enumerate(zip(DD, PI1)):
+            N = PI.shape[-1]
+            if p == 1:
+                tG = np.array([(0, 0, 0), (0, 1, 0), (0, 0, 1)])
             else:
-                cellbarycenter = self.smspace.cellbarycenter
-                k = cfun(cellbarycenter)
-                f1 = lambda x: (x[1].T@tG@x[1] + (np.eye(x[1].shape[1]) - x[0]@x[1]).T@(np.eye(x[1].shape[1]) - x[0]@x[1]))*x[2]
-                K = list(map(f1, zip(DD, PI1, k)))
-        else:
-            tG = list(map(f, G))
-            if cfun is None:
-                f1 = lambda x: x[1].T@x[2]@x[1] + (np.eye(x[1].shape[1]) - x[0]@x[1]).T@(np.eye(x[1].shape[1]) - x[0]@x[1])
-                K = list(map(f1, zip(DD, PI1, tG)))
+                tG = self.G.stacks[i].copy()
+                tG[:, 0, :] = 0
+            M = np.eye(N) - D@PI
+            if (p == 1) and (cfun is None):
+                S = M.swapaxes(-1, -2)@cyclic_matrix(N)@M
             else:
-                cellbarycenter = self.smspace.cellbarycenter
-                k = cfun(cellbarycenter)
-                f1 = lambda x: (x[1].T@x[2]@x[1] + (np.eye(x[1].shape[1]) - x[0]@x[1]).T@(np.eye(x[1].shape[1]) - x[0]@x[1]))*x[3]
-                K = list(map(f1, zip(DD, PI1, tG, k)))
-
-        f2 = lambda x: np.repeat(x, x.shape[0])
-        f3 = lambda x: np.tile(x, x.shape[0])
-        f4 = lambda x: x.flatten()
-
-        I = np.concatenate(list(map(f2, cd)))
-        J = np.concatenate(list(map(f3, cd)))
-        val = np.concatenate(list(map(f4, K)))
+                S = M.swapaxes(-1, -2)@M
+            val = PI.swapaxes(-1, -2)@tG@PI + S
+            if cfun is not None:
+                val *= k[i].reshape(-1, 1, 1)
+            K.append(val)
+
+        cell2dof = self.dof.cell2dof
         gdof = self.number_of_global_dofs()
-        A = csr_matrix((val, (I, J)), shape=(gdof, gdof), dtype=np.float)
+        A = buckets.assemble(K, cell2dof, gdof)
         return A
 
     def mass_matrix(self, cfun=None):
         area = self.smspace.cellmeasure
-        p = self.p
+        buckets = self.buckets
 
-        PI0 = self.PI0
-        D = self.D
-        H = self.H
-        C = self.C
-
-        cell2dof, cell2dofLocation = self.cell_to_dof()
-        NC = len(cell2dofLocation) - 1
-        cd = np.hsplit(cell2dof, cell2dofLocation[1:-1])
-        DD = np.vsplit(D, cell2dofLocation[1:-1])
+        DD = buckets.rows(self.D)
+        PI0 = buckets.cell(self.PI0)
+        H = buckets.cell(self.H)
+        area = buckets.cell(area)
 
-        f1 = lambda x: x[0]@x[1]
-        PIS = list(map(f1, zip(DD, PI0)))
+        K = []
+        for D, PI, h, a in zip(DD, PI0, H, area):
+            M = np.eye(D.shape[1]) - D@PI
+            val = PI.swapaxes(-1, -2)@h@PI
+            val += a.reshape(-1, 1, 1)*M.swapaxes(-1, -2)@M
+            K.append(val)
 
-        f1 = lambda x: x[0].T@x[1]@x[0] + x[3]*(np.eye(x[2].shape[1]) - x[2]).T@(np.eye(x[2].shape[1]) - x[2])
-        K = list(map(f1, zip(PI0, H, PIS, area)))
-
-        f2 = lambda x: np.repeat(x, x.shape[0])
-        f3 = lambda x: np.tile(x, x.shape[0])
-        f4 = lambda x: x.flatten()
-
-        I = np.concatenate(list(map(f2, cd)))
-        J = np.concatenate(list(map(f3, cd)))
-        val = np.concatenate(list(map(f4, K)))
+        cell2dof = self.dof.cell2dof
         gdof = self.number_of_global_dofs()
-        M = csr_matrix((val, (I, J)), shape=(gdof, gdof), dtype=np.float)
+        M = buckets.assemble(K, cell2dof, gdof)
         return M
 
     def cross_mass_matrix(self, wh):
         p = self.p
         mesh = self.mesh
-
-        area = self.smspace.cellmeasure
-        PI0 = self.PI0
+        buckets = self.buckets
 
         phi = self.smspace.basis
         def u(x, index):
@@ -432,75 +399,44 @@ class ConformingVirtualElementSpace2d():
             return np.einsum('ij, ijm, ijn->ijmn', wval, val, val)
         H = self.integralalg.integral(u, celltype=True)
 
-        cell2dof, cell2dofLocation = self.cell_to_dof()
-        NC = len(cell2dofLocation) - 1
-        cd = np.hsplit(cell2dof, cell2dofLocation[1:-1])
-
-        f1 = lambda x: x[0].T@x[1]@x[0]
-        K = list(map(f1, zip(PI0, H)))
+        K = [PI.swapaxes(-1, -2)@h@PI
+                for PI, h in zip(buckets.cell(self.PI0), buckets.cell(H))]
 
-        f2 = lambda x: np.repeat(x, x.shape[0])
-        f3 = lambda x: np.tile(x, x.shape[0])
-        f4 = lambda x: x.flatten()
-
-        I = np.concatenate(list(map(f2, cd)))
-        J = np.concatenate(list(map(f3, cd)))
-        val = np.concatenate(list(map(f4, K)))
+        cell2dof = self.dof.cell2dof
         gdof = self.number_of_global_dofs()
-        M = csr_matrix((val, (I, J)), shape=(gdof, gdof), dtype=np.float)
+        M = buckets.assemble(K, cell2dof, gdof)
         return M
 
     def source_vector(self, f):
-        PI0 = self.PI0
+        buckets = self.buckets
         phi = self.smspace.basis
         def u(x, index):
             return np.einsum('ij, ijm->ijm', f(x), phi(x, index=index))
         bb = self.integralalg.integral(u, celltype=True)
-        g = lambda x: x[0].T@x[1]
-        bb = np.concatenate(list(map(g, zip(PI0, bb))))
+        bb = [np.einsum('cji, cj->ci', PI, b)
+                for PI, b in zip(buckets.cell(self.PI0), buckets.cell(bb))]
         gdof = self.number_of_global_dofs()
-        b = np.bincount(self.dof.cell2dof, weights=bb, minlength=gdof)
+        b = buckets.assemble_vector(bb, self.dof.cell2dof, gdof)
         return b
 
     def chen_stability_term(self):
-        area = self.smspace.cellmeasure
-
-        p = self.p
-        G = self.G
-        D = self.D
-        PI1 = self.PI1
-
-        cell2dof, cell2dofLocation = self.cell_to_dof()
-        NC = len(cell2dofLocation) - 1
-        cd = np.hsplit(cell2dof, cell2dofLocation[1:-1])
-        DD = np.vsplit(D, cell2dofLocation[1:-1])
+        buckets = self.buckets
+        DD = buckets.rows(self.D)
+        PI1 = buckets.cell(self.PI1)
 
         tG = np.array([(0, 0, 0), (0, 1, 0), (0, 0, 1)])
-        def f1(x):
-            M = np.eye(x[1].shape[1])
-            M -= x[0]@x[1]
-            N = x[1].shape[1]
-            A = np.zeros((N, N))
-            idx = np.arange(N)
-            A[idx, idx] = 2
-            A[idx[:-1], idx[1:]] = -1
-            A[idx[1:], idx[:-1]] = -1
-            A[0, -1] = -1
-            A[-1, 0] = -1
-            return x[1].T@tG@x[1],  M.T@A@M
-        K = list(map(f1, zip(DD, PI1)))
-        f2 = lambda x: np.repeat(x, x.shape[0])
-        f3 = lambda x: np.tile(x, x.shape[0])
-        f4 = lambda x: x[0].flatten()
-        f5 = lambda x: x[1].flatten()
-
-        I = np.concatenate(list(map(f2, cd)))
-        J = np.concatenate(list(map(f3, cd)))
-        val0 = np.concatenate(list(map(f4, K)))
-        val1 = np.concatenate(list(map(f5, K)))
+        K0 = []
+        K1 = []
+        for D, PI in zip(DD, PI1):
+            N = PI.shape[-1]
+            M = np.eye(N) - D@PI
+            K0.append(PI.swapaxes(-1, -2)@tG@PI)
+            K1.append(M.swapaxes(-1, -2)@cyclic_matrix(N)@M)
+
+        cell2dof = self.dof.cell2dof
         gdof = self.number_of_global_dofs()
-        A = csr_matrix((val0, (I, J)), shape=(gdof, gdof), dtype=np.float)
-        S = csr_matrix((val1, (I, J)), shape=(gdof, gdof), dtype=np.float)
+        A = buckets.assemble(K0, cell2dof, gdof)
+        S = buckets.assemble(K1, cell2dof, gdof)
         return A, S
 
     def cell_to_dof(self):
@@ -578,13 +514,8 @@ class ConformingVirtualElementSpace2d():
             uh = self.smspace.interpolation(u, HB)
 
             cell2dof, cell2dofLocation = self.cell_to_dof()
-            NC = len(cell2dofLocation) - 1
-            cd = np.hsplit(cell2dof, cell2dofLocation[1:-1])
-            DD = np.vsplit(self.D, cell2dofLocation[1:-1])
-
             smldof = self.smspace.number_of_local_dofs()
-            f1 = lambda x: x[0]@x[1]
-            uh = np.concatenate(list(map(f1, zip(DD, uh.reshape(-1, smldof)))))
+            uh = self.buckets.rows_dot(self.D, uh.reshape(-1, smldof))
 
             ldof = self.number_of_local_dofs()
             w = np.repeat(1/self.smspace.cellmeasure, ldof)
@@ -621,6 +552,13 @@ class ConformingVirtualElementSpace2d():
         return np.zeros(shape, dtype=np.float)
 
     def matrix_D(self, H):
+        """
+
+        Notes
+        -----
+        D 的第 i 个单元的块是 (ldof_i, smldof) 的矩阵, 存在 layout 为 'rows'
+        的 CellMatrices 中, 按单元的顶点个数分组, 不形成稠密矩阵.
+        """
         p = self.p
         smldof = self.smspace.number_of_local_dofs()
         mesh = self.mesh
@@ -633,11 +571,13 @@ class ConformingVirtualElementSpace2d():
         isInEdge = (edge2cell[:, 0] != edge2cell[:, 1])
 
         cell2dof, cell2dofLocation = self.cell_to_dof()
-        D = np.ones((len(cell2dof), smldof), dtype=np.float)
+        D = self.buckets.zeros(smldof, layout='rows')
 
         if p == 1:
+            loc = np.arange(len(cell2dof)).reshape(-1, 1)
             bc = np.repeat(self.smspace.cellbarycenter, NV, axis=0)
-            D[:, 1:] = (node[cell, :] - bc)/np.repeat(h, NV).reshape(-1, 1)
+            D.set(loc, 0, 1)
+            D.set(loc, np.arange(1, 3), (node[cell, :] - bc)/np.repeat(h, NV).reshape(-1, 1))
             return D
 
         qf = GaussLobattoQuadrature(p+1)
@@ -645,32 +585,42 @@ class ConformingVirtualElementSpace2d():
         ps = np.einsum('ij, kjm->ikm', bcs, node[edge])
         phi0 = self.smspace.basis(ps[:-1], index=edge2cell[:, 0])
         phi1 = self.smspace.basis(ps[p:0:-1, isInEdge, :], index=edge2cell[isInEdge, 1])
+        r = np.arange(smldof)
         idx = cell2dofLocation[edge2cell[:, 0]] + edge2cell[:, 2]*p + np.arange(p).reshape(-1, 1)
-        D[idx, :] = phi0
+        D.set(idx[..., None], r, phi0)
         idx = cell2dofLocation[edge2cell[isInEdge, 1]] + edge2cell[isInEdge, 3]*p + np.arange(p).reshape(-1, 1)
-        D[idx, :] = phi1
+        D.set(idx[..., None], r, phi1)
         if p > 1:
             area = self.smspace.cellmeasure
             idof = (p-1)*p//2 # the number of dofs of scale polynomial space with degree p-2
             idx = cell2dofLocation[1:].reshape(-1, 1) + np.arange(-idof, 0)
-            D[idx, :] = H[:, :idof, :]/area.reshape(-1, 1, 1)
+            D.set(idx[..., None], r, H[:, :idof, :]/area.reshape(-1, 1, 1))
         return D
 
     def matrix_B(self):
+        """
+
+        Notes
+        -----
+        B 的第 i 个单元的块是 (smldof, ldof_i) 的矩阵, 存在 layout 为 'cols'
+        的 CellMatrices 中, 边界上的积分直接累加到各个单元的块中.
+        """
         p = self.p
         smldof = self.smspace.number_of_local_dofs()
         mesh = self.mesh
         NV = mesh.number_of_vertices_of_cells()
         h = self.smspace.cellsize
         cell2dof, cell2dofLocation = self.cell_to_dof()
-        B = np.zeros((smldof, cell2dof.shape[0]), dtype=np.float)
+        B = self.buckets.zeros(smldof, layout='cols')
         if p == 1:
-            B[0, :] = 1/np.repeat(NV, NV)
-            B[1:, :] = mesh.node_normal().T/np.repeat(h, NV).reshape(1, -1)
+            loc = np.arange(len(cell2dof))
+            B.set(loc, 0, 1/np.repeat(NV, NV))
+            B.set(loc, np.arange(1, 3).reshape(-1, 1),
+                    mesh.node_normal().T/np.repeat(h, NV).reshape(1, -1))
             return B
         else:
             idx = cell2dofLocation[0:-1] + NV*p
-            B[0, idx] = 1
+            B.set(idx, 0, 1)
             idof = (p-1)*p//2
             start = 3
             r = np.arange(1, p+1)
@@ -679,8 +629,8 @@ class ConformingVirtualElementSpace2d():
                 idx0 = np.arange(start, start+i-1)
                 idx1 =  np.arange(start-2*i+1, start-i)
                 idx1 = idx.reshape(-1, 1) + idx1
-                B[idx0, idx1] -= r[i-2::-1]
-                B[idx0+2, idx1] -= r[0:i-1]
+                B.add(idx1, idx0, -r[i-2::-1], unique=True)
+                B.add(idx1, idx0+2, -r[0:i-1], unique=True)
                 start += i+1
 
             node = mesh.entity('node')
@@ -700,11 +650,15 @@ class ConformingVirtualElementSpace2d():
             # i: the virtual element basis number
 
             NV = mesh.number_of_vertices_of_cells()
+            m = np.arange(smldof).reshape(-1, 1, 1)
 
+            # 一条边的前 p 个点是单元的不同自由度, 最后一个点是下一条边的
+            # 起点, 分两次累加, 每次都没有重复的位置
             val = np.einsum('i, ijmk, jk->mji', ws, gphi0, nm, optimize=True)
             idx = cell2dofLocation[edge2cell[:, [0]]] + \
                     (edge2cell[:, [2]]*p + np.arange(p+1))%(NV[edge2cell[:, [0]]]*p)
-            np.add.at(B, (np.s_[:], idx), val)
+            B.add(idx[:, :p], m, val[..., :p], unique=True)
+            B.add(idx[:, p:], m, val[..., p:], unique=True)
 
 
             if isInEdge.sum() > 0:
@@ -712,7 +666,8 @@ class ConformingVirtualElementSpace2d():
                 idx = cell2dofLocation[edge2cell[isInEdge, 1]].reshape(-1, 1) + \
                         (edge2cell[isInEdge, 3].reshape(-1, 1)*p + np.arange(p+1)) \
                         %(NV[edge2cell[isInEdge, 1]].reshape(-1, 1)*p)
-                np.add.at(B, (np.s_[:], idx), val)
+                B.add(idx[:, :p], m, val[..., :p], unique=True)
+                B.add(idx[:, p:], m, val[..., p:], unique=True)
             return B
 
     def matrix_G(self, B, D):
@@ -720,44 +675,35 @@ class ConformingVirtualElementSpace2d():
         if p == 1:
             G = np.array([(1, 0, 0), (0, 1, 0), (0, 0, 1)])
         else:
-            cell2dof, cell2dofLocation = self.cell_to_dof()
-            BB = np.hsplit(B, cell2dofLocation[1:-1])
-            DD = np.vsplit(D, cell2dofLocation[1:-1])
-            g = lambda x: x[0]@x[1]
-            G = list(map(g, zip(BB, DD)))
+            buckets = self.buckets
+            G = [b@d for b, d in zip(buckets.cols(B), buckets.rows(D))]
+            G = buckets.matrices(G)
         return G
 
     def matrix_C(self, H, PI1):
         p = self.p
-
-        smldof = self.smspace.number_of_local_dofs()
+        buckets = self.buckets
         idof = (p-1)*p//2
+        area = buckets.cell(self.smspace.cellmeasure)
 
-        mesh = self.mesh
-        NV = mesh.number_of_vertices_of_cells()
-        d = lambda x: x[0]@x[1]
-        C = list(map(d, zip(H, PI1)))
-        if p == 1:
-            return C
-        else:
-            l = lambda x: np.r_[
-                    '0',
-                    np.r_['1', np.zeros((idof, p*x[0])), x[1]*np.eye(idof)],
-                    x[2][idof:, :]]
-            return list(map(l, zip(NV, self.smspace.cellmeasure, C)))
+        C = [h@pi for h, pi in zip(buckets.cell(H), buckets.cell(PI1))]
+        if p > 1:
+            # 前 idof 行换成内部自由度的矩: [0, area*I]
+            for c, a in zip(C, area):
+                c[:, :idof, :] = 0
+                c[:, :idof, -idof:] = a.reshape(-1, 1, 1)*np.eye(idof)
+        return buckets.matrices(C)
 
     def matrix_PI_0(self, H, C):
-        cell2dof, cell2dofLocation = self.cell_to_dof()
-        pi0 = lambda x: inv(x[0])@x[1]
-        return list(map(pi0, zip(H, C)))
+        buckets = self.buckets
+        PI0 = [np.linalg.solve(h, c) for h, c in zip(buckets.cell(H), buckets.cell(C))]
+        return buckets.matrices(PI0)
 
     def matrix_PI_1(self, G, B):
         p = self.p
-        cell2dof, cell2dofLocation = self.cell_to_dof()
+        buckets = self.buckets
         if p == 1:
-            return np.hsplit(B, cell2dofLocation[1:-1])
+            return buckets.matrices(buckets.cols(B))
         else:
-            BB = np.hsplit(B, cell2dofLocation[1:-1])
-            g = lambda x: inv(x[0])@x[1]
-            return list(map(g, zip(G, BB)))
-
+            PI1 = [np.linalg.solve(g, b) for g, b in zip(buckets.cell(G), buckets.cols(B))]
+            return buckets.matrices(PI1)
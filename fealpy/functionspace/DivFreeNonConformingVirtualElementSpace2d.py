@@ -5,6 +5,7 @@ import scipy.io as sio
 
 from .Function import Function
 from .ScaledMonomialSpace2d import ScaledMonomialSpace2d
+from .CellBuckets import CellBuckets
 from ..quadrature import GaussLegendreQuadrature
 from ..quadrature import PolygonMeshIntegralAlg
 from ..common import ranges
@@ -93,6 +94,8 @@ class DivFreeNonConformingVirtualElementSpace2d:
         self.smspace = ScaledMonomialSpace2d(mesh, p, q=q)
         self.mesh = mesh
         self.dof = DFNCVEMDof2d(mesh, p) # 注意这里只是边上的标量的自由度管理对 象
+        # 按单元的边数分组, 同一组单元的投影矩阵一起计算
+        self.buckets = CellBuckets(self.dof.cell2dofLocation)
         self.integralalg = self.smspace.integralalg
 
         self.CM = self.smspace.cell_mass_matrix()
@@ -150,60 +153,57 @@ class DivFreeNonConformingVirtualElementSpace2d:
 
     def project_to_smspace(self, uh):
         p = self.p
-        idof = p*(p-1) 
-        NE = self.mesh.number_of_edges()
-        NC = self.mesh.number_of_cells()
-        cell2dof = self.dof.cell2dof
-        cell2dofLocation = self.dof.cell2dofLocation
         smldof = self.smspace.number_of_local_dofs(p=p)
         sh = self.smspace.function(dim=2)
         c2d = self.smspace.cell_to_dof()
-        def f(i):
-            PI0 = self.PI0[i]
-            s0 = slice(cell2dofLocation[i], cell2dofLocation[i+1])
-            D0 = self.D[0][s0, :]
-            D1 = self.D[1][i, 0]
-            D2 = self.D[1][i, 1]
-
-            D = block([
-                [D0,  0],
-                [ 0, D0],
-                [D1, D2]])
-
-
-            idx = cell2dof[cell2dofLocation[i]:cell2dofLocation[i+1]]
-            x0 = uh[idx]
-            x1 = uh[idx+NE*p]
-            x2 = np.zeros(idof, dtype=self.ftype)
-            start = 2*NE*p + i*idof
-            x2[:] = uh[start:start+idof]
-            x = np.r_[x0, x1, x2]
-            y = (PI0[:2*smldof]@x).flat
-            sh[c2d[i], 0] = y[:smldof]
-            sh[c2d[i], 1] = y[smldof:]
-        list(map(f, range(NC)))
+        buckets = self.buckets
+        for c, PI0, cd in zip(buckets.cells, buckets.cell(self.PI0), self.bucket_to_dof()):
+            y = np.einsum('cij, cj->ci', PI0[:, :2*smldof], uh[cd])
+            sh[c2d[c], 0] = y[:, :smldof]
+            sh[c2d[c], 1] = y[:, smldof:]
         return sh
 
-    def matrix_PI0(self):
+    def bucket_to_dof(self):
+        """
+
+        Notes
+        -----
+        每组单元的全局自由度编号, 每组为 (nc, 2*NV*p + p*(p-1)), 依次是
+        两个分量的边自由度和单元内部自由度.
+        """
         p = self.p
-        NC = self.mesh.number_of_cells()
+        NE = self.mesh.number_of_edges()
+        idof = p*(p-1)
         cell2dof = self.dof.cell2dof
-        cell2dofLocation = self.dof.cell2dofLocation
-        def f(i):
-            G = block([
-                [self.G[0][i]  ,   self.G[2][i]  , self.B[0][i]],
-                [self.G[2][i].T,   self.G[1][i]  , self.B[1][i]],
-                [self.B[0][i].T,   self.B[1][i].T,            0]]
-                )
-            s = slice(cell2dofLocation[i], cell2dofLocation[i+1])
-            R = block([
-                [self.R[0][0][:, s], self.R[0][1][:, s], self.R[0][2][i]],
-                [self.R[1][0][:, s], self.R[1][1][:, s], self.R[1][2][i]],
-                [   self.J[0][:, s],    self.J[1][:, s],    self.J[2][i]]])
-            PI = inv(G)@R
-            return PI
-        PI0 = list(map(f, range(NC)))
-        return PI0
+        cd = []
+        for c, idx in zip(self.buckets.cells, self.buckets.dofs):
+            cd0 = cell2dof[idx]
+            cd1 = 2*NE*p + c[:, None]*idof + np.arange(idof)
+            cd.append(np.concatenate((cd0, NE*p + cd0, cd1), axis=1))
+        return cd
+
+    def matrix_PI0(self):
+        p = self.p
+        buckets = self.buckets
+        cell, cols = buckets.cell, buckets.cols
+        G, B, R, J = self.G, self.B, self.R, self.J
+        PI0 = []
+        for G0, G1, G2, B0, B1, R00, R01, R02, R10, R11, R12, J0, J1, J2 in zip(
+                cell(G[0]), cell(G[1]), cell(G[2]), cell(B[0]), cell(B[1]),
+                cols(R[0][0]), cols(R[0][1]), cell(R[0][2]),
+                cols(R[1][0]), cols(R[1][1]), cell(R[1][2]),
+                cols(J[0]), cols(J[1]), cell(J[2])):
+            Z = np.zeros((len(G0), B0.shape[-1], B0.shape[-1]), dtype=self.ftype)
+            GG = np.block([
+                [G0,                   G2,                   B0],
+                [G2.swapaxes(-1, -2),  G1,                   B1],
+                [B0.swapaxes(-1, -2),  B1.swapaxes(-1, -2),  Z]])
+            RR = np.block([
+                [R00, R01, R02],
+                [R10, R11, R12],
+                [ J0,  J1,  J2]])
+            PI0.append(np.linalg.solve(GG, RR))
+        return buckets.matrices(PI0)
 
     def matrix_Q_L(self):
         p = self.p
@@ -661,68 +661,57 @@ class DivFreeNonConformingVirtualElementSpace2d:
         """
         p = self.p # 空间次数
         idof0 = (p+1)*p//2-1 # k-1 次多项式空间的梯度空间
-        cell2dof = self.dof.cell2dof
-        cell2dofLocation = self.dof.cell2dofLocation
         mesh = self.mesh
-        NE = mesh.number_of_edges()
-        NC = self.mesh.number_of_cells()
         cell, cellLocation = mesh.entity('cell')
         cell2edge = mesh.ds.cell_to_edge()
 
         smldof = self.smspace.number_of_local_dofs(p=p)
 
         eh = mesh.entity_measure('edge')
-        ch = self.smspace.cellsize
         area = self.smspace.cellmeasure
-        Z0 = np.zeros((idof0, idof0), dtype=self.ftype)
-        def f1(i):
-            s0 = slice(cell2dofLocation[i], cell2dofLocation[i+1])
-            PI0 = self.PI0[i]
-            D = np.eye(PI0.shape[1])
-            D0 = self.D[0][s0, :]
-            D1 = self.D[1][i, 0]
-            D2 = self.D[1][i, 1]
-            D -= block([
-                [D0,  0],
-                [ 0, D0],
-                [D1, D2]])@PI0[:2*smldof]
-
-            s1 = slice(cellLocation[i], cellLocation[i+1]) 
-            S = list(self.H1[cell2edge[s1]]*eh[cell2edge[s1]][:, None, None])
-            S += S
-            S.append(Z0)
+        buckets = self.buckets
+        cell, cols = buckets.cell, buckets.cols
+        U = [[cols(U0), cols(U1), cell(U2)] for U0, U1, U2 in self.U]
+        U = [np.block([[U0[k], U1[k], U2[k]] for U0, U1, U2 in U])
+                for k in range(len(buckets))]
+
+        A = []
+        for c, PI0, D0, D1, UU, H0 in zip(buckets.cells,
+                cell(self.PI0), buckets.rows(self.D[0]), cell(self.D[1]),
+                U, cell(self.H0)):
+            NC, N = PI0.shape[0], PI0.shape[-1]
+            n = D0.shape[1] # 单元边上一个分量的自由度个数
+            Z = np.zeros((NC, n, smldof), dtype=self.ftype)
+            D = np.eye(N) - np.block([
+                [D0, Z],
+                [Z, D0],
+                [D1[:, 0], D1[:, 1]]])@PI0[:, :2*smldof]
+
+            # 边上的 p x p 块在对角线上出现两次, 然后是 idof0 个零, p > 2
+            # 时最后是 inv(Q)*area
+            NV = n//p
+            e = cell2edge[cellLocation[c, None] + np.arange(NV)]
+            E = self.H1[e]*eh[e, None, None] # (NC, NV, p, p)
+            k = np.arange(2*NV)[:, None, None]*p
+            S = np.zeros((NC, N, N), dtype=self.ftype)
+            S[:, k + np.arange(p)[:, None], k + np.arange(p)] = np.concatenate((E, E), axis=1)
             if p > 2:
-                S.append(inv(self.Q[i])*area[i])
-            S = D.T@block_diag(S)@D
-            U = block([
-                [self.U[0][0][:, s0], self.U[0][1][:, s0], self.U[0][2][i]],
-                [self.U[1][0][:, s0], self.U[1][1][:, s0], self.U[1][2][i]],
-                [self.U[2][0][:, s0], self.U[2][1][:, s0], self.U[2][2][i]]])
-            H0 = block([
-                [self.H0[i],              0,          0],
-                [         0, 0.5*self.H0[i],          0],
-                [         0,              0, self.H0[i]]])
-            return S + U.T@H0@U 
-
-        A = list(map(f1, range(NC)))
+                S[:, 2*n+idof0:, 2*n+idof0:] = inv(self.Q[c])*area[c, None, None]
+            S = D.swapaxes(-1, -2)@S@D
 
+            Z = np.zeros_like(H0)
+            H0 = np.block([
+                [H0,       Z,  Z],
+                [ Z, 0.5*H0,  Z],
+                [ Z,       Z, H0]])
+            A.append(S + UU.swapaxes(-1, -2)@H0@UU)
+
+        A = buckets.matrices(A)
         if celltype:
             return A
-        
-        idof = p*(p-1) #
-        def f2(i):
-            s = slice(cell2dofLocation[i], cell2dofLocation[i+1])
-            cd = np.r_[cell2dof[s], NE*p + cell2dof[s], 2*NE*p + np.arange(i*idof, (i+1)*idof)]
-            return np.meshgrid(cd, cd)
-        
-        idx = list(map(f2, range(NC)))
-        I = np.concatenate(list(map(lambda x: x[1].flat, idx)))
-        J = np.concatenate(list(map(lambda x: x[0].flat, idx)))
 
-        gdof = self.number_of_global_dofs() 
-
-        A = np.concatenate(list(map(lambda x: x.flat, A)))
-        A = csr_matrix((A, (I, J)), shape=(gdof, gdof), dtype=self.ftype)
+        gdof = self.number_of_global_dofs()
+        A = buckets.assemble(A, self.bucket_to_dof(), gdof, dtype=self.ftype)
         return  A
 
     def matrix_P(self):
@@ -791,14 +780,11 @@ class DivFreeNonConformingVirtualElementSpace2d:
                 return np.einsum('ijm, ijn->ijmn', 
                         self.smspace.basis(x, index=index, p=p), f(x))
             bb = self.integralalg.integral(u0, celltype=True) # (NC, ndof, 2)
-            b = np.zeros((NC, idof0), dtype=self.ftype)
-            def u1(i):
-                PI0 = self.PI0[i]
-                n = cell2dofLocation[i+1] - cell2dofLocation[i] 
-                b[i, :] = bb[i, :, 0]@PI0[:ndof, 2*n:2*n+idof0] + bb[i, :,
-                        1]@PI0[ndof:2*ndof, 2*n:2*n+idof0]
-            list(map(u1, range(NC)))
-            return b # (NC, idof0)
+            buckets = self.buckets
+            b = [np.einsum('ci, cij->cj', b[..., 0], PI0[:, :ndof, -idof:])
+                    + np.einsum('ci, cij->cj', b[..., 1], PI0[:, ndof:2*ndof, -idof:])
+                    for b, PI0 in zip(buckets.cell(bb), buckets.cell(self.PI0))]
+            return buckets.scatter(b)[:, :idof0] # (NC, idof0)
         else:
             area = self.smspace.cellmeasure
             ndof = self.smspace.number_of_local_dofs(p=p-2)
@@ -836,24 +822,12 @@ class DivFreeNonConformingVirtualElementSpace2d:
                 return np.einsum('ijm, ijn->ijmn', 
                         self.smspace.basis(x, index=index, p=p), f(x))
             bb = self.integralalg.integral(u0, celltype=True) # (NC, ndof, 2)
-            cell2dof = self.dof.cell2dof # 这里只有边上的自由度
-            cell2dofLocation = self.dof.cell2dofLocation
-            eb = np.zeros((2, len(cell2dof)), dtype=self.ftype)
-            cb = np.zeros((NC, idof), dtype=self.ftype)
-            def u1(i):
-                PI0 = self.PI0[i]
-                n = cell2dofLocation[i+1] - cell2dofLocation[i] 
-                s = slice(cell2dofLocation[i], cell2dofLocation[i+1])
-                eb[0, s] = bb[i, :, 0]@PI0[:ndof, :n] + bb[i, :, 1]@PI0[ndof:2*ndof, :n]
-                eb[1, s] = bb[i, :, 0]@PI0[:ndof, n:2*n] + bb[i, :, 1]@PI0[ndof:2*ndof, n:2*n]
-                cb[i, :] = bb[i, :, 0]@PI0[:ndof, 2*n:] + bb[i, :, 1]@PI0[ndof:2*ndof, 2*n:]
-            list(map(u1, range(NC)))
+            buckets = self.buckets
+            b = [np.einsum('ci, cij->cj', b[..., 0], PI0[:, :ndof])
+                    + np.einsum('ci, cij->cj', b[..., 1], PI0[:, ndof:2*ndof])
+                    for b, PI0 in zip(buckets.cell(bb), buckets.cell(self.PI0))]
             gdof = self.number_of_global_dofs()
-            b = np.zeros((gdof, ), dtype=self.ftype)
-            np.add.at(b, cell2dof, eb[0])
-            np.add.at(b[NE*p:], cell2dof, eb[1])
-            c2d = self.cell_to_dof(doftype='cell')
-            np.add.at(b, c2d, cb)
+            b = buckets.assemble_vector(b, self.bucket_to_dof(), gdof)
             return b
         else:
             area = self.smspace.cellmeasure
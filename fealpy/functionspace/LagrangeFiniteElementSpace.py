@@ -915,6 +915,18 @@ class LagrangeFiniteElementSpace():
         return A 
 
     def source_vector(self, f, dim=None, q=None):
+        """
+
+        Notes
+        -----
+        f 也可以是一组函数 (列表或者元组), 这时一次组装所有的载荷向量, 返回
+        形状为 (gdof, nrhs) 的数组, 第 i 列对应 f[i], 见 source_vectors.
+        """
+        if isinstance(f, (list, tuple)):
+            if dim is not None:
+                raise ValueError("a list of sources only supports scalar functions!")
+            return self.source_vectors(f)
+
         p = self.p
         cellmeasure = self.cellmeasure
         bcs, ws = self.integrator.get_quadrature_points_and_weights()
@@ -952,6 +964,46 @@ class LagrangeFiniteElementSpace():
 
         return b
 
+    def source_vectors(self, fs):
+        """
+
+        Parameters
+        ----------
+        fs : 标量函数 (或者常数) 的列表, 函数可以是 cartesian 或者
+            barycentric 的
+
+        Notes
+        -----
+        一次组装多个载荷向量, 返回 (gdof, nrhs) 的数组. 积分点, 基函数的值
+        和到全局自由度的累加对所有的右端只做一次, 累加是一次稀疏矩阵和
+        (NC*ldof, nrhs) 数组的乘积.
+        """
+        bcs, ws = self.integrator.get_quadrature_points_and_weights()
+        NQ = len(ws)
+        NC = self.mesh.number_of_cells()
+        pp = None
+        fval = np.zeros((NQ, NC, len(fs)), dtype=self.ftype)
+        for i, f in enumerate(fs):
+            if np.isscalar(f):
+                fval[..., i] = f
+            elif f.coordtype == 'cartesian':
+                if pp is None:
+                    pp = self.mesh.bc_to_point(bcs)
+                fval[..., i] = f(pp)
+            elif f.coordtype == 'barycentric':
+                val = f(bcs)
+                fval[..., i] = val[:, None] if len(val.shape) == 1 else val
+
+        phi = self.basis(bcs) # (NQ, 1, ldof)
+        bb = np.einsum('q, qcr, qci, c->cir', ws, fval, phi, self.cellmeasure)
+
+        gdof = self.number_of_global_dofs()
+        cell2dof = self.cell_to_dof()
+        ldof = cell2dof.shape[1]
+        S = csr_matrix((np.ones(NC*ldof), (cell2dof.flat, range(NC*ldof))),
+                shape=(gdof, NC*ldof))
+        return S@bb.reshape(NC*ldof, -1)
+
     def set_dirichlet_bc(self, uh, gD, threshold=None, q=None):
         """
         初始化解 uh  的第一类边界条件。
@@ -6,6 +6,7 @@ from .Function import Function
 from ..quadrature import GaussLegendreQuadrature
 from ..quadrature import PolygonMeshIntegralAlg
 from .ScaledMonomialSpace2d import ScaledMonomialSpace2d
+from .CellBuckets import CellBuckets
 
 class NCVEMDof2d():
     """
@@ -121,6 +122,7 @@ class NonConformingVirtualElementSpace2d():
         self.smspace = ScaledMonomialSpace2d(mesh, p, q=q)
         self.mesh = mesh
         self.dof = NCVEMDof2d(mesh, p)
+        self.buckets = CellBuckets(self.dof.cell2dofLocation)
 
         self.integralalg = self.smspace.integralalg
 
@@ -140,84 +142,63 @@ class NonConformingVirtualElementSpace2d():
         """
         p = self.p
         cell2dof = self.dof.cell2dof
-        cell2dofLocation = self.dof.cell2dofLocation
-        cd = np.hsplit(cell2dof, cell2dofLocation[1:-1])
-        g = lambda x: x[0]@uh[x[1]]
         S = self.smspace.function()
-        S[:] = np.concatenate(list(map(g, zip(self.PI1, cd))))
+        S[:] = self.buckets.matvec(self.PI1, uh, cell2dof).reshape(-1)
         return S
 
     def stiff_matrix(self):
         p = self.p
-        G = self.G
-        D = self.D
-        PI1 = self.PI1
+        buckets = self.buckets
+        DD = buckets.rows(self.D)
+        PI1 = buckets.cell(self.PI1)
+        G = buckets.cell(self.G)
+
+        K = []
+        for D, PI, g in zip(DD, PI1, G):
+            tG = g.copy()
+            tG[:, 0, :] = 0
+            M = np.eye(PI.shape[-1]) - D@PI
+            K.append(PI.swapaxes(-1, -2)@tG@PI + M.swapaxes(-1, -2)@M)
 
-        cell2dof, cell2dofLocation = self.dof.cell2dof, self.dof.cell2dofLocation
-        cd = np.hsplit(cell2dof, cell2dofLocation[1:-1])
-
-        DD = np.vsplit(D, cell2dofLocation[1:-1])
-
-        def f(x):
-            x[0, :] = 0
-            return x
-        tG = list(map(f, G))
-
-        f1 = lambda x: x[1].T@x[2]@x[1] + (np.eye(x[1].shape[1]) - x[0]@x[1]).T@(np.eye(x[1].shape[1]) - x[0]@x[1])
-        K = list(map(f1, zip(DD, PI1, tG)))
-
-        f2 = lambda x: np.repeat(x, x.shape[0])
-        f3 = lambda x: np.tile(x, x.shape[0])
-        f4 = lambda x: x.flatten()
-
-        I = np.concatenate(list(map(f2, cd)))
-        J = np.concatenate(list(map(f3, cd)))
-        val = np.concatenate(list(map(f4, K)))
+        cell2dof = self.dof.cell2dof
         gdof = self.number_of_global_dofs()
-        A = csr_matrix((val, (I, J)), shape=(gdof, gdof), dtype=np.float)
+        A = buckets.assemble(K, cell2dof, gdof)
         return A
 
     def mass_matrix(self):
         p = self.p
+        buckets = self.buckets
 
         # the projector matrix
-        D = self.D
-        H = self.H
-        C = self.C
+        DD = buckets.rows(self.D)
+        PI0 = buckets.cell(self.PI0)
+        H = buckets.cell(self.H)
+        area = buckets.cell(self.smspace.cellmeasure)
+
+        K = []
+        for D, PI, h, a in zip(DD, PI0, H, area):
+            M = np.eye(D.shape[1]) - D@PI
+            val = PI.swapaxes(-1, -2)@h@PI
+            val += a.reshape(-1, 1, 1)*M.swapaxes(-1, -2)@M
+            K.append(val)
 
         # the dof arrays
-        cell2dof, cell2dofLocation = self.dof.cell2dof, self.dof.cell2dofLocation
-        cd = np.hsplit(cell2dof, cell2dofLocation[1:-1])
-
-        f1 = lambda x: x[0]@x[1]
-        PI0 = self.PI0
-        DD = np.vsplit(D, cell2dofLocation[1:-1])
-        PIS = list(map(f1, zip(DD, PI0)))
-
-        f1 = lambda x: x[0].T@x[1]@x[0] + x[3]*(np.eye(x[2].shape[1]) - x[2]).T@(np.eye(x[2].shape[1]) - x[2])
-        K = list(map(f1, zip(PI0, H, PIS, self.smspace.cellmeasure)))
-
-        f2 = lambda x: np.repeat(x, x.shape[0])
-        f3 = lambda x: np.tile(x, x.shape[0])
-        f4 = lambda x: x.flatten()
-
-        I = np.concatenate(list(map(f2, cd)))
-        J = np.concatenate(list(map(f3, cd)))
-        val = np.concatenate(list(map(f4, K)))
+        cell2dof = self.dof.cell2dof
         gdof = self.number_of_global_dofs()
-        M = csr_matrix((val, (I, J)), shape=(gdof, gdof), dtype=np.float)
+        M = buckets.assemble(K, cell2dof, gdof)
         return M
 
 
     def source_vector(self, f):
+        buckets = self.buckets
         phi = self.smspace.basis
         def u(x, index):
             return np.einsum('ij, ijm->ijm', f(x), phi(x, index=index))
         bb = self.integralalg.integral(u, celltype=True)
-        g = lambda x: x[0].T@x[1]
-        bb = np.concatenate(list(map(g, zip(self.PI0, bb))))
+        bb = [np.einsum('cji, cj->ci', PI, b)
+                for PI, b in zip(buckets.cell(self.PI0), buckets.cell(bb))]
         gdof = self.number_of_global_dofs()
-        b = np.bincount(self.dof.cell2dof, weights=bb, minlength=gdof)
+        b = buckets.assemble_vector(bb, self.dof.cell2dof, gdof)
         return b
 
     def set_dirichlet_bc(self, uh, g, is_dirichlet_boundary=None):
@@ -345,6 +326,12 @@ class NonConformingVirtualElementSpace2d():
         return H
 
     def matrix_D(self, H):
+        """
+
+        Notes
+        -----
+        D 存在 layout 为 'rows' 的 CellMatrices 中, 见 CellBuckets.zeros.
+        """
         p = self.p
         smldof = self.smspace.number_of_local_dofs()
         mesh = self.mesh
@@ -355,7 +342,7 @@ class NonConformingVirtualElementSpace2d():
         isInEdge = (edge2cell[:, 0] != edge2cell[:, 1])
 
         cell2dof, cell2dofLocation = self.cell_to_dof()
-        D = np.ones((len(cell2dof), smldof), dtype=np.float)
+        D = self.buckets.zeros(smldof, layout='rows')
 
         qf = GaussLegendreQuadrature(p)
         bcs = qf.quadpts
@@ -363,18 +350,25 @@ class NonConformingVirtualElementSpace2d():
         phi0 = self.smspace.basis(ps, index=edge2cell[:, 0])
         phi1 = self.smspace.basis(ps[p-1::-1, isInEdge, :], index=edge2cell[isInEdge, 1])
 
+        r = np.arange(smldof)
         idx = cell2dofLocation[edge2cell[:, 0]] + edge2cell[:, 2]*p + np.arange(p).reshape(-1, 1)
-        D[idx, :] = phi0
+        D.set(idx[..., None], r, phi0)
 
         idx = cell2dofLocation[edge2cell[isInEdge, 1]] + edge2cell[isInEdge, 3]*p + np.arange(p).reshape(-1, 1)
-        D[idx, :] = phi1
+        D.set(idx[..., None], r, phi1)
         if p > 1:
             idof = (p-1)*p//2  # the number of dofs of scale polynomial space with degree p-2
             idx = cell2dofLocation[1:].reshape(-1, 1) + np.arange(-idof, 0)
-            D[idx, :] = H[:, :idof, :]/self.smspace.cellmeasure.reshape(-1, 1, 1)
+            D.set(idx[..., None], r, H[:, :idof, :]/self.smspace.cellmeasure.reshape(-1, 1, 1))
         return D
 
     def matrix_B(self):
+        """
+
+        Notes
+        -----
+        B 存在 layout 为 'cols' 的 CellMatrices 中, 见 CellBuckets.zeros.
+        """
         p = self.p
         smldof = self.smspace.number_of_local_dofs()
 
@@ -389,7 +383,7 @@ class NonConformingVirtualElementSpace2d():
         qf = GaussLegendreQuadrature(p)
         bcs, ws = qf.get_quadrature_points_and_weights()
 
-        B = np.zeros((smldof, cell2dof.shape[0]), dtype=np.float)
+        B = self.buckets.zeros(smldof, layout='cols')
 
         # the internal part
         if p > 1:
@@ -402,8 +396,8 @@ class NonConformingVirtualElementSpace2d():
                 idx0 = np.arange(start, start+i-1)
                 idx1 = np.arange(start-2*i+1, start-i)
                 idx1 = idx.reshape(-1, 1) + idx1
-                B[idx0, idx1] -= r[i-2::-1]
-                B[idx0+2, idx1] -= r[0:i-1]
+                B.add(idx1, idx0, -r[i-2::-1], unique=True)
+                B.add(idx1, idx0+2, -r[0:i-1], unique=True)
                 start += i+1
 
         # the normal deriveration part
@@ -417,28 +411,25 @@ class NonConformingVirtualElementSpace2d():
         # m: the scaled basis number,
         # j: the edge number,
         # i: the virtual element basis number
+        m = np.arange(smldof).reshape(-1, 1, 1)
         val = np.einsum('i, ijmk, jk->mji', ws, gphi0, nm, optimize=True)
         idx = (cell2dofLocation[edge2cell[:, 0]]
                 + edge2cell[:, 2]*p).reshape(-1, 1) + np.arange(p)
-        B[:, idx] += val
-        B[0, idx] = h.reshape(-1, 1)*ws
+        B.add(idx, m, val, unique=True)
+        B.set(idx, 0, h.reshape(-1, 1)*ws)
 
         val = np.einsum('i, ijmk, jk->mji', ws, gphi1, -nm[isInEdge],
                 optimize=True)
         idx = ( cell2dofLocation[edge2cell[isInEdge, 1]]
                 + edge2cell[isInEdge, 3]*p).reshape(-1, 1) + np.arange(p)
-        B[:, idx] += val
-        B[0, idx] = h[isInEdge].reshape(-1, 1)*ws
+        B.add(idx, m, val, unique=True)
+        B.set(idx, 0, h[isInEdge].reshape(-1, 1)*ws)
         return B
 
     def matrix_G(self, B, D):
-        p = self.p
-        cell2dof, cell2dofLocation = self.dof.cell2dof, self.dof.cell2dofLocation
-        BB = np.hsplit(B, cell2dofLocation[1:-1])
-        DD = np.vsplit(D, cell2dofLocation[1:-1])
-        g = lambda x: x[0]@x[1]
-        G = list(map(g, zip(BB, DD)))
-        return G
+        buckets = self.buckets
+        G = [b@d for b, d in zip(buckets.cols(B), buckets.rows(D))]
+        return buckets.matrices(G)
 
     def matrix_G_test(self, integralalg):
         def u(x, index=None):
@@ -451,33 +442,23 @@ class NonConformingVirtualElementSpace2d():
 
     def matrix_C(self, H, PI1):
         p = self.p
-
-        smldof = self.smspace.number_of_local_dofs()
+        buckets = self.buckets
         idof = (p-1)*p//2
+        area = buckets.cell(self.smspace.cellmeasure)
 
-        mesh = self.mesh
-        cell2dof, cell2dofLocation = self.dof.cell2dof, self.dof.cell2dofLocation
-        d = lambda x: x[0]@x[1]
-        C = list(map(d, zip(H, PI1)))
-        if p == 1:
-            return C
-        else:
-            NV = mesh.number_of_vertices_of_cells()
-            l = lambda x: np.r_[
-                    '0',
-                    np.r_['1', np.zeros((idof, p*x[0])), x[1]*np.eye(idof)],
-                    x[2][idof:, :]]
-            return list(map(l, zip(NV, self.smspace.cellmeasure, C)))
+        C = [h@pi for h, pi in zip(buckets.cell(H), buckets.cell(PI1))]
+        if p > 1:
+            for c, a in zip(C, area):
+                c[:, :idof, :] = 0
+                c[:, :idof, -idof:] = a.reshape(-1, 1, 1)*np.eye(idof)
+        return buckets.matrices(C)
 
     def matrix_PI_0(self, H, C):
-        cell2dof, cell2dofLocation = self.dof.cell2dof, self.dof.cell2dofLocation
-        pi0 = lambda x: inv(x[0])@x[1]
-        return list(map(pi0, zip(H, C)))
+        buckets = self.buckets
+        PI0 = [np.linalg.solve(h, c) for h, c in zip(buckets.cell(H), buckets.cell(C))]
+        return buckets.matrices(PI0)
 
     def matrix_PI_1(self, G, B):
-        p = self.p
-        cell2dof, cell2dofLocation = self.dof.cell2dof, self.dof.cell2dofLocation
-        BB = np.hsplit(B, cell2dofLocation[1:-1])
-        g = lambda x: inv(x[0])@x[1]
-        return list(map(g, zip(G, BB)))
-
+        buckets = self.buckets
+        PI1 = [np.linalg.solve(g, b) for g, b in zip(buckets.cell(G), buckets.cols(B))]
+        return buckets.matrices(PI1)
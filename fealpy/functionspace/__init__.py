@@ -1,27 +1,41 @@
-from .SimplexSetSpace import SimplexSetSpace
-from .LagrangeFiniteElementSpace import LagrangeFiniteElementSpace
-from .SurfaceLagrangeFiniteElementSpace import SurfaceLagrangeFiniteElementSpace
-from .ConformingVirtualElementSpace2d import CVEMDof2d, ConformingVirtualElementSpace2d
-from .NonConformingVirtualElementSpace2d import NCVEMDof2d, NonConformingVirtualElementSpace2d
-from .ScaledMonomialSpace2d import ScaledMonomialSpace2d
-from .ScaledMonomialSpace3d import ScaledMonomialSpace3d
-from .QuadBilinearFiniteElementSpace import QuadBilinearFiniteElementSpace
-from .WeakGalerkinSpace2d import WeakGalerkinSpace2d
-
-from .DivFreeNonConformingVirtualElementSpace2d import DivFreeNonConformingVirtualElementSpace2d
-from .ReducedDivFreeNonConformingVirtualElementSpace2d import ReducedDivFreeNonConformingVirtualElementSpace2d
-
-from .RaviartThomasFiniteElementSpace2d import RaviartThomasFiniteElementSpace2d
-from .RaviartThomasFiniteElementSpace3d import RaviartThomasFiniteElementSpace3d
-
-from .FirstKindNedelecFiniteElementSpace2d import FirstKindNedelecFiniteElementSpace2d
-from .FourierSpace import FourierSpace
-
-#from .mixed_fem_space import RTFiniteElementSpace2d
-from .vem_space import VEMDof2d, VirtualElementSpace2d
-from .MonomialSpace2d import MonomialSpace2d
-from .PrismFiniteElementSpace import PrismFiniteElementSpace
-from .femdof import CPPFEMDof3d
-from .ConformingVirtualElementSpace2d import CVEMDof2d, ConformingVirtualElementSpace2d
-
-from .ParametricLagrangeFiniteElementSpace import ParametricLagrangeFiniteElementSpace
+"""
+functionspace
+=============
+
+子包中的空间在第一次使用时才导入 (见 fealpy.common.lazy), 例如 FourierSpace
+需要的 pyfftw 只有用到它的时候才需要安装.
+"""
+
+from ..common.lazy import lazy_import
+
+__getattr__, __dir__ = lazy_import(__name__, {
+    'SimplexSetSpace': '.SimplexSetSpace',
+    'LagrangeFiniteElementSpace': '.LagrangeFiniteElementSpace',
+    'SurfaceLagrangeFiniteElementSpace': '.SurfaceLagrangeFiniteElementSpace',
+    'CVEMDof2d': '.ConformingVirtualElementSpace2d',
+    'ConformingVirtualElementSpace2d': '.ConformingVirtualElementSpace2d',
+    'NCVEMDof2d': '.NonConformingVirtualElementSpace2d',
+    'NonConformingVirtualElementSpace2d': '.NonConformingVirtualElementSpace2d',
+    'CellBuckets': '.CellBuckets',
+    'ScaledMonomialSpace2d': '.ScaledMonomialSpace2d',
+    'ScaledMonomialSpace3d': '.ScaledMonomialSpace3d',
+    'QuadBilinearFiniteElementSpace': '.QuadBilinearFiniteElementSpace',
+    'WeakGalerkinSpace2d': '.WeakGalerkinSpace2d',
+
+    'DivFreeNonConformingVirtualElementSpace2d': '.DivFreeNonConformingVirtualElementSpace2d',
+    'ReducedDivFreeNonConformingVirtualElementSpace2d': '.ReducedDivFreeNonConformingVirtualElementSpace2d',
+
+    'RaviartThomasFiniteElementSpace2d': '.RaviartThomasFiniteElementSpace2d',
+    'RaviartThomasFiniteElementSpace3d': '.RaviartThomasFiniteElementSpace3d',
+
+    'FirstKindNedelecFiniteElementSpace2d': '.FirstKindNedelecFiniteElementSpace2d',
+    'FourierSpace': '.FourierSpace',
+
+    'VEMDof2d': '.vem_space',
+    'VirtualElementSpace2d': '.vem_space',
+    'MonomialSpace2d': '.MonomialSpace2d',
+    'PrismFiniteElementSpace': '.PrismFiniteElementSpace',
+    'CPPFEMDof3d': '.femdof',
+
+    'ParametricLagrangeFiniteElementSpace': '.ParametricLagrangeFiniteElementSpace',
+    })
@@ -1,62 +1,80 @@
-import sys
-import numpy as np
-import scipy.io as sio
 import re
+import numpy as np
 
 from .TriangleMesh import TriangleMesh
+from .bulkio import parse_block, load_cache, save_cache
 
 class CCGMeshReader:
-    def __init__(self, fname):
-        try:
-            with open(fname, 'r') as f:
-                self.lines = f.read().split('\n')
-        except EnvironmentError:
-            print("Warning! open file failed!")
-        self.cline = 0
+    """
+
+    Notes
+    -----
+    读取计算共形几何 (CCG) 的 .m 网格文件, 例如
+
+        Vertex 1 0.1 0.2 0.3 {uv=(0.5 0.5) rgb=(1 0 0)}
+        Face 1 1 2 3
+        Edge 1 2 {sharp}
+
+    用正则表达式一次取出所有的 Vertex, Face 和 Edge 行, 数值部分各自用一次
+    np.fromstring 解析.
+
+    cache 为真时解析的结果缓存在 fname.npz 中, 再次读取同一个文件时直接读
+    取缓存.
+    """
+    def __init__(self, fname, cache=False):
+        self.fname = fname
+        self.cache = cache
 
     def read(self):
-        data, uv, rgb = self.read_vertices()
-        cell = self.read_faces()
-        self.read_edges()
+        data = load_cache(self.fname) if self.cache else None
+        if data is None:
+            with open(self.fname, 'r') as f:
+                self.contents = f.read()
+            data = {}
+            data['vertex'], data['uv'], data['rgb'] = self.read_vertices()
+            data['face'] = self.read_faces()
+            data['edge'] = self.read_edges()
+            self.contents = None
+            if self.cache:
+                save_cache(self.fname, data)
+        self.data = data
 
-        NN = len(data)
-        idxmap = np.zeros(int(data[:, 0].max()), dtype=np.int_)
-        idxmap[data[:, 0].astype(np.int_)-1] = range(NN)
-        cell = idxmap[cell-1]
+        vertex = data['vertex']
+        NN = len(vertex)
+        idxmap = np.zeros(int(vertex[:, 0].max()), dtype=np.int_)
+        idxmap[vertex[:, 0].astype(np.int_)-1] = range(NN)
+        cell = idxmap[data['face']-1]
 
-        mesh = TriangleMesh(data[:, 1:].copy(), cell)
+        mesh = TriangleMesh(vertex[:, 1:].copy(), cell)
 
-        if uv is not None:
-            mesh.nodedata['uv'] = uv
+        if data.get('uv') is not None:
+            mesh.nodedata['uv'] = data['uv']
 
-        if rgb is not None:
-            mesh.nodedata['rgb'] = rgb
+        if data.get('rgb') is not None:
+            mesh.nodedata['rgb'] = data['rgb']
 
         return mesh
 
     def read_vertices(self):
-        vertices = list(filter(lambda x : x.find('Vertex') > -1, self.lines))
-        data = np.array([ s[7:s.find(' {')].split(' ') for s in vertices],
-                dtype=np.float64)
-        if vertices[0].find('uv')>-1:
-            uv = [re.findall(r'uv=\(.*?\)', s)[0][4:-1].split(' ') for s in vertices]
-            uv = np.array(uv, dtype=np.float64) 
-        else:
-            uv = None
-
-        if vertices[0].find('rgb') > -1:
-            rgb = [ re.findall(r'rgb=\(.*?\)', s)[0][5:-1].split(' ') for s in vertices]
-            rgb = np.array(rgb, dtype=np.float64) 
-        else:
-            rgb = None
+        vertices = '\n'.join(re.findall(r'^Vertex[ \t]+([^\n]*)', self.contents, re.M))
+        data = parse_block(re.sub(r'\{[^}\n]*\}?', '', vertices), ncol=4)
+        NN = len(data)
+
+        uv = re.findall(r'uv=\(([^)]*)\)', vertices)
+        uv = parse_block('\n'.join(uv), ncol=2) if len(uv) == NN else None
+
+        rgb = re.findall(r'rgb=\(([^)]*)\)', vertices)
+        rgb = parse_block('\n'.join(rgb), ncol=3) if len(rgb) == NN else None
 
         return data, uv, rgb
 
     def read_faces(self):
-        faces = list(filter(lambda x : x.find('Face') > -1, self.lines))
-        cell = np.array([s[5:].split(' ')[1:] for s in faces], dtype=np.int_)
-        return cell
+        faces = re.findall(r'^Face[ \t]+([^{\n]*)', self.contents, re.M)
+        cell = parse_block('\n'.join(faces), ncol=4, dtype=np.int_)
+        return cell[:, 1:]
 
     def read_edges(self):
-        edges = list(filter(lambda x : x.find('Edge') > -1, self.lines))
-        print(edges[0])
+        edges = re.findall(r'^Edge[ \t]+([^{\n]*)', self.contents, re.M)
+        if len(edges) == 0:
+            return None
+        return parse_block('\n'.join(edges), ncol=2, dtype=np.int_)
@@ -1,132 +1,169 @@
 
-import sys
+import re
 import numpy as np
-import scipy.io as sio
 
-import matplotlib.pyplot as plt
+from .bulkio import parse_block, load_cache, save_cache
 
-from .TriangleMesh import TriangleMesh
+FAB_BEGIN = re.compile(r'^[ \t]*BEGIN[ \t]+(\w+)[^\n]*\n?', re.M)
+FAB_END = re.compile(r'^[ \t]*END\b', re.M)
 
 class FABFileReader:
-    def __init__(self, fname):
-        try:
-            with open(fname, 'r') as f:
-                self.lines = f.read().split('\n')
-        except EnvironmentError:
-            print("Warning! open file failed!")
-        self.cline = 0
+    """
+
+    Notes
+    -----
+    读取 FracMan 的 .fab 裂缝网络文件.
+
+    先找到所有 BEGIN ... END 段. FRACTURE 段中逐个裂缝只看它的头一行 (得
+    到顶点个数和属性组数), 顶点行和属性行的编号用数组运算得到, 然后各自用一
+    次 np.fromstring 解析, 所以 Python 循环的次数是裂缝的个数, 而不是行数.
+
+    cache 为真时解析的结果缓存在 fname.npz 中, 再次读取同一个文件时直接读
+    取缓存.
+    """
+    def __init__(self, fname, cache=False):
+        self.fname = fname
+        self.cache = cache
+        self.format = {}
+        self.properties = {}
+        self.sets = {}
 
     def read(self):
-        NL = len(self.lines)
-        while self.cline < NL:
-            line = self.lines[self.cline]
-            words = [word.replace(' ', '') for word in line.split(' ')]
-            if words[0] == 'BEGIN':
-                if words[1] == 'FORMAT':
-                    self.read_format()
-                elif words[1] == 'PROPERTIES':
-                    self.read_properties()
-                elif words[1] == 'SETS':
-                    self.read_sets()
-                elif words[1] == 'FRACTURE':
-                    self.read_fracture()
-                elif words[1] == 'TESSFRACTURE':
-                    self.read_tessfracture()
-                elif words[1] == 'ROCKBLOCK':
-                    self.read_rockblock()
-                else:
-                    raise ValueError('I do not code for {}!'.format(words[1]))
+        data = load_cache(self.fname) if self.cache else None
+        if data is not None:
+            self.load(data)
+            return
+
+        with open(self.fname, 'r') as f:
+            contents = f.read()
+        for name, block in self.sections(contents):
+            if name == 'FORMAT':
+                self.format = self.read_format(block)
+            elif name == 'PROPERTIES':
+                self.properties = self.read_properties(block)
+            elif name == 'SETS':
+                self.sets = self.read_sets(block)
+            elif name == 'FRACTURE':
+                self.read_fracture(block)
+            elif name in {'TESSFRACTURE', 'ROCKBLOCK'}:
+                pass
             else:
-                self.cline += 1
+                raise ValueError('I do not code for {}!'.format(name))
+        if self.cache:
+            save_cache(self.fname, self.dump())
 
-    def read_format(self):
-        self.cline += 1
-        line = self.lines[self.cline]
-        self.format = {}
-        while line.find('END') == -1:
-            words = line.split()
-            assert words[1] == '='
-            self.format[words[0]] = words[2]
-            self.cline += 1
-            line = self.lines[self.cline]
+    def sections(self, contents):
+        """
 
-    def read_properties(self):
-        self.cline += 1
-        line = self.lines[self.cline]
-        self.properties = {}
-        while line.find('END') == -1:
+        Notes
+        -----
+        逐个返回 BEGIN name ... END 段的名字和内容. 数据块中没有 END, 所以用
+        str.find 直接跳到下一个 END, 不用逐行扫描.
+        """
+        start = 0
+        while True:
+            m = FAB_BEGIN.search(contents, start)
+            if m is None:
+                return
+            pos = contents.find('END', m.end())
+            while pos != -1:
+                e = FAB_END.match(contents, contents.rfind('\n', 0, pos) + 1)
+                if e is not None:
+                    break
+                pos = contents.find('END', pos + 3)
+            if pos == -1:
+                raise ValueError('the section {} is not closed!'.format(m.group(1)))
+            yield m.group(1), contents[m.end():e.start()]
+            start = e.end()
+
+    def read_format(self, block):
+        data = {}
+        for line in block.split('\n'):
             words = line.split()
+            if len(words) == 0:
+                continue
             assert words[1] == '='
-            self.properties[words[0]] = words[2]
-            self.cline += 1
-            line = self.lines[self.cline]
+            data[words[0]] = words[2]
+        return data
+
+    read_properties = read_format
+    read_sets = read_format
 
-    def read_fracture(self):
+    def read_fracture(self, block):
         NF = int(self.format['No_Fractures']) # 裂缝个数
         NN = int(self.format['No_Nodes']) # 节点个数
         NP = int(self.format['No_Properties']) # 性质个数
-        self.unknown = np.zeros((NF, 3), dtype=np.float) # 未知属性
-        self.node = np.zeros((NN, 3), dtype=np.float)
-        self.fracture = np.zeros(NN, dtype=np.int)
-        self.fractureLocation = np.zeros(NF+1, dtype=np.int)
-        self.prop = [] 
-        start = 0
+        block = block.strip()
+        if re.search(r'\n\s*\n', block) is not None: # 去掉空行
+            block = re.sub(r'\n\s*\n', '\n', block)
+        lines = block.split('\n')
+
+        # 每个裂缝的头一行后面是 NV 个顶点行和 NS 个属性行, 只在头一行上循环
+        head = np.zeros(NF, dtype=np.int_)
+        cline = 0
         for i in range(NF):
-            self.cline += 1 # 移到下一行
-            line = self.lines[self.cline]
-            words = line.split()
-            index = words[0] # index of the fracture
-            self.unknown[i, 0] = float(words[3])
-            self.unknown[i, 1] = float(words[4])
-            self.unknown[i, 2] = float(words[5])
-
-            NV = int(words[1]) 
-            n = int(words[2]) # 属性组数
-
-            for j in range(NV):
-                self.cline += 1
-                line = self.lines[self.cline]
-                words = line.split()
-                self.node[start, 0] = float(words[1]) # drop words[0]
-                self.node[start, 1] = float(words[2])
-                self.node[start, 2] = float(words[3])
-                self.fracture[start] = start
-                start += 1
-            self.fractureLocation[i+1] = self.fractureLocation[i] + NV
-
-            prop = np.zeros((n, NP), dtype=np.float)
-            for j in range(n):
-                self.cline += 1
-                line = self.lines[self.cline]
-                words = line.split()
-                prop[j, 0] = float(words[1])
-                prop[j, 1] = float(words[2])
-                prop[j, 2] = float(words[3])
-            self.prop.append(prop)
-
-    def read_sets(self):
-        self.cline += 1
-        line = self.lines[self.cline]
-        self.sets = {}
-        while line.find('END') == -1:
-            words = line.split()
-            assert words[1] == '='
-            self.sets[words[0]] = words[2]
-            self.cline += 1
-            line = self.lines[self.cline]
+            head[i] = cline
+            words = lines[cline].split(None, 3)
+            cline += 1 + int(words[1]) + int(words[2])
+        lines = np.array(lines, dtype=object)
+        data = parse_block('\n'.join(lines[head]))
+        data = data.reshape(NF, -1)
+        NV = data[:, 1].astype(np.int_)
+        NS = data[:, 2].astype(np.int_) # 属性组数
+        self.unknown = data[:, 3:6] # 未知属性
 
-    def read_tessfracture(self):
-        self.cline += 1
-        line = self.lines[self.cline]
-        self.format = {}
-        while line.find('END') == -1:
-            self.cline += 1
-            line = self.lines[self.cline]
+        self.fractureLocation = np.zeros(NF+1, dtype=np.int_)
+        np.cumsum(NV, out=self.fractureLocation[1:])
+        self.propLocation = np.zeros(NF+1, dtype=np.int_)
+        np.cumsum(NS, out=self.propLocation[1:])
 
-    def read_rockblock(self):
-        self.cline += 1
-        line = self.lines[self.cline]
-        self.format = {}
-        while line.find('END') == -1:
-            self.cline += 1
-            line = self.lines[self.cline]
+        # 第 i 个裂缝的顶点行是 head[i] + 1, ..., head[i] + NV[i]
+        idx = np.arange(self.fractureLocation[-1]) + np.repeat(
+                head + 1 - self.fractureLocation[:-1], NV)
+        self.node = parse_block('\n'.join(lines[idx]), ncol=4)[:, 1:] # drop words[0]
+        if len(self.node) != NN:
+            raise ValueError('the number of nodes is {}, but No_Nodes = {}!'.format(
+                len(self.node), NN))
+        self.fracture = np.arange(NN)
+
+        self.propdata = np.zeros((self.propLocation[-1], NP), dtype=np.float64)
+        if self.propLocation[-1] > 0:
+            idx = np.arange(self.propLocation[-1]) + np.repeat(
+                    head + 1 + NV - self.propLocation[:-1], NS)
+            nc = len(lines[idx[0]].split())
+            data = parse_block('\n'.join(lines[idx]), ncol=nc)
+            k = min(NP, nc - 1)
+            self.propdata[:, :k] = data[:, 1:1+k]
+        self.prop = self.split_prop()
+
+    def split_prop(self):
+        """
+
+        Notes
+        -----
+        每个裂缝的属性数组, 是 propdata 的视图.
+        """
+        NS = np.diff(self.propLocation)
+        if np.all(NS == NS[0]):
+            return list(self.propdata.reshape(len(NS), NS[0], -1))
+        return np.split(self.propdata, self.propLocation[1:-1])
+
+    def dump(self):
+        data = {'format': self.format, 'properties': self.properties,
+                'sets': self.sets}
+        if hasattr(self, 'node'):
+            data['fracture'] = {'unknown': self.unknown, 'node': self.node,
+                    'fractureLocation': self.fractureLocation,
+                    'propdata': self.propdata,
+                    'propLocation': self.propLocation}
+        return data
+
+    def load(self, data):
+        self.format = {k: str(v) for k, v in data.get('format', {}).items()}
+        self.properties = {k: str(v) for k, v in data.get('properties', {}).items()}
+        self.sets = {k: str(v) for k, v in data.get('sets', {}).items()}
+        if 'fracture' in data:
+            for key, val in data['fracture'].items():
+                setattr(self, key, val)
+            self.fracture = np.arange(len(self.node))
+            self.prop = self.split_prop()
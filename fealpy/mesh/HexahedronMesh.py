@@ -50,6 +50,33 @@ class HexahedronMesh(Mesh3d):
         self.itype = cell.dtype
         self.ftype = node.dtype
 
+        self.nodedata = {}
+        self.celldata = {}
+
+    def to_vtk(self, etype='cell', index=np.s_[:]):
+        """
+
+        Notes
+        -----
+        把网格转化为 VTK 的格式
+        """
+        node = self.entity('node')
+
+        cell = self.entity(etype)[index]
+        NV = cell.shape[-1]
+
+        cell = np.r_['1', np.zeros((len(cell), 1), dtype=cell.dtype), cell]
+        cell[:, 0] = NV
+
+        if etype in {'cell', 3}:
+            cellType = 12  # 六面体
+        elif etype in {'face', 2}:
+            cellType = 9  # 四边形
+        elif etype in {'edge', 1}:
+            cellType = 3  # segment
+
+        return node, cell.flatten(), cellType, len(cell)
+
     def volume(self):
         pass
 
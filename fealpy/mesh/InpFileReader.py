@@ -1,19 +1,166 @@
+import re
 import numpy as np
 
+from .bulkio import parse_block, load_cache, save_cache
+
+# Abaqus 单元类型的顶点个数
+INP_ELEMENT = {
+        'T2D2': 2, 'T3D2': 2, 'B21': 2, 'B31': 2,
+        'CPS3': 3, 'CPE3': 3, 'CAX3': 3, 'S3': 3, 'S3R': 3, 'STRI3': 3, 'DC2D3': 3,
+        'CPS4': 4, 'CPE4': 4, 'CAX4': 4, 'S4': 4, 'S4R': 4, 'CPS4R': 4,
+        'CPE4R': 4, 'DC2D4': 4,
+        'CPS6': 6, 'CPE6': 6, 'STRI65': 6,
+        'CPS8': 8, 'CPE8': 8, 'S8R': 8,
+        'C3D4': 4, 'DC3D4': 4, 'C3D6': 6, 'C3D8': 8, 'C3D8R': 8, 'DC3D8': 8,
+        'C3D10': 10, 'C3D15': 15, 'C3D20': 20, 'C3D20R': 20,
+        }
+
+# 可以直接生成网格的单元类型
+INP_MESH = {
+        'CPS3': 'tri', 'CPE3': 'tri', 'CAX3': 'tri', 'S3': 'tri', 'S3R': 'tri',
+        'STRI3': 'tri', 'DC2D3': 'tri',
+        'CPS4': 'quad', 'CPE4': 'quad', 'CAX4': 'quad', 'S4': 'quad',
+        'S4R': 'quad', 'CPS4R': 'quad', 'CPE4R': 'quad', 'DC2D4': 'quad',
+        'C3D4': 'tet', 'DC3D4': 'tet',
+        'C3D8': 'hex', 'C3D8R': 'hex', 'DC3D8': 'hex',
+        }
+
 
 class InpFileReader():
+    """
+
+    Notes
+    -----
+    读取 Abaqus 的 .inp 文件中的节点, 单元, 节点集和单元集.
+
+    文件按关键字行 (以 * 开头) 分成若干段, 每段的数据一次交给
+    np.fromstring 解析. 单元的一条记录可以跨越多行, 所以按单元类型的顶点个
+    数确定列数, 而不是按行.
+
+    cache 为真时解析的结果缓存在 fname.npz 中, 再次读取同一个文件时直接读
+    取缓存.
+    """
+    def __init__(self, fname, cache=False):
+        self.fname = fname
+        self.cache = cache
+        self.data = {'node': None, 'element': {}, 'nset': {}, 'elset': {}}
+
+    def read(self):
+        """
+
+        Notes
+        -----
+        读取文件, 返回由维数最高的一组单元生成的网格. 单元类型不能直接生成
+        网格时返回 None, 这时可以从 self.data 中取出原始数据.
+        """
+        data = load_cache(self.fname) if self.cache else None
+        if data is not None:
+            self.data.update(data)
+        else:
+            self.parse()
+            if self.cache:
+                save_cache(self.fname, self.data)
+        return self.to_mesh()
+
+    def parse(self):
+        with open(self.fname, 'r') as f:
+            contents = f.read()
+        contents = re.sub(r'^\*\*[^\n]*\n?', '', contents, flags=re.M) # 注释
+        parts = re.split(r'^[ \t]*(\*[^\n]*)\n?', contents, flags=re.M)
+        nodes = []
+        elements = {}
+        for keyword, block in zip(parts[1::2], parts[2::2]):
+            name, options = self.keyword(keyword)
+            if name == 'NODE':
+                nodes.append(self.read_block(block))
+            elif name == 'ELEMENT':
+                etype = options.get('TYPE')
+                ncol = INP_ELEMENT.get(etype)
+                a = self.read_block(block, None if ncol is None else ncol + 1)
+                elements.setdefault(etype, []).append(a.astype(np.int_))
+                if 'ELSET' in options:
+                    self.add_set('elset', options['ELSET'], a[:, 0].astype(np.int_))
+            elif name in {'NSET', 'ELSET'}:
+                key = 'NSET' if name == 'NSET' else 'ELSET'
+                idx = parse_block(block, sep=',').astype(np.int_)
+                if ('GENERATE' in options) and (len(idx) > 0):
+                    idx = np.concatenate([np.arange(s, e+1, d)
+                        for s, e, d in idx.reshape(-1, 3)])
+                self.add_set(name.lower(), options[key], idx)
+
+        if len(nodes) > 0:
+            node = np.concatenate(nodes, axis=0)
+            self.data['node'] = {'index': node[:, 0].astype(np.int_),
+                    'xyz': node[:, 1:]}
+        for etype, a in elements.items():
+            a = np.concatenate(a, axis=0)
+            self.data['element'][etype] = {'index': a[:, 0], 'cell': a[:, 1:]}
+
+    def keyword(self, line):
+        """
+
+        Notes
+        -----
+        把关键字行 `*ELEMENT, TYPE=C3D4, ELSET=A` 分成大写的名字和选项字典.
+        """
+        words = [w.strip() for w in line[1:].split(',')]
+        name = words[0].upper().replace(' ', '')
+        options = {}
+        for w in words[1:]:
+            if w == '':
+                continue
+            key, _, val = w.partition('=')
+            options[key.strip().upper()] = val.strip()
+        return name, options
+
+    def read_block(self, block, ncol=None):
+        if block.strip() == '':
+            return np.zeros((0, ncol or 1), dtype=np.float64)
+        if ncol is None: # 按第一行的列数
+            first = block.lstrip().split('\n', 1)[0]
+            ncol = len([w for w in first.split(',') if w.strip() != ''])
+        return parse_block(block, ncol=ncol, sep=',')
+
+    def add_set(self, kind, name, idx):
+        sets = self.data[kind]
+        sets[name] = np.concatenate([sets[name], idx]) if name in sets else idx
+
+    def to_mesh(self):
+        if (self.data['node'] is None) or (len(self.data['element']) == 0):
+            return None
+        rank = {'tri': 2, 'quad': 2, 'tet': 3, 'hex': 3}
+        etypes = [e for e in self.data['element'] if e in INP_MESH]
+        if len(etypes) == 0:
+            return None
+        etype = max(etypes, key=lambda e: rank[INP_MESH[e]])
+        meshtype = INP_MESH[etype]
+        cell = np.concatenate([self.data['element'][e]['cell'] for e in etypes
+            if INP_MESH[e] == meshtype], axis=0)
+
+        index = self.data['node']['index']
+        node = self.data['node']['xyz']
+        idxmap = np.zeros(index.max()+1, dtype=np.int_)
+        idxmap[index] = range(len(index))
+        cell = idxmap[cell]
 
-    def __init__(self, fname):
-        with open(fname, 'r') as f:
-            contents = f.read() 
-        contents = re.sub('**.*\n', '', contents) 
-        contents = contents.split('\n')
-        self.contents = contents
-        self.cline = 0
+        if meshtype == 'tri':
+            from .TriangleMesh import TriangleMesh
+            if np.all(node[:, 2:] == 0):
+                node = node[:, :2]
+            return TriangleMesh(node.copy(), cell)
+        elif meshtype == 'quad':
+            from .QuadrangleMesh import QuadrangleMesh
+            return QuadrangleMesh(node[:, :2].copy(), cell)
+        elif meshtype == 'tet':
+            from .TetrahedronMesh import TetrahedronMesh
+            return TetrahedronMesh(node, cell)
+        else:
+            from .HexahedronMesh import HexahedronMesh
+            return HexahedronMesh(node, cell)
 
 if __name__ == '__main__':
     import sys
 
     fname = sys.argv[1]
     reader = InpFileReader(fname)
-    reader.read()
+    print(reader.read())
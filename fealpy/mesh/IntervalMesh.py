@@ -30,6 +30,28 @@ class IntervalMesh():
         self.ftype = node.dtype
 
 
+    def to_vtk(self, etype='cell', index=np.s_[:]):
+        """
+
+        Notes
+        -----
+        把网格转化为 VTK 的格式
+        """
+        node = self.entity('node')
+        GD = self.geo_dimension()
+        if GD < 3:
+            node = np.concatenate((node, np.zeros((node.shape[0], 3-GD), dtype=self.ftype)), axis=1)
+
+        cell = self.entity(etype)[index]
+        NV = cell.shape[-1]
+
+        cell = np.r_['1', np.zeros((len(cell), 1), dtype=cell.dtype), cell]
+        cell[:, 0] = NV
+
+        cellType = 3  # segment
+
+        return node, cell.flatten(), cellType, len(cell)
+
     def integrator(self, k, etype='cell'):
         return GaussLegendreQuadrature(k)
 
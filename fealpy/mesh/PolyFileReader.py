@@ -1,62 +1,126 @@
-import numpy as np
+import os
 import re
+import numpy as np
+
+from .bulkio import parse_block, load_cache, save_cache
 
 class PolyFileReader():
-    def __init__(self, fname):
-        with open(fname, 'r') as f:
-            contents = f.read() 
-        contents = re.sub('#.*\n', '', contents) 
-        contents = contents.split('\n')
-        self.contents = contents
-        self.cline = 0
+    """
+
+    Notes
+    -----
+    读取 Triangle 的 .poly 文件 (二维的平面直线图).
+
+    去掉注释以后 .poly 文件就是一串数, 所以整个文件只用 np.fromstring 解析
+    一次, 然后按每段的头信息计算偏移量取出顶点, 线段, 洞和区域. 顶点个数为
+    0 时从同名的 .node 文件中读取顶点.
+
+    cache 为真时解析的结果缓存在 fname.npz 中, 再次读取同一个文件时直接读
+    取缓存.
+    """
+    def __init__(self, fname, cache=False):
+        self.fname = fname
+        self.cache = cache
         self.data = {'vertices':None, 'segments':None, 'holes':None,
                 'regions':None}
 
     def read(self):
+        data = load_cache(self.fname) if self.cache else None
+        if data is not None:
+            self.data.update(data)
+            return self.data
+
+        self.tokens = self.read_tokens(self.fname)
+        self.cline = 0 # 当前在 tokens 中的位置
         self.read_vertices()
         self.read_segments()
         self.read_holes()
-        self.contents = None
-        print(self.data)
+        self.read_regions()
+        self.tokens = None
+        if self.cache:
+            save_cache(self.fname, self.data)
+        return self.data
+
+    def read_tokens(self, fname):
+        with open(fname, 'r') as f:
+            contents = f.read()
+        contents = re.sub('#.*', '', contents)
+        return parse_block(contents)
+
+    def read_head(self, n):
+        head = self.tokens[self.cline:self.cline+n].astype(np.int_)
+        self.cline += n
+        return head
+
+    def read_data(self, N, nc):
+        """
+
+        Notes
+        -----
+        从当前位置取出 N 行 nc 列的数据块.
+        """
+        start = self.cline
+        self.cline += N*nc
+        if self.cline > len(self.tokens):
+            raise ValueError('the file `{}` is truncated!'.format(self.fname))
+        return self.tokens[start:self.cline].reshape(N, nc)
+
+    def read_vertices(self, node=False):
+        """
 
-    def read_vertices(self):
-        head = np.fromstring(self.contents[self.cline], np.int, sep=' ')
+        Notes
+        -----
+        顶点个数为 0 时 (Triangle 写出的头信息是 `0 2 0 1`, 维数不为 0) 顶
+        点在同名的 .node 文件中, node 为真表示当前读的是 .node 文件.
+        """
+        head = self.read_head(4)
         NV = head[0]
+        if (NV == 0) and (not node): # 顶点在 .node 文件中
+            tokens, cline = self.tokens, self.cline
+            self.tokens = self.read_tokens(os.path.splitext(self.fname)[0] + '.node')
+            self.cline = 0
+            self.read_vertices(node=True)
+            self.tokens, self.cline = tokens, cline
+            return
+        if head[1] != 2:
+            raise ValueError("We don't support the dimension `{}`! ".format(head[1]))
         nc = 3 + head[2] + head[3]
-        data = np.zeros((NV, nc), dtype=np.float)
-        self.read_data(data)
-        self.data['vertices'] = {'index': data[:, 0].astype(np.int), 'xy': data[:, 1:3]} 
+        data = self.read_data(NV, nc)
+        self.data['vertices'] = {'index': data[:, 0].astype(np.int_), 'xy': data[:, 1:3]}
         self.data['vertices']['attribute'] = data[:, 3:3+head[2]] if head[2] > 0 else None
-        self.data['vertices']['bdmarker'] = data[:, 3+head[2]:].astype(np.int) if head[3] == 1 else None
+        self.data['vertices']['bdmarker'] = data[:, 3+head[2]:].astype(np.int_) if head[3] == 1 else None
 
     def read_segments(self):
-        head = np.fromstring(self.contents[self.cline], np.int, sep=' ')
+        head = self.read_head(2)
         NS = head[0]
         nc = 3 + head[1]
-        data = np.zeros((NS, nc), dtype=np.int)
-        self.read_data(data)
+        data = self.read_data(NS, nc).astype(np.int_)
         self.data['segments'] = {'index': data[:, 0], 'endpoint': data[:, 1:3]-1}
         self.data['segments']['bdmarker'] = data[:, 3:] if head[1] == 1 else None
 
     def read_holes(self):
-        head = np.fromstring(self.contents[self.cline], np.int, sep=' ')
-        NH = head[0]
-        nc = 3
+        if self.cline >= len(self.tokens):
+            return
+        NH = self.read_head(1)[0]
         if NH > 0:
-            data = np.zeros((NH, nc), dtype=np.float)
-            self.read_data(data)
-            self.data['holes']={'index': data[:, 0].astype(np.int), 'xy':data[:, 1:]}
+            data = self.read_data(NH, 3)
+            self.data['holes']={'index': data[:, 0].astype(np.int_), 'xy':data[:, 1:]}
 
-    def read_data(self, data):
-        N = data.shape[0]
-        self.cline += 1
-        for i in range(N):
-            data[i, :] = np.fromstring(self.contents[self.cline + i], np.float, sep=' ')
-        self.cline += N
+    def read_regions(self):
+        if self.cline >= len(self.tokens):
+            return
+        NR = self.read_head(1)[0]
+        if NR > 0:
+            # 区域的最大面积约束是可选的, 由剩下的数的个数确定列数
+            nc = 5 if len(self.tokens) - self.cline >= 5*NR else 4
+            data = self.read_data(NR, nc)
+            self.data['regions'] = {'index': data[:, 0].astype(np.int_),
+                    'xy': data[:, 1:3], 'attribute': data[:, 3]}
+            self.data['regions']['maxarea'] = data[:, 4] if nc == 5 else None
 
 if __name__ == '__main__':
     import sys
 
     fname = sys.argv[1]
     reader = PolyFileReader(fname)
-    reader.read()
+    print(reader.read())
@@ -26,6 +26,9 @@ class PolygonMesh(Mesh2d):
         self.itype = cell.dtype
         self.ftype = node.dtype
 
+        self.nodedata = {}
+        self.celldata = {}
+
     def integrator(self, k):
         return TriangleQuadrature(k)
 
@@ -38,18 +41,38 @@ class PolygonMesh(Mesh2d):
     def number_of_nodes_of_cells(self):
         return self.ds.number_of_vertices_of_cells()
 
-    def to_vtk(self):
-        NC = self.number_of_cells()
-        cell = self.ds.cell
+    def to_vtk(self, etype='cell', index=np.s_[:]):
+        """
+
+        Notes
+        -----
+        把网格转化为 VTK 的格式, 单元数组为 [nv, v_0, ..., nv, v_0, ...]
+        """
+        node = self.entity('node')
+        GD = self.geo_dimension()
+        if GD == 2:
+            node = np.concatenate((node, np.zeros((node.shape[0], 1), dtype=self.ftype)), axis=1)
+
+        if etype in {'edge', 'face', 1}:
+            edge = self.entity('edge')[index]
+            cell = np.r_['1', np.zeros((len(edge), 1), dtype=edge.dtype), edge]
+            cell[:, 0] = 2
+            return node, cell.flatten(), 3, len(cell)
+
         cellLocation = self.ds.cellLocation
-        NV = self.ds.number_of_vertices_of_cells()
-        cells = np.zeros(len(cell) + NC, dtype=np.int)
-        isIdx = np.ones(len(cell) + NC, dtype=np.bool)
-        isIdx[0] = False
-        isIdx[np.add.accumulate(NV+1)[:-1]] = False
-        cells[~isIdx] = NV
-        cells[isIdx] = cell
-        return NC, cells
+        start = cellLocation[:-1][index]
+        NV = (cellLocation[1:] - cellLocation[:-1])[index]
+        NC = len(NV)
+        location = np.cumsum(NV + 1) - (NV + 1) # 每个单元在 cells 中的起始位置
+        cells = np.zeros(location[-1] + NV[-1] + 1 if NC > 0 else 0,
+                dtype=self.itype)
+        cells[location] = NV
+        isIdx = np.ones(len(cells), dtype=np.bool_)
+        isIdx[location] = False
+        k = np.arange(NV.sum()) - np.repeat(location - np.arange(NC), NV)
+        cells[isIdx] = self.ds.cell[np.repeat(start, NV) + k]
+        VTK_POLYGON = 7
+        return node, cells, VTK_POLYGON, NC
 
     @classmethod
     def from_mesh(cls, mesh):
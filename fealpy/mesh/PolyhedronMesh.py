@@ -11,20 +11,76 @@ class PolyhedronMesh():
         self.meshtype = 'polyhedron'
         self.dtype= dtype 
 
-    def to_vtk(self):
-        NF = self.number_of_faces()
+        self.nodedata = {}
+        self.celldata = {}
+
+    def to_vtk(self, etype='cell', index=np.s_[:]):
+        """
+
+        Notes
+        -----
+        把网格转化为 VTK 的格式.
+
+        单元的类型是 VTK_POLYHEDRON, 单元数组和 vtkUnstructuredGrid 的
+        InsertNextCell 一样, 每个单元为
+
+            [n, nf, nv_0, v, ..., nv_1, v, ...]
+
+        n 是后面的数的个数, nf 是单元的面的个数, 然后是每个面的顶点个数和顶
+        点. 面对 face2cell[:, 0] 是外法向, 对 face2cell[:, 1] 要反过来.
+        """
+        node = self.node
         face = self.ds.face
-        face2cell = self.ds.face2cell
         faceLocation = self.ds.faceLocation
-        NV = self.ds.number_of_vertices_of_faces()
-
-        faces = np.zeros(len(face) + NF, dtype=np.int)
-        isIdx = np.ones(len(face) + NF, dtype=np.bool)
-        isIdx[0] = False
-        isIdx[np.add.accumulate(NV+1)[:-1]] = False
-        faces[~isIdx] = NV
-        faces[isIdx] = face
-        return NF, faces
+        NFV = faceLocation[1:] - faceLocation[:-1]
+        if etype in {'face', 2}:
+            NF = len(NFV)
+            cells = np.zeros(len(face) + NF, dtype=face.dtype)
+            isIdx = np.ones(len(face) + NF, dtype=np.bool_)
+            isIdx[np.cumsum(NFV + 1) - (NFV + 1)] = False
+            cells[~isIdx] = NFV
+            cells[isIdx] = face
+            VTK_POLYGON = 7
+            return node, cells, VTK_POLYGON, NF
+
+        NC = self.number_of_cells()
+        face2cell = self.ds.face2cell
+        isIntFace = (face2cell[:, 0] != face2cell[:, 1])
+
+        # 每个单元的面, 按单元排序
+        fidx = np.r_[np.arange(len(NFV)), np.flatnonzero(isIntFace)]
+        fcell = np.r_[face2cell[:, 0], face2cell[isIntFace, 1]]
+        flip = np.r_[np.zeros(len(NFV), dtype=np.bool_),
+                np.ones(isIntFace.sum(), dtype=np.bool_)]
+        idx = np.argsort(fcell, kind='stable')
+        fidx, fcell, flip = fidx[idx], fcell[idx], flip[idx]
+
+        nv = NFV[fidx]
+        nf = np.bincount(fcell, minlength=NC)
+        n = np.zeros(NC, dtype=np.int_) # 每个单元中面的数据的长度
+        np.add.at(n, fcell, nv + 1)
+
+        # 每个单元前面有 n 和 nf 两个数
+        location = np.cumsum(n + 2) - (n + 2)
+        cells = np.zeros((n + 2).sum(), dtype=face.dtype)
+        cells[location] = n + 1
+        cells[location + 1] = nf
+        fpos = np.cumsum(nv + 1) - (nv + 1) + 2*(fcell + 1)
+        cells[fpos] = nv
+        k = np.arange(nv.sum()) - np.repeat(np.cumsum(nv) - nv, nv)
+        fk = np.where(np.repeat(flip, nv), np.repeat(nv - 1, nv) - k, k)
+        cells[np.repeat(fpos + 1, nv) + k] = face[np.repeat(faceLocation[fidx], nv) + fk]
+
+        if not isinstance(index, slice) or index != np.s_[:]:
+            location = np.r_[location, len(cells)]
+            start = location[:-1][index]
+            length = (location[1:] - location[:-1])[index]
+            idx = np.repeat(start, length) + np.arange(length.sum()) - \
+                    np.repeat(np.cumsum(length) - length, length)
+            cells = cells[idx]
+            NC = len(length)
+        VTK_POLYHEDRON = 42
+        return node, cells, VTK_POLYHEDRON, NC
 
     def check(self):
         N = self.number_of_nodes()
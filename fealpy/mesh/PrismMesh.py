@@ -37,6 +37,36 @@ class PrismMesh(Mesh3d):
         self.ftype = node.dtype
         self.itype = cell.dtype
 
+        self.nodedata = {}
+        self.celldata = {}
+
+    def to_vtk(self, etype='cell', index=np.s_[:]):
+        """
+
+        Notes
+        -----
+        把网格转化为 VTK 的格式, 三棱柱只输出单元和边.
+
+        VTK 的三棱柱 (VTK_WEDGE) 要求底面 (0, 1, 2) 的法向指向单元外部, 这
+        里的底面是 (0, 2, 1), 所以要调整顶点的顺序.
+        """
+        node = self.entity('node')
+
+        if etype in {'cell', 3}:
+            cell = self.entity('cell')[index][:, [0, 2, 1, 3, 5, 4]]
+            cellType = 13  # 三棱柱
+        elif etype in {'edge', 1}:
+            cell = self.entity('edge')[index]
+            cellType = 3  # segment
+        else:
+            raise ValueError("We don't support the entity type `{}`! ".format(etype))
+        NV = cell.shape[-1]
+
+        cell = np.r_['1', np.zeros((len(cell), 1), dtype=cell.dtype), cell]
+        cell[:, 0] = NV
+
+        return node, cell.flatten(), cellType, len(cell)
+
     def number_of_tri_faces(self):
         face = self.ds.face
         return sum(face[:, -2] == face[:, -1])
@@ -36,6 +36,31 @@ class QuadrangleMesh(Mesh2d):
         self.nodedata = {}
         self.edgedata = {}
 
+    def to_vtk(self, etype='cell', index=np.s_[:]):
+        """
+
+        Notes
+        -----
+        把网格转化为 VTK 的格式
+        """
+        node = self.entity('node')
+        GD = self.geo_dimension()
+        if GD == 2:
+            node = np.concatenate((node, np.zeros((node.shape[0], 1), dtype=self.ftype)), axis=1)
+
+        cell = self.entity(etype)[index]
+        NV = cell.shape[-1]
+
+        cell = np.r_['1', np.zeros((len(cell), 1), dtype=cell.dtype), cell]
+        cell[:, 0] = NV
+
+        if etype in {'cell', 2}:
+            cellType = 9  # 四边形
+        elif etype in {'edge', 'face', 1}:
+            cellType = 3  # segment
+
+        return node, cell.flatten(), cellType, len(cell)
+
     def number_of_corner_nodes(self):
         return self.ds.NN
 
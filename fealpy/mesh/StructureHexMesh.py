@@ -12,6 +12,9 @@ class StructureHexMesh(Mesh3d):
         self.box = box
         self.h = (box[1] - box[0])/nx
         self.ds = StructureHexMeshDataStructure(nx, ny, nz)
+
+        self.nodedata = {}
+        self.celldata = {}
     
     def multi_index(self):
         NN = self.ds.NN
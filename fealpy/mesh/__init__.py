@@ -49,3 +49,5 @@ from .FABFileReader import FABFileReader
 
 from .meshio import load_mat_mesh
 
+
+from .partition import MeshPartition, partition_mesh
@@ -1,5 +1,16 @@
+import sys
+import json
+from timeit import default_timer as dtimer
+
 import numpy as np
 
+from ..common.jsontools import to_builtin
+
+try:
+    import resource
+except ImportError: # windows
+    resource = None
+
 def mark(eta, theta, method='L2'):
     isMarked = np.zeros(len(eta), dtype=np.bool)
     if method == 'MAX':
@@ -31,3 +42,211 @@ class AdaptiveMarker():
         idx = qtmesh.leaf_cell_index()
         markedIdx = mark(self.eta, self.ctheta, method='COARSEN')
         return idx[markedIdx]
+
+def peak_rss():
+    """
+
+    Notes
+    -----
+    返回当前进程的内存使用峰值 (MB), 系统不支持时返回 None.
+    """
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin': # macOS 上单位是 byte, linux 上是 KB
+        return rss/1024**2
+    else:
+        return rss/1024
+
+
+class AdaptiveDriver():
+    def __init__(self, space_factory, assembler, solver, estimator, marker,
+            refine=None, error=None, maxit=50, maxdof=None, maxtime=None,
+            maxmem=None, logfile=None, disp=False):
+        """
+
+        Parameters
+        ----------
+        space_factory : callable, space_factory(mesh) 返回离散空间
+        assembler : callable, assembler(space) 返回离散系统, 比如 (A, F)
+        solver : callable, solver(space, system) 返回离散解 uh
+        estimator : callable, estimator(uh) 返回每个单元上的误差指示子 eta
+        marker : callable, marker(eta) 返回被标记单元的逻辑数组或编号数组
+        refine : callable, refine(mesh, isMarkedCell) 加密网格, 默认调用
+            mesh.bisect(isMarkedCell). 这里 isMarkedCell 总是逻辑数组
+        error : callable, error(uh) 返回一个误差值或者一个误差字典, 可选
+        maxit : 最大自适应迭代次数
+        maxdof : 自由度预算, 新空间的自由度超过它时停止
+        maxtime : 墙上时间预算 (秒)
+        maxmem : 内存峰值预算 (MB)
+        logfile : 每步的统计信息以 JSONL 格式写入到这个文件中, 每次调用 run
+            时先清空
+        disp : 是否在屏幕上输出每步的统计信息
+
+        Notes
+        -----
+        通用的 solve -> estimate -> mark -> refine 自适应循环, 并统计每一步
+        各个阶段的时间, 自由度, 内存峰值和误差.
+
+        Examples
+        --------
+        driver = AdaptiveDriver(
+                lambda mesh: LagrangeFiniteElementSpace(mesh, p=1),
+                assembler, solver, space.residual_estimate,
+                lambda eta: mark(eta, theta=0.2),
+                maxdof=1e5, logfile='afem.jsonl')
+        uh = driver.run(mesh)
+        """
+        self.space_factory = space_factory
+        self.assembler = assembler
+        self.solver = solver
+        self.estimator = estimator
+        self.marker = marker
+        self.refine = refine
+        self.error = error
+
+        self.maxit = maxit
+        self.maxdof = maxdof
+        self.maxtime = maxtime
+        self.maxmem = maxmem
+        self.logfile = logfile
+        self.disp = disp
+
+        self.stats = []
+        self.stopreason = None
+
+    def phase(self, stats, name, func, *args):
+        """
+
+        Notes
+        -----
+        运行一个阶段, 并把运行时间记录到 stats['time'][name] 中.
+        """
+        start = dtimer()
+        val = func(*args)
+        stats['time'][name] = dtimer() - start
+        return val
+
+    def marked_flag(self, isMarkedCell, NC):
+        """
+
+        Notes
+        -----
+        把标记函数返回的编号数组转化为长度为 NC 的逻辑数组, 逻辑数组直接返
+        回. 注意编号数组 [0] 表示标记了第 0 个单元, 不能用 np.sum 判断是否
+        有单元被标记.
+        """
+        isMarkedCell = np.asarray(isMarkedCell)
+        if isMarkedCell.dtype == np.bool_:
+            return isMarkedCell
+        flag = np.zeros(NC, dtype=np.bool_)
+        flag[isMarkedCell] = True
+        return flag
+
+    def refine_mesh(self, mesh, isMarkedCell):
+        if self.refine is not None:
+            self.refine(mesh, isMarkedCell)
+        else:
+            mesh.bisect(isMarkedCell)
+
+    def check_budget(self, gdof=None, start=None):
+        """
+
+        Notes
+        -----
+        检查预算, 超出时返回停止的原因, 否则返回 None.
+        """
+        if (gdof is not None) and (self.maxdof is not None):
+            if gdof > self.maxdof:
+                return 'maxdof'
+        if (start is not None) and (self.maxtime is not None):
+            if dtimer() - start > self.maxtime:
+                return 'maxtime'
+        if self.maxmem is not None:
+            rss = peak_rss()
+            if (rss is not None) and (rss > self.maxmem):
+                return 'maxmem'
+        return None
+
+    def write(self, stats):
+        if self.logfile is not None:
+            with open(self.logfile, 'a') as f:
+                f.write(json.dumps(stats, default=to_builtin) + '\n')
+
+        if self.disp:
+            print('iter {}: gdof {}, time {:.3e}, rss {} MB, error {}'.format(
+                stats['iter'], stats['gdof'], stats['totaltime'],
+                stats['rss'], stats['error']))
+
+    def run(self, mesh):
+        """
+
+        Notes
+        -----
+        在 mesh 上运行自适应算法, 返回最后一次求得的离散解. mesh 会被就地加
+        密. 每步的统计信息保存在 self.stats 中, 停止原因保存在
+        self.stopreason 中.
+        """
+        self.stats = []
+        self.stopreason = 'maxit'
+        if self.logfile is not None: # 清空上一次运行的记录, 与 self.stats 一致
+            open(self.logfile, 'w').close()
+        start = dtimer()
+        uh = None
+        for i in range(self.maxit):
+            stats = {'iter': i, 'time': {}}
+            space = self.phase(stats, 'space', self.space_factory, mesh)
+            gdof = space.number_of_global_dofs()
+            stats['gdof'] = gdof
+            stats['NC'] = mesh.number_of_cells()
+
+            reason = self.check_budget(gdof=gdof)
+            if reason is not None: # 超出自由度预算, 不再求解
+                self.stopreason = reason
+                break
+
+            system = self.phase(stats, 'assemble', self.assembler, space)
+            uh = self.phase(stats, 'solve', self.solver, space, system)
+
+            if self.error is not None:
+                stats['error'] = self.phase(stats, 'error', self.error, uh)
+            else:
+                stats['error'] = None
+
+            eta = self.phase(stats, 'estimate', self.estimator, uh)
+            stats['eta'] = np.sqrt(np.sum(eta**2))
+
+            reason = None
+            if i == self.maxit - 1:
+                reason = 'maxit'
+            else:
+                isMarkedCell = self.phase(stats, 'mark', self.marker, eta)
+                isMarkedCell = self.marked_flag(isMarkedCell, len(eta))
+                if not np.any(isMarkedCell):
+                    reason = 'nomarked'
+                else:
+                    self.phase(stats, 'refine', self.refine_mesh, mesh,
+                            isMarkedCell)
+
+            stats['totaltime'] = sum(stats['time'].values())
+            stats['walltime'] = dtimer() - start
+            stats['rss'] = peak_rss()
+            self.stats.append(stats)
+            self.write(stats)
+
+            if reason is None:
+                reason = self.check_budget(start=start)
+            if reason is not None:
+                self.stopreason = reason
+                break
+        return uh
+
+    def dominant_phase(self):
+        """
+
+        Notes
+        -----
+        返回每步迭代中耗时最多的阶段名字.
+        """
+        return [max(s['time'], key=s['time'].get) for s in self.stats]
+
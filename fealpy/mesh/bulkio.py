@@ -0,0 +1,111 @@
+"""
+
+Notes
+-----
+网格文件读取程序的公共部分.
+
+大的网格文件 (几百万行) 不能逐行用 Python 解析. 这里的做法是先找到各个段
+的边界, 然后把整个数值块一次交给 np.fromstring 解析.
+
+解析的结果可以缓存在文件旁边的二进制文件 fname.npz 中, 其中记录了原文件的
+大小和修改时间, 原文件没有变化时直接读取缓存.
+"""
+
+import os
+
+import numpy as np
+
+CACHE_VERSION = 1
+
+
+def parse_block(text, ncol=None, dtype=np.float64, sep=' '):
+    """
+
+    Notes
+    -----
+    把一块由空白 (或者 sep) 分隔的数值文本一次解析成数组, ncol 给出时变
+    形为 (-1, ncol) 的二维数组.
+    """
+    if sep != ' ':
+        text = text.replace(sep, ' ')
+    a = np.fromstring(text, dtype=np.float64, sep=' ')
+    if ncol is not None:
+        if len(a)%ncol != 0:
+            raise ValueError('the data block can not be reshaped to `{}` '
+                    'columns!'.format(ncol))
+        a = a.reshape(-1, ncol)
+    return a if dtype == np.float64 else a.astype(dtype)
+
+
+def cache_name(fname):
+    return fname + '.npz'
+
+
+def source_stamp(fname):
+    s = os.stat(fname)
+    return np.array([CACHE_VERSION, s.st_size, s.st_mtime_ns], dtype=np.int64)
+
+
+def flatten(data, prefix=''):
+    """
+
+    Notes
+    -----
+    把嵌套的字典展开成 'a/b' 到数组的字典, 值为 None 的项不保存.
+    """
+    flat = {}
+    for key, val in data.items():
+        name = prefix + key
+        if isinstance(val, dict):
+            flat.update(flatten(val, name + '/'))
+        elif val is not None:
+            flat[name] = np.asarray(val)
+    return flat
+
+
+def unflatten(flat):
+    data = {}
+    for name, val in flat.items():
+        keys = name.split('/')
+        d = data
+        for key in keys[:-1]:
+            d = d.setdefault(key, {})
+        d[keys[-1]] = val[()] if val.ndim == 0 else val
+    return data
+
+
+def load_cache(fname):
+    """
+
+    Notes
+    -----
+    读取 fname 的缓存, 缓存不存在或者已经过期时返回 None.
+    """
+    cname = cache_name(fname)
+    if not os.path.exists(cname):
+        return None
+    try:
+        with np.load(cname, allow_pickle=False) as f:
+            if not np.array_equal(f['__source__'], source_stamp(fname)):
+                return None
+            flat = {name: f[name] for name in f.files if name != '__source__'}
+    except (OSError, ValueError, KeyError):
+        return None
+    return unflatten(flat)
+
+
+def save_cache(fname, data):
+    """
+
+    Notes
+    -----
+    把解析的结果 (名字到数组的嵌套字典) 写到 fname 的缓存中. 先写到临时文
+    件再换名, 不会留下不完整的缓存.
+    """
+    cname = cache_name(fname)
+    tmp = cname + '.tmp'
+    flat = flatten(data)
+    flat['__source__'] = source_stamp(fname)
+    with open(tmp, 'wb') as f:
+        np.savez(f, **flat)
+    os.replace(tmp, cname)
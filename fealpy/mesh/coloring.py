@@ -1,12 +1,13 @@
 
 import numpy as np 
+from scipy.sparse import csr_matrix
 
 def coloring(mesh, method='random', etype='node'):
-    if method is 'random':
+    if method == 'random':
         c = randomcoloring(mesh)
-    if method is 'random1':
+    if method == 'random1':
         c = randomcoloring1(mesh)
-    if method is 'random2':
+    if method == 'random2':
         c = randomcoloring2(mesh)
     return c
 
@@ -23,7 +24,7 @@ def opt_coloring(mesh, c):
 
     edge = mesh.ds.edge
 
-    nc = np.zeros((NN, mc), dtype=np.bool)
+    nc = np.zeros((NN, mc), dtype=np.bool_)
     np.add.at(nc, (edge[:, 0], c[edge[:, 1]]-1), True)
     np.add.at(nc, (edge[:, 1], c[edge[:, 0]]-1), True)
 
@@ -34,7 +35,7 @@ def randomcoloring(mesh):
 
     edge = mesh.ds.edge
 
-    c = np.zeros(NN, dtype=np.int)
+    c = np.zeros(NN, dtype=np.int_)
 
     isUnColor = (c == 0) 
     color = 0
@@ -86,7 +87,7 @@ def randomcoloring1(mesh):
     NN = mesh.number_of_nodes()
     edge = mesh.ds.edge
 
-    c = np.zeros(NN, dtype=np.int)
+    c = np.zeros(NN, dtype=np.int_)
 
     isUnColor = (c == 0) 
 
@@ -110,12 +111,12 @@ def randomcoloring1(mesh):
     return c
 
 def randomcoloring2(mesh):
-    N = mesh.number_of_points()
+    N = mesh.number_of_nodes()
     NE = mesh.number_of_edges()
 
     edge = mesh.ds.edge
 
-    c = np.zeros(N, dtype=np.int)
+    c = np.zeros(N, dtype=np.int_)
 
     isUnColor = (c == 0) 
     color = 1
@@ -142,3 +143,46 @@ def randomcoloring2(mesh):
     
 
 
+def cell_coloring(cell2dof, gdof=None, seed=0):
+    """
+
+    Notes
+    -----
+    单元的着色, 有公共自由度的两个单元颜色不同, 颜色从 0 开始编号.
+
+    每种颜色用随机优先级 (Jones-Plassmann) 逐步选出未着色单元的一个极大独立
+    集. 随机数的种子是固定的, 所以同样的输入总是得到同样的着色.
+    """
+    cell2dof = np.asarray(cell2dof)
+    NC, ldof = cell2dof.shape
+    if gdof is None:
+        gdof = cell2dof.max() + 1
+    I = np.repeat(np.arange(NC), ldof)
+    C2D = csr_matrix((np.ones(NC*ldof, dtype=np.int_), (I, cell2dof.flat)),
+            shape=(NC, gdof))
+    G = (C2D@C2D.T).tocoo()
+    isNotDiag = G.row != G.col
+    row = G.row[isNotDiag]
+    col = G.col[isNotDiag]
+
+    r = np.random.RandomState(seed).random_sample(NC)
+    c = np.full(NC, -1, dtype=np.int_)
+    color = 0
+    while np.any(c < 0):
+        isCand = (c < 0)
+        flag = isCand[row] & isCand[col]
+        row = row[flag]
+        col = col[flag]
+        row0, col0 = row, col
+        while np.any(isCand):
+            # 优先级比所有候选邻居都大的候选单元
+            isLess = r[col0] > r[row0]
+            isMax = isCand & (np.bincount(row0[isLess], minlength=NC) == 0)
+            c[isMax] = color
+            isCand[isMax] = False
+            isCand[col0[isMax[row0]]] = False
+            flag = isCand[row0] & isCand[col0]
+            row0 = row0[flag]
+            col0 = col0[flag]
+        color += 1
+    return c
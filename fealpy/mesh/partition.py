@@ -0,0 +1,314 @@
+"""
+
+Notes
+-----
+网格剖分: 把网格的单元分成若干个子区域, 每个子区域生成一个带有 k 层影子单元
+(ghost cell) 的局部网格, 以及局部到全局的节点, 单元和自由度编号.
+
+单元的对偶图由 cell_to_cell 生成 (有公共边或者面的两个单元相连), 优先用
+METIS 剖分 (见 fealpy.graph.metis). 没有安装 METIS 时, 按单元重心的 Morton
+序 (Z 序) 排序以后等分, 得到的子区域也是紧凑的, 只是界面会长一些.
+
+影子单元按节点的邻接关系逐层扩展: 第 1 层是与子区域内的单元有公共节点的
+单元, 第 l+1 层是与前 l 层有公共节点的单元. 这样一层影子单元就足够在子区
+域内完整地组装属于它的节点 (以及其上的自由度) 的方程.
+
+节点和自由度的拥有者是包含它的单元所属的子区域中编号最小的一个.
+
+Examples
+--------
+mp = MeshPartition(mesh, nparts=4, nghost=1)
+sd = mp.subdomain(0)
+sd.mesh # 局部网格, 与 mesh 的类型相同
+sd.cell # 局部单元的全局编号, 前 sd.NO 个是子区域自己的单元
+sd.node # 局部节点的全局编号
+gspace = LagrangeFiniteElementSpace(mesh, p=2)
+lspace = LagrangeFiniteElementSpace(sd.mesh, p=2)
+l2g, isOwnedDof = sd.dof_map(gspace, lspace)
+"""
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+
+def dual_graph(mesh):
+    """
+
+    Notes
+    -----
+    单元的对偶图, 返回 (NC, NC) 的 csr 格式的邻接矩阵, 不含对角元.
+    """
+    G = mesh.ds.cell_to_cell(return_sparse=True, return_boundary=False)
+    return csr_matrix(G, dtype=np.int_)
+
+
+def cell_to_node_matrix(mesh):
+    """
+
+    Notes
+    -----
+    单元和节点的关联矩阵, (NC, NN) 的 csr 矩阵.
+    """
+    cell = mesh.entity('cell')
+    NC, NV = cell.shape
+    NN = mesh.number_of_nodes()
+    I = np.repeat(np.arange(NC), NV)
+    val = np.ones(NC*NV, dtype=np.int_)
+    return csr_matrix((val, (I, cell.flat)), shape=(NC, NN))
+
+
+def morton_code(points, bits=None):
+    """
+
+    Notes
+    -----
+    点的 Morton 码 (Z 序): 把每个坐标分量量化成 bits 位的整数, 然后交错各
+    分量的二进制位.
+    """
+    NP, GD = points.shape
+    if bits is None:
+        bits = min(63//GD, 20)
+    pmin = points.min(axis=0)
+    h = points.max(axis=0) - pmin
+    h[h == 0.0] = 1.0
+    q = ((points - pmin)/h*(2**bits - 1)).astype(np.uint64)
+    code = np.zeros(NP, dtype=np.uint64)
+    for b in range(bits):
+        for d in range(GD):
+            bit = (q[:, d] >> np.uint64(b)) & np.uint64(1)
+            code |= bit << np.uint64(b*GD + d)
+    return code
+
+
+def morton_partition(mesh, nparts):
+    """
+
+    Notes
+    -----
+    按单元重心的 Morton 序排序, 然后分成单元个数相同的 nparts 段.
+    """
+    NC = mesh.number_of_cells()
+    bc = mesh.entity_barycenter('cell')
+    idx = np.argsort(morton_code(bc), kind='stable')
+    part = np.zeros(NC, dtype=np.int_)
+    part[idx] = np.arange(NC)*nparts//NC
+    return part
+
+
+def metis_partition(mesh, nparts, **options):
+    """
+
+    Notes
+    -----
+    用 METIS 剖分单元的对偶图, options 是 METIS 的参数, 比如 seed, contig.
+    没有安装 METIS 时抛出 ImportError.
+    """
+    try:
+        from ..graph import metis
+    except (ImportError, OSError, RuntimeError) as e:
+        raise ImportError('METIS is not available: {}'.format(e))
+
+    G = dual_graph(mesh)
+    adj = G.indices.astype(np.int32)
+    adjLocation = G.indptr.astype(np.int32)
+    graph = metis.array_to_metis(adj, adjLocation)
+    _, part = metis.part_graph(graph, nparts=nparts, **options)
+    return np.array(part, dtype=np.int_)
+
+
+def partition_mesh(mesh, nparts, method='auto', **options):
+    """
+
+    Parameters
+    ----------
+    mesh : 网格
+    nparts : 子区域的个数
+    method : 'metis', 'morton' 或者 'auto' (有 METIS 时用 METIS)
+
+    Notes
+    -----
+    返回每个单元所属的子区域编号.
+    """
+    if nparts == 1:
+        return np.zeros(mesh.number_of_cells(), dtype=np.int_)
+    if method in {'auto', 'metis'}:
+        try:
+            return metis_partition(mesh, nparts, **options)
+        except ImportError:
+            if method == 'metis':
+                raise
+    elif method != 'morton':
+        raise ValueError("We don't support partition method `{}`! ".format(method))
+    return morton_partition(mesh, nparts)
+
+
+class MeshPartition():
+    """
+    网格的剖分, 保存每个单元的子区域编号, 并生成各个子区域.
+    """
+    def __init__(self, mesh, nparts, method='auto', nghost=1, part=None,
+            **options):
+        """
+
+        Parameters
+        ----------
+        mesh : TriangleMesh, TetrahedronMesh, QuadrangleMesh 或者
+            HexahedronMesh 等节点-单元结构的网格
+        nparts : 子区域的个数
+        method : 剖分方法, 见 partition_mesh
+        nghost : 影子单元的层数
+        part : 直接给出每个单元的子区域编号, 这时不再剖分
+        options : 传给 METIS 的参数
+        """
+        self.mesh = mesh
+        self.nparts = nparts
+        self.nghost = nghost
+        if part is None:
+            part = partition_mesh(mesh, nparts, method=method, **options)
+        self.part = np.asarray(part, dtype=np.int_)
+        self.cell2node = cell_to_node_matrix(mesh)
+        self.node2cell = self.cell2node.T.tocsr()
+
+        # 节点的拥有者: 包含它的单元所属的子区域中编号最小的一个
+        NN = mesh.number_of_nodes()
+        cell = mesh.entity('cell')
+        self.nodeowner = np.full(NN, nparts, dtype=np.int_)
+        np.minimum.at(self.nodeowner, cell,
+                np.broadcast_to(self.part[:, None], cell.shape))
+        self.subdomains = {}
+
+    def __str__(self):
+        s = '{}:\n'.format(self.__class__.__name__)
+        s += '  Number of parts: {}\n'.format(self.nparts)
+        s += '  Edge cut: {}\n'.format(self.edgecut())
+        s += '  Number of cells in each part: {}\n'.format(
+                np.bincount(self.part, minlength=self.nparts))
+        return s
+
+    def number_of_parts(self):
+        return self.nparts
+
+    def edgecut(self):
+        """
+
+        Notes
+        -----
+        对偶图中两端属于不同子区域的边的个数, 即子区域之间的界面边 (面) 数.
+        """
+        G = dual_graph(self.mesh).tocoo()
+        return int(np.sum(self.part[G.row] != self.part[G.col])//2)
+
+    def ghost_layers(self, i):
+        """
+
+        Notes
+        -----
+        返回每个单元相对于子区域 i 的层数: 0 表示属于子区域 i, 1, .., nghost
+        表示影子单元的层数, -1 表示不在局部网格中.
+        """
+        NC = self.mesh.number_of_cells()
+        layer = np.full(NC, -1, dtype=np.int_)
+        isCell = (self.part == i)
+        layer[isCell] = 0
+        for l in range(1, self.nghost+1):
+            isNode = (self.node2cell@isCell.astype(np.int_)) > 0
+            isNew = ((self.cell2node@isNode.astype(np.int_)) > 0) & ~isCell
+            layer[isNew] = l
+            isCell |= isNew
+        return layer
+
+    def dof_owner(self, space):
+        """
+
+        Notes
+        -----
+        全局自由度的拥有者: 包含它的单元所属的子区域中编号最小的一个.
+        """
+        cell2dof = space.cell_to_dof()
+        owner = np.full(space.number_of_global_dofs(), self.nparts,
+                dtype=np.int_)
+        np.minimum.at(owner, cell2dof,
+                np.broadcast_to(self.part[:, None], cell2dof.shape))
+        return owner
+
+    def subdomain(self, i):
+        if i not in self.subdomains:
+            self.subdomains[i] = SubDomain(self, i)
+        return self.subdomains[i]
+
+    def __iter__(self):
+        for i in range(self.nparts):
+            yield self.subdomain(i)
+
+
+class SubDomain():
+    """
+    一个子区域的局部网格和局部到全局的编号.
+
+    Notes
+    -----
+    cell : 局部单元的全局编号, 按层数排列, 前 NO 个是子区域自己的单元
+    layer : 局部单元的层数, 0 表示自己的单元
+    node : 局部节点的全局编号, 从小到大排列
+    isOwnedNode : 局部节点是否属于这个子区域
+    mesh : 局部网格, 与全局网格的类型相同, 单元的顶点顺序与全局网格一致
+    """
+    def __init__(self, partition, i):
+        gmesh = partition.mesh
+        self.partition = partition
+        self.rank = i
+
+        layer = partition.ghost_layers(i)
+        cell = np.nonzero(layer >= 0)[0]
+        idx = np.argsort(layer[cell], kind='stable')
+        self.cell = cell[idx]
+        self.layer = layer[self.cell]
+        self.NO = int(np.sum(self.layer == 0))
+
+        gcell = gmesh.entity('cell')[self.cell]
+        self.node, lcell = np.unique(gcell, return_inverse=True)
+        lcell = lcell.reshape(gcell.shape)
+        self.isOwnedNode = (partition.nodeowner[self.node] == i)
+
+        gnode = gmesh.entity('node')
+        self.mesh = gmesh.__class__(gnode[self.node], lcell)
+
+    def number_of_owned_cells(self):
+        return self.NO
+
+    def number_of_ghost_cells(self):
+        return len(self.cell) - self.NO
+
+    def is_ghost_cell(self):
+        return self.layer > 0
+
+    def neighbors(self):
+        """
+
+        Notes
+        -----
+        拥有局部网格中影子单元的子区域, 即需要和这个子区域交换数据的子区域.
+        """
+        part = self.partition.part[self.cell[self.NO:]]
+        return np.unique(part)
+
+    def dof_map(self, gspace, lspace):
+        """
+
+        Parameters
+        ----------
+        gspace : 全局网格上的有限元空间
+        lspace : 局部网格上的同类有限元空间
+
+        Notes
+        -----
+        返回局部自由度的全局编号 l2g 和局部自由度是否属于这个子区域. 自由度
+        的对应关系由两个空间的 cell_to_dof 得到, 所以对任何有 cell_to_dof 的
+        空间都适用.
+        """
+        gc2d = gspace.cell_to_dof()
+        lc2d = lspace.cell_to_dof()
+        l2g = np.zeros(lspace.number_of_global_dofs(), dtype=np.int_)
+        l2g[lc2d] = gc2d[self.cell]
+        owner = self.partition.dof_owner(gspace)
+        return l2g, owner[l2g] == self.rank
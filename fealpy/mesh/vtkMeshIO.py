@@ -1,13 +1,13 @@
-
-import vtk
-from vtk.numpy_interface import dataset_adapter as dsa
-from .PolygonMesh import PolygonMesh
-
-from tvtk.api import tvtk, write_data
+import os
 
 import numpy as np
 
+from .PolygonMesh import PolygonMesh
+
 def load_vtk_mesh(fileName):
+    import vtk
+    from vtk.numpy_interface import dataset_adapter as dsa
+
     reader = vtk.vtkUnstructuredGridReader()
     reader.SetFileName(fileName)
     reader.Update()
@@ -20,46 +20,26 @@ def load_vtk_mesh(fileName):
     pmesh = PolygonMesh(point[:,[0,1]], cell, cellLocation, cellType)
     return pmesh
 
-def write_vtk_mesh(mesh, fileName):
-    node = mesh.entity('node')
-    GD = mesh.geo_dimension()
-    if GD == 2:
-        node = np.concatenate((node, np.zeros((node.shape[0], 1),
-            dtype=mesh.ftype)), axis=1)
-    ug = tvtk.UnstructuredGrid(points=node)
-
-    if mesh.meshtype is 'hex':
-        cell_type = tvtk.Hexahedron().cell_type
-        cell = mesh.ds.cell
-    elif mesh.meshtype is 'tri':
-        cell_type = tvtk.Triangle().cell_type
-        cell = mesh.ds.cell
-        for key, value in mesh.cellData.items():
-            i = ug.cell_data.add_array(value)
-            ug.cell_data.get_array(i).name=key
-        for key, value in mesh.pointData.items():
-            i = ug.point_data.add_array(value)
-            ug.point_data.get_array(i).name = key
-    elif mesh.meshtype is 'polyhedron':
-        cell_type = tvtk.Polygon().cell_type
-        NF, faces = mesh.to_vtk()
-        cell = tvtk.CellArray()
-        cell.set_cells(NF, faces)
-    elif mesh.meshtype is 'polygon':
-       cell_type = tvtk.Polygon().cell_type
-       NC, cells = mesh.to_vtk()
-       cell = tvtk.CellArray()
-       cell.set_cells(NC, cells)
-    elif mesh.meshtype is 'tet':
-        cell_type = tvtk.Tetra().cell_type
-        cell = mesh.ds.cell
-        for key, value in mesh.cellData.items():
-            i = ug.cell_data.add_array(value)
-            ug.cell_data.get_array(i).name = key
-        for key, value in mesh.pointData.items():
-            i = ug.point_data.add_array(value)
-            ug.point_data.get_array(i).name = key
-    ug.set_cells(cell_type, cell) 
-    write_data(ug, fileName)
-
-
+def write_vtk_mesh(mesh, fileName, compress=False, encoding='raw'):
+    """
+
+    Notes
+    -----
+    用 mesh.to_vtk() 把网格和 nodedata, celldata 写到 VTK XML (.vtu) 文件中,
+    不需要安装 vtk 和 tvtk. fileName 的扩展名不是 .vtu 时换成 .vtu.
+
+    Returns
+    -------
+    写入的文件名
+    """
+    from ..writer.vtkxml import write_vtu
+
+    root, ext = os.path.splitext(fileName)
+    if ext != '.vtu':
+        fileName = root + '.vtu'
+    node, cell, cellType, NC = mesh.to_vtk()
+    write_vtu(fileName, node, cell, cellType, NC,
+            nodedata=getattr(mesh, 'nodedata', None),
+            celldata=getattr(mesh, 'celldata', None),
+            compress=compress, encoding=encoding)
+    return fileName
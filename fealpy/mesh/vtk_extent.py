@@ -4,61 +4,131 @@ Notes
 -----
     FEALPy 的 VTK 的扩展模块
 
+    VTK 的 Lagrange 单元的点的编号规则: 先是顶点, 然后是各条边上的内部点,
+    再是各个面的内部点, 最后是单元的内部点; 面和单元的内部点又按同样的规
+    则递归地编号. 这里直接用 NumPy 生成这个顺序, 不需要安装 vtk.
+
 Authors
 ------
 Huayi Wei, weihuayi@xtu.edu.cn
 """
 import numpy as np
-import vtk
-import vtk.util.numpy_support as vnp
 
 from .vtkCellTypes import *
 
+# VTK 的 Lagrange 单元的边和面 (用 VTK 的顶点编号)
+VTK_TRIANGLE_EDGE = [(0, 1), (1, 2), (2, 0)]
+VTK_TETRA_EDGE = [(0, 1), (1, 2), (2, 0), (0, 3), (1, 3), (2, 3)]
+VTK_TETRA_FACE = [(0, 1, 3), (2, 3, 1), (0, 3, 2), (0, 2, 1)]
+
+
+def lagrange_triangle_points(V, p):
+    """
+
+    Notes
+    -----
+        按 VTK 的顺序给出 p 次三角形单元上的点. V 是三个顶点的整数坐标 (例
+        如重心坐标的 p 倍), 返回所有点的整数坐标.
+    """
+    V = np.asarray(V)
+    if p == 0:
+        return V[:1]
+    points = [V]
+    k = np.arange(1, p).reshape(-1, 1)
+    for i, j in VTK_TRIANGLE_EDGE:
+        points.append(V[i] + (V[j] - V[i])*k//p)
+    if p >= 3: # 内部点是以 (V_i + 边上第一个内部点) 为顶点的 p-3 次三角形
+        W = V + (V.sum(axis=0) - 3*V)//p
+        points.append(lagrange_triangle_points(W, p-3))
+    return np.concatenate(points)
+
+
+def lagrange_tetrahedron_points(V, p):
+    """
+
+    Notes
+    -----
+        按 VTK 的顺序给出 p 次四面体单元上的点, V 是四个顶点的整数坐标.
+    """
+    V = np.asarray(V)
+    if p == 0:
+        return V[:1]
+    points = [V]
+    k = np.arange(1, p).reshape(-1, 1)
+    for i, j in VTK_TETRA_EDGE:
+        points.append(V[i] + (V[j] - V[i])*k//p)
+    if p >= 3:
+        for face in VTK_TETRA_FACE:
+            F = V[list(face)]
+            W = F + (F.sum(axis=0) - 3*F)//p
+            points.append(lagrange_triangle_points(W, p-3))
+    if p >= 4:
+        W = V + (V.sum(axis=0) - 4*V)//p
+        points.append(lagrange_tetrahedron_points(W, p-4))
+    return np.concatenate(points)
+
+
+def lagrange_quadrilateral_index(p):
+    """
+
+    Notes
+    -----
+        p 次四边形单元上 (i, j) 点的 VTK 编号, 与 vtkLagrangeQuadrilateral
+        的 PointIndexFromIJK 相同.
+    """
+    i, j = np.mgrid[0:p+1, 0:p+1]
+    ibdy = (i == 0) | (i == p)
+    jbdy = (j == 0) | (j == p)
+    index = np.zeros((p+1, p+1), dtype=np.int_)
+
+    # 顶点
+    isVertex = ibdy & jbdy
+    index[isVertex] = np.where(i[isVertex] == 0, np.where(j[isVertex] == 0, 0, 3),
+            np.where(j[isVertex] == 0, 1, 2))
+
+    # 边: 先是 j = 0 和 j = p 上的 i 方向的边, 然后是 i = 0 和 i = p 上的
+    # j 方向的边, 顺序为 (j = 0), (i = p), (j = p), (i = 0)
+    flag = jbdy & ~ibdy
+    index[flag] = (i[flag] - 1) + np.where(j[flag] == 0, 0, 2*(p-1)) + 4
+    flag = ibdy & ~jbdy
+    index[flag] = (j[flag] - 1) + np.where(i[flag] == 0, 3*(p-1), p-1) + 4
+
+    # 内部点
+    flag = ~ibdy & ~jbdy
+    index[flag] = 4 + 4*(p-1) + (i[flag] - 1) + (p-1)*(j[flag] - 1)
+    return index
+
+
 def vtk_cell_index(p, celltype):
     """
 
     Notes
     -----
         获取 vtk cell 的相对于 fealpy 网格 cell 的顶点编号规则，用于把 FEALPy 中
-        的 cell 顶点编号顺序转化为 vtk 的编号顺序。
+        的 cell 顶点编号顺序转化为 vtk 的编号顺序, 即 cell[:, index] 是 vtk 编号
+        顺序的单元.
+
+        单形的 VTK 第 i 个顶点就是 fealpy 的第 i 个顶点, 不改变单元的定向.
     """
-    if celltype == VTK_LAGRANGE_CURVE: 
-        return np.arange(p+1, dtype=np.int_)
+    if celltype == VTK_LAGRANGE_CURVE:
+        # fealpy 的边为 [v_0, 内部点, v_1], vtk 为 [v_0, v_1, 内部点]
+        return np.r_[0, p, 1:p]
     elif celltype == VTK_LAGRANGE_TRIANGLE:
-        tri = vtk.vtkLagrangeTriangle()
-        ldof = (p + 1)*(p + 2)//2
-        tri.GetPointIds().SetNumberOfIds(ldof)
-        tri.GetPoints().SetNumberOfPoints(ldof)
-        tri.Initialize()
-        multiIndex = np.zeros((ldof, 3), dtype=np.int_)
-        for i in range(ldof):
-            tri.GetPointIds().SetId(i, i)
-            tri.ToBarycentricIndex(i, multiIndex[i])
+        multiIndex = lagrange_triangle_points(p*np.eye(3, dtype=np.int_), p)
         s = np.sum(multiIndex[:, 1:], axis=-1)
         index = s*(s+1)//2 + multiIndex[:, 2]
         return index
     elif celltype == VTK_LAGRANGE_TETRAHEDRON:
-        tet = vtk.vtkLagrangeTetra()
-        ldof = (p + 1)*(p + 2)*(p + 3)//6
-        tet.GetPointIds().SetNumberOfIds(ldof)
-        tet.GetPoints().SetNumberOfPoints(ldof)
-        tet.Initialize()
-        multiIndex = np.zeros((ldof, 4), dtype=np.int_)
-        for i in range(ldof):
-            tet.GetPointIds().SetId(i, i)
-            tet.ToBarycentricIndex(i, multiIndex[i])
+        multiIndex = lagrange_tetrahedron_points(p*np.eye(4, dtype=np.int_), p)
         s0 = np.sum(multiIndex[:, 1:], axis=-1)
         s1 = np.sum(multiIndex[:, 2:], axis=-1)
         index = s0*(s0+1)*(s0+2)//6 + s1*(s1+1)//2 + multiIndex[:, 3]
         return index
     elif celltype == VTK_LAGRANGE_QUADRILATERAL:
-        quad = vtk.vtkLagrangeQuadrilateral()
-        orders = (p, p)
         sizes = (p + 1, p + 1)
+        idx = lagrange_quadrilateral_index(p)
         index = np.zeros(sizes[0]*sizes[1], dtype=np.int_)
-        for i, loc in enumerate(np.ndindex(sizes)):
-            idx = quad.PointIndexFromIJK(loc[0], loc[1], orders)
-            index[idx] = i
+        index[idx.flat] = np.arange(sizes[0]*sizes[1]) # 与 np.ndindex(sizes) 的顺序相同
         return index
 
 def write_to_vtu(fname, node, NC, cellType, cell, nodedata=None, celldata=None):
@@ -66,35 +136,8 @@ def write_to_vtu(fname, node, NC, cellType, cell, nodedata=None, celldata=None):
 
     Notes
     -----
+        用 fealpy.writer.vtkxml 写 VTK XML 文件, 不需要安装 vtk.
     """
-    points = vtk.vtkPoints()
-    points.SetData(vnp.numpy_to_vtk(node))
-
-    cells = vtk.vtkCellArray()
-    cells.SetCells(NC, vnp.numpy_to_vtkIdTypeArray(cell))
-
-    mesh =vtk.vtkUnstructuredGrid() 
-    mesh.SetPoints(points)
-    mesh.SetCells(cellType, cells)
-
-    pdata = mesh.GetPointData()
-
-    if nodedata is not None:
-        for key, val in nodedata.items():
-            if val is not None:
-                d = vnp.numpy_to_vtk(val[:])
-                d.SetName(key)
-                pdata.AddArray(d)
-
-    if celldata is not None:
-        cdata = mesh.GetCellData()
-        for key, val in celldata.items():
-            if val is not None:
-                d = vnp.numpy_to_vtk(val[:])
-                d.SetName(key)
-                cdata.AddArray(d)
-    writer = vtk.vtkXMLUnstructuredGridWriter()
-    writer.SetFileName(fname)
-    writer.SetInputData(mesh)
-    writer.Write()
-
+    from ..writer.vtkxml import write_vtu
+    write_vtu(fname, node, cell, cellType, NC, nodedata=nodedata,
+            celldata=celldata)
@@ -1,4 +1,5 @@
 import numpy as np
+from mpi4py import MPI
 
 class CommToplogy():
     """
@@ -26,16 +27,22 @@ class CSRMatrixCommToplogy(CommToplogy):
     进程进行任务分割，并建立好通信拓扑，然后广播给每个进程。两种方式需要探讨优劣
     。
     """
-    def __init__(self, comm, N):
+    def __init__(self, comm, N, location=None):
         """__init__
 
         :param comm: 通信子
         :param    N: CSR 矩阵规模
+        :param location: 每个进程拥有的行的起始位置, 长度为 size+1, 默认按行
+            均匀分块
         """
         super(CSRMatrixCommToplogy, self).__init__(comm) 
 
         comm = self.comm
         size = comm.Get_size()
+        if location is not None:
+            self.location = np.asarray(location, dtype='i')
+            return
+
         NN = N//size
         RE = N%size
 
@@ -56,47 +63,37 @@ class CSRMatrixCommToplogy(CommToplogy):
 
         Note
         ----
-        1. 接收数据必须首先开辟好内存空间，这是必须的吗？
+        需要交换的数据个数用一次 Alltoall 得到, 所以不要求矩阵的稀疏结构是
+        对称的.
         """
 
         comm = self.comm
         size = comm.Get_size()
         rank = comm.Get_rank()
 
-        indices = np.unique(indices)
+        self.sds = {}
+        self.rds = {}
+        indices = np.unique(indices).astype('i')
         isNotLocal = (indices < self.location[rank]) | (indices >= self.location[rank+1])
         indices = indices[isNotLocal]
 
-        N = self.location[-1]
-        NN = N//size
-        RE = N%size
-        ranks = (indices - RE)//NN
-        ranks[ranks<0] = 0
-        self.neighbor = set(ranks)
+        ranks = np.searchsorted(self.location, indices, side='right') - 1
 
-        #发送当前进程需要接收数据的个数
+        #交换需要接收和发送数据的个数
+        rcount = np.bincount(ranks, minlength=size).astype('i')
+        scount = np.zeros(size, dtype='i')
+        comm.Alltoall(rcount, scount)
+
+        # 邻居包括需要接收和需要发送数据的进程, 其中一个方向可以没有数据
+        self.neighbor = set(np.nonzero((rcount > 0) | (scount > 0))[0].tolist())
         for r in self.neighbor:
             self.rds[r] = indices[ranks==r]
-            data = np.array(len(self.rds[r]), dtype='i')
-            comm.Isend(data, dest=r, tag=rank)
+            self.sds[r] = np.zeros(scount[r], dtype='i')
 
-        #接收当前进程需要发送数据的个数，并分配内存
-        for r in self.neighbor:
-            data = np.zeros(1, dtype='i')
-            req = comm.Irecv(data, source=r, tag=r)
-            req.Wait()
-            self.sds[r] = np.zeros(data[0], dtype='i') 
-
-        #发送当前进程需要接收数据的编号信息
-        for r in self.neighbor: 
-            data = self.rds[r]
-            comm.Isend(data, dest=r, tag=rank) 
-
-        #接收当前进程需要发送数据的编号信息
-        for r in self.neighbor:  
-            data = self.sds[r]
-            req = comm.Irecv(data, source=r, tag=r)
-            req.Wait()
+        #交换需要接收和发送数据的编号信息, 所有请求同时发出
+        reqs = [comm.Irecv(self.sds[r], source=r, tag=r) for r in self.neighbor]
+        reqs += [comm.Isend(self.rds[r], dest=r, tag=rank) for r in self.neighbor]
+        MPI.Request.Waitall(reqs)
 
     def get_parallel_operator(self, A):
         rank = self.comm.Get_rank()
@@ -1,4 +1,5 @@
 import numpy as np
+from mpi4py import MPI
 
 class NumCompComponent():
     """
@@ -17,21 +18,68 @@ class NumCompComponent():
 
         Note
         ----
+        影子数据的交换用持久通信请求 (Send_init/Recv_init) 实现, 发送和接收
+        缓冲区按数组的类型和列数预先分配, 每次交换只需要打包, Startall,
+        Waitall 和解包. 通信拓扑重新创建以后, 缓冲区和请求也会重新创建.
         """
         self.commtop = commtop
+        self.plans = {} # (dtype, shape[1:]) -> 缓冲区和持久请求
+        self.sds = None # 创建 plans 时的通信拓扑
+        self.active = None # 正在进行的交换
 
+    def plan(self, array):
+        ct = self.commtop
+        if self.sds is not ct.sds:
+            self.free()
+            self.sds = ct.sds
+
+        key = (array.dtype.str, array.shape[1:])
+        if key not in self.plans:
+            comm = ct.comm
+            rank = comm.Get_rank()
+            neighbor = sorted(ct.neighbor)
+            ns = [len(ct.sds[r]) for r in neighbor]
+            nr = [len(ct.rds[r]) for r in neighbor]
+            sbuf = np.zeros((sum(ns),) + array.shape[1:], dtype=array.dtype)
+            rbuf = np.zeros((sum(nr),) + array.shape[1:], dtype=array.dtype)
+            sidx = np.cumsum([0] + ns)
+            ridx = np.cumsum([0] + nr)
+            reqs = []
+            for i, r in enumerate(neighbor):
+                reqs.append(comm.Recv_init(rbuf[ridx[i]:ridx[i+1]], source=r, tag=r))
+            for i, r in enumerate(neighbor):
+                reqs.append(comm.Send_init(sbuf[sidx[i]:sidx[i+1]], dest=r, tag=rank))
+            sds = np.concatenate([ct.sds[r] for r in neighbor] + [np.zeros(0, dtype='i')])
+            rds = np.concatenate([ct.rds[r] for r in neighbor] + [np.zeros(0, dtype='i')])
+            self.plans[key] = (sbuf, rbuf, sds, rds, reqs)
+        return self.plans[key]
+
+    def free(self):
+        for sbuf, rbuf, sds, rds, reqs in self.plans.values():
+            for req in reqs:
+                req.Free()
+        self.plans = {}
+
+    def begin(self, array):
+        """
+        打包需要发送的数据并开始交换, 在 end 之前不能修改 array 中要发送的
+        部分, 也不能使用要接收的部分.
+        """
+        sbuf, rbuf, sds, rds, reqs = self.plan(array)
+        np.take(array, sds, axis=0, out=sbuf)
+        MPI.Prequest.Startall(reqs)
+        self.active = (array, rbuf, rds, reqs)
+
+    def end(self):
+        """
+        等待交换完成, 并把收到的数据放到 array 中.
+        """
+        array, rbuf, rds, reqs = self.active
+        MPI.Request.Waitall(reqs)
+        array[rds] = rbuf
+        self.active = None
+        return array
 
     def communicating(self, array):
-        ct = self.commtop
-        comm = ct.comm
-        rank = comm.Get_rank()
-        for r in ct.neighbor: 
-            data = array[ct.sds[r]]
-            print("rank: ", rank, "data: ", len(ct.sds[r]), len(ct.rds[r]), "r: ", r)
-            comm.Isend(data, dest=r, tag=rank) 
-
-        for r in ct.neighbor:  
-            data = np.zeros(len(ct.rds[r]), dtype=array.dtype)
-            req = comm.Irecv(data, source=r, tag=r)
-            req.Wait()
-            array[ct.rds[r]] = data
+        self.begin(array)
+        return self.end()
@@ -1,9 +1,213 @@
 import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse.linalg import LinearOperator, splu, spilu
 
+from .NumCompComponent import NumCompComponent
 
 
 class ParaAlgorithm():
+    """ParaAlgorithm
+
+    Note
+    ----
+    按行分块的分布式 CSR 矩阵上的 Krylov 子空间方法.
+
+    向量都只存本进程拥有的那一段, 矩阵向量乘时先把它放到全局长度的工作数组
+    中, 通过 NumCompComponent 从邻居进程收到需要的分量, 再与本进程的行相乘.
+    矩阵分成对角块 (拥有的列) 和非对角块两部分, 对角块的乘法与通信重叠.
+    内积用 allreduce 求和.
+
+    预条件子是块 Jacobi 型的: 每个进程只用自己的对角块 (拥有的行和列), 对角
+    块可以用 Jacobi, ILU, LU 或者 AMG 近似求逆, 不需要通信.
     """
-    """
-    def __init__(self):
-        pass
+    def __init__(self, A, commtop):
+        """__init__
+
+        :param       A: 本进程拥有的行组成的 CSR 矩阵, 列是全局编号
+        :param commtop: 与 A 对应的 CSRMatrixCommToplogy
+        """
+        self.A = A
+        self.commtop = commtop
+        self.comm = commtop.comm
+        self.component = NumCompComponent(commtop)
+
+        rank = self.comm.Get_rank()
+        self.start = commtop.location[rank]
+        self.end = commtop.location[rank+1]
+        self.works = {} # 不同列数的工作数组
+
+        A = A.tocoo()
+        isLocal = (A.col >= self.start) & (A.col < self.end)
+        N = self.end - self.start
+        self.Ad = csr_matrix((A.data[isLocal], (A.row[isLocal],
+            A.col[isLocal] - self.start)), shape=(N, N))
+        self.Ao = csr_matrix((A.data[~isLocal], (A.row[~isLocal],
+            A.col[~isLocal])), shape=A.shape)
+        self.niter = 0
+        self.residuals = []
+
+    def matvec(self, x):
+        """matvec
+
+        x 可以是一维数组, 也可以是多列的二维数组.
+        """
+        key = (x.dtype.str, x.shape[1:])
+        if key not in self.works:
+            self.works[key] = np.zeros((self.A.shape[1],) + x.shape[1:],
+                    dtype=x.dtype)
+        work = self.works[key]
+        work[self.start:self.end] = x
+        self.component.begin(work)
+        y = self.Ad@x
+        self.component.end()
+        y += self.Ao@work
+        return y
+
+    def dot(self, x, y):
+        return self.comm.allreduce(np.dot(x, y))
+
+    def dots(self, X, y):
+        """dots
+
+        一次通信计算多个内积.
+        """
+        h = X@y
+        out = np.zeros_like(h)
+        self.comm.Allreduce(h, out)
+        return out
+
+    def norm(self, x):
+        return np.sqrt(self.dot(x, x))
+
+    def diagonal_block(self):
+        return self.Ad.tocsc()
+
+    def preconditioner(self, method='amg', **options):
+        """preconditioner
+
+        :param method: 'jacobi', 'ilu', 'lu' 或者 'amg'
+
+        块 Jacobi 预条件子.
+        """
+        D = self.diagonal_block()
+        N = D.shape[0]
+        if method == 'jacobi':
+            d = 1.0/D.diagonal()
+            solve = lambda r: d*r
+        elif method == 'ilu':
+            solve = spilu(D, **options).solve
+        elif method == 'lu':
+            solve = splu(D).solve
+        elif method == 'amg':
+            from ..solver import AMGSolver
+            solver = AMGSolver(**options)
+            solver.setup(D.tocsr())
+            solve = solver.aspreconditioner().matvec
+        else:
+            raise ValueError("We don't support preconditioner `{}`! ".format(method))
+        return LinearOperator((N, N), matvec=solve, dtype=D.dtype)
+
+    def cg(self, b, x0=None, tol=1e-8, maxit=1000, M=None, callback=None):
+        """cg
+
+        预条件共轭梯度法, 每步两次 allreduce. 返回解和 info, info 为 0 表示
+        收敛, 否则是迭代步数.
+        """
+        x = np.zeros_like(b) if x0 is None else x0.copy()
+        M = (lambda r: r) if M is None else M.matvec
+        nb = self.norm(b)
+        if nb == 0.0:
+            self.niter = 0
+            self.residuals = []
+            return np.zeros_like(b), 0
+
+        r = b - self.matvec(x)
+        z = M(r)
+        p = z.copy()
+        rr, rz = self.dots(np.array([r, z]), r)
+        self.residuals = [np.sqrt(rr)/nb]
+        info = maxit
+        for k in range(maxit):
+            if self.residuals[-1] < tol:
+                info = 0
+                break
+            q = self.matvec(p)
+            alpha = rz/self.dot(p, q)
+            x += alpha*p
+            r -= alpha*q
+            z = M(r)
+            rr, rznew = self.dots(np.array([r, z]), r)
+            beta = rznew/rz
+            rz = rznew
+            p = z + beta*p
+            self.residuals.append(np.sqrt(rr)/nb)
+            if callback is not None:
+                callback(x)
+        else:
+            if self.residuals[-1] < tol:
+                info = 0
+        self.niter = len(self.residuals) - 1
+        return x, info
+
+    def gmres(self, b, x0=None, tol=1e-8, restart=30, maxit=1000, M=None,
+            callback=None):
+        """gmres
+
+        右预条件的重启 GMRES, 用两次经典 Gram-Schmidt 正交化, 每步三次
+        allreduce. maxit 是总的内迭代步数.
+        """
+        x = np.zeros_like(b) if x0 is None else x0.copy()
+        M = (lambda r: r) if M is None else M.matvec
+        nb = self.norm(b)
+        if nb == 0.0:
+            self.niter = 0
+            self.residuals = []
+            return np.zeros_like(b), 0
+
+        N = len(b)
+        V = np.zeros((restart+1, N), dtype=b.dtype)
+        Z = np.zeros((restart, N), dtype=b.dtype)
+        H = np.zeros((restart+1, restart), dtype=b.dtype)
+        r = b - self.matvec(x)
+        beta = self.norm(r)
+        self.residuals = [beta/nb]
+        niter = 0
+        info = maxit
+        while niter < maxit:
+            if self.residuals[-1] < tol:
+                info = 0
+                break
+            V[0] = r/beta
+            H[:] = 0.0
+            g = np.zeros(restart+1, dtype=b.dtype)
+            g[0] = beta
+            for j in range(restart):
+                Z[j] = M(V[j])
+                w = self.matvec(Z[j])
+                h = self.dots(V[:j+1], w)
+                w -= h@V[:j+1]
+                h1 = self.dots(V[:j+1], w)
+                w -= h1@V[:j+1]
+                H[:j+1, j] = h + h1
+                H[j+1, j] = self.norm(w)
+                niter += 1
+                y, res = self.least_squares(H[:j+2, :j+1], g[:j+2])
+                self.residuals.append(res/nb)
+                if (H[j+1, j] == 0.0) or (res/nb < tol) or (niter == maxit):
+                    break
+                V[j+1] = w/H[j+1, j]
+            x += y@Z[:j+1]
+            if callback is not None:
+                callback(x)
+            r = b - self.matvec(x)
+            beta = self.norm(r)
+            self.residuals[-1] = beta/nb
+        else:
+            if self.residuals[-1] < tol:
+                info = 0
+        self.niter = niter
+        return x, info
+
+    def least_squares(self, H, g):
+        y = np.linalg.lstsq(H, g, rcond=None)[0]
+        return y, np.linalg.norm(g - H@y)
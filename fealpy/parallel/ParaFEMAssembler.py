@@ -0,0 +1,198 @@
+import numpy as np
+from scipy.sparse import csr_matrix
+
+from ..mesh.partition import MeshPartition, partition_mesh
+from ..functionspace import LagrangeFiniteElementSpace
+from .CommToplogy import CSRMatrixCommToplogy
+
+
+class ParaFEMAssembler():
+    """ParaFEMAssembler
+
+    Note
+    ----
+    分布式内存的 Lagrange 有限元组装. 每个进程都持有整个网格 (适合在一台机器
+    上用 mpirun -n k 运行), 0 号进程剖分网格 (见 fealpy.mesh.partition) 并广
+    播给其它进程, 每个进程只在自己的单元上组装.
+
+    自由度按拥有者重新编号, 使得每个进程拥有的自由度是连续的一段
+    [location[rank], location[rank+1]), 进程拥有这些行. 在界面上, 其它进程
+    组装的属于本进程的行通过 Alltoallv 发送过来相加, 得到按行分块的分布式
+    CSR 矩阵, 它的列仍然是 (新编号下的) 全局编号, 与 CSRMatrixCommToplogy
+    的约定一致.
+
+    Example
+    -------
+    comm = MPI.COMM_WORLD
+    assembler = ParaFEMAssembler(comm, mesh, p=1)
+    A = assembler.stiff_matrix()
+    F = assembler.source_vector(pde.source)
+    A, F = assembler.apply_dirichlet_bc(A, F, pde.dirichlet)
+    alg = ParaAlgorithm(A, assembler.commtop)
+    x, info = alg.cg(F, M=alg.preconditioner('amg'))
+    uh = assembler.gather(x) # 0 号进程上得到全局编号下的解
+    """
+    def __init__(self, comm, mesh, p=1, q=None, method='auto', part=None):
+        """__init__
+
+        :param comm: 通信子
+        :param mesh: 全局网格, 每个进程上都一样
+        :param    p: Lagrange 有限元的次数
+        :param method: 网格剖分的方法, 见 partition_mesh
+        :param part: 直接给出每个单元所属的进程
+        """
+        self.comm = comm
+        size = comm.Get_size()
+        rank = comm.Get_rank()
+
+        if part is None:
+            if rank == 0:
+                part = partition_mesh(mesh, size, method=method)
+            part = comm.bcast(part, root=0)
+        self.partition = MeshPartition(mesh, size, nghost=0, part=part)
+        self.subdomain = self.partition.subdomain(rank)
+
+        self.mesh = mesh
+        self.space = LagrangeFiniteElementSpace(mesh, p=p, q=q)
+        self.lspace = LagrangeFiniteElementSpace(self.subdomain.mesh, p=p, q=q)
+
+        # 按拥有者重新编号
+        owner = self.partition.dof_owner(self.space)
+        gdof = len(owner)
+        self.perm = np.argsort(owner, kind='stable') # 新编号 -> 原编号
+        self.g2n = np.zeros(gdof, dtype=np.int_) # 原编号 -> 新编号
+        self.g2n[self.perm] = np.arange(gdof)
+        self.location = np.zeros(size+1, dtype='i')
+        self.location[1:] = np.cumsum(np.bincount(owner, minlength=size))
+
+        l2g, _ = self.subdomain.dof_map(self.space, self.lspace)
+        self.l2n = self.g2n[l2g] # 局部编号 -> 新编号
+        self.commtop = CSRMatrixCommToplogy(comm, gdof, location=self.location)
+
+    def number_of_global_dofs(self):
+        return self.location[-1]
+
+    def number_of_owned_dofs(self):
+        rank = self.comm.Get_rank()
+        return self.location[rank+1] - self.location[rank]
+
+    def owned_range(self):
+        rank = self.comm.Get_rank()
+        return self.location[rank], self.location[rank+1]
+
+    def exchange(self, I, *vals):
+        """exchange
+
+        把行号为 I 的数据发送给拥有这些行的进程, 返回本进程收到的 (包括自己
+        的) 行号和数据.
+        """
+        comm = self.comm
+        size = comm.Get_size()
+        dest = np.searchsorted(self.location, I, side='right') - 1
+        idx = np.argsort(dest, kind='stable')
+        scount = np.bincount(dest, minlength=size).astype('i')
+        rcount = np.zeros(size, dtype='i')
+        comm.Alltoall(scount, rcount)
+        sdispl = np.zeros(size, dtype='i')
+        sdispl[1:] = np.cumsum(scount)[:-1]
+        rdispl = np.zeros(size, dtype='i')
+        rdispl[1:] = np.cumsum(rcount)[:-1]
+
+        out = []
+        for v in (I,) + vals:
+            sbuf = np.ascontiguousarray(v[idx])
+            rbuf = np.zeros(rcount.sum(), dtype=sbuf.dtype)
+            comm.Alltoallv([sbuf, (scount, sdispl)], [rbuf, (rcount, rdispl)])
+            out.append(rbuf)
+        return out
+
+    def assemble_matrix(self, M):
+        """assemble_matrix
+
+        :param M: 本进程的单元上组装的局部矩阵, 行列都是局部编号
+
+        把局部矩阵组装成本进程拥有的行组成的分布式 CSR 矩阵.
+        """
+        M = M.tocoo()
+        I = self.l2n[M.row]
+        J = self.l2n[M.col]
+        I, J, V = self.exchange(I, J, M.data)
+        start, end = self.owned_range()
+        N = self.number_of_global_dofs()
+        A = csr_matrix((V, (I - start, J)), shape=(end - start, N))
+        A.sum_duplicates()
+        self.commtop.create_comm_toplogy(A.indices)
+        return A
+
+    def assemble_vector(self, b):
+        """assemble_vector
+
+        把局部向量组装成本进程拥有的那一段.
+        """
+        I, V = self.exchange(self.l2n, b)
+        start, end = self.owned_range()
+        return np.bincount(I - start, weights=V, minlength=end - start)
+
+    def stiff_matrix(self, c=None):
+        return self.assemble_matrix(self.lspace.stiff_matrix(c=c))
+
+    def mass_matrix(self, c=None):
+        return self.assemble_matrix(self.lspace.mass_matrix(c=c))
+
+    def source_vector(self, f):
+        return self.assemble_vector(self.lspace.source_vector(f))
+
+    def apply_dirichlet_bc(self, A, F, gD):
+        """apply_dirichlet_bc
+
+        处理 Dirichlet 边界条件: 边界自由度对应的行变为单位行, 列移到右端.
+        与 fealpy.boundarycondition.eliminate_dirichlet_dof 一样, 在 A 的拷
+        贝上根据 indptr 和 indices 把边界行和列的元素置零, 对角元置为 1, 不
+        做稀疏矩阵乘法. 本进程的第 i 行的对角元在第 i + start 列.
+        """
+        isBdDof = self.space.is_boundary_dof()
+        N = self.number_of_global_dofs()
+        x = np.zeros(N, dtype=F.dtype)
+        ipoints = self.space.interpolation_points()
+        x[self.g2n[isBdDof]] = gD(ipoints[isBdDof])
+        isBdDof = isBdDof[self.perm]
+
+        start, end = self.owned_range()
+        isBdRow = isBdDof[start:end]
+        F = F - A@x
+        F[isBdRow] = x[start:end][isBdRow]
+
+        A = A.tocsr(copy=True)
+        A.sum_duplicates()
+        row = np.repeat(np.arange(end - start), np.diff(A.indptr))
+        col = A.indices
+        A.data[isBdRow[row] | isBdDof[col]] = 0.0
+        isDiag = (col == row + start) & isBdRow[row]
+        A.data[isDiag] = 1.0
+
+        # 结构中没有对角元的边界行
+        hasDiag = np.zeros(end - start, dtype=np.bool_)
+        hasDiag[row[isDiag]] = True
+        idx, = np.nonzero(isBdRow & ~hasDiag)
+        if len(idx) > 0:
+            A = A + csr_matrix((np.ones(len(idx), dtype=A.dtype), (idx, idx + start)),
+                    shape=A.shape)
+        A.eliminate_zeros()
+        self.commtop.create_comm_toplogy(A.indices)
+        return A, F
+
+    def gather(self, x, root=0):
+        """gather
+
+        把各个进程拥有的解收集到 root 进程上, 并恢复为原来的全局编号.
+        """
+        comm = self.comm
+        count = np.diff(self.location)
+        displ = self.location[:-1]
+        if comm.Get_rank() == root:
+            y = np.zeros(self.number_of_global_dofs(), dtype=x.dtype)
+            comm.Gatherv(np.ascontiguousarray(x), [y, (count, displ)], root=root)
+            return y[self.g2n]
+        else:
+            comm.Gatherv(np.ascontiguousarray(x), None, root=root)
+            return None
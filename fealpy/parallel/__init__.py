@@ -3,3 +3,5 @@ from .CommToplogy import CommToplogy
 from .CommToplogy import CSRMatrixCommToplogy
 
 from .NumCompComponent import NumCompComponent
+from .ParaAlgorithm import ParaAlgorithm
+from .ParaFEMAssembler import ParaFEMAssembler
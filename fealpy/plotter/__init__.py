@@ -1,3 +1,8 @@
-from .VTKPlotter import VTKPlotter
-from .actors import Actor
-from .actors import meshactor
+from ..common.lazy import lazy_import
+
+# 需要 vtk, 在第一次使用时才导入 (见 fealpy.common.lazy)
+__getattr__, __dir__ = lazy_import(__name__, {
+    'VTKPlotter': '.VTKPlotter',
+    'Actor': '.actors',
+    'meshactor': '.actors',
+    })
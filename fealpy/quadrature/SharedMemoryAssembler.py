@@ -0,0 +1,259 @@
+import multiprocessing as mp
+from multiprocessing import shared_memory
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+from ..mesh.coloring import cell_coloring
+
+
+# 工作进程中的状态, 由 init_worker 设置
+_worker = {}
+
+
+def init_worker(space, qf, arrays):
+    _worker['space'] = space
+    _worker['qf'] = qf
+    _worker['arrays'] = arrays
+
+
+def cell_matrix(space, qf, form, index, cellmeasure, c=None):
+    """
+
+    Notes
+    -----
+    计算 index 中单元的单元矩阵, 与 FEMeshIntegralAlg.serial_construct_matrix
+    的公式相同. 这里不用 einsum 的 optimize 选项, 使得每个单元矩阵的求和顺序
+    与一次计算多少个单元无关.
+    """
+    bcs, ws = qf.get_quadrature_points_and_weights()
+    basis = space.grad_basis if form == 'stiff' else space.basis
+    phi = basis(bcs, index=index)
+    NC = len(index)
+    if phi.ndim == 3:
+        phi = phi[..., None]
+    phi = np.broadcast_to(phi, (len(ws), NC) + phi.shape[2:])
+    measure = cellmeasure[index]
+
+    w = np.broadcast_to(ws[:, None], (len(ws), NC))
+    phi0 = phi
+    if c is not None:
+        if np.isscalar(c):
+            w = c*w
+        elif c.ndim == 1: # (NC, ) 分片常数
+            measure = c[index]*measure
+        elif c.shape == (phi.shape[-1], phi.shape[-1]): # 常数扩散系数
+            phi0 = np.einsum('mn, ijkn->ijkm', c, phi)
+        else: # (NQ, NC)
+            w = w*c[:, index]
+    return np.einsum('ij, ijkl, ijml, j->jkm', w, phi0, phi, measure)
+
+
+def assemble_chunk(task):
+    form, start, stop, cshape = task
+    arrays = _worker['arrays']
+    index = arrays['order'][start:stop]
+    pos = arrays['pos'][index]
+    c = cshape
+    if isinstance(cshape, tuple):
+        c = arrays['c'][:np.prod(cshape)].reshape(cshape)
+    M = cell_matrix(_worker['space'], _worker['qf'], form, index,
+            arrays['cellmeasure'], c=c)
+    # 同一种颜色的单元没有公共自由度, 所以 pos 中没有重复的位置
+    arrays['data'][pos] += M
+    return stop - start
+
+
+class SharedMemoryAssembler():
+    """
+    共享内存的多进程有限元矩阵组装.
+
+    Notes
+    -----
+    单元按公共自由度着色 (见 fealpy.mesh.coloring.cell_coloring), 同一种颜色的
+    单元没有公共自由度, 多个工作进程可以同时把它们的单元矩阵直接加到共享的
+    CSR 矩阵的 data 数组中, 不需要加锁, 也不需要最后再做一次归约. 颜色之间
+    依次进行.
+
+    CSR 矩阵的稀疏结构和每个单元矩阵元素在 data 中的位置 pos 预先计算好, 与
+    单元的尺寸, 系数和 data 一起放在 multiprocessing.shared_memory 中. 工作
+    进程在这些共享内存创建之后用 fork 的方式启动, 直接映射同一块共享内存, 读
+    父进程中的网格和空间时也不复制网格.
+
+    data 中的每个元素按颜色的顺序累加, 而着色是确定的, 所以得到的矩阵与工作
+    进程的个数和任务的划分无关, 每一位都相同.
+
+    适用于任何有 cell_to_dof, 并且 basis 和 grad_basis 支持 index 参数的空间.
+    不支持 fork 的平台上在当前进程中依次组装.
+
+    Examples
+    --------
+    space = LagrangeFiniteElementSpace(mesh, p=2)
+    with SharedMemoryAssembler(space, nworkers=8) as assembler:
+        A = assembler.stiff_matrix()
+        M = assembler.mass_matrix(c=rho)
+    """
+    def __init__(self, space, nworkers=None, q=None, chunksize=None, seed=0):
+        """
+
+        Parameters
+        ----------
+        space : 有限元空间
+        nworkers : 工作进程的个数, 默认为 cpu 的个数
+        q : 积分公式的次数, 默认用 space 的积分公式
+        chunksize : 每个任务的单元个数, 默认把每种颜色的单元平均分给工作
+            进程
+        seed : 单元着色的随机种子
+        """
+        self.space = space
+        self.mesh = space.mesh
+        self.nworkers = mp.cpu_count() if nworkers is None else nworkers
+        self.qf = space.integrator if q is None else self.mesh.integrator(q, etype='cell')
+        self.chunksize = chunksize
+        self.pool = None
+        self.shms = {}
+        self.arrays = {}
+
+        cell2dof = space.cell_to_dof()
+        gdof = space.number_of_global_dofs()
+        NC, ldof = cell2dof.shape
+
+        # 单元着色, 按颜色排列单元
+        self.color = cell_coloring(cell2dof, gdof=gdof, seed=seed)
+        self.order = np.argsort(self.color, kind='stable')
+        self.location = np.zeros(self.color.max()+2, dtype=np.int_)
+        self.location[1:] = np.cumsum(np.bincount(self.color))
+
+        # CSR 矩阵的稀疏结构和单元矩阵元素在 data 中的位置
+        I = np.broadcast_to(cell2dof[:, :, None], (NC, ldof, ldof))
+        J = np.broadcast_to(cell2dof[:, None, :], (NC, ldof, ldof))
+        key = I.astype(np.int64)*gdof + J
+        key, pos = np.unique(key, return_inverse=True)
+        self.indices = (key%gdof).astype(np.int32)
+        self.indptr = np.zeros(gdof+1, dtype=np.int32)
+        self.indptr[1:] = np.cumsum(np.bincount(key//gdof, minlength=gdof))
+        self.shape = (gdof, gdof)
+
+        NQ = len(self.qf.get_quadrature_points_and_weights()[1])
+        GD = self.mesh.geo_dimension()
+        ftype = self.mesh.ftype
+        self.share('order', self.order)
+        self.share('pos', pos.reshape(NC, ldof, ldof))
+        self.share('cellmeasure', self.mesh.entity_measure('cell'))
+        self.share('data', np.zeros(len(key), dtype=ftype))
+        self.share('c', np.zeros(max(NQ*NC, GD*GD), dtype=ftype))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __del__(self):
+        if hasattr(self, 'shms'):
+            self.close()
+
+    def number_of_colors(self):
+        return len(self.location) - 1
+
+    def share(self, name, array):
+        """
+
+        Notes
+        -----
+        把数组复制到共享内存中.
+        """
+        shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        a = np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)
+        a[:] = array
+        self.shms[name] = shm
+        self.arrays[name] = a
+        return a
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
+        self.arrays = {}
+        for shm in self.shms.values():
+            shm.close()
+            shm.unlink()
+        self.shms = {}
+
+    def get_pool(self):
+        if (self.pool is None) and (self.nworkers > 1):
+            if 'fork' not in mp.get_all_start_methods():
+                self.nworkers = 1
+                return None
+            ctx = mp.get_context('fork')
+            self.pool = ctx.Pool(self.nworkers, initializer=init_worker,
+                    initargs=(self.space, self.qf, self.arrays))
+        return self.pool
+
+    def tasks(self, form, cshape):
+        """
+
+        Notes
+        -----
+        每种颜色的任务列表, 同一种颜色的任务可以同时进行.
+        """
+        for i in range(self.number_of_colors()):
+            start, stop = self.location[i], self.location[i+1]
+            n = self.chunksize
+            if n is None:
+                n = max(-(-(stop - start)//self.nworkers), 1)
+            yield [(form, s, min(s+n, stop), cshape) for s in range(start, stop, n)]
+
+    def coefficient(self, c):
+        """
+
+        Notes
+        -----
+        把数组或者函数形式的系数放到共享内存中, 返回它的形状, 标量原样返回.
+        """
+        if (c is None) or np.isscalar(c):
+            return c
+        if callable(c):
+            bcs, ws = self.qf.get_quadrature_points_and_weights()
+            if c.coordtype == 'barycentric':
+                c = c(bcs)
+            else:
+                c = c(self.mesh.bc_to_point(bcs))
+        c = np.asarray(c, dtype=self.mesh.ftype)
+        if c.ndim == 1 and len(c) != self.mesh.number_of_cells():
+            raise ValueError("the shape of the coefficient array is not supported!")
+        self.arrays['c'][:c.size] = c.flat
+        return c.shape
+
+    def assemble(self, form, c=None):
+        """
+
+        Parameters
+        ----------
+        form : 'stiff' 或者 'mass'
+        c : 系数, 可以是标量, (NC, ) 的分片常数, (GD, GD) 的常数矩阵,
+            (NQ, NC) 的积分点上的值, 或者可以在积分点上求值的函数
+        """
+        cshape = self.coefficient(c)
+        data = self.arrays['data']
+        data[:] = 0.0
+
+        pool = self.get_pool()
+        if pool is None:
+            init_worker(self.space, self.qf, self.arrays)
+            for tasks in self.tasks(form, cshape):
+                for task in tasks:
+                    assemble_chunk(task)
+        else:
+            for tasks in self.tasks(form, cshape):
+                pool.map(assemble_chunk, tasks)
+
+        return csr_matrix((data.copy(), self.indices.copy(), self.indptr.copy()),
+                shape=self.shape)
+
+    def stiff_matrix(self, c=None):
+        return self.assemble('stiff', c=c)
+
+    def mass_matrix(self, c=None):
+        return self.assemble('mass', c=c)
@@ -1,14 +1,33 @@
+"""
+solver
+======
 
-from .solve import solve, active_set_solver
-from .amg import AMGSolver
-from .matlab_solver import MatlabSolver
+求解器在第一次使用时才导入 (见 fealpy.common.lazy), pyamg, petsc4py 等可选
+的依赖只有用到对应的求解器时才需要安装.
+"""
 
-try:
-    from .petsc_solver import PETScSolver
-except ImportError:
-    print('I do not find petsc and petsc4py installed on this system!, so you can not use it')
+from ..common.lazy import lazy_import
 
-from .fast_solver import HighOrderLagrangeFEMFastSolver
-from .fast_solver import SaddlePointFastSolver
-from .fast_solver import LinearElasticityLFEMFastSolver 
-from .fast_solver import LinearElasticityRLFEMFastSolver
+__getattr__, __dir__ = lazy_import(__name__, {
+    'solve': '.solve',
+    'active_set_solver': '.solve',
+    'AMGSolver': '.amg',
+    'GeometricMultigrid': '.gmg',
+    'MeshHierarchy': '.gmg',
+    'FactorizationCache': '.factorization_cache',
+    'LOBPCGSolver': '.eigns',
+    'LinearSolver': '.linear_solver',
+    'linear_solve': '.linear_solver',
+    'register_solver': '.linear_solver',
+    'SolverTelemetry': '.telemetry',
+    'SaddlePointPreconditioner': '.block_preconditioner',
+    'SaddlePointSolver': '.block_preconditioner',
+    'SchwarzPreconditioner': '.schwarz',
+    'MatlabSolver': '.matlab_solver',
+    'PETScSolver': '.petsc_solver',
+
+    'HighOrderLagrangeFEMFastSolver': '.fast_solver',
+    'SaddlePointFastSolver': '.fast_solver',
+    'LinearElasticityLFEMFastSolver': '.fast_solver',
+    'LinearElasticityRLFEMFastSolver': '.fast_solver',
+    })
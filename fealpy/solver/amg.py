@@ -1,65 +1,295 @@
 import numpy as np
-from scipy.sparse.linalg import cg, inv, dsolve, spsolve
-from scipy.sparse import spdiags, csr_matrix
-from timeit import default_timer as timer
+from scipy.sparse import csr_matrix, spdiags
 
+from .multigrid import MultigridSolver
 
 
-class AMGSolver():
+def strong_mask(A, theta=0.25):
+    """
+
+    Notes
+    -----
+    经典的强连接判断: 如果
+
+        -a_{ij} >= theta * max_{k != i} (-a_{ik})
+
+    则称 i 强依赖于 j. 返回与 A.data 对应的逻辑数组. 这里要求 A 是 csr 格式,
+    并且已经排序和合并了重复元素.
+    """
+    N = A.shape[0]
+    i = np.repeat(np.arange(N), np.diff(A.indptr))
+    j = A.indices
+    val = -A.data
+    isOff = (i != j)
+
+    m = np.zeros(N, dtype=A.dtype)
+    v = np.where(isOff, val, -np.inf)
+    isNonEmpty = np.diff(A.indptr) > 0
+    m[isNonEmpty] = np.maximum.reduceat(v, A.indptr[:-1][isNonEmpty])
+    return isOff & (val > 0) & (val >= theta*m[i])
+
+
+def strength_of_connection(A, theta=0.25):
+    """
+
+    Notes
+    -----
+    返回强连接矩阵 S, S[i, j] == 1 表示 i 强依赖于 j.
+    """
+    A = A.tocsr()
+    A.sum_duplicates()
+    N = A.shape[0]
+    isStrong = strong_mask(A, theta=theta)
+    i = np.repeat(np.arange(N), np.diff(A.indptr))
+    S = csr_matrix(
+            (np.ones(isStrong.sum(), dtype=np.int_), (i[isStrong], A.indices[isStrong])),
+            shape=A.shape)
+    return S
+
+
+def coarsen_rs(S, seed=None):
+    """
+
+    Notes
+    -----
+    C/F 分裂. 以 Ruge-Stuben 的测度 lambda_i = |S_i^T| (强依赖 i 的点的个数)
+    加上一个随机扰动做为权重, 每一轮把未定点中权重是局部最大的点放入粗点集
+    合 C, 再把强依赖于新粗点的未定点放入细点集合 F, 同时增大这些新细点所强
+    依赖的未定点的权重. 每一轮都是向量化的运算.
+
+    既不强依赖于其它点, 也不被其它点强依赖的孤立点直接放入 F.
+
+    返回粗点的逻辑数组 isC.
+    """
+    N = S.shape[0]
+    S = S.tocsr()
+    ST = S.T.tocsr()
+    G = (S + ST).tocsr() # 对称化后的强连接图
+    i = np.repeat(np.arange(N), np.diff(G.indptr))
+    j = G.indices
+    isOff = (i != j)
+    G = csr_matrix((G.data[isOff], (i[isOff], j[isOff])), shape=G.shape)
+    i = i[isOff]
+    j = j[isOff]
+
+    rng = np.random.default_rng(seed)
+    w = np.diff(ST.indptr) + rng.random(N)
+
+    state = np.zeros(N, dtype=np.int8) # 0: 未定点, 1: 粗点, -1: 细点
+    state[np.diff(G.indptr) == 0] = -1 # 孤立点是细点
+
+    isU = (state == 0)
+    while np.any(isU):
+        # 未定点中权重局部最大的点
+        flag = isU[i] & isU[j]
+        wmax = np.full(N, -np.inf)
+        ii = i[flag]
+        if len(ii) > 0:
+            row, start = np.unique(ii, return_index=True)
+            wmax[row] = np.maximum.reduceat(w[j[flag]], start)
+        isNewC = isU & (w > wmax)
+        state[isNewC] = 1
+
+        # 强依赖于新粗点的未定点成为细点
+        isNewF = (S@isNewC.astype(np.int_) > 0) & isU & (~isNewC)
+        state[isNewF] = -1
+
+        # 新细点所强依赖的点更有可能成为粗点
+        w += S.T@isNewF.astype(np.int_)
+        isU = (state == 0)
+
+    return state == 1
+
+
+def interpolation_weights(A, AP, isC):
+    """
+
+    Notes
+    -----
+    经典 (直接) 插值权重. A 用来提供对角元和每行所有非对角元的和, AP 是 A
+    在插值集合上的限制 (只保留 F 行和 C 列). 对 F 点 i
+
+        w_{ij} = -alpha_i a_{ij}/a_{ii}, a_{ij} < 0
+        w_{ij} = -beta_i a_{ij}/a_{ii}, a_{ij} > 0
+
+    其中 alpha_i (beta_i) 是所有负 (正) 非对角元的和与插值集合上负 (正)
+    非对角元的和的比值. 如果插值集合上没有正的元素, 就把正元素的和加到对角
+    元上.
+    """
+    N = A.shape[0]
+    A = A.tocoo()
+    isOff = (A.row != A.col)
+    a = A.data
+    d = A.diagonal()
+
+    flag = isOff & (a < 0)
+    sneg = np.bincount(A.row[flag], weights=a[flag], minlength=N)
+    flag = isOff & (a > 0)
+    spos = np.bincount(A.row[flag], weights=a[flag], minlength=N)
+
+    AP = AP.tocoo()
+    r, c, v = AP.row, AP.col, AP.data
+    flag = (~isC[r]) & isC[c] & (r != c) & (v != 0)
+    r, c, v = r[flag], c[flag], v[flag]
+
+    isNeg = v < 0
+    pneg = np.bincount(r[isNeg], weights=v[isNeg], minlength=N)
+    ppos = np.bincount(r[~isNeg], weights=v[~isNeg], minlength=N)
+
+    alpha = np.zeros(N, dtype=A.dtype)
+    np.divide(sneg, pneg, out=alpha, where=(pneg != 0))
+    beta = np.zeros(N, dtype=A.dtype)
+    isPos = (ppos != 0)
+    np.divide(spos, ppos, out=beta, where=isPos)
+    d = d + np.where(isPos, 0, spos)
+
+    w = np.where(isNeg, -alpha[r]*v/d[r], -beta[r]*v/d[r])
+
+    cidx = np.cumsum(isC) - 1 # 粗点的编号
+    NC = isC.sum()
+    C, = np.nonzero(isC)
+    I = np.r_[C, r]
+    J = np.r_[np.arange(NC), cidx[c]]
+    val = np.r_[np.ones(NC, dtype=A.dtype), w]
+    P = csr_matrix((val, (I, J)), shape=(N, NC))
+    return P
+
+
+def direct_interpolation(A, S, isC):
+    """
+
+    Notes
+    -----
+    直接插值, F 点 i 的插值集合是 i 强依赖的粗点.
+    """
+    AP = A.multiply(S.astype(np.bool_)).tocsr()
+    return interpolation_weights(A, AP, isC)
+
+
+def standard_interpolation(A, S, isC):
+    """
+
+    Notes
+    -----
+    标准插值. 先用 F 点 i 强依赖的细点 k 所在的方程
+
+        e_k = -1/a_{kk} \sum_{j != k} a_{kj} e_j
+
+    消去第 i 个方程中的 e_k, 得到新的矩阵
+
+        \hat A = A - W D^{-1} A
+
+    其中 W 中只保留 a_{ik} (i, k 都是细点, 且 i 强依赖于 k). 再在 \hat A 上
+    做直接插值, i 的插值集合是 i 强依赖的粗点与 k 强依赖的粗点的并集.
+    """
+    N = A.shape[0]
+    A = A.tocsr()
+    isF = ~isC
+    S = S.tocsr()
+    S.data[:] = 1
+
+    DF = spdiags(isF.astype(A.dtype), 0, N, N)
+    DC = spdiags(isC.astype(A.dtype), 0, N, N)
+
+    # 细点之间的强连接, 只保留 A 的值
+    W = (DF@A.multiply(S)@DF).tocsr()
+    W.eliminate_zeros()
+
+    Dinv = spdiags(1/A.diagonal(), 0, N, N)
+    Ahat = (A - W@Dinv@A).tocsr()
+
+    # 插值集合的模式
+    SC = (S@DC).tocsr()
+    Wabs = W.copy()
+    Wabs.data = np.abs(Wabs.data)
+    pattern = (SC + Wabs@SC).tocsr()
+    pattern.data[:] = 1
+
+    AP = Ahat.multiply(pattern).tocsr()
+    return interpolation_weights(Ahat, AP, isC)
+
+
+class AMGSolver(MultigridSolver):
     """
     代数多重网格解法器类。用代数多重网格方法求解
 
     Ax = b
 
     要从 A 图结构中生成一个抽象的网格。
+
+    Notes
+    -----
+    setup 只依赖于矩阵的图结构和数值, 构造出插值算子层次之后, 当矩阵的结构
+    不变而只有数值变化时 (比如 Picard 迭代或者时间步进), 可以调用 update 只
+    重新计算 Galerkin 粗网格算子和磨光子, 复用已有的插值算子.
+
+    Examples
+    --------
+    solver = AMGSolver()
+    solver.setup(A)
+    x = solver.solve(b, tol=1e-10, accel='cg')
+
+    solver.update(A1) # A1 与 A 有相同的结构
+    x = solver.solve(b1, x0=x)
     """
-    def __init__(self):
-        pass
+    def __init__(self, theta=0.25, csize=50, maxlevel=25, itype='standard',
+            ctype='V', smoother='gs', nu=1, seed=None):
+        """
+
+        Parameters
+        ----------
+        theta : 强连接阈值
+        csize : 最粗层矩阵的最大规模, 最粗层用直接法求解
+        maxlevel : 最大层数
+        itype : 插值类型, 'direct' 或者 'standard'
+        ctype : 循环类型, 'V', 'W' 或者 'F'
+        smoother : 磨光子, 可以是 smoother.py 中注册的名字, 或者是一个以矩阵
+            为参数的类或函数, 返回的对象要有 smooth(x, b, nu, lower) 方法
+        nu : 前后磨光的次数
+        seed : C/F 分裂中随机数的种子
+        """
+        super().__init__(ctype=ctype, smoother=smoother, nu=nu)
+        self.theta = theta
+        self.csize = csize
+        self.maxlevel = maxlevel
+        self.itype = itype
+        self.seed = seed
 
     def setup(self, A):
-        self.A = A
-
-    def solve(self, b):
-        pass
-
-    def coarsen_rs(self, theta=0.025):
-        A = self.A
-        N = A.shape[0]
-
-        D = A.min(axis=1).toarray()# 最小的副对角线的值， 绝对值是是最大的
-        D = spdiags(1/D.reshape(-1), 0, N, N)
-        Am = D@A
-
-        # 删除弱连通关系
-        i, j = Am.nonzero()
-        val = np.asarray(Am[i, j]).reshape(-1)
-
-        idx = (-val > theta)
-        data = np.ones(idx.sum(), dtype=np.int)
-        As = csr_matrix( # 有向图的非对称矩阵
-                (data, (i[idx], j[idx])), shape=(N, N), dtype=np.int)
-        Am = csr_matrix(
-                (val[idx], (i[idx], j[idx])), shape=(N, N), dtype=A.dtype)
-        Ass = (As + As.T)/2 # 无向图的对称矩阵
-
-        # 把孤立点放到 F 集合
-        isF = np.zeros(N, dtype=np.bool) # 细点
-        dgIn = np.asarray(As.sum(axis=1)).reshape(-1) # 接入强联接顶点的数目
-        isF[digIn == 0] = True # 孤立点是细点
-
-        # 发现一个逼近的极大独立集做为粗点
-        isC = np.zeros(N, dtype=np.bool) # C: coarse node
-        U = np.arange(N)                 # U: undecided node 
-        degFin = np.zeros(N, dtype=np.int) # number of F nodes strong connected to
-
-        while isC.sum() < N/2 and U.shape[0] > 20:
-            # S: selected set, changing in the coarsening
-            isS = np.zeros(N, dtype=np.bool)
-            degInAll = digIn + degFin
-            flag = (np.randdom.rand(N) < 0.85*degInAll/degInAll.mean()) & \
-                    (degInAll > 0)
-            isS[flag] = True
-            S, = isS.nonzero()
-
-            
+        """
+
+        Notes
+        -----
+        构造多重网格的层次结构: 强连接, C/F 分裂, 插值算子和 Galerkin 粗网格
+        算子.
+        """
+        A = A.tocsr()
+        A.sum_duplicates()
+        A.sort_indices()
+        self.A = [A]
+        self.P = []
+        self.R = []
+        while (len(self.A) < self.maxlevel) and (A.shape[0] > self.csize):
+            S = strength_of_connection(A, theta=self.theta)
+            isC = coarsen_rs(S, seed=self.seed)
+            NC = isC.sum()
+            if (NC == 0) or (NC == A.shape[0]):
+                break
+
+            if self.itype == 'direct':
+                P = direct_interpolation(A, S, isC)
+            elif self.itype == 'standard':
+                P = standard_interpolation(A, S, isC)
+            else:
+                raise ValueError("We don't support interpolation `{}`! ".format(self.itype))
+
+            R = P.T.tocsr()
+            A = (R@A@P).tocsr()
+            A.sum_duplicates()
+            A.sort_indices()
+
+            self.P.append(P)
+            self.R.append(R)
+            self.A.append(A)
 
+        self.setup_smoothers()
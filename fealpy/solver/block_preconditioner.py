@@ -0,0 +1,415 @@
+"""
+
+Notes
+-----
+鞍点问题
+
+    [[A,   B], [x0]   [F0]
+     [B^T, C]] [x1] = [F1]
+
+的块预条件子, 其中 A 对称正定, C 是零或者对称半负定的稳定化项. 适用于
+Stokes 问题 (A 是向量拉格朗日元的刚度矩阵), 以及 Darcy 问题和混合元的
+Poisson 问题 (A 是 RT 元的质量矩阵).
+
+预条件子由速度块的近似逆 A^{-1} 和 Schur 补 S = B^T A^{-1} B - C 的近似逆
+组成:
+
+    'diag' : 块对角 diag(A, S), 对称正定, 配合 MINRES
+    'tri'  : 块上三角 [[A, B], [0, -S]], 配合 GMRES
+    'al'   : 增广 Lagrange 方法, 把 A 换成 A + gamma B W^{-1} B^T (W 是压力
+             质量矩阵的对角), 右端做相应的修改, 然后用块上三角预条件子
+
+Schur 补的近似:
+
+    'diag' : B^T diag(A)^{-1} B - C, 用 AMG 求逆. 适用于 Darcy 问题, 这时它
+             相当于压力的间断元刚度矩阵
+    'mass' : 压力的质量矩阵 Mp (Stokes 问题中要除以粘性系数), 用 Chebyshev
+             迭代求逆
+    'bfbt' : (B^T D^{-1} B)^{-1} B^T D^{-1} A D^{-1} B (B^T D^{-1} B)^{-1},
+             D = diag(A), 不需要压力质量矩阵
+
+'diag' 和 'mass' 与网格尺寸无关, Krylov 方法的迭代步数在网格加密时基本不
+变. 'bfbt' 在有 Dirichlet 边界时迭代步数随网格加密增长, 只在没有压力质量
+矩阵时使用. 增广 Lagrange 方法的 gamma 越大, Schur 补近似得越好, 但
+A + gamma B W^{-1} B^T 越难用 AMG 求逆, gamma 较大时速度块最好用直接法.
+
+Picard 或者 Newton 迭代中每步重新组装矩阵, 结构不变的块只调用
+AMGSolver.update, 没有变化的块 (比如 B 和 Mp) 的近似逆直接复用.
+"""
+
+import numpy as np
+from numpy.linalg import norm
+from scipy.sparse import spdiags, bmat, block_diag, vstack
+from scipy.sparse.linalg import gmres, LinearOperator
+
+from .amg import AMGSolver
+from .smoother import ChebyshevSmoother
+from .factorization_cache import FactorizationCache, matrix_key
+from .linear_solver import preconditioned_minres, same_structure
+
+
+class SaddlePointPreconditioner():
+    """
+    鞍点问题的块预条件子.
+
+    Examples
+    --------
+    P = SaddlePointPreconditioner(ptype='diag', schur='mass')
+    P.setup(A, B, Mp=Mp)
+    M = P.aslinearoperator() # 可以做为 minres, gmres 的 M 参数
+    """
+    def __init__(self, ptype='diag', schur='diag', ublock='amg', gamma=None,
+            ncycle=1, mass_iter=2, **options):
+        """
+
+        Parameters
+        ----------
+        ptype : 'diag', 'tri' 或者 'al'
+        schur : Schur 补的近似, 'diag', 'mass' 或者 'bfbt'
+        ublock : 速度块的求逆方法, 'amg' (AMG 的 V 循环), 'jacobi' (对角,
+            适用于 RT 元的质量矩阵) 或者 'lu' (直接法)
+        gamma : 增广 Lagrange 方法的参数, 默认为 1
+        ncycle : 速度块和 Schur 补上 AMG 循环的次数
+        mass_iter : 压力质量矩阵上 Chebyshev 迭代的次数
+        options : 以 amg_ 开头的参数传给 AMGSolver, 比如 amg_smoother='mcgs'
+        """
+        if ptype not in {'diag', 'tri', 'al'}:
+            raise ValueError("We don't support preconditioner `{}`! ".format(ptype))
+        if schur not in {'diag', 'mass', 'bfbt'}:
+            raise ValueError("We don't support Schur approximation `{}`! ".format(schur))
+        if ublock not in {'amg', 'jacobi', 'lu'}:
+            raise ValueError("We don't support velocity solver `{}`! ".format(ublock))
+        self.ptype = ptype
+        self.schur = schur
+        self.ublock = ublock
+        self.gamma = (1.0 if ptype == 'al' else 0.0) if gamma is None else gamma
+        self.ncycle = ncycle
+        self.mass_iter = mass_iter
+        self.amgoptions = {k[4:]: v for k, v in options.items() if k.startswith('amg_')}
+
+        self.amgs = {}
+        self.keys = {}
+        self.cache = FactorizationCache()
+        self.nbuild = 0 # 重新构造 AMG 层次的次数
+        self.nupdate = 0 # 复用 AMG 插值算子的次数
+
+    def __str__(self):
+        s = '{}:\n'.format(self.__class__.__name__)
+        s += '  Type: {}, Schur: {}, velocity: {}\n'.format(
+                self.ptype, self.schur, self.ublock)
+        s += '  AMG setup: {}, AMG update: {}\n'.format(self.nbuild, self.nupdate)
+        return s
+
+    def amg(self, name, M):
+        """
+
+        Notes
+        -----
+        返回矩阵 M 上的 AMGSolver. 名字为 name 的块已经有 AMG 层次并且结构没
+        有变化时, 只调用 update.
+        """
+        M = M.tocsr()
+        M.sum_duplicates()
+        M.sort_indices()
+        amg = self.amgs.get(name)
+        if (amg is not None) and same_structure(amg.A[0], M):
+            if matrix_key(amg.A[0]) != matrix_key(M):
+                amg.update(M)
+                self.nupdate += 1
+        else:
+            amg = AMGSolver(**self.amgoptions)
+            amg.setup(M)
+            self.amgs[name] = amg
+            self.nbuild += 1
+        return amg
+
+    def changed(self, name, *ms):
+        """
+
+        Notes
+        -----
+        检查名字为 name 的一组矩阵与上次 setup 时相比是否发生了变化.
+        """
+        key = tuple(None if m is None else matrix_key(m) for m in ms)
+        if self.keys.get(name) == key:
+            return False
+        self.keys[name] = key
+        return True
+
+    def setup(self, A, B, C=None, Mp=None):
+        """
+
+        Parameters
+        ----------
+        A : 速度块, 对称正定
+        B : 形状为 (m, n) 的耦合块, m, n 分别是速度和压力的自由度个数
+        C : 压力块, None 表示零矩阵
+        Mp : 压力的质量矩阵, schur='mass' 和增广 Lagrange 方法需要
+
+        Notes
+        -----
+        可以反复调用, 只重新计算发生了变化的部分.
+        """
+        A = A.tocsr()
+        B = B.tocsr()
+        m, n = B.shape
+        if self.schur == 'mass' and Mp is None:
+            raise ValueError("the Schur approximation `mass` needs the pressure mass matrix Mp!")
+
+        if self.gamma > 0.0:
+            if C is not None:
+                raise ValueError("the augmented Lagrangian method needs C to be zero!")
+            if Mp is None:
+                self.Winv = np.ones(n)
+            else:
+                self.Winv = 1.0/Mp.diagonal()
+            W = spdiags(self.Winv, 0, n, n)
+            A = (A + self.gamma*(B@W@B.T)).tocsr()
+        self.A = A
+        self.B = B
+        self.C = C
+        self.shape = (m, n)
+
+        # 速度块
+        if self.ublock == 'amg':
+            self.amg('velocity', A)
+        elif self.ublock == 'jacobi':
+            self.Dinv = 1.0/A.diagonal()
+        else:
+            self.cache.factorize(A)
+
+        # Schur 补
+        D = spdiags(1.0/A.diagonal(), 0, m, m)
+        if self.schur == 'diag':
+            if self.changed('schur', A, B, C):
+                S = (B.T@D@B).tocsr()
+                if C is not None:
+                    S = (S - C).tocsr()
+                self.amg('schur', S)
+        elif self.schur == 'mass':
+            if self.changed('schur', Mp, C):
+                S = Mp if C is None else (Mp - C)
+                self.chebyshev = ChebyshevSmoother(S.tocsr())
+        else:
+            if self.changed('schur', A, B):
+                L = (B.T@D@B).tocsr()
+                self.amg('bfbt', L)
+            self.DB = (D@B).tocsr()
+
+    def velocity_solve(self, r):
+        if self.ublock == 'amg':
+            amg = self.amgs['velocity']
+            z = None
+            for i in range(self.ncycle):
+                z = amg.cycle(r, z)
+            return z
+        elif self.ublock == 'jacobi':
+            return self.Dinv*r
+        else:
+            return self.cache.solve(self.A, r)
+
+    def schur_solve(self, r):
+        """
+
+        Notes
+        -----
+        近似计算 S^{-1} r, S = B^T A^{-1} B - C 是对称正定的.
+        """
+        if self.schur == 'diag':
+            amg = self.amgs['schur']
+            z = None
+            for i in range(self.ncycle):
+                z = amg.cycle(r, z)
+        elif self.schur == 'mass':
+            z = self.chebyshev.smooth(np.zeros_like(r), r, nu=self.mass_iter)
+        else:
+            amg = self.amgs['bfbt']
+            y = amg.cycle(r)
+            y = self.DB.T@(self.A@(self.DB@y))
+            z = amg.cycle(y)
+        if self.gamma > 0.0:
+            z += self.gamma*self.Winv*r
+        return z
+
+    def matvec(self, r):
+        m, n = self.shape
+        z = np.zeros_like(r)
+        if self.ptype == 'diag':
+            z[:m] = self.velocity_solve(r[:m])
+            z[m:] = self.schur_solve(r[m:])
+        else:
+            z[m:] = -self.schur_solve(r[m:])
+            z[:m] = self.velocity_solve(r[:m] - self.B@z[m:])
+        return z
+
+    def aslinearoperator(self):
+        N = sum(self.shape)
+        return LinearOperator((N, N), matvec=self.matvec, dtype=self.A.dtype)
+
+
+class SaddlePointSolver():
+    """
+    块预条件的鞍点问题解法器. 块对角预条件子用 MINRES, 其它的用 GMRES.
+
+    Examples
+    --------
+    A, B, Mp = stokes_blocks(uspace, pspace, nu=nu, isBdDof=isBdDof)
+    solver = SaddlePointSolver(ptype='diag', schur='mass', tol=1e-8)
+    for i in range(maxit): # Picard 迭代, 只有 A 发生变化
+        u, p = solver.solve(A + N(u), B, F0, F1, Mp=Mp)
+    print(solver.niter, solver.preconditioner)
+    """
+    def __init__(self, ptype='diag', schur='diag', tol=1e-8, maxit=500,
+            restart=50, telemetry=None, **options):
+        """
+
+        Parameters
+        ----------
+        ptype, schur, options : 见 SaddlePointPreconditioner
+        tol : 相对残量的停止条件
+        maxit : 最大迭代步数
+        restart : GMRES 的重启步数
+        telemetry : SolverTelemetry 对象, 每次求解在其中生成一条记录
+        """
+        self.telemetry = telemetry
+        self.tol = tol
+        self.maxit = maxit
+        self.restart = restart
+        self.preconditioner = SaddlePointPreconditioner(ptype=ptype,
+                schur=schur, **options)
+        self.residuals = []
+        self.niter = 0
+        self.info = None
+
+    def solve(self, A, B, F0, F1, C=None, Mp=None, x0=None):
+        """
+
+        Notes
+        -----
+        返回速度和压力 (x0, x1). 相对残量的历史记录在 self.residuals 中 (GMRES
+        记录的是预条件残量), 迭代步数在 self.niter 中.
+        """
+        t = self.telemetry
+        if t is None:
+            return self.iterate(A, B, F0, F1, C=C, Mp=Mp, x0=x0)
+
+        P = self.preconditioner
+        name = 'saddle_{}_{}'.format(P.ptype, P.schur)
+        m, n = B.shape
+        with t.record(name, size=m+n, tol=self.tol) as rec:
+            x0, x1 = self.iterate(A, B, F0, F1, C=C, Mp=Mp, x0=x0)
+            rec['nnz'] = int(A.nnz + 2*B.nnz + (0 if C is None else C.nnz))
+            t.finish(info=self.info)
+        return x0, x1
+
+    def iterate(self, A, B, F0, F1, C=None, Mp=None, x0=None):
+        t = self.telemetry
+        P = self.preconditioner
+        P.setup(A, B, C=C, Mp=Mp)
+        if t is not None:
+            for amg in P.amgs.values():
+                if amg.telemetry is not t:
+                    amg.attach(t)
+        m, n = B.shape
+        F = np.r_[F0, F1]
+        if P.gamma > 0.0:
+            # 增广 Lagrange 方法中 B^T x0 = F1, 所以解不变
+            F[:m] += P.gamma*(B@(P.Winv*F1))
+        K = bmat([[P.A, B], [B.T, C]], format='csr')
+
+        nb = norm(F)
+        if nb == 0.0:
+            nb = 1.0
+        self.residuals = []
+        def callback(xk):
+            if np.ndim(xk) == 0:
+                self.residuals.append(float(xk))
+            elif t is None:
+                self.residuals.append(norm(F - K@xk)/nb)
+            else:
+                with t.timed('monitor'):
+                    self.residuals.append(norm(F - K@xk)/nb)
+            if t is not None:
+                t.iteration(self.residuals[-1])
+
+        Kop = K
+        M = P.aslinearoperator()
+        if t is not None:
+            Kop, M = t.operator(K), t.preconditioner(M)
+        if P.ptype == 'diag':
+            x, info = preconditioned_minres(Kop, F, x0=x0, tol=self.tol,
+                    maxit=self.maxit, M=M, callback=callback)
+        else:
+            # 每个内迭代记录一次预条件残量的相对范数
+            x, info = gmres(Kop, F, x0=x0, tol=self.tol, restart=self.restart,
+                    maxiter=self.maxit, M=M, callback=callback,
+                    callback_type='pr_norm')
+        self.niter = len(self.residuals)
+        self.info = info
+        return x[:m], x[m:]
+
+
+def stokes_blocks(uspace, pspace, nu=1.0, isBdDof=None):
+    """
+
+    Parameters
+    ----------
+    uspace : 速度的拉格朗日有限元空间 (标量空间, 向量按分量排列)
+    pspace : 压力的拉格朗日有限元空间
+    nu : 粘性系数
+    isBdDof : 速度的 Dirichlet 自由度, 长度为 uspace 的自由度个数 (各分量
+        相同) 或者 GD 倍
+
+    Notes
+    -----
+    返回 Stokes 问题
+
+        nu (grad u, grad v) - (p, div v) = (f, v)
+                            - (div u, q) = 0
+
+    的块 (A, B, Mp), 其中 A = nu diag(S, .., S), B = -[D_0; ..; D_{GD-1}],
+    Mp 是压力的质量矩阵除以 nu. Dirichlet 自由度对应的行和列已经处理, 右端
+    的处理见 DirichletBC.apply.
+    """
+    from ..boundarycondition import eliminate_dirichlet_dof
+
+    GD = uspace.geo_dimension()
+    S = uspace.stiff_matrix()
+    A = nu*block_diag([S]*GD, format='csr')
+    B = -vstack(uspace.div_matrix(pspace), format='csr')
+    Mp = pspace.mass_matrix()/nu
+    if isBdDof is not None:
+        if len(isBdDof) != A.shape[0]:
+            isBdDof = np.tile(isBdDof, GD)
+        A = eliminate_dirichlet_dof(A, isBdDof, copy=True)
+        B = (spdiags((~isBdDof).astype(B.dtype), 0, A.shape[0], A.shape[0])@B).tocsr()
+    return A, B, Mp
+
+
+def darcy_blocks(space, K=None):
+    """
+
+    Parameters
+    ----------
+    space : RaviartThomasFiniteElementSpace2d 或者 3d
+    K : 渗透率的倒数为常数时的系数, 默认为 1
+
+    Notes
+    -----
+    返回混合元 Darcy 问题
+
+        (K^{-1} u, v) - (p, div v) = <g, v.n>
+                      - (div u, q) = -(f, q)
+
+    的块 (A, B, Mp), A 是 RT 元的质量矩阵, Mp 是压力 (分片多项式) 的质量
+    矩阵. 这时 Schur 补的近似用 schur='diag', 速度块用 ublock='jacobi'.
+    """
+    if hasattr(space, 'mass_matrix'):
+        A = space.mass_matrix()
+    else:
+        A = space.stiff_matrix()
+    if K is not None:
+        A = A/K
+    B = -space.div_matrix()
+    Mp = space.smspace.mass_matrix()
+    return A.tocsr(), B.tocsr(), Mp
@@ -1,6 +1,11 @@
+from collections import OrderedDict
+
 import numpy as np
 from numpy.linalg import norm
-import pyamg
+from scipy.linalg import eigh
+
+from .amg import AMGSolver
+from .factorization_cache import matrix_key
 
 
 def picard(A, M, u0, tol=1e-12, atol = 1e-12, ml=None, sigma=None):
@@ -8,6 +13,7 @@ def picard(A, M, u0, tol=1e-12, atol = 1e-12, ml=None, sigma=None):
         A += sigma*M
 
     if ml is None:
+        import pyamg
         ml = pyamg.ruge_stuben_solver(A)
     else:
         if sigma is not None:
@@ -33,4 +39,240 @@ def picard(A, M, u0, tol=1e-12, atol = 1e-12, ml=None, sigma=None):
     return u0, d0
 
 
+class LOBPCGSolver():
+    """
+    用块 LOBPCG 方法求广义特征值问题
+
+        A x = lambda M x
+
+    的最小的 k 个特征对, 用代数多重网格的一次 V 循环做预条件子.
+
+    Notes
+    -----
+    1. 预条件子是 A + sigma*M 的 AMG 层次结构, 按矩阵的散列缓存. 在同一层网
+       格上反复求解 (比如求特征值之后再求源问题, 或者多次调用) 时只做一次
+       setup.
+    2. 初值可以由粗网格上的特征向量延拓得到 (见 prolongate), 这样在自适应
+       加密的每一层上只需要很少的迭代步.
+    3. 残量满足要求的特征对被锁定, 不再计算它们的预条件残量和搜索方向, 但
+       仍然参加 Rayleigh-Ritz 投影.
+    4. 每一步各特征对的相对残量 |A x - lambda M x|/|A x| 记录在
+       self.residuals 中.
+
+    Examples
+    --------
+    solver = LOBPCGSolver(k=4)
+    vals, X = solver.solve(A, M)
+    # 加密之后, IM 是从粗网格到细网格的插值矩阵
+    vals, X = solver.solve(A1, M1, X0=solver.prolongate(IM))
+    """
+    def __init__(self, k=1, sigma=None, tol=1e-8, maxit=500, ncycle=1,
+            ncache=4, seed=0, disp=False, **options):
+        """
+
+        Parameters
+        ----------
+        k : 默认求解的特征对的个数
+        sigma : 预条件子用 A + sigma*M 生成, A 半正定时要给一个正的平移
+        tol : 相对残量的停止条件
+        maxit : 最大迭代步数
+        ncycle : 每次应用预条件子时 V 循环的次数
+        ncache : 缓存的 AMG 层次结构的个数
+        seed : 随机初值的种子
+        disp : 是否打印收敛信息
+        options : 传给 AMGSolver 的参数
+        """
+        self.k = k
+        self.sigma = sigma
+        self.tol = tol
+        self.maxit = maxit
+        self.ncycle = ncycle
+        self.ncache = ncache
+        self.seed = seed
+        self.disp = disp
+        self.options = options
+
+        self.amgs = OrderedDict()
+        self.X = None
+        self.vals = None
+        self.residuals = None
+        self.niter = 0
+
+    def preconditioner(self, A, M=None):
+        """
+
+        Notes
+        -----
+        返回 A + sigma*M 的 AMG 解法器, 同一个矩阵只做一次 setup.
+        """
+        if (self.sigma is not None) and (M is not None):
+            key = (matrix_key(A), matrix_key(M), self.sigma)
+        else:
+            key = (matrix_key(A), )
+
+        if key in self.amgs:
+            self.amgs.move_to_end(key)
+            return self.amgs[key]
+
+        if len(key) == 3:
+            A = A + self.sigma*M
+        amg = AMGSolver(**self.options)
+        amg.setup(A)
+        self.amgs[key] = amg
+        while len(self.amgs) > self.ncache:
+            self.amgs.popitem(last=False)
+        return amg
+
+    def prolongate(self, I):
+        """
+
+        Notes
+        -----
+        把上一次求得的特征向量用插值矩阵 I 延拓到细空间上, 做为下一次求解的
+        初值.
+        """
+        return I@self.X
+
+    def solve(self, A, M, X0=None, k=None):
+        """
+
+        Parameters
+        ----------
+        A, M : 对称矩阵, M 正定
+        X0 : 初值, 形状为 (N, ) 或者 (N, m). m < k 时用随机向量补充
+        k : 特征对的个数, 默认是初始化时给定的个数
+
+        Returns
+        -------
+        vals : 从小到大排列的 k 个特征值
+        X : 对应的 M 正交归一的特征向量, 形状为 (N, k)
+        """
+        A = A.tocsr()
+        M = M.tocsr()
+        N = A.shape[0]
+        k = self.k if k is None else k
+        k = min(k, N)
+        amg = self.preconditioner(A, M)
+        rng = np.random.default_rng(self.seed)
+
+        X = rng.random((N, k)) - 0.5
+        if X0 is not None:
+            X0 = np.asarray(X0).reshape(N, -1)[:, :k]
+            isNonZero = norm(X0, axis=0) > 0
+            m = isNonZero.sum()
+            X[:, :m] = X0[:, isNonZero]
+
+        # 初始的 Rayleigh-Ritz 投影
+        AX = A@X
+        MX = M@X
+        vals, C = rayleigh_ritz(X, AX, MX, k)
+        X = X@C
+        AX = AX@C
+        MX = MX@C
+
+        P = None
+        isLocked = np.zeros(k, dtype=np.bool_)
+        residuals = []
+        for i in range(self.maxit):
+            R = AX - MX*vals
+            nAX = norm(AX, axis=0)
+            nAX[nAX == 0] = 1.0
+            res = norm(R, axis=0)/nAX
+            residuals.append(res)
+            isLocked |= (res < self.tol)
+            if np.all(isLocked):
+                break
+            isActive = ~isLocked
+
+            # 预条件残量, 并与 X 做 M 正交
+            W = None
+            for j in range(self.ncycle):
+                W = amg.cycle(R[:, isActive], x=W)
+            W -= X@(MX.T@W)
+            Z = [W]
+            AZ = [A@W]
+            MZ = [M@W]
+            if P is not None:
+                c = MX.T@P[:, isActive]
+                Z.append(P[:, isActive] - X@c)
+                AZ.append(AP[:, isActive] - AX@c)
+                MZ.append(MP[:, isActive] - MX@c)
+            Q, AQ, MQ = m_orthonormalize(np.hstack(Z), np.hstack(AZ), np.hstack(MZ))
+
+            # 在 [X, Q] 上做 Rayleigh-Ritz 投影
+            S = np.hstack((X, Q))
+            AS = np.hstack((AX, AQ))
+            MS = np.hstack((MX, MQ))
+            vals, C = rayleigh_ritz(S, AS, MS, k)
+            CQ = C[k:]
+            P = Q@CQ
+            AP = AQ@CQ
+            MP = MQ@CQ
+            X = S@C
+            AX = AS@C
+            MX = MS@C
+
+        self.niter = len(residuals) - 1
+        self.residuals = np.array(residuals)
+        self.nlocked = isLocked.sum()
+        if self.disp:
+            print('LOBPCG: iter {}, locked {}/{}, residual {}'.format(
+                self.niter, self.nlocked, k, self.residuals[-1].max()))
+
+        # 固定特征向量的符号: 绝对值最大的分量为正
+        idx = np.argmax(np.abs(X), axis=0)
+        X *= np.sign(X[idx, np.arange(k)])
+        self.vals = vals
+        self.X = X
+        return vals, X
+
+    def eig(self, A, M, x0=None):
+        """
+
+        Notes
+        -----
+        返回最小的特征值对应的特征向量和特征值.
+        """
+        vals, X = self.solve(A, M, X0=x0, k=1)
+        return X[:, 0], vals[0]
+
+    def psolve(self, A, b, M=None, x0=None, tol=1e-12):
+        """
+
+        Notes
+        -----
+        用缓存的 AMG 解法器求解 (A + sigma*M) x = b.
+        """
+        amg = self.preconditioner(A, M)
+        return amg.solve(b, x0=x0, tol=tol, accel='cg')
+
+
+def rayleigh_ritz(S, AS, MS, k):
+    """
+
+    Notes
+    -----
+    在 S 张成的子空间上求解小规模的广义特征值问题, 返回最小的 k 个特征值和
+    系数矩阵 C, S@C 是 M 正交归一的.
+    """
+    H = S.T@AS
+    G = S.T@MS
+    H = (H + H.T)/2
+    G = (G + G.T)/2
+    vals, C = eigh(H, G, subset_by_index=[0, k-1])
+    return vals, C
+
+
+def m_orthonormalize(Z, AZ, MZ, eps=1e-10):
+    """
 
+    Notes
+    -----
+    把 Z 的列向量 M 正交归一化, 同时变换 A@Z 和 M@Z. 线性相关的方向被去掉.
+    """
+    G = Z.T@MZ
+    G = (G + G.T)/2
+    e, V = eigh(G)
+    isKeep = e > eps*e.max()
+    T = V[:, isKeep]/np.sqrt(e[isKeep])
+    return Z@T, AZ@T, MZ@T
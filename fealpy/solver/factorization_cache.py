@@ -0,0 +1,243 @@
+import weakref
+import hashlib
+from collections import OrderedDict
+
+import numpy as np
+from scipy.sparse.linalg import splu
+
+
+class FactorizationCache():
+    """
+    稀疏矩阵分解的缓存.
+
+    Notes
+    -----
+    时间步进或者不动点迭代中, 常常要反复求解系数矩阵相同的线性方程组, 每次都
+    调用 spsolve 会重复做同样的 LU 分解. 这个类把分解结果缓存起来, 以矩阵的
+    结构 (形状, indptr, indices) 和数值的散列做为键, 矩阵相同的时候直接做前
+    代回代.
+
+    结构的散列按矩阵对象缓存, 同一个矩阵对象再次求解时只需要重新计算数值的
+    散列. 数值的散列是 O(nnz) 的, 与分解相比可以忽略, 但它保证矩阵的数值在
+    原地改变以后不会用到过期的分解.
+
+    缓存按照最近最少使用的顺序淘汰, 所有分解因子占用的内存不超过 maxmem.
+
+    如果安装了 scikit-sparse, 对称正定的矩阵用 Cholesky 分解, 否则用
+    SuperLU 分解.
+
+    Examples
+    --------
+    cache = FactorizationCache(maxmem=256)
+    for i in range(NT):
+        A = M + 0.5*dt*S # 每步重新组装, 只在第一步分解
+        x = cache.solve(A, b)
+    X = cache.solve_many(A, B) # B 的每一列是一个右端
+    """
+    def __init__(self, maxmem=512, method='auto'):
+        """
+
+        Parameters
+        ----------
+        maxmem : 缓存的分解因子占用内存的上限, 单位是 MB
+        method : 'auto', 'lu' 或者 'cholesky'. 'auto' 表示对称矩阵先尝试
+            Cholesky 分解, 失败或者没有安装 scikit-sparse 时用 LU 分解
+        """
+        self.maxmem = maxmem*1024**2
+        self.method = method
+        self.factors = OrderedDict() # key -> (solve, nbytes, method)
+        self.structures = {} # id(A) -> (weakref(A), structure hash)
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.factors)
+
+    def __contains__(self, A):
+        return self.key(self.canonical(A)) in self.factors
+
+    def __str__(self):
+        s = '{}:\n'.format(self.__class__.__name__)
+        s += '  Number of factorizations: {}\n'.format(len(self.factors))
+        s += '  Memory: {:.2f} MB / {:.2f} MB\n'.format(
+                self.nbytes/1024**2, self.maxmem/1024**2)
+        s += '  Hits: {}, misses: {}\n'.format(self.hits, self.misses)
+        return s
+
+    def clear(self):
+        self.factors.clear()
+        self.structures.clear()
+        self.nbytes = 0
+
+    def structure_hash(self, A):
+        """
+
+        Notes
+        -----
+        矩阵结构的散列, 按对象缓存. 对象被回收之后, 对应的记录也被删除.
+        """
+        k = id(A)
+        if k in self.structures:
+            ref, h = self.structures[k]
+            if ref() is A:
+                return h
+
+        h = structure_digest(A)
+        try:
+            ref = weakref.ref(A, lambda r, k=k: self.structures.pop(k, None))
+        except TypeError:
+            return h
+        self.structures[k] = (ref, h)
+        return h
+
+    def key(self, A):
+        """
+
+        Notes
+        -----
+        矩阵的键, 由结构的散列和数值的散列组成, 与 matrix_key 相同. A 要求
+        是 canonical 处理过的矩阵.
+        """
+        return (A.format, self.structure_hash(A), data_digest(A))
+
+    def canonical(self, A):
+        return canonical_matrix(A, fmt='csc')
+
+    def factorize(self, A):
+        """
+
+        Notes
+        -----
+        分解矩阵 A 并返回求解函数, 已经在缓存中的直接返回.
+        """
+        A = self.canonical(A)
+        key = self.key(A)
+        if key in self.factors:
+            self.hits += 1
+            self.factors.move_to_end(key)
+            return self.factors[key][0]
+
+        self.misses += 1
+        solve, nbytes, method = self.decompose(A)
+        self.factors[key] = (solve, nbytes, method)
+        self.nbytes += nbytes
+        while (self.nbytes > self.maxmem) and (len(self.factors) > 1):
+            _, (_, n, _) = self.factors.popitem(last=False)
+            self.nbytes -= n
+        return solve
+
+    def decompose(self, A):
+        method = self.method
+        if method in {'auto', 'cholesky'}:
+            isSymmetric = (method == 'cholesky') or is_symmetric(A)
+            if isSymmetric:
+                try:
+                    from sksparse.cholmod import cholesky, CholmodError
+                except ImportError:
+                    if method == 'cholesky':
+                        raise
+                else:
+                    try:
+                        f = cholesky(A.tocsc())
+                        nnz = f.L().nnz
+                        nbytes = nnz*(A.dtype.itemsize + 4)
+                        return f, nbytes, 'cholesky'
+                    except CholmodError:
+                        if method == 'cholesky':
+                            raise
+        lu = splu(A.tocsc())
+        nbytes = lu.nnz*(A.dtype.itemsize + 4) + 4*A.shape[0]
+        return lu.solve, nbytes, 'lu'
+
+    def solve(self, A, b):
+        """
+
+        Notes
+        -----
+        求解 Ax = b, b 可以是一维数组, 也可以是每一列为一个右端的二维数组.
+        """
+        solve = self.factorize(A)
+        b = np.asarray(b)
+        dtype = np.result_type(A.dtype, b.dtype)
+        return solve(b.astype(dtype, copy=False))
+
+    def solve_many(self, A, B):
+        """
+
+        Parameters
+        ----------
+        A : 系数矩阵
+        B : 形状为 (N, nrhs) 的数组, 或者是长度为 N 的向量组成的列表
+
+        Notes
+        -----
+        一次分解之后对所有右端做前代回代, 返回形状为 (N, nrhs) 的解.
+        """
+        if isinstance(B, (list, tuple)):
+            B = np.column_stack(B)
+        B = np.asarray(B)
+        if len(B.shape) == 1:
+            B = B[:, None]
+        X = self.solve(A, B)
+        return X.reshape(B.shape)
+
+
+def canonical_matrix(A, fmt='csr'):
+    """
+
+    Notes
+    -----
+    转化为 csr 或者 csc 格式 (其它格式转化为 fmt 格式), 并合并重复元素,
+    排序列 (行) 号, 保证相等的矩阵有相同的 indptr, indices 和 data. 已经是
+    这种格式时不复制.
+    """
+    if A.format not in {'csc', 'csr'}:
+        A = A.asformat(fmt)
+    if not A.has_canonical_format:
+        A = A.copy()
+        A.sum_duplicates()
+    return A
+
+
+def structure_digest(A):
+    """
+
+    Notes
+    -----
+    csr 或者 csc 矩阵的形状, 数据类型和非零结构 (indptr, indices) 的散列.
+    """
+    m = hashlib.blake2b(digest_size=16)
+    m.update(np.array(A.shape, dtype=np.int64).tobytes())
+    m.update(str(A.dtype).encode())
+    m.update(np.ascontiguousarray(A.indptr).tobytes())
+    m.update(np.ascontiguousarray(A.indices).tobytes())
+    return m.hexdigest()
+
+
+def data_digest(A):
+    m = hashlib.blake2b(digest_size=16)
+    m.update(np.ascontiguousarray(A.data).tobytes())
+    return m.hexdigest()
+
+
+def matrix_key(A):
+    """
+
+    Notes
+    -----
+    由稀疏矩阵的格式, 形状, 结构和数值生成的键, 可以做为缓存的键. 先用
+    canonical_matrix 处理, 所以存储方式不同的相等矩阵有相同的键. 与
+    FactorizationCache.key 的散列方式相同.
+    """
+    A = canonical_matrix(A)
+    return (A.format, structure_digest(A), data_digest(A))
+
+
+def is_symmetric(A, rtol=1e-12):
+    if A.shape[0] != A.shape[1]:
+        return False
+    D = A - A.T
+    if D.nnz == 0:
+        return True
+    return np.abs(D.data).max() <= rtol*np.abs(A.data).max()
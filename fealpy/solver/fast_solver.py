@@ -2,20 +2,30 @@
 import numpy as np
 from scipy.sparse import coo_matrix, csc_matrix, csr_matrix, block_diag
 from scipy.sparse import spdiags, eye, bmat, tril, triu
-from scipy.sparse.linalg import cg, inv, dsolve,  gmres, lgmres, LinearOperator, spsolve_triangular
+from scipy.sparse.linalg import cg, inv, dsolve,  gmres, lgmres, LinearOperator
 from scipy.sparse.linalg import spilu
 import pyamg
 
-from ..decorator import timer
-
-class IterationCounter(object):
-    def __init__(self, disp=True):
-        self._disp = disp
-        self.niter = 0
-    def __call__(self, rk=None):
-        self.niter += 1
-        if self._disp:
-            print('iter %3i\trk = %s' % (self.niter, rk))
+from .smoother import get_smoother
+from .block_preconditioner import SaddlePointSolver
+from .telemetry import SolverTelemetry
+from ..boundarycondition import eliminate_dirichlet_dof
+from .smoother import GaussSeidelSweepSmoother, DampedJacobiSmoother
+
+def pcg(A, F, M=None, x0=None, tol=1e-8, telemetry=None, name='pcg'):
+    """
+
+    Notes
+    -----
+    (预条件) 共轭梯度法, 迭代的残量, 用时和收敛状态记录在 telemetry 中.
+    """
+    with telemetry.record(name, A=A, tol=tol):
+        if M is not None:
+            M = telemetry.preconditioner(M)
+        x, info = cg(telemetry.operator(A), F, x0=x0, M=M, tol=tol,
+                callback=telemetry.callback(A, F))
+        telemetry.finish(info=info)
+    return x
 
 class GaussSeidelSmoother():
     def __init__(self, A, isDDof=None):
@@ -23,58 +33,34 @@ class GaussSeidelSmoother():
 
         Notes
         -----
-
+        三角求解用 smoother.py 中无填充的自然顺序 LU 分解, 而不是每次扫描都
+        调用 spsolve_triangular.
         """
         if isDDof is not None:
             # 处理 D 氏 自由度条件
-            gdof = len(isDDof)
-            bdIdx = np.zeros(gdof, dtype=np.int_)
-            bdIdx[isDDof] = 1 
-            Tbd = spdiags(bdIdx, 0, gdof, gdof)
-            T = spdiags(1-bdIdx, 0, gdof, gdof)
-            A = T@A@T + Tbd
-
-        self.L0 = tril(A).tocsr()
-        self.U0 = triu(A, k=1).tocsr()
+            A = eliminate_dirichlet_dof(A, isDDof, copy=True)
 
-        self.U1 = self.L0.T.tocsr()
-        self.L1 = self.U0.T.tocsr()
+        self.smoother = GaussSeidelSweepSmoother(A.tocsr())
 
     def smooth(self, b, lower=True, maxit=100):
         r = np.zeros_like(b)
-        if lower:
-            for i in range(maxit):
-                r[:] = spsolve_triangular(self.L0, b-self.U0@r, lower=lower)
-        else:
-            for i in range(maxit):
-                r[:] = spsolve_triangular(self.U1, b-self.L1@r, lower=lower)
-        return r
+        return self.smoother.smooth(r, b, nu=maxit, lower=lower)
 
 class JacobiSmoother():
-    def __init__(self, A, isDDof=None):
+    def __init__(self, A, isDDof=None, omega=2/3):
         if isDDof is not None:
             # 处理 D 氏 自由度条件
-            gdof = len(isDDof)
-            bdIdx = np.zeros(gdof, dtype=np.int_)
-            bdIdx[isDDof] = 1 
-            Tbd = spdiags(bdIdx, 0, gdof, gdof)
-            T = spdiags(1-bdIdx, 0, gdof, gdof)
-            A = T@A@T + Tbd
+            A = eliminate_dirichlet_dof(A, isDDof, copy=True)
 
-        self.D = A.diagonal() 
-        self.L = tril(A, k=-1).tocsr()
-        self.U = triu(A, k=1).tocsr()
+        self.smoother = DampedJacobiSmoother(A.tocsr(), omega=omega)
 
     def smooth(self, b, maxit=100):
-        r = b.copy()
-        for i in range(maxit):
-            r[:] = b - self.L@r - self.U@r
-            r /= self.D
-        return r
+        r = np.zeros_like(b)
+        return self.smoother.smooth(r, b, nu=maxit)
 
 
 class HighOrderLagrangeFEMFastSolver():
-    def __init__(self, A, F, P, I, isBdDof):
+    def __init__(self, A, F, P, I, isBdDof, smoother='gs', telemetry=None):
         """
 
 
@@ -82,8 +68,13 @@ class HighOrderLagrangeFEMFastSolver():
         -----
             求解高次拉格朗日有限元的快速算法
 
-            
+            smoother 是磨光子的名字, 比如 'gs', 'mcgs', 'chebyshev',
+            'l1jacobi', 见 smoother.py 中的 smoothers
+
+            每次求解的迭代步数, 残量和用时记录在 self.telemetry 中, 见
+            telemetry.py
         """
+        self.telemetry = SolverTelemetry() if telemetry is None else telemetry
         self.gdof = len(isBdDof)
         self.A = A # 矩阵 (gdof, gdof), 注意这里是没有处理 D 氏边界的矩阵
         self.F = F # 右端 (gdof, ), 注意这里也没有处理 D 氏边界
@@ -91,27 +82,14 @@ class HighOrderLagrangeFEMFastSolver():
         self.isBdDof = isBdDof
 
         # 获得磨光子
-        gdof = self.gdof
-        bdIdx = np.zeros(gdof, dtype=np.int_)
-        bdIdx[isBdDof] = 1 # 这里假定 A 的前 NN 个自由度是网格节点
-        Tbd = spdiags(bdIdx, 0, gdof, gdof)
-        T = spdiags(1-bdIdx, 0, gdof, gdof)
-        A = T@A@T + Tbd
-
-        self.L0 = tril(A).tocsr()
-        self.U0 = triu(A, k=1).tocsr()
-
-        self.U1 = self.L0.T.tocsr()
-        self.L1 = self.U0.T.tocsr()
+        self.AD = eliminate_dirichlet_dof(A, isBdDof, copy=True)
+        self.smoother = self.telemetry.smoother(get_smoother(smoother, self.AD))
 
 
         # 处理预条件子的边界条件
         NN = P.shape[0]
-        bdIdx = np.zeros(NN, dtype=np.int_)
-        bdIdx[isBdDof[:NN]] = 1 # 这里假定 A 的前 NN 个自由度是网格节点
-        Tbd = spdiags(bdIdx, 0, NN, NN)
-        T = spdiags(1-bdIdx, 0, NN, NN)
-        P = T@P@T + Tbd
+        # 这里假定 A 的前 NN 个自由度是网格节点
+        P = eliminate_dirichlet_dof(P, isBdDof[:NN], copy=True)
         self.ml = pyamg.ruge_stuben_solver(P)  # P 的 D 氏边界条件用户先处理一下
 
 
@@ -131,24 +109,26 @@ class HighOrderLagrangeFEMFastSolver():
         return r
 
     def preconditioner(self, b):
-        b = self.smooth(b, lower=True, m=3)
-        b = self.I.T@b
-        b = self.ml.solve(b, tol=1e-8, accel='cg')       
-        b = self.I@b
-        b = self.smooth(self.I@b, lower=False, m=3)
-        return b
-
-    def smooth(self, b, lower=True, m=3):
-        r = np.zeros_like(b)
-        if lower:
-            for i in range(m):
-                r[:] = spsolve_triangular(self.L0, b-self.U0@r, lower=lower)
-        else:
-            for i in range(m):
-                r[:] = spsolve_triangular(self.U1, b-self.L1@r, lower=lower)
-        return r
+        """
+
+        Notes
+        -----
+        对称的两层预条件子: 前磨光, 在线性元空间上用 AMG 做粗空间校正, 后
+        磨光.
+        """
+        x = self.smooth(b, lower=True, m=3)
+        r = b - self.AD@x
+        r = self.I.T@r
+        e = self.ml.solve(r, tol=1e-8, accel='cg')       
+        x += self.I@e
+        x = self.smooth(b, x=x, lower=False, m=3)
+        return x
+
+    def smooth(self, b, x=None, lower=True, m=3):
+        if x is None:
+            x = np.zeros_like(b)
+        return self.smoother.smooth(x, b, nu=m, lower=lower)
 
-    @timer
     def solve(self, uh, F, tol=1e-8):
         """
 
@@ -168,15 +148,12 @@ class HighOrderLagrangeFEMFastSolver():
         A = LinearOperator((gdof, gdof), matvec=self.linear_operator)
         P = LinearOperator((gdof, gdof), matvec=self.preconditioner)
                 
-        counter = IterationCounter()
-        uh[:], info = cg(A, F, M=P, tol=tol, callback=counter)
-        print("Convergence info:", info)
-        print("Number of iteration of cg:", counter.niter)
-
+        uh[:] = pcg(A, F, M=P, tol=tol, telemetry=self.telemetry,
+                name='HighOrderLagrangeFEMFastSolver')
         return uh 
 
 class LinearElasticityRLFEMFastSolver():
-    def __init__(self, lam, mu, M, G, P, isBdDof):
+    def __init__(self, lam, mu, M, G, P, isBdDof, telemetry=None):
         """
 
         Notes
@@ -185,7 +162,9 @@ class LinearElasticityRLFEMFastSolver():
         G: 恢复矩阵 [X, Y, Z] 
         P: 预条件矩阵
         isBdDof: Dirichlet 边界自由度标记 (gdof, )
+        telemetry: 记录迭代信息的 SolverTelemetry 对象
         """
+        self.telemetry = SolverTelemetry() if telemetry is None else telemetry
 
         self.GD = len(G) 
         self.gdof = P.shape[0]
@@ -198,11 +177,7 @@ class LinearElasticityRLFEMFastSolver():
         self.G = G
 
         # 处理预条件子的边界条件
-        bdIdx = np.zeros(P.shape[0], dtype=np.int_)
-        bdIdx[isBdDof] = 1
-        Tbd = spdiags(bdIdx, 0, P.shape[0], P.shape[0])
-        T = spdiags(1-bdIdx, 0, P.shape[0], P.shape[0])
-        P = T@P@T + Tbd
+        P = eliminate_dirichlet_dof(P, isBdDof, copy=True)
         self.ml = pyamg.ruge_stuben_solver(P) 
 
     def linear_operator(self, b):
@@ -251,7 +226,6 @@ class LinearElasticityRLFEMFastSolver():
             r[i] = self.ml.solve(b[i], tol=1e-8, accel='cg')       
         return r.reshape(-1)
 
-    @timer
     def solve(self, uh, F, tol=1e-8):
         """
 
@@ -288,31 +262,28 @@ class LinearElasticityRLFEMFastSolver():
         A = LinearOperator((GD*gdof, GD*gdof), matvec=self.linear_operator)
         P = LinearOperator((GD*gdof, GD*gdof), matvec=self.preconditioner)
                 
-        counter = IterationCounter()
-        uh.T.flat, info = cg(A, F.T.flat, tol=1e-8, callback=counter)
-        print("Convergence info:", info)
-        print("Number of iteration of pcg:", counter.niter)
-
+        uh.T.flat = pcg(A, np.array(F.T.flat), tol=1e-8,
+                telemetry=self.telemetry, name='LinearElasticityRLFEMFastSolver')
         return uh 
 
     def cg(self, A, F, uh):
-        counter = IterationCounter()
-        uh.T.flat, info = cg(A, F.T.flat, tol=1e-8, callback=counter)
-        print("Convergence info:", info)
-        print("Number of iteration of pcg:", counter.niter)
+        uh.T.flat = pcg(A, np.array(F.T.flat), tol=1e-8, telemetry=self.telemetry,
+                name='cg')
         return uh 
 
 class LinearElasticityLFEMFastSolver():
-    def __init__(self, A, P, isBdDof):
+    def __init__(self, A, P, isBdDof, telemetry=None):
         """
         Notes
         -----
         A: [[A00, A01], [A10, A11]] (2*gdof, 2*gdof)
            [[A00, A01, A02], [A10, A11, A12], [A20, A21, A22]] (3*gdof, 3*gdof)
         P: 预条件子 (gdof, gdof)
+        telemetry: 记录迭代信息的 SolverTelemetry 对象
 
         这里的边界条件处理放到矩阵和向量的乘积运算当中, 所心不需要修改矩阵本身
         """
+        self.telemetry = SolverTelemetry() if telemetry is None else telemetry
         self.GD = len(A) 
         self.gdof = P.shape[0]
 
@@ -320,11 +291,7 @@ class LinearElasticityLFEMFastSolver():
         self.isBdDof = isBdDof
 
         # 处理预条件子的边界条件
-        bdIdx = np.zeros(P.shape[0], dtype=np.int_)
-        bdIdx[isBdDof] = 1
-        Tbd = spdiags(bdIdx, 0, P.shape[0], P.shape[0])
-        T = spdiags(1-bdIdx, 0, P.shape[0], P.shape[0])
-        P = T@P@T + Tbd
+        P = eliminate_dirichlet_dof(P, isBdDof, copy=True)
         self.ml = pyamg.ruge_stuben_solver(P) 
 
     def linear_operator(self, b):
@@ -354,7 +321,6 @@ class LinearElasticityLFEMFastSolver():
             r[i] = self.ml.solve(b[i], tol=1e-8, accel='cg')       
         return r.reshape(-1)
 
-    @timer
     def solve(self, uh, F, tol=1e-8):
         """
 
@@ -368,6 +334,7 @@ class LinearElasticityLFEMFastSolver():
         gdof = self.gdof
 
         # 处理 Dirichlet 右端边界条件
+        isBdDof = self.isBdDof
         for i in range(GD):
             for j in range(GD):
                 F[:, i] -= self.A[i][j]@uh[:, j]
@@ -376,15 +343,13 @@ class LinearElasticityLFEMFastSolver():
         A = LinearOperator((GD*gdof, GD*gdof), matvec=self.linear_operator)
         P = LinearOperator((GD*gdof, GD*gdof), matvec=self.preconditioner)
                 
-        uh.T.flat, info = cg(A, F.T.flat, M=P, tol=1e-8, callback=counter)
-        print("Convergence info:", info)
-        print("Number of iteration of pcg:", counter.niter)
-
+        uh.T.flat = pcg(A, np.array(F.T.flat), M=P, tol=tol,
+                telemetry=self.telemetry, name='LinearElasticityLFEMFastSolver')
         return uh 
 
 
 class SaddlePointFastSolver():
-    def __init__(self, A, F):
+    def __init__(self, A, F, **options):
         """
 
         Notes
@@ -396,66 +361,22 @@ class SaddlePointFastSolver():
             M   x0 + B x1 = F0 
             B^T x0 + C x1 = F1
 
-        TODO:
+            默认用块对角预条件的 MINRES 方法, M 块用对角求逆 (适用于 RT 元的
+            质量矩阵), Schur 补用 B^T diag(M)^{-1} B - C 的 AMG 循环近似. 其
+            它的选择 (块三角, 增广 Lagrange, 压力质量矩阵等) 通过 options 传
+            给 SaddlePointSolver, 见 block_preconditioner.py.
 
+            迭代步数, 残量和用时记录在 self.telemetry 中.
         """
         self.A = A
         self.F = F
-
-        M = A[0]
-        B = A[1]
-        C = A[2]
-
-        self.D = 1.0/M.diagonal() # M 矩阵的对角线的逆
-        # S 相当于间断元的刚度矩阵
-        S = (B.T@spdiags(self.D, 0, M.shape[0], M.shape[1])@B).tocsr()
-        self.ml = pyamg.ruge_stuben_solver(S) # 这里要求必须有网格内部节点 
-
-        # TODO：把间断元插值到连续元线性元空间，然后再做 AMG
-
-    def linear_operator(self, b):
-        M = self.A[0]
-        B = self.A[1]
-        m = M.shape[0]
-        n = B.shape[1]
-        r = np.zeros_like(b)
-        r[:m] = M@b[:m] + B@b[m:]
-        r[m:] = B.T@b[:m]
-        return r
-
-    def diag_preconditioner(self, b):
-        D = self.D
-        m = self.A[0].shape[0]
-        n = self.A[1].shape[1]
-
-        r = np.zeros_like(b)
-
-        b0 = b[:m]
-        b1 = b[m:]
-
-        r[:m] = b0*D
-        r[m:] = self.ml.solve(b1, tol=1e-8, accel='cg')       
-        return r 
-    
-    @timer
-    def solve(self, tol=1e-8):
-        M = self.A[0]
-        B = self.A[1]
-        C = self.A[2]
-
-        m = M.shape[0]
-        n = B.shape[1]
-        gdof = m + n
-
-        counter = IterationCounter()
-        F = np.r_[self.F[0], self.F[1]]
-        A = LinearOperator((gdof, gdof), matvec=self.linear_operator)
-        P = LinearOperator((gdof, gdof), matvec=self.diag_preconditioner)
-        x, info = lgmres(A, F, M=P, tol=1e-8, callback=counter)
-        print("Convergence info:", info)
-        print("Number of iteration of gmres:", counter.niter)
-
-        return x[:m], x[m:] 
-
-
-
+        options.setdefault('ublock', 'jacobi')
+        if options.get('telemetry') is None:
+            options['telemetry'] = SolverTelemetry()
+        self.telemetry = options['telemetry']
+        self.solver = SaddlePointSolver(**options)
+
+    def solve(self, tol=1e-8, Mp=None):
+        M, B, C = self.A
+        self.solver.tol = tol
+        return self.solver.solve(M, B, self.F[0], self.F[1], C=C, Mp=Mp)
@@ -0,0 +1,227 @@
+import numpy as np
+from scipy.sparse import csr_matrix, block_diag
+
+from .multigrid import MultigridSolver
+
+
+class MeshHierarchy():
+    """
+    记录网格加密过程中生成的嵌套网格序列和线性插值矩阵.
+
+    Notes
+    -----
+    支持三角形和四面体网格的一致加密和二分加密 (自适应加密). 每次加密之后
+    保存一份当前网格的拷贝, 以及从上一层网格节点到当前网格节点的线性插值矩
+    阵. 任意次的拉格朗日有限元空间之间的延拓算子都由它们生成.
+
+    Examples
+    --------
+    mh = MeshHierarchy(mesh)
+    mh.uniform_refine(n=3)
+    mh.bisect(isMarkedCell)
+    P = mh.prolongations(p=2)
+    solver = GeometricMultigrid(P)
+    """
+    def __init__(self, mesh):
+        self.mesh = mesh
+        self.meshes = [self.copy(mesh)]
+        self.IM = []
+
+    def copy(self, mesh):
+        node = mesh.entity('node').copy()
+        cell = mesh.entity('cell').copy()
+        return mesh.__class__(node, cell)
+
+    def number_of_levels(self):
+        return len(self.meshes)
+
+    def uniform_refine(self, n=1):
+        """
+
+        Notes
+        -----
+        一致加密, 新节点是加密前的边的中点, 并按边的编号排在原有节点的后面.
+        """
+        mesh = self.mesh
+        for i in range(n):
+            NN = mesh.number_of_nodes()
+            NE = mesh.number_of_edges()
+            edge = mesh.entity('edge')
+            I = np.r_[np.arange(NN), np.repeat(np.arange(NN, NN+NE), 2)]
+            J = np.r_[np.arange(NN), edge.flat]
+            val = np.r_[np.ones(NN), np.full(2*NE, 0.5)]
+            IM = csr_matrix((val, (I, J)), shape=(NN+NE, NN), dtype=mesh.ftype)
+            mesh.uniform_refine()
+            self.IM.append(IM)
+            self.meshes.append(self.copy(mesh))
+
+    def bisect(self, isMarkedCell=None):
+        """
+
+        Notes
+        -----
+        二分加密被标记的单元.
+        """
+        IM = self.mesh.bisect(isMarkedCell, returnim=True)
+        self.IM.append(IM.tocsr())
+        self.meshes.append(self.copy(self.mesh))
+
+    def prolongation(self, level, p=1):
+        """
+
+        Notes
+        -----
+        第 level-1 层网格上的 p 次拉格朗日有限元空间到第 level 层上的 p 次拉
+        格朗日有限元空间的延拓矩阵.
+
+        细网格单元的顶点在父单元中的重心坐标就是线性插值矩阵中对应的行, 由
+        此得到细单元插值点在父单元中的重心坐标, 再计算粗空间基函数在这些点
+        上的值.
+        """
+        from ..functionspace import LagrangeFiniteElementSpace
+
+        meshc = self.meshes[level-1]
+        meshf = self.meshes[level]
+        IM = self.IM[level-1]
+        if p == 1:
+            return IM
+
+        TD = meshc.top_dimension()
+        cellc = meshc.entity('cell')
+        cellf = meshf.entity('cell')
+        NCf = len(cellf)
+        NNf = meshf.number_of_nodes()
+
+        # 找到每个细单元的父单元: 细单元顶点的插值支集的并正好是父单元的顶点
+        I = np.repeat(np.arange(NCf), TD+1)
+        C2N = csr_matrix((np.ones(len(I)), (I, cellf.flat)), shape=(NCf, NNf))
+        IMP = IM.copy()
+        IMP.data = np.abs(IMP.data)
+        U = (C2N@IMP).tocsr()
+        U.sort_indices()
+        if np.any(np.diff(U.indptr) != TD+1):
+            raise ValueError('the meshes are not nested!')
+        parent = match_rows(np.sort(cellc, axis=1), U.indices.reshape(NCf, TD+1))
+
+        # 细单元顶点在父单元中的重心坐标 lam[f, v, k]
+        R = np.broadcast_to(cellf[:, :, None], (NCf, TD+1, TD+1))
+        C = np.broadcast_to(cellc[parent][:, None, :], (NCf, TD+1, TD+1))
+        lam = np.asarray(IM[R.flat, C.flat]).reshape(NCf, TD+1, TD+1)
+
+        spacec = LagrangeFiniteElementSpace(meshc, p=p)
+        spacef = LagrangeFiniteElementSpace(meshf, p=p)
+        multiIndex = spacec.multi_index_matrix[TD](p)/p
+        bc = np.einsum('iv, fvk->fik', multiIndex, lam)
+        phi = spacec.basis(bc)[..., 0, :] # (NCf, ldof, ldof)
+
+        # 每个细自由度取一个包含它的细单元来计算
+        c2df = spacef.cell_to_dof()
+        c2dc = spacec.cell_to_dof()
+        ldof = c2df.shape[1]
+        gdof, idx = np.unique(c2df.flat, return_index=True)
+        f = idx//ldof
+        i = idx%ldof
+        val = phi[f, i, :]
+        val[np.abs(val) < 1e-12] = 0.0
+        I = np.broadcast_to(gdof[:, None], val.shape)
+        J = c2dc[parent[f]]
+        P = csr_matrix((val.flat, (I.flat, J.flat)),
+                shape=(spacef.number_of_global_dofs(),
+                    spacec.number_of_global_dofs()))
+        P.eliminate_zeros()
+        return P
+
+    def prolongations(self, p=1, dim=1, dirichlet=True, threshold=None):
+        """
+
+        Parameters
+        ----------
+        p : 拉格朗日有限元空间的次数
+        dim : 向量型问题 (比如线弹性) 的分量个数, 自由度按分量排列, 与
+            DirichletBC 中 np.tile(isDDof, dim) 的排列方式一致
+        dirichlet : 是否在边界自由度上施加齐次 Dirichlet 条件. 如果是, 粗空
+            间中去掉边界自由度, 最细层的边界自由度对应的行置为零.
+        threshold : 判断 Dirichlet 边界的函数, 与 DirichletBC 中的 threshold
+            相同, 默认整个边界都是 Dirichlet 边界
+
+        Notes
+        -----
+        返回从最细层到最粗层排列的延拓矩阵列表, 可以直接传给
+        GeometricMultigrid.
+        """
+        from ..functionspace import LagrangeFiniteElementSpace
+
+        NL = self.number_of_levels()
+        if dirichlet:
+            isBdDof = [np.tile(
+                LagrangeFiniteElementSpace(mesh, p=p).is_boundary_dof(threshold=threshold), dim)
+                for mesh in self.meshes]
+
+        Ps = []
+        for level in range(NL-1, 0, -1):
+            P = self.prolongation(level, p=p)
+            if dim > 1:
+                P = block_diag([P]*dim, format='csr')
+            if dirichlet:
+                P = P[:, ~isBdDof[level-1]]
+                if level == NL - 1:
+                    isInDof = (~isBdDof[level]).astype(P.dtype)
+                    P = csr_matrix(P.multiply(isInDof[:, None]))
+                else:
+                    P = P[~isBdDof[level]]
+            Ps.append(P.tocsr())
+        return Ps
+
+
+def match_rows(a, b):
+    """
+
+    Notes
+    -----
+    对 b 的每一行, 返回 a 中相同的行的编号. 要求 b 的每一行都在 a 中出现.
+    """
+    a = np.ascontiguousarray(a)
+    b = np.ascontiguousarray(b.astype(a.dtype))
+    dtype = np.dtype((np.void, a.dtype.itemsize*a.shape[1]))
+    va = a.view(dtype).ravel()
+    vb = b.view(dtype).ravel()
+    idx = np.argsort(va)
+    pos = np.searchsorted(va[idx], vb)
+    return idx[pos]
+
+
+class GeometricMultigrid(MultigridSolver):
+    """
+    几何多重网格解法器.
+
+    Notes
+    -----
+    插值算子来自于网格加密的层次结构 (见 MeshHierarchy), 粗网格矩阵用
+    Galerkin 方法 P^T A P 得到. 可以直接迭代求解, 也可以做为共轭梯度法的预
+    条件子.
+
+    Examples
+    --------
+    mh = MeshHierarchy(mesh)
+    mh.uniform_refine(n=4)
+    solver = GeometricMultigrid(mh.prolongations(p=2))
+    solver.setup(A)
+    x = solver.solve(F, accel='cg')
+    """
+    def __init__(self, P, ctype='V', smoother='mcgs', nu=2):
+        """
+
+        Parameters
+        ----------
+        P : 从最细层到最粗层排列的延拓矩阵列表
+        ctype : 循环类型, 'V', 'W' 或者 'F'
+        smoother : 磨光子的名字或者类, 比如 'jacobi', 'chebyshev', 'mcgs'
+        nu : 前后磨光的次数
+        """
+        super().__init__(ctype=ctype, smoother=smoother, nu=nu)
+        self.P = [p.tocsr() for p in P]
+        self.R = [p.T.tocsr() for p in self.P]
+
+    def setup(self, A):
+        self.galerkin(A)
+        self.setup_smoothers()
@@ -0,0 +1,612 @@
+"""
+
+Notes
+-----
+线性解法器的注册表. 所有的后端都有相同的接口:
+
+    backend = Backend(**options)
+    backend.setup(A)
+    x, info = backend.solve(b, x0=None)
+
+b 也可以是形状为 (N, nrhs) 的数组, 每一列是一个右端. 直接法只做一次分解,
+AMG 预条件的共轭梯度法用块共轭梯度法 (block_cg) 同时求解所有的列, 其它后
+端逐列求解.
+
+info 中至少包含 'niter', 'residuals' 和 'converged'. LinearSolver 在此基础
+上统一计算最终的相对残量, 记录时间和矩阵规模, 并根据矩阵的规模, 对称性和
+正定性自动选择后端. 这样应用程序只需要改变参数就可以切换解法器:
+
+    solver = LinearSolver(method='auto', tol=1e-10)
+    x = solver.solve(A, b)
+    print(solver.stats)
+
+    x, stats = linear_solve(A, b, method='cg_amg', tol=1e-10)
+"""
+
+import numpy as np
+from numpy.linalg import norm
+from timeit import default_timer as timer
+from scipy.sparse import spdiags
+from scipy.sparse.linalg import cg, gmres, spilu, LinearOperator
+
+from .amg import AMGSolver
+from .factorization_cache import FactorizationCache, is_symmetric
+
+
+class LinearSolverBackend():
+    """
+    后端的基类.
+
+    Notes
+    -----
+    所有后端都接受相同的公共参数 tol, maxit 和 disp, 不认识的参数被忽略,
+    这样同一组参数可以传给任何后端.
+    """
+    multirhs = False # solve 是否直接支持多个右端
+
+    def __init__(self, tol=1e-8, maxit=1000, disp=False, **options):
+        self.tol = tol
+        self.maxit = maxit
+        self.disp = disp
+        self.options = options
+        self.telemetry = None
+
+    @classmethod
+    def available(cls):
+        return True
+
+    def setup(self, A):
+        self.A = A.tocsr()
+
+    def callback(self, b):
+        """
+
+        Notes
+        -----
+        返回记录相对残量的回调函数和残量列表.
+        """
+        A = self.A
+        nb = norm(b)
+        if nb == 0.0:
+            nb = 1.0
+        residuals = []
+        t = self.telemetry
+        def callback(xk):
+            if t is None:
+                residuals.append(norm(b - A@xk)/nb)
+            else:
+                with t.timed('monitor'):
+                    residuals.append(norm(b - A@xk)/nb)
+                t.iteration(residuals[-1])
+            if self.disp:
+                print('iter {:4d}  residual {:.4e}'.format(len(residuals), residuals[-1]))
+        return callback, residuals
+
+    def instrument(self, A, M=None):
+        """
+
+        Notes
+        -----
+        挂上了 SolverTelemetry 时, 返回记录算子和预条件子用时的 A 和 M.
+        """
+        t = self.telemetry
+        if t is None:
+            return A, M
+        return t.operator(A), None if M is None else t.preconditioner(M)
+
+
+class DirectLUSolver(LinearSolverBackend):
+    """
+    SuperLU 直接法, 分解由 FactorizationCache 缓存.
+    """
+    multirhs = True
+
+    def __init__(self, **options):
+        super().__init__(**options)
+        self.cache = FactorizationCache(method='lu')
+
+    def setup(self, A):
+        self.A = A.tocsc()
+        self.cache.factorize(self.A)
+
+    def solve(self, b, x0=None):
+        x = self.cache.solve(self.A, b)
+        return x, {'niter': 1, 'residuals': [], 'converged': True}
+
+
+class CholeskySolver(DirectLUSolver):
+    """
+    对称正定矩阵的 Cholesky 分解, 需要 scikit-sparse.
+    """
+    def __init__(self, **options):
+        LinearSolverBackend.__init__(self, **options)
+        self.cache = FactorizationCache(method='cholesky')
+
+    @classmethod
+    def available(cls):
+        try:
+            import sksparse.cholmod
+        except ImportError:
+            return False
+        return True
+
+
+class CGAMGSolver(LinearSolverBackend):
+    """
+    AMG 预条件的共轭梯度法, 用于对称正定矩阵.
+
+    Notes
+    -----
+    options 中以 amg_ 开头的参数传给 AMGSolver, 比如 amg_smoother='mcgs'.
+    矩阵的结构不变时 setup 只调用 AMGSolver.update. 多个右端时用块共轭梯
+    度法, 每一步对所有的列做一次 AMG 循环.
+    """
+    multirhs = True
+
+    def setup(self, A):
+        A = A.tocsr()
+        amgoptions = {k[4:]: v for k, v in self.options.items() if k.startswith('amg_')}
+        if hasattr(self, 'amg') and same_structure(self.A, A):
+            self.amg.update(A)
+        else:
+            self.amg = AMGSolver(**amgoptions)
+            self.amg.setup(A)
+        if self.telemetry is not None:
+            self.amg.attach(self.telemetry)
+        self.A = A
+
+    def solve(self, b, x0=None):
+        callback, residuals = self.callback(b)
+        A, M = self.instrument(self.A, self.amg.aspreconditioner())
+        if len(b.shape) == 2:
+            x, info = block_cg(A, b, X0=x0, tol=self.tol, maxit=self.maxit,
+                    M=M, callback=callback)
+        else:
+            x, info = cg(A, b, x0=x0, tol=self.tol, maxiter=self.maxit,
+                    M=M, callback=callback)
+        return x, {'niter': len(residuals), 'residuals': residuals,
+                'converged': info == 0}
+
+
+class GMRESILUSolver(LinearSolverBackend):
+    """
+    ILU 预条件的重启 GMRES 方法, 用于一般的非对称矩阵.
+
+    Notes
+    -----
+    options: drop_tol (默认 1e-4), fill_factor (默认 10), restart (默认 30).
+    """
+    def setup(self, A):
+        self.A = A.tocsr()
+        ilu = spilu(A.tocsc(),
+                drop_tol=self.options.get('drop_tol', 1e-4),
+                fill_factor=self.options.get('fill_factor', 10))
+        N = A.shape[0]
+        self.M = LinearOperator((N, N), matvec=ilu.solve, dtype=A.dtype)
+
+    def solve(self, b, x0=None):
+        callback, residuals = self.callback(b)
+        A, M = self.instrument(self.A, self.M)
+        x, info = gmres(A, b, x0=x0, tol=self.tol,
+                restart=self.options.get('restart', 30), maxiter=self.maxit,
+                M=M, callback=callback, callback_type='x')
+        return x, {'niter': len(residuals), 'residuals': residuals,
+                'converged': info == 0}
+
+
+class BlockMINRESSolver(LinearSolverBackend):
+    """
+    块对角预条件的 MINRES 方法, 用于对称不定的鞍点问题
+
+        [[A, B^T], [B, -C]]
+
+    Notes
+    -----
+    options 中的 blocks 给出各块的规模, 比如 blocks=[n0, n1]. 每个对角块用
+    AMG 的一次 V 循环求逆, 负定的块先取负号; 如果对角块是零矩阵 (比如不可
+    压缩流体的压力块), 就用 Schur 补的近似 B diag(A)^{-1} B^T 代替. 没有给
+    出 blocks 时只用一个块, 即 AMG 预条件的 MINRES.
+    """
+    def setup(self, A):
+        A = A.tocsr()
+        self.A = A
+        N = A.shape[0]
+        blocks = self.options.get('blocks', [N])
+        offset = np.r_[0, np.cumsum(blocks)]
+        if offset[-1] != N:
+            raise ValueError('the sum of blocks {} is not equal to {}'.format(blocks, N))
+
+        self.offset = offset
+        self.amgs = []
+        amgoptions = {k[4:]: v for k, v in self.options.items() if k.startswith('amg_')}
+        s0 = slice(offset[0], offset[1])
+        for i in range(len(blocks)):
+            s = slice(offset[i], offset[i+1])
+            Aii = A[s, s]
+            if (Aii.nnz == 0) or (np.abs(Aii.data).max() == 0):
+                if i == 0:
+                    raise ValueError('the first diagonal block can not be zero!')
+                Dinv = 1.0/A[s0, s0].diagonal()
+                B = A[s, s0]
+                Aii = (B@spdiags(Dinv, 0, len(Dinv), len(Dinv))@B.T).tocsr()
+            elif np.all(Aii.diagonal() < 0):
+                Aii = -Aii
+            amg = AMGSolver(**amgoptions)
+            amg.setup(Aii)
+            if self.telemetry is not None:
+                amg.attach(self.telemetry)
+            self.amgs.append(amg)
+
+        def matvec(r):
+            z = np.zeros_like(r)
+            for i, amg in enumerate(self.amgs):
+                s = slice(offset[i], offset[i+1])
+                z[s] = amg.cycle(r[s])
+            return z
+        self.M = LinearOperator((N, N), matvec=matvec, dtype=A.dtype)
+
+    def solve(self, b, x0=None):
+        callback, residuals = self.callback(b)
+        A, M = self.instrument(self.A, self.M)
+        x, info = preconditioned_minres(A, b, x0=x0, tol=self.tol,
+                maxit=self.maxit, M=M, callback=callback)
+        return x, {'niter': len(residuals), 'residuals': residuals,
+                'converged': info == 0}
+
+
+class PETScKSPSolver(LinearSolverBackend):
+    """
+    PETSc 的 KSP 解法器, 需要 petsc4py.
+
+    Notes
+    -----
+    options: ksp_type (默认 'cg'), pc_type (默认 'gamg').
+    """
+    @classmethod
+    def available(cls):
+        try:
+            import petsc4py
+        except ImportError:
+            return False
+        return True
+
+    def setup(self, A):
+        from petsc4py import PETSc
+        A = A.tocsr()
+        self.A = A
+        PA = PETSc.Mat().createAIJ(size=A.shape, csr=(A.indptr, A.indices, A.data))
+        ksp = PETSc.KSP().create(PETSc.COMM_WORLD)
+        ksp.setType(self.options.get('ksp_type', 'cg'))
+        ksp.getPC().setType(self.options.get('pc_type', 'gamg'))
+        ksp.setTolerances(rtol=self.tol, max_it=self.maxit)
+        ksp.setOperators(PA)
+        ksp.setConvergenceHistory()
+        ksp.setFromOptions()
+        self.ksp = ksp
+
+    def solve(self, b, x0=None):
+        from petsc4py import PETSc
+        x = np.zeros_like(b) if x0 is None else x0.copy()
+        if x0 is not None:
+            self.ksp.setInitialGuessNonzero(True)
+        Pb = PETSc.Vec().createWithArray(b)
+        Px = PETSc.Vec().createWithArray(x)
+        self.ksp.solve(Pb, Px)
+        history = self.ksp.getConvergenceHistory()
+        nb = norm(b) if norm(b) > 0 else 1.0
+        return x, {'niter': self.ksp.getIterationNumber(),
+                'residuals': list(history/nb),
+                'converged': self.ksp.getConvergedReason() > 0}
+
+
+def preconditioned_minres(A, b, x0=None, tol=1e-8, maxit=1000, M=None,
+        callback=None):
+    """
+
+    Notes
+    -----
+    预条件的 MINRES 方法 (Elman, Silvester, Wathen 的算法), 当残量的
+    M 范数 (M 是预条件子) 相对于初始值下降到 tol 以下时停止. scipy 的 minres
+    用的是向后误差的停止条件, 在鞍点问题上常常在真实残量还很大时就停止.
+
+    返回解和 info, info == 0 表示收敛.
+    """
+    N = len(b)
+    x = np.zeros_like(b) if x0 is None else x0.copy()
+    if M is None:
+        M = LinearOperator((N, N), matvec=lambda r: r, dtype=b.dtype)
+
+    v0 = np.zeros_like(b)
+    v1 = b - A@x
+    z1 = M@v1
+    gamma0 = 1.0
+    gamma1 = np.sqrt(z1@v1)
+    if gamma1 == 0.0:
+        return x, 0
+    w0 = np.zeros_like(b)
+    w1 = np.zeros_like(b)
+    eta = eta0 = gamma1
+    s0 = s1 = 0.0
+    c0 = c1 = 1.0
+    for i in range(maxit):
+        z1 = z1/gamma1
+        Az = A@z1
+        delta = Az@z1
+        v2 = Az - (delta/gamma1)*v1 - (gamma1/gamma0)*v0
+        z2 = M@v2
+        gamma2 = np.sqrt(max(z2@v2, 0.0))
+        alpha0 = c1*delta - c0*s1*gamma1
+        alpha1 = np.sqrt(alpha0**2 + gamma2**2)
+        alpha2 = s1*delta + c0*c1*gamma1
+        alpha3 = s0*gamma1
+        c0, c1 = c1, alpha0/alpha1
+        s0, s1 = s1, gamma2/alpha1
+        w2 = (z1 - alpha3*w0 - alpha2*w1)/alpha1
+        x += c1*eta*w2
+        eta = -s1*eta
+        if callback is not None:
+            callback(x)
+        if (abs(eta) < tol*eta0) or (gamma2 == 0.0):
+            return x, 0
+        v0, v1 = v1, v2
+        z1 = z2
+        w0, w1 = w1, w2
+        gamma0, gamma1 = gamma1, gamma2
+    return x, maxit
+
+
+def block_cg(A, B, X0=None, tol=1e-8, maxit=1000, M=None, callback=None):
+    """
+
+    Parameters
+    ----------
+    A : 对称正定矩阵或者 LinearOperator
+    B : 形状为 (N, nrhs) 的右端
+    X0 : 初值
+    tol : 每一列相对残量的停止条件
+    M : 预条件子, 要能作用在 (N, nrhs) 的数组上 (比如 LinearOperator 的
+        matmat)
+
+    Notes
+    -----
+    块共轭梯度法 (Ji, Li 的无中断版本), 所有的列共享一个 Krylov 子空间, 每
+    一步做一次矩阵和 nrhs 个向量的乘积, 一次块预条件, 以及若干个 nrhs x nrhs
+    的小矩阵运算. 搜索方向每一步做正交化, 并去掉线性相关的部分, 所以某些列
+    先收敛 (或者右端线性相关) 时不会中断.
+
+    返回解和 info, info == 0 表示所有的列都收敛.
+    """
+    B = np.asarray(B)
+    X = np.zeros_like(B) if X0 is None else np.array(X0, dtype=B.dtype)
+    nb = norm(B, axis=0)
+    nb[nb == 0.0] = 1.0
+    apply = (lambda R: R) if M is None else (lambda R: M@R)
+
+    R = B - A@X
+    if np.max(norm(R, axis=0)/nb) < tol:
+        return X, 0
+    P = orthonormalize(apply(R))
+    for i in range(maxit):
+        Q = A@P
+        PQ = P.T@Q
+        alpha = np.linalg.solve(PQ, P.T@R)
+        X += P@alpha
+        R -= Q@alpha
+        if callback is not None:
+            callback(X)
+        if np.max(norm(R, axis=0)/nb) < tol:
+            return X, 0
+        Z = apply(R)
+        beta = -np.linalg.solve(PQ, Q.T@Z)
+        P = orthonormalize(Z + P@beta)
+        if P.shape[1] == 0:
+            break
+    return X, maxit
+
+
+def orthonormalize(P, rtol=1e-12):
+    """
+
+    Notes
+    -----
+    P 的列空间的标准正交基, 去掉相对奇异值小于 rtol 的方向.
+    """
+    U, s, _ = np.linalg.svd(P, full_matrices=False)
+    if len(s) == 0 or s[0] == 0.0:
+        return U[:, :0]
+    return U[:, s > rtol*s[0]]
+
+
+def same_structure(A, B):
+    return (A.shape == B.shape) and (A.nnz == B.nnz) and \
+            np.array_equal(A.indptr, B.indptr) and \
+            np.array_equal(A.indices, B.indices)
+
+
+def register_solver(name, backend):
+    """
+
+    Notes
+    -----
+    注册一个新的后端, backend 是 LinearSolverBackend 的子类.
+    """
+    solvers[name] = backend
+
+
+def select_solver(A, symmetric=None, spd=None, direct_size=50000, **options):
+    """
+
+    Parameters
+    ----------
+    A : 稀疏矩阵
+    symmetric : 矩阵是否对称, None 表示数值判断
+    spd : 矩阵是否对称正定, None 表示用对称性加上对角元全为正来猜测
+    direct_size : 不超过这个规模的矩阵用直接法
+
+    Notes
+    -----
+    1. 小规模的矩阵用直接法, 对称正定并且有 scikit-sparse 时用 Cholesky,
+       否则用 LU.
+    2. 大规模的对称正定矩阵用 AMG 预条件的 CG.
+    3. 大规模的对称不定矩阵, 给出 blocks 时用块预条件的 MINRES.
+    4. 其它情况用 ILU 预条件的 GMRES.
+    """
+    N = A.shape[0]
+    if symmetric is None:
+        symmetric = is_symmetric(A.tocsr())
+    if spd is None:
+        spd = symmetric and np.all(A.diagonal() > 0)
+    if N <= direct_size:
+        if spd and CholeskySolver.available():
+            return 'cholesky'
+        return 'lu'
+    if spd:
+        return 'cg_amg'
+    if symmetric and ('blocks' in options):
+        return 'minres_block'
+    return 'gmres_ilu'
+
+
+class LinearSolver():
+    """
+    统一的线性解法器.
+
+    Examples
+    --------
+    solver = LinearSolver(method='auto', tol=1e-10, spd=True)
+    x = solver.solve(A, b)
+    print(solver.stats['method'], solver.stats['niter'])
+    """
+    def __init__(self, method='auto', symmetric=None, spd=None,
+            direct_size=50000, telemetry=None, **options):
+        """
+
+        Parameters
+        ----------
+        method : 后端的名字, 见 solvers, 'auto' 表示自动选择
+        symmetric, spd, direct_size : 自动选择后端时的提示, 见 select_solver
+        telemetry : SolverTelemetry 对象, 每次求解在其中生成一条记录
+        options : 传给后端的参数, 比如 tol, maxit, disp, blocks, amg_smoother
+        """
+        self.method = method
+        self.telemetry = telemetry
+        self.symmetric = symmetric
+        self.spd = spd
+        self.direct_size = direct_size
+        self.options = options
+        self.backends = {}
+        self.stats = None
+
+    def get_backend(self, A):
+        method = self.method
+        if method == 'auto':
+            method = select_solver(A, symmetric=self.symmetric, spd=self.spd,
+                    direct_size=self.direct_size, **self.options)
+        if method not in solvers:
+            raise ValueError("We don't support solver `{}`! ".format(method))
+        if not solvers[method].available():
+            raise ImportError("The solver `{}` is not available on this system!".format(method))
+        if method not in self.backends:
+            self.backends[method] = solvers[method](**self.options)
+        return method, self.backends[method]
+
+    def solve(self, A, b, x0=None):
+        """
+
+        Notes
+        -----
+        求解 Ax = b, b 可以是一维数组, 也可以是每一列为一个右端的二维数组.
+        统计信息保存在 self.stats 中:
+
+            method : 使用的后端
+            converged : 是否收敛
+            niter : 迭代步数, 直接法为 1
+            residual : 最终的相对残量 |b - Ax|/|b|, 多个右端时取各列的最大值
+            residuals : 迭代过程中的相对残量
+            setup_time, solve_time : setup 和求解的时间
+            size, nnz : 矩阵的规模和非零元个数
+
+        给出 telemetry 时, 每步迭代的残量和用时也记录在其中.
+        """
+        method, backend = self.get_backend(A)
+        t = self.telemetry
+        backend.telemetry = t
+        if t is not None:
+            t.start(method, A=A, tol=backend.tol)
+        try:
+            start = timer()
+            backend.setup(A)
+            end = timer()
+            setup_time = end - start
+
+            start = timer()
+            if (len(b.shape) == 2) and (not backend.multirhs):
+                x, info = self.solve_columns(backend, b, x0=x0)
+            else:
+                x, info = backend.solve(b, x0=x0)
+            end = timer()
+        except BaseException:
+            if t is not None:
+                t.stop(error=True)
+            raise
+
+        nb = norm(b, axis=0)
+        residual = norm(b - A@x, axis=0)/np.where(nb == 0.0, 1.0, nb)
+        residual = np.max(residual)
+        if t is not None:
+            t.finish(converged=info['converged'], residual=residual)
+            t.current['setup_time'] = setup_time
+            t.stop()
+        self.stats = {
+                'method': method,
+                'converged': bool(info['converged']),
+                'niter': info['niter'],
+                'residual': residual,
+                'residuals': info['residuals'],
+                'setup_time': setup_time,
+                'solve_time': end - start,
+                'size': A.shape[0],
+                'nnz': A.nnz}
+        return x
+
+
+    def solve_columns(self, backend, b, x0=None):
+        """
+
+        Notes
+        -----
+        不支持多个右端的后端逐列求解, setup 只做一次.
+        """
+        x = np.zeros_like(b)
+        niter = 0
+        residuals = []
+        converged = True
+        for i in range(b.shape[1]):
+            x[:, i], info = backend.solve(b[:, i],
+                    x0=None if x0 is None else x0[:, i])
+            niter += info['niter']
+            residuals += info['residuals']
+            converged = converged and info['converged']
+        return x, {'niter': niter, 'residuals': residuals, 'converged': converged}
+
+
+def linear_solve(A, b, x0=None, method='auto', **options):
+    """
+
+    Notes
+    -----
+    LinearSolver 的函数形式, 返回解和统计信息.
+    """
+    solver = LinearSolver(method=method, **options)
+    x = solver.solve(A, b, x0=x0)
+    return x, solver.stats
+
+
+solvers = {
+        'lu': DirectLUSolver,
+        'cholesky': CholeskySolver,
+        'cg_amg': CGAMGSolver,
+        'gmres_ilu': GMRESILUSolver,
+        'minres_block': BlockMINRESSolver,
+        'petsc': PETScKSPSolver,
+        }
@@ -0,0 +1,243 @@
+import numpy as np
+from numpy.linalg import norm
+from scipy.sparse.linalg import cg, gmres, factorized, LinearOperator
+
+from .smoother import get_smoother
+from .telemetry import TimedSmoother
+
+
+class MultigridSolver():
+    """
+    多重网格解法器的基类.
+
+    Notes
+    -----
+    子类负责在 setup 中生成各层的矩阵 self.A, 插值算子 self.P 和限制算子
+    self.R (第 0 层是最细层), 然后调用 setup_smoothers. 这个基类提供 V, W,
+    F 循环, 迭代求解和预条件子.
+    """
+    def __init__(self, ctype='V', smoother='gs', nu=1):
+        """
+
+        Parameters
+        ----------
+        ctype : 循环类型, 'V', 'W' 或者 'F'
+        smoother : 磨光子, 可以是 smoother.py 中注册的名字, 或者是一个以矩阵
+            为参数的类或函数, 返回的对象要有 smooth(x, b, nu, lower) 方法
+        nu : 前后磨光的次数
+        """
+        self.ctype = ctype
+        self.smoother = smoother
+        self.nu = nu
+
+        self.A = []
+        self.P = []
+        self.R = []
+        self.smoothers = []
+        self.residuals = []
+        self.telemetry = None
+
+    def __str__(self):
+        s = '{}:\n'.format(self.__class__.__name__)
+        s += '  Number of levels: {}\n'.format(len(self.A))
+        s += '  Operator complexity: {:.3f}\n'.format(self.operator_complexity())
+        s += '  Grid complexity: {:.3f}\n'.format(self.grid_complexity())
+        s += '  level   unknowns   nonzeros\n'
+        for i, A in enumerate(self.A):
+            s += '  {:5d} {:10d} {:10d}\n'.format(i, A.shape[0], A.nnz)
+        return s
+
+    def operator_complexity(self):
+        return sum(A.nnz for A in self.A)/self.A[0].nnz
+
+    def grid_complexity(self):
+        return sum(A.shape[0] for A in self.A)/self.A[0].shape[0]
+
+    def attach(self, telemetry):
+        """
+
+        Notes
+        -----
+        挂上一个 SolverTelemetry 对象, 之后的求解都会被记录, 磨光子的时间单
+        独统计. 做为预条件子时, 循环的时间记在调用者的记录中.
+        """
+        self.telemetry = telemetry
+        self.smoothers = [telemetry.smoother(
+            s.smoother if isinstance(s, TimedSmoother) else s) for s in self.smoothers]
+
+    def update(self, A):
+        """
+
+        Notes
+        -----
+        矩阵的值改变而结构不变时, 复用已有的插值算子, 只重新计算 Galerkin 粗
+        网格算子, 磨光子和最粗层的分解.
+        """
+        if len(self.A) == 0:
+            self.setup(A)
+        else:
+            self.galerkin(A)
+            self.setup_smoothers()
+
+    def galerkin(self, A):
+        """
+
+        Notes
+        -----
+        用已有的插值和限制算子生成各层的 Galerkin 粗网格矩阵 R A P.
+        """
+        A = A.tocsr()
+        self.A = [A]
+        for P, R in zip(self.P, self.R):
+            A = (R@A@P).tocsr()
+            self.A.append(A)
+
+    def setup_smoothers(self):
+        smoother = self.smoother
+        self.smoothers = []
+        for A in self.A[:-1]:
+            s = get_smoother(smoother, A)
+            if self.telemetry is not None:
+                s = self.telemetry.smoother(s)
+            self.smoothers.append(s)
+            if isinstance(smoother, tuple): # 给定的着色只对最细层有效
+                name, kwargs = smoother
+                smoother = (name, {k: v for k, v in kwargs.items() if k != 'color'})
+        self.coarse_solver = factorized(self.A[-1].tocsc())
+
+    def coarse_solve(self, b):
+        if len(b.shape) == 1:
+            return self.coarse_solver(b)
+        else:
+            return np.column_stack([self.coarse_solver(c) for c in b.T])
+
+    def cycle(self, b, x=None, level=0, ctype=None):
+        """
+
+        Notes
+        -----
+        从第 level 层开始做一次 V, W 或者 F 循环.
+        """
+        ctype = self.ctype if ctype is None else ctype
+        if level == len(self.A) - 1:
+            return self.coarse_solve(b)
+
+        if x is None:
+            x = np.zeros_like(b)
+
+        A = self.A[level]
+        smoother = self.smoothers[level]
+        x = smoother.smooth(x, b, nu=self.nu, lower=True)
+
+        r = b - A@x
+        rc = self.R[level]@r
+        ec = np.zeros_like(rc)
+        if ctype == 'V':
+            ec = self.cycle(rc, ec, level=level+1, ctype='V')
+        elif ctype == 'W':
+            ec = self.cycle(rc, ec, level=level+1, ctype='W')
+            ec = self.cycle(rc, ec, level=level+1, ctype='W')
+        elif ctype == 'F':
+            ec = self.cycle(rc, ec, level=level+1, ctype='F')
+            ec = self.cycle(rc, ec, level=level+1, ctype='V')
+        else:
+            raise ValueError("We don't support cycle `{}`! ".format(ctype))
+        x += self.P[level]@ec
+
+        x = smoother.smooth(x, b, nu=self.nu, lower=False)
+        return x
+
+    def aspreconditioner(self, ctype=None):
+        """
+
+        Notes
+        -----
+        返回一次多重网格循环做为预条件子, 可以做为 cg, gmres 等的 M 参数.
+        作用在 (N, nrhs) 的数组上时, 所有的列一起做一次循环.
+        """
+        N = self.A[0].shape[0]
+        def matvec(b):
+            return self.cycle(b.reshape(-1), ctype=ctype)
+        def matmat(B):
+            return self.cycle(B, ctype=ctype)
+        return LinearOperator((N, N), matvec=matvec, matmat=matmat,
+                dtype=self.A[0].dtype)
+
+    def solve(self, b, x0=None, tol=1e-8, maxit=100, accel=None, ctype=None):
+        """
+
+        Parameters
+        ----------
+        b : 右端向量
+        x0 : 初值
+        tol : 相对残量的停止条件
+        maxit : 最大迭代次数
+        accel : None 表示直接用多重网格迭代, 'cg' 或者 'gmres' 表示把多重
+            网格做为预条件子
+        ctype : 循环类型, 默认用初始化时给定的类型
+
+        Notes
+        -----
+        相对残量的历史记录在 self.residuals 中. 挂上了 SolverTelemetry 时,
+        同时记录到其中.
+        """
+        t = self.telemetry
+        if t is None:
+            return self.iterate(b, x0=x0, tol=tol, maxit=maxit, accel=accel,
+                    ctype=ctype)
+
+        name = self.__class__.__name__
+        if accel is not None:
+            name = accel + '_' + name
+        with t.record(name, A=self.A[0], tol=tol, nlevel=len(self.A)):
+            x = self.iterate(b, x0=x0, tol=tol, maxit=maxit, accel=accel,
+                    ctype=ctype)
+            t.finish(info=self.info, residual=self.residuals[-1])
+        return x
+
+    def iterate(self, b, x0=None, tol=1e-8, maxit=100, accel=None, ctype=None):
+        t = self.telemetry
+        A = self.A[0]
+        Aop = A if t is None else t.operator(A)
+        x = np.zeros_like(b) if x0 is None else x0.copy()
+        nb = norm(b)
+        if nb == 0.0:
+            nb = 1.0
+        self.residuals = [norm(b - A@x)/nb]
+
+        def callback(xk):
+            if t is None:
+                self.residuals.append(norm(b - A@xk)/nb)
+            else:
+                with t.timed('monitor'):
+                    self.residuals.append(norm(b - A@xk)/nb)
+                t.iteration(self.residuals[-1])
+
+        if accel is None:
+            self.info = maxit
+            for i in range(maxit):
+                if self.residuals[-1] < tol:
+                    self.info = 0
+                    break
+                if t is None:
+                    x = self.cycle(b, x, ctype=ctype)
+                else:
+                    with t.timed('preconditioner'):
+                        x = self.cycle(b, x, ctype=ctype)
+                callback(x)
+            if self.residuals[-1] < tol:
+                self.info = 0
+            return x
+
+        M = self.aspreconditioner(ctype=ctype)
+        if t is not None:
+            M = t.preconditioner(M)
+        if accel == 'cg':
+            x, info = cg(Aop, b, x0=x, tol=tol, maxiter=maxit, M=M, callback=callback)
+        elif accel == 'gmres':
+            x, info = gmres(Aop, b, x0=x, tol=tol, maxiter=maxit, M=M,
+                    callback=callback, callback_type='x')
+        else:
+            raise ValueError("We don't support accel `{}`! ".format(accel))
+        self.info = info
+        return x
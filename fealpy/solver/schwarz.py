@@ -0,0 +1,346 @@
+"""
+
+Notes
+-----
+重叠型 Schwarz 区域分解预条件子.
+
+把自由度分成 nparts 个有重叠的子区域 Omega_i, R_i 是到 Omega_i 上的限制,
+A_i = R_i A R_i^T 是局部矩阵, 则
+
+    加性 Schwarz (AS) :         M^{-1} = sum_i R_i^T A_i^{-1} R_i
+    限制加性 Schwarz (RAS) :    M^{-1} = sum_i R_i^T D_i A_i^{-1} R_i
+
+其中 D_i 只保留 Omega_i 中属于子区域 i 的 (不重叠的) 自由度, 各个子区域的
+修正不再相加. AS 是对称的, 配合共轭梯度法; RAS 不对称, 配合 GMRES, 迭代步
+数通常比 AS 少.
+
+子区域由网格剖分 (见 fealpy.mesh.partition) 得到: 子区域 i 包含第 i 块单元
+以及 overlap 层影子单元上的全部自由度. 没有给出有限元空间时, 用矩阵的图从
+连续的行分块向外扩展 overlap 层.
+
+单层方法的迭代步数随子区域个数增长, 可以加一个粗空间:
+
+    M^{-1} = M_1^{-1} + P (P^T A P)^{-1} P^T
+
+粗空间可以是每个子区域上 (每个分量) 的特征函数 ('aggregation'), 也可以由
+粗网格的延拓矩阵给出 (见 MeshHierarchy.prolongations).
+
+局部矩阵用 LU 分解, 分解在 setup 时进行, 局部矩阵没有变化时重复使用.
+nworkers > 1 时, 子区域平均分给若干个工作进程, 分解和每次的局部求解都在工
+作进程中并行进行, 右端和解通过共享内存传递.
+
+Examples
+--------
+M = SchwarzPreconditioner(space=space, nparts=16, overlap=1,
+        method='as', coarse='aggregation')
+M.setup(A)
+x, info = cg(A, b, M=M.aspreconditioner())
+"""
+
+import multiprocessing as mp
+from multiprocessing import shared_memory
+
+import numpy as np
+from scipy.sparse import csr_matrix, csc_matrix
+from scipy.sparse.linalg import LinearOperator, splu
+
+from .factorization_cache import matrix_key
+
+
+def local_solves(factors, arrays, ras):
+    """
+
+    Notes
+    -----
+    对 factors 中的每个子区域做局部求解. RAS 时直接把子区域拥有的分量写到
+    y 中 (各个子区域拥有的自由度互不相交), AS 时把局部解写到 z 中各自的位置.
+    """
+    r = arrays['r']
+    for idx, own, offset, solve in factors.values():
+        z = solve(r[idx])
+        if ras:
+            arrays['y'][idx[own]] = z[own]
+        else:
+            arrays['z'][offset:offset+len(idx)] = z
+
+
+def schwarz_worker(conn, arrays):
+    factors = {}
+    while True:
+        cmd, args = conn.recv()
+        if cmd == 'setup':
+            blocks, keep = args
+            factors = {i: factors[i] for i in keep}
+            for i, (idx, own, offset, Ai) in blocks.items():
+                factors[i] = (idx, own, offset, splu(Ai).solve)
+            conn.send(None)
+        elif cmd == 'solve':
+            local_solves(factors, arrays, args)
+            conn.send(None)
+        elif cmd == 'close':
+            conn.close()
+            break
+
+
+class SchwarzPreconditioner():
+    def __init__(self, space=None, nparts=4, overlap=1, method='as',
+            coarse=None, nworkers=1, partition='auto'):
+        """
+
+        Parameters
+        ----------
+        space : 有限元空间或者空间的列表 (比如混合元的 [uspace, pspace]), 矩
+            阵的自由度按空间依次排列; 只有一个空间时矩阵可以是向量型问题,
+            自由度按分量排列 (与 np.tile(isDDof, dim) 的排列方式一致)
+        nparts : 子区域的个数
+        overlap : 重叠的层数 (影子单元的层数, 或者矩阵图上扩展的层数)
+        method : 'as' 或者 'ras'
+        coarse : None, 'aggregation', 延拓矩阵 P, 或者从细到粗排列的延拓
+            矩阵列表 (MeshHierarchy.prolongations 的返回值)
+        nworkers : 做局部分解和求解的进程个数
+        partition : 网格剖分的方法, 见 fealpy.mesh.partition.partition_mesh
+        """
+        if method not in {'as', 'ras'}:
+            raise ValueError("We don't support Schwarz method `{}`! ".format(method))
+        self.space = space
+        self.nparts = nparts
+        self.overlap = overlap
+        self.method = method
+        self.coarse = coarse
+        self.nworkers = nworkers
+        self.partition = partition
+
+        self.dofs = None # 每个子区域的自由度
+        self.owns = None # 子区域的自由度中属于该子区域的部分
+        self.keys = {} # 子区域 -> 局部矩阵的键
+        self.factors = {} # 子区域 -> (idx, own, offset, solve)
+        self.nfactor = 0 # 局部矩阵分解的次数
+        self.workers = []
+        self.shms = {}
+        self.arrays = {}
+
+    def __str__(self):
+        s = '{}:\n'.format(self.__class__.__name__)
+        s += '  method: {}, overlap: {}, coarse: {}\n'.format(
+                self.method, self.overlap,
+                None if self.coarse is None else self.P.shape[1])
+        if self.dofs is not None:
+            n = [len(idx) for idx in self.dofs]
+            s += '  number of subdomains: {}\n'.format(len(n))
+            s += '  local size: min {}, max {}, total {}\n'.format(
+                    min(n), max(n), sum(n))
+        s += '  number of factorizations: {}\n'.format(self.nfactor)
+        return s
+
+    def __del__(self):
+        if hasattr(self, 'workers'):
+            self.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def subdomain_dofs(self, A):
+        """
+
+        Notes
+        -----
+        生成每个子区域的自由度, 以及其中属于该子区域的部分.
+        """
+        N = A.shape[0]
+        if self.space is None:
+            # 连续的行分块, 沿矩阵的图向外扩展
+            part = np.arange(N)*self.nparts//N
+            G = csr_matrix((np.ones(A.nnz, dtype=np.int_), A.indices,
+                A.indptr), shape=A.shape)
+            dofs = []
+            owns = []
+            for i in range(self.nparts):
+                isOwn = (part == i)
+                isDof = isOwn.copy()
+                for l in range(self.overlap):
+                    isDof |= (G@isDof.astype(np.int_)) > 0
+                idx = np.nonzero(isDof)[0]
+                dofs.append(idx)
+                owns.append(isOwn[idx])
+            return dofs, owns
+
+        from ..mesh.partition import MeshPartition
+        spaces = self.space if isinstance(self.space, (list, tuple)) else [self.space]
+        mesh = spaces[0].mesh
+        mpart = MeshPartition(mesh, self.nparts, method=self.partition,
+                nghost=self.overlap)
+
+        gdofs = [space.number_of_global_dofs() for space in spaces]
+        if len(spaces) == 1:
+            ncomp = N//gdofs[0]
+            offsets = [k*gdofs[0] for k in range(ncomp)]
+            spaces = spaces*ncomp
+            gdofs = gdofs*ncomp
+        else:
+            offsets = np.cumsum([0] + gdofs[:-1]).tolist()
+        if offsets[-1] + gdofs[-1] != N:
+            raise ValueError('the size of the matrix does not match the spaces!')
+
+        owners = {}
+        cell2dofs = {}
+        for space in set(spaces):
+            owners[space] = mpart.dof_owner(space)
+            cell2dofs[space] = space.cell_to_dof()
+
+        dofs = []
+        owns = []
+        for i in range(self.nparts):
+            cell = np.nonzero(mpart.ghost_layers(i) >= 0)[0]
+            idx = []
+            own = []
+            for space, offset in zip(spaces, offsets):
+                dof = np.unique(cell2dofs[space][cell])
+                idx.append(dof + offset)
+                own.append(owners[space][dof] == i)
+            dofs.append(np.concatenate(idx))
+            owns.append(np.concatenate(own))
+        return dofs, owns
+
+    def coarse_space(self, A):
+        coarse = self.coarse
+        if isinstance(coarse, str):
+            if coarse != 'aggregation':
+                raise ValueError("We don't support coarse space `{}`! ".format(coarse))
+            # 每个子区域上每个分量的特征函数
+            N = A.shape[0]
+            ncomp = 1
+            if (self.space is not None) and not isinstance(self.space, (list, tuple)):
+                ncomp = N//self.space.number_of_global_dofs()
+            n = N//ncomp
+            J = np.zeros(N, dtype=np.int_)
+            for i, (idx, own) in enumerate(zip(self.dofs, self.owns)):
+                idx = idx[own]
+                J[idx] = i*ncomp + idx//n
+            # Dirichlet 边界条件处理之后只有对角元的行不在粗空间中
+            d = A.diagonal()
+            isFree = np.asarray(abs(A).sum(axis=1)).flat > np.abs(d)
+            J, col = np.unique(J[isFree], return_inverse=True)
+            P = csr_matrix((np.ones(len(col), dtype=A.dtype),
+                (np.nonzero(isFree)[0], col)), shape=(N, len(J)))
+            # 分片常数的函数能量太大, 用一步阻尼 Jacobi 光滑
+            P = P - (2/3)*csr_matrix(A.multiply(1/d[:, None]))@P
+            return P.tocsr()
+        if isinstance(coarse, (list, tuple)):
+            P = coarse[0]
+            for Pi in coarse[1:]:
+                P = P@Pi
+            return P.tocsr()
+        return csr_matrix(coarse)
+
+    def setup(self, A):
+        """
+
+        Notes
+        -----
+        分解局部矩阵. 重复调用时只重新分解发生变化的局部矩阵.
+        """
+        A = A.tocsr()
+        N = A.shape[0]
+        if (self.dofs is None) or (self.arrays.get('r') is None) or \
+                (len(self.arrays['r']) != N):
+            self.close()
+            self.dofs, self.owns = self.subdomain_dofs(A)
+            self.keys = {}
+            self.factors = {}
+            nz = sum(len(idx) for idx in self.dofs)
+            self.share('r', np.zeros(N, dtype=A.dtype))
+            self.share('y', np.zeros(N, dtype=A.dtype))
+            self.share('z', np.zeros(nz, dtype=A.dtype))
+            self.allidx = np.concatenate(self.dofs)
+            self.offsets = np.cumsum([0] + [len(idx) for idx in self.dofs])
+            if self.nworkers > 1:
+                self.start_workers()
+
+        # 只分解变化了的局部矩阵
+        blocks = {}
+        for i, idx in enumerate(self.dofs):
+            Ai = csc_matrix(A[idx][:, idx])
+            key = matrix_key(Ai)
+            if self.keys.get(i) != key:
+                self.keys[i] = key
+                blocks[i] = (idx, self.owns[i], self.offsets[i], Ai)
+        self.nfactor += len(blocks)
+
+        if len(self.workers) == 0:
+            for i, (idx, own, offset, Ai) in blocks.items():
+                self.factors[i] = (idx, own, offset, splu(Ai).solve)
+        else:
+            for w, (conn, process, subdomains) in enumerate(self.workers):
+                b = {i: blocks[i] for i in subdomains if i in blocks}
+                keep = [i for i in subdomains if i not in blocks]
+                conn.send(('setup', (b, keep)))
+            for conn, process, subdomains in self.workers:
+                conn.recv()
+
+        if self.coarse is not None:
+            self.P = self.coarse_space(A)
+            Ac = (self.P.T@A@self.P).tocsc()
+            self.coarse_solve = splu(Ac).solve
+        self.A = A
+        return self
+
+    def share(self, name, array):
+        shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        a = np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)
+        a[:] = array
+        self.shms[name] = shm
+        self.arrays[name] = a
+        return a
+
+    def start_workers(self):
+        if 'fork' not in mp.get_all_start_methods():
+            return
+        ctx = mp.get_context('fork')
+        for w in range(min(self.nworkers, self.nparts)):
+            conn, child = ctx.Pipe()
+            process = ctx.Process(target=schwarz_worker, args=(child, self.arrays),
+                    daemon=True)
+            process.start()
+            child.close()
+            subdomains = list(range(w, self.nparts, self.nworkers))
+            self.workers.append((conn, process, subdomains))
+
+    def close(self):
+        for conn, process, subdomains in self.workers:
+            conn.send(('close', None))
+            process.join()
+            conn.close()
+        self.workers = []
+        self.arrays = {}
+        for shm in self.shms.values():
+            shm.close()
+            shm.unlink()
+        self.shms = {}
+
+    def matvec(self, r):
+        arrays = self.arrays
+        ras = (self.method == 'ras')
+        arrays['r'][:] = r
+        if len(self.workers) == 0:
+            local_solves(self.factors, arrays, ras)
+        else:
+            for conn, process, subdomains in self.workers:
+                conn.send(('solve', ras))
+            for conn, process, subdomains in self.workers:
+                conn.recv()
+
+        if ras:
+            y = arrays['y'].copy()
+        else:
+            y = np.bincount(self.allidx, weights=arrays['z'],
+                    minlength=len(r)).astype(r.dtype)
+        if self.coarse is not None:
+            y += self.P@self.coarse_solve(self.P.T@r)
+        return y
+
+    def aspreconditioner(self):
+        N = self.A.shape[0]
+        return LinearOperator((N, N), matvec=self.matvec, dtype=self.A.dtype)
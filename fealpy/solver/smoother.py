@@ -0,0 +1,324 @@
+"""
+
+Notes
+-----
+多重网格循环中用到的磨光子.
+
+所有的磨光子都有相同的接口:
+
+    smoother = Smoother(A)
+    x = smoother.smooth(x, b, nu=1, lower=True)
+
+`smooth` 从初值 x 出发做 nu 步磨光, 并返回磨光后的 x. `lower` 在对称
+的循环中用来区分前磨光和后磨光 (比如 Gauss-Seidel 的向前和向后扫描).
+
+磨光子可以用 smoothers 中注册的名字给出, 也可以用 (名字, 参数字典) 给出,
+比如 ('mcgs', {'color': c}) 用网格节点的着色 (见 fealpy.mesh.coloring) 做
+多色 Gauss-Seidel.
+"""
+
+import numpy as np
+from scipy.sparse import tril, triu
+from scipy.sparse.linalg import splu
+
+
+class DampedJacobiSmoother():
+    def __init__(self, A, omega=2/3):
+        """
+
+        Notes
+        -----
+        带阻尼的 Jacobi 磨光子, x += omega*D^{-1}(b - A x)
+        """
+        self.A = A
+        self.omega = omega
+        self.Dinv = 1.0/A.diagonal()
+
+    def smooth(self, x, b, nu=1, lower=True):
+        A = self.A
+        Dinv = self.Dinv
+        if len(b.shape) == 2:
+            Dinv = Dinv[:, None]
+        for i in range(nu):
+            x += self.omega*Dinv*(b - A@x)
+        return x
+
+
+class L1JacobiSmoother():
+    def __init__(self, A, omega=1.0):
+        """
+
+        Notes
+        -----
+        l1-Jacobi 磨光子, x += omega*D_1^{-1}(b - A x), 其中
+
+            (D_1)_{ii} = a_{ii} + \sum_{j != i} |a_{ij}|
+
+        对于对称正定矩阵, 不需要阻尼 (omega = 1) 和谱的估计就是收敛的.
+        """
+        self.A = A
+        self.omega = omega
+        self.Dinv = 1.0/l1_diagonal(A)
+
+    def smooth(self, x, b, nu=1, lower=True):
+        A = self.A
+        Dinv = self.Dinv
+        if len(b.shape) == 2:
+            Dinv = Dinv[:, None]
+        for i in range(nu):
+            x += self.omega*Dinv*(b - A@x)
+        return x
+
+
+def l1_diagonal(A):
+    """
+
+    Notes
+    -----
+    返回 a_{ii} + \sum_{j != i} |a_{ij}|.
+    """
+    A = A.tocsr()
+    d = A.diagonal()
+    s = np.asarray(abs(A).sum(axis=1)).reshape(-1)
+    return d + s - np.abs(d)
+
+
+class GaussSeidelSweepSmoother():
+    def __init__(self, A):
+        """
+
+        Notes
+        -----
+        Gauss-Seidel 磨光子, 前磨光时向前扫描, 后磨光时向后扫描, 以保证
+        V 循环是对称的.
+
+        三角矩阵用自然顺序且不选主元的 LU 分解, 分解没有填充, 回代在
+        SuperLU 中完成, 比 spsolve_triangular 快得多.
+        """
+        self.A = A
+        self.U = triu(A, k=1).tocsr()
+        self.L1 = tril(A, k=-1).tocsr()
+        self.Lsolve = triangular_solver(tril(A))
+        self.Usolve = triangular_solver(triu(A))
+
+    def smooth(self, x, b, nu=1, lower=True):
+        if lower:
+            for i in range(nu):
+                x[:] = self.Lsolve(b - self.U@x)
+        else:
+            for i in range(nu):
+                x[:] = self.Usolve(b - self.L1@x)
+        return x
+
+
+def triangular_solver(T):
+    """
+
+    Notes
+    -----
+    返回三角矩阵 T 的求解函数.
+    """
+    lu = splu(T.tocsc(), permc_spec='NATURAL', diag_pivot_thresh=0.0,
+            options={'SymmetricMode': True})
+    return lu.solve
+
+
+class ChebyshevSmoother():
+    def __init__(self, A, degree=3, ratio=1/30, lmax=None):
+        """
+
+        Parameters
+        ----------
+        A : 对称正定矩阵
+        degree : Chebyshev 多项式的次数
+        ratio : 磨光的区间为 [ratio*lmax, lmax]
+        lmax : D^{-1}A 的最大特征值的上界, 默认用幂法估计
+
+        Notes
+        -----
+        Jacobi 预条件的 Chebyshev 多项式磨光子, 只用到矩阵向量乘积, 完全向量
+        化.
+
+        谱的上界只在构造时估计一次. 矩阵的数值有小的变化 (比如时间步进中)
+        时, 可以把旧磨光子的 lmax 传进来, 省去幂法迭代.
+        """
+        self.A = A
+        self.degree = degree
+        self.Dinv = 1.0/A.diagonal()
+        if lmax is None:
+            lmax = spectral_radius(A, self.Dinv)
+        self.lmax = lmax
+        self.lmin = ratio*lmax
+
+    def smooth(self, x, b, nu=1, lower=True):
+        A = self.A
+        Dinv = self.Dinv
+        if len(b.shape) == 2:
+            Dinv = Dinv[:, None]
+        theta = (self.lmax + self.lmin)/2
+        delta = (self.lmax - self.lmin)/2
+        sigma = theta/delta
+        for i in range(nu):
+            r = Dinv*(b - A@x)
+            d = r/theta
+            rho = 1/sigma
+            for k in range(self.degree):
+                x += d
+                if k == self.degree - 1:
+                    break
+                r -= Dinv*(A@d)
+                rho1 = 1/(2*sigma - rho)
+                d *= rho1*rho
+                d += 2*rho1/delta*r
+                rho = rho1
+        return x
+
+
+class MultiColorGaussSeidelSmoother():
+    def __init__(self, A, color=None, seed=None):
+        """
+
+        Parameters
+        ----------
+        A : 矩阵
+        color : 每个自由度的颜色, 同一种颜色的自由度之间在 A 中没有耦合, 默认
+            用 color_graph 对 A 的图进行着色. 颜色可以用任意整数编号, 比如
+            fealpy.mesh.coloring 中从 1 开始编号的网格节点着色 (对线性元
+            的矩阵是合法的着色)
+
+        Notes
+        -----
+        多色 Gauss-Seidel 磨光子. 同一种颜色的自由度可以同时更新, 每种颜色的
+        更新是一次向量化的带掩码的运算.
+        """
+        self.A = A.tocsr()
+        if color is None:
+            color = color_graph(self.A, seed=seed)
+        else:
+            _, color = np.unique(color, return_inverse=True)
+            if not is_valid_coloring(self.A, color):
+                raise ValueError('the coloring is not valid for the matrix!')
+        self.color = color
+        d = self.A.diagonal()
+        NC = color.max() + 1
+        self.index = [np.nonzero(color == c)[0] for c in range(NC)]
+        self.Ac = [self.A[idx] for idx in self.index]
+        self.Dinv = [1.0/d[idx] for idx in self.index]
+
+    def number_of_colors(self):
+        return len(self.index)
+
+    def sweep(self, x, b, order):
+        for c in order:
+            idx = self.index[c]
+            Dinv = self.Dinv[c]
+            if len(b.shape) == 2:
+                Dinv = Dinv[:, None]
+            x[idx] += Dinv*(b[idx] - self.Ac[c]@x)
+        return x
+
+    def smooth(self, x, b, nu=1, lower=True):
+        NC = len(self.index)
+        order = range(NC) if lower else range(NC-1, -1, -1)
+        for i in range(nu):
+            x = self.sweep(x, b, order)
+        return x
+
+
+def spectral_radius(A, Dinv=None, maxit=15, seed=0):
+    """
+
+    Notes
+    -----
+    用幂法估计 D^{-1}A 的谱半径, 并乘以 1.1 做为上界.
+    """
+    N = A.shape[0]
+    if Dinv is None:
+        Dinv = 1.0/A.diagonal()
+    x = np.random.default_rng(seed).random(N)
+    lam = 0.0
+    for i in range(maxit):
+        y = Dinv*(A@x)
+        lam = np.linalg.norm(y)/np.linalg.norm(x)
+        x = y/np.linalg.norm(y)
+    return 1.1*lam
+
+
+def color_graph(A, seed=None):
+    """
+
+    Notes
+    -----
+    对矩阵 A 的图进行着色, 有非零元 a_{ij} 的两个点 i, j 颜色不同. 每一轮在
+    未着色的点中取随机权重局部最大的点做为一种新的颜色, 是向量化的运算.
+
+    颜色从 0 开始编号.
+    """
+    A = A.tocoo()
+    N = A.shape[0]
+    flag = A.row != A.col
+    i = np.r_[A.row[flag], A.col[flag]]
+    j = np.r_[A.col[flag], A.row[flag]]
+    idx = np.argsort(i, kind='stable')
+    i = i[idx]
+    j = j[idx]
+
+    w = np.random.default_rng(seed).random(N)
+    color = np.full(N, -1, dtype=np.int_)
+    c = 0
+    isU = np.ones(N, dtype=np.bool_)
+    while np.any(isU):
+        # 只保留两个端点都没有着色的边, 边的数目逐轮减少
+        flag = isU[i] & isU[j]
+        i = i[flag]
+        j = j[flag]
+        wmax = np.full(N, -np.inf)
+        if len(i) > 0:
+            start, = np.nonzero(np.r_[True, i[1:] != i[:-1]])
+            wmax[i[start]] = np.maximum.reduceat(w[j], start)
+        isNew = isU & (w > wmax)
+        color[isNew] = c
+        c += 1
+        isU = (color == -1)
+    return color
+
+
+def is_valid_coloring(A, color):
+    """
+
+    Notes
+    -----
+    检查 A 中非零的非对角元连接的两个点的颜色都不相同.
+    """
+    A = A.tocoo()
+    flag = (A.row != A.col) & (A.data != 0)
+    return not np.any(color[A.row[flag]] == color[A.col[flag]])
+
+
+def get_smoother(smoother, A):
+    """
+
+    Notes
+    -----
+    根据名字, (名字, 参数字典) 或者类生成磨光子对象.
+    """
+    if smoother is None:
+        smoother = 'jacobi'
+    kwargs = {}
+    if isinstance(smoother, tuple):
+        smoother, kwargs = smoother
+    if isinstance(smoother, str):
+        if smoother not in smoothers:
+            raise ValueError("We don't support smoother `{}`! ".format(smoother))
+        return smoothers[smoother](A, **kwargs)
+    else:
+        return smoother(A, **kwargs)
+
+
+smoothers = {
+        'jacobi': DampedJacobiSmoother,
+        'l1jacobi': L1JacobiSmoother,
+        'gs': GaussSeidelSweepSmoother,
+        'chebyshev': ChebyshevSmoother,
+        'mcgs': MultiColorGaussSeidelSmoother,
+        }
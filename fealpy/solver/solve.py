@@ -8,6 +8,8 @@ from scipy.sparse import spdiags
 from timeit import default_timer as timer
 import pyamg
 
+from .linear_solver import linear_solve
+
 def solve1(a, L, uh, dirichlet=None, neuman=None, solver='cg'):
     space = a.space
 
@@ -51,7 +53,15 @@ def solve1(a, L, uh, dirichlet=None, neuman=None, solver='cg'):
 
     return A 
 
-def solve(dmodel, uh, dirichlet=None, solver='direct'):
+def solve(dmodel, uh, dirichlet=None, solver='direct', telemetry=None):
+    """
+
+    Notes
+    -----
+    solver 为 'cg', 'amg' 和 'direct' 以外的名字时从 linear_solver.py 的注
+    册表中选择解法器, 比如 'auto'. 这时可以给出 SolverTelemetry 对象
+    telemetry, 求解的方法, 迭代次数和残量都记录在其中.
+    """
     space = uh.space
     start = timer()
     A = dmodel.get_left_matrix()
@@ -82,8 +92,10 @@ def solve(dmodel, uh, dirichlet=None, solver='direct'):
         start = timer()
         uh[:] = spsolve(AD, b)
         end = timer()
-    else:
-        raise ValueError("We don't support solver `{}`! ".format(solver))
+    else: # 其它的解法器从 linear_solver.py 的注册表中选择, 比如 'auto'
+        start = timer()
+        uh[:], _ = linear_solve(AD, b, method=solver, telemetry=telemetry)
+        end = timer()
 
     print("Solve time:", end-start)
 
@@ -0,0 +1,346 @@
+"""
+
+Notes
+-----
+迭代解法器的运行记录.
+
+SolverTelemetry 对象可以挂到 solver 中的任何一个解法器上, 每次求解生成一条
+记录, 包括:
+
+    solver : 解法器的名字
+    size, nnz : 矩阵的规模和非零元个数
+    status : 'converged', 'maxit', 'breakdown', 'error' 或者 'unknown'
+    niter : 迭代步数
+    residuals : 每步的相对残量
+    iterations : 每步的用时, 以及其中算子作用, 预条件子, 磨光子和残量监控各
+        自的用时
+    time : 整个求解中各部分的用时, wall 是墙上时间
+
+各部分的用时是互斥的: 预条件子的时间不包括其中磨光子的时间, 剩下的
+wall - operator - preconditioner - smoother - monitor 是 Krylov 方法本身的
+向量运算的时间.
+
+记录可以按解法器汇总 (summary), 也可以导出为 json 或者 csv, 用于在日志中跟
+踪解法器的性能, 而不用在屏幕上打印.
+
+Examples
+--------
+telemetry = SolverTelemetry()
+solver = AMGSolver()
+solver.setup(A)
+solver.attach(telemetry)
+x = solver.solve(b, accel='cg')
+print(telemetry)
+telemetry.to_json('solver.json')
+"""
+
+import json
+from contextlib import contextmanager
+from timeit import default_timer as timer
+
+import numpy as np
+from numpy.linalg import norm
+from scipy.sparse.linalg import LinearOperator, aslinearoperator
+
+from ..common.jsontools import to_builtin
+
+
+class SolverTelemetry():
+    categories = ('operator', 'preconditioner', 'smoother', 'monitor')
+
+    def __init__(self, disp=False, history=True):
+        """
+
+        Parameters
+        ----------
+        disp : 是否在每步迭代时打印残量
+        history : 是否保存每步迭代的残量和用时, 只需要汇总信息时可以设为
+            False
+        """
+        self.disp = disp
+        self.history = history
+        self.records = []
+        self.active = [] # 正在进行的求解, 可以嵌套
+        self.timers = [] # [类别, 开始时间, 子计时的时间]
+
+    def __len__(self):
+        return len(self.records)
+
+    def __str__(self):
+        s = '{}:\n'.format(self.__class__.__name__)
+        s += '  {:>16s} {:>6s} {:>6s} {:>8s} {:>10s} {:>10s} {:>10s} {:>10s}\n'.format(
+                'solver', 'calls', 'fails', 'iters', 'wall', 'operator',
+                'precond', 'smoother')
+        for name, v in self.summary().items():
+            s += '  {:>16s} {:6d} {:6d} {:8d} {:10.4f} {:10.4f} {:10.4f} {:10.4f}\n'.format(
+                    name, v['ncalls'], v['nfailed'], v['niter'],
+                    v['time']['wall'], v['time']['operator'],
+                    v['time']['preconditioner'], v['time']['smoother'])
+        return s
+
+    def clear(self):
+        self.records = []
+
+    @property
+    def current(self):
+        return self.active[-1] if len(self.active) > 0 else None
+
+    def start(self, solver, A=None, **meta):
+        """
+
+        Notes
+        -----
+        开始一条新的记录, meta 中的信息 (比如 tol) 原样保存.
+        """
+        rec = {
+                'solver': solver,
+                'size': None if A is None else int(A.shape[0]),
+                'nnz': getattr(A, 'nnz', None),
+                'status': 'unknown',
+                'converged': None,
+                'info': None,
+                'niter': 0,
+                'residual': None,
+                'residuals': [],
+                'iterations': [],
+                'time': dict.fromkeys(self.categories + ('wall',), 0.0),
+                }
+        if (rec['nnz'] is not None):
+            rec['nnz'] = int(rec['nnz'])
+        rec.update(meta)
+        rec['_start'] = timer()
+        rec['_last'] = (rec['_start'], dict(rec['time']))
+        self.active.append(rec)
+        return rec
+
+    def finish(self, info=None, converged=None, residual=None):
+        """
+
+        Parameters
+        ----------
+        info : scipy 迭代法返回的 info, 0 表示收敛, 大于 0 表示达到最大迭代步
+            数, 小于 0 表示中断
+        converged : 直接给出是否收敛, 比如直接法
+        residual : 最终的相对残量, 默认取最后一步的残量
+        """
+        rec = self.current
+        if info is not None:
+            rec['info'] = int(info)
+            if converged is None:
+                converged = (info == 0)
+        if converged is not None:
+            rec['converged'] = bool(converged)
+            if converged:
+                rec['status'] = 'converged'
+            elif (info is not None) and (info < 0):
+                rec['status'] = 'breakdown'
+            else:
+                rec['status'] = 'maxit'
+        if residual is not None:
+            rec['residual'] = float(residual)
+
+    def stop(self, error=False):
+        rec = self.active.pop()
+        rec['time']['wall'] = timer() - rec.pop('_start')
+        rec.pop('_last')
+        if error:
+            rec['status'] = 'error'
+        if (rec['residual'] is None) and (len(rec['residuals']) > 0):
+            rec['residual'] = rec['residuals'][-1]
+        if not self.history:
+            rec['residuals'] = []
+            rec['iterations'] = []
+        self.records.append(rec)
+        return rec
+
+    @contextmanager
+    def record(self, solver, A=None, **meta):
+        """
+
+        Notes
+        -----
+        在 with 语句中记录一次求解, 出现异常时状态为 'error'.
+        """
+        rec = self.start(solver, A=A, **meta)
+        try:
+            yield rec
+        except BaseException:
+            self.stop(error=True)
+            raise
+        self.stop()
+
+    def enter(self, category):
+        self.timers.append([category, timer(), 0.0])
+
+    def exit(self):
+        category, t0, child = self.timers.pop()
+        dt = timer() - t0
+        if len(self.timers) > 0:
+            self.timers[-1][2] += dt
+        rec = self.current
+        if rec is not None:
+            rec['time'][category] += dt - child
+
+    @contextmanager
+    def timed(self, category):
+        self.enter(category)
+        try:
+            yield
+        finally:
+            self.exit()
+
+    def iteration(self, residual=None):
+        """
+
+        Notes
+        -----
+        记录一步迭代, 以及从上一步到这一步各部分的用时.
+        """
+        rec = self.current
+        if rec is None:
+            return
+        rec['niter'] += 1
+        if residual is not None:
+            residual = float(residual)
+            rec['residuals'].append(residual)
+        now = timer()
+        last, times = rec['_last']
+        if self.history:
+            it = {k: rec['time'][k] - times[k] for k in self.categories}
+            it['time'] = now - last
+            rec['iterations'].append(it)
+        rec['_last'] = (now, dict(rec['time']))
+        if self.disp:
+            print('{} iter {:4d}  residual {}'.format(
+                rec['solver'], rec['niter'], residual))
+
+    def callback(self, A=None, b=None):
+        """
+
+        Notes
+        -----
+        返回可以传给 cg, gmres 等的回调函数. 回调的参数是残量的范数时直接记
+        录; 是当前的解时, 给出 A 和 b 就计算相对残量 |b - Ax|/|b|, 这部分时间
+        记在 monitor 中.
+        """
+        nb = None
+        if b is not None:
+            nb = norm(b)
+            if nb == 0.0:
+                nb = 1.0
+        def callback(xk):
+            if np.ndim(xk) == 0:
+                self.iteration(xk)
+            elif A is not None:
+                with self.timed('monitor'):
+                    r = norm(b - A@xk)/nb
+                self.iteration(r)
+            else:
+                self.iteration()
+        return callback
+
+    def wrap(self, A, category):
+        """
+
+        Notes
+        -----
+        返回一个 LinearOperator, 作用时的时间记在 category 中.
+        """
+        A = aslinearoperator(A)
+        def matvec(x):
+            with self.timed(category):
+                return A.matvec(x)
+        def matmat(X):
+            with self.timed(category):
+                return A.matmat(X)
+        def rmatvec(x):
+            with self.timed(category):
+                return A.rmatvec(x)
+        return LinearOperator(A.shape, matvec=matvec, matmat=matmat,
+                rmatvec=rmatvec, dtype=A.dtype)
+
+    def operator(self, A):
+        return self.wrap(A, 'operator')
+
+    def preconditioner(self, M):
+        return self.wrap(M, 'preconditioner')
+
+    def smoother(self, smoother):
+        return TimedSmoother(smoother, self)
+
+    def summary(self):
+        """
+
+        Notes
+        -----
+        按解法器的名字汇总所有的记录, 'total' 是全部记录的汇总.
+        """
+        groups = {}
+        for rec in self.records:
+            groups.setdefault(rec['solver'], []).append(rec)
+        if len(self.records) > 0:
+            groups['total'] = self.records
+        s = {}
+        for name, recs in groups.items():
+            niter = [r['niter'] for r in recs]
+            s[name] = {
+                    'ncalls': len(recs),
+                    'nfailed': sum(r['status'] != 'converged' for r in recs),
+                    'niter': int(sum(niter)),
+                    'mean_niter': float(np.mean(niter)),
+                    'max_niter': int(max(niter)),
+                    'max_size': max((r['size'] or 0) for r in recs),
+                    'time': {k: float(sum(r['time'][k] for r in recs))
+                        for k in self.categories + ('wall',)},
+                    }
+        return s
+
+    def to_dict(self):
+        return {'records': self.records, 'summary': self.summary()}
+
+    def to_json(self, fname=None, indent=None):
+        """
+
+        Notes
+        -----
+        导出为 json 字符串, 给出 fname 时同时写入文件.
+        """
+        s = json.dumps(self.to_dict(), indent=indent, default=to_builtin)
+        if fname is not None:
+            with open(fname, 'w') as f:
+                f.write(s)
+        return s
+
+    def to_csv(self, fname):
+        """
+
+        Notes
+        -----
+        每条记录写成一行, 不包括迭代的历史.
+        """
+        keys = ['solver', 'status', 'size', 'nnz', 'niter', 'residual']
+        keys += ['time_' + k for k in self.categories + ('wall',)]
+        with open(fname, 'w') as f:
+            f.write(','.join(keys) + '\n')
+            for rec in self.records:
+                row = [rec['solver'], rec['status'], rec['size'], rec['nnz'],
+                        rec['niter'], rec['residual']]
+                row += [rec['time'][k] for k in self.categories + ('wall',)]
+                f.write(','.join('' if v is None else str(v) for v in row) + '\n')
+
+
+class TimedSmoother():
+    """
+    记录磨光时间的磨光子代理.
+    """
+    def __init__(self, smoother, telemetry):
+        self.smoother = smoother
+        self.telemetry = telemetry
+
+    def __getattr__(self, name):
+        return getattr(self.smoother, name)
+
+    def smooth(self, *args, **kwargs):
+        with self.telemetry.timed('smoother'):
+            return self.smoother.smooth(*args, **kwargs)
+
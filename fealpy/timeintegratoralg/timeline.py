@@ -28,6 +28,23 @@ class UniformTimeLine():
         self.T1 = self.T1 + n*self.dt
         self.NL += n
 
+    def checkpoint_state(self):
+        """
+
+        Notes
+        -----
+        返回恢复时间层所需的最少的状态, 见 fealpy.writer.Checkpointer
+        """
+        return {'T0': self.T0, 'T1': self.T1, 'NL': self.NL, 'dt': self.dt,
+                'current': self.current}
+
+    def restore_state(self, state):
+        self.T0 = state['T0']
+        self.T1 = state['T1']
+        self.NL = state['NL']
+        self.dt = state['dt']
+        self.current = state['current']
+
     def uniform_refine(self, n=1):
         for i in range(n):
             self.NL = 2*(self.NL - 1) + 1
@@ -125,14 +125,15 @@ class PoissonCVEMModel():
             else:
                 raise ValueError("I have note code method: {}!".format(rtype))
 
+            B = self.space.B.toarray()
             for i in range(ldof):
                 S0[i::ldof] = np.bincount(
                         idx,
-                        weights=self.space.B[i, :]*ruh[cell, 0],
+                        weights=B[i, :]*ruh[cell, 0],
                         minlength=NC)
                 S1[i::ldof] = np.bincount(
                         idx,
-                        weights=self.space.B[i, :]*ruh[cell, 1],
+                        weights=B[i, :]*ruh[cell, 1],
                         minlength=NC)
 
         try:
@@ -217,7 +218,7 @@ class PoissonCVEMModel():
 
         cell2dof, cell2dofLocation = space.dof.cell2dof, space.dof.cell2dofLocation
         uh = self.uh[cell2dof]
-        DD = np.vsplit(D, cell2dofLocation[1:-1])
+        DD = D # 每个单元上的 D 矩阵, 见 CellBuckets
         uh = np.hsplit(uh, cell2dofLocation[1:-1])
 
         def f0(x):
@@ -84,7 +84,7 @@ class PoissonNCVEMModel():
 
         cell2dof, cell2dofLocation = space.dof.cell2dof, space.dof.cell2dofLocation
         uh = self.uh[cell2dof]
-        DD = np.vsplit(D, cell2dofLocation[1:-1])
+        DD = D # 每个单元上的 D 矩阵, 见 CellBuckets
         uh = np.hsplit(uh, cell2dofLocation[1:-1])
 
         def f0(x):
@@ -0,0 +1,339 @@
+import time
+import queue
+import traceback
+import multiprocessing as mp
+from multiprocessing import shared_memory, resource_tracker
+
+import numpy as np
+
+from .vtkxml import write_vtu
+
+
+def async_writer_worker(geometry, compress, inq, outq):
+    """
+
+    Notes
+    -----
+    写文件的进程. 收到一个时间层的消息后, 先把其中变化了的数据从共享内存复
+    制出来并通知主进程 ('copied'), 共享内存可以马上被重用, 然后再写文件.
+    """
+    node, cell, cellType, NC = geometry
+    shms = {}
+    rings = {}
+    data = {'nodedata': {}, 'celldata': {}}
+    while True:
+        msg = inq.get() # 阻塞等待, 不占用 CPU
+        if msg is None:
+            break
+        if msg[0] == 'flush':
+            outq.put(('flushed', msg[1]))
+            continue
+        _, mid, fname, items, new = msg
+        try:
+            for key, (name, shape, dtype) in new.items():
+                shm = shared_memory.SharedMemory(name=name)
+                shms[key] = shm
+                rings[key] = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+            for (kind, name), slot in items.items():
+                data[kind][name] = rings[(kind, name)][slot].copy()
+        except Exception:
+            outq.put(('copied', mid))
+            outq.put(('error', traceback.format_exc()))
+            continue
+        outq.put(('copied', mid))
+        try:
+            write_vtu(fname, node, cell, cellType, NC, nodedata=data['nodedata'],
+                    celldata=data['celldata'], compress=compress)
+        except Exception:
+            outq.put(('error', traceback.format_exc()))
+    rings.clear()
+    for shm in shms.values():
+        shm.close()
+
+
+class AsyncMeshWriter:
+    """
+
+    Notes
+    -----
+    异步输出: 写文件在一个后台进程中进行, 模拟程序只需要把数据复制到共享内
+    存中就可以继续计算.
+
+    网格的几何 (节点和单元) 在创建时只传一次, 之后每个时间层只传数据. 每个
+    数据在共享内存中有 maxsize + 2 个槽, 轮流使用; 与上一次传出的值相同的数
+    据不再复制, 后台进程沿用上一次的值. 'drop-oldest' 时如果还有排队的时间
+    层, 没有变化的数据仍然不复制, 但会引用它所在的槽传出, 因为排队的时间层
+    可能被丢掉.
+
+    等待写出的时间层个数超过 maxsize 时的处理方式 (policy):
+
+        'block'       : 等待后台进程
+        'drop-oldest' : 丢掉最早的一个还没有写出的时间层
+        'coalesce'    : 不等待, 在本地只保留最新的一个时间层, 有空位时再传出
+
+    后台进程中的异常会在下一次调用 write, flush 或者 close 时以 RuntimeError
+    的形式抛出.
+
+    Examples
+    --------
+    with AsyncMeshWriter(mesh, maxsize=2) as writer:
+        simulator.run(ctx=ctx, writer=writer)
+    print(writer)
+    """
+    def __init__(self, mesh, maxsize=2, policy='block', compress=False,
+            check=True):
+        """
+
+        Parameters
+        ----------
+        mesh : 网格, 几何在整个模拟过程中不变
+        maxsize : 等待写出的时间层的最大个数
+        policy : 'block', 'drop-oldest' 或者 'coalesce'
+        compress : 是否用 zlib 压缩
+        check : 是否检查数据有没有变化, 没有变化的数据不再传输
+        """
+        if policy not in {'block', 'drop-oldest', 'coalesce'}:
+            raise ValueError("We don't support policy `{}`! ".format(policy))
+        self.maxsize = maxsize
+        self.policy = policy
+        self.check = check
+        self.nslots = maxsize + 2
+
+        self.shms = {} # (kind, name) -> 共享内存
+        self.rings = {} # (kind, name) -> (nslots, ...) 的数组
+        self.latest = {} # (kind, name) -> 最近一次写入的槽
+        self.owner = {} # (kind, name) -> 每个槽最后被哪个时间层使用
+        self.outstanding = {} # 还没有被后台进程复制的时间层 mid -> items
+        self.dirty = set() # 被丢掉的时间层中需要重新传出的数据
+        self.new = {} # 还没有通知后台进程的共享内存
+        self.pending = None # 'coalesce' 时在本地等待的时间层
+        self.mid = 0
+        self.flushed = -1
+        self.error = None
+
+        self.nwrite = 0 # 调用 write 的次数
+        self.ndrop = 0 # 没有写出的时间层个数
+        self.nbytes = 0 # 复制到共享内存的字节数
+        self.time = 0.0 # 模拟程序在 write 中花的时间
+
+        # 先启动 resource_tracker, 后台进程与主进程共用, 否则后台进程退出时
+        # 它自己的 resource_tracker 会把共享内存当作泄漏的资源删掉
+        resource_tracker.ensure_running()
+        ctx = mp.get_context()
+        self.inq = ctx.Queue()
+        self.outq = ctx.Queue()
+        self.process = ctx.Process(target=async_writer_worker,
+                args=(mesh.to_vtk(), compress, self.inq, self.outq), daemon=True)
+        self.process.start()
+
+    def __str__(self):
+        s = '{}:\n'.format(self.__class__.__name__)
+        s += '  policy: {}, maxsize: {}\n'.format(self.policy, self.maxsize)
+        s += '  number of snapshots: {}, dropped: {}\n'.format(self.nwrite, self.ndrop)
+        s += '  copied to shared memory (MB): {:.3f}\n'.format(self.nbytes/2**20)
+        s += '  time spent in write (s): {:.6f}\n'.format(self.time)
+        return s
+
+    def __call__(self, fname, mesh):
+        return self.write(fname, nodedata=mesh.nodedata, celldata=mesh.celldata)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __del__(self):
+        if hasattr(self, 'process'):
+            try:
+                self.close()
+            except RuntimeError:
+                pass
+
+    def handle(self, msg):
+        if msg[0] == 'copied':
+            self.outstanding.pop(msg[1], None)
+        elif msg[0] == 'flushed':
+            self.flushed = msg[1]
+        elif msg[0] == 'error':
+            self.error = msg[1]
+
+    def poll(self):
+        while True:
+            try:
+                self.handle(self.outq.get_nowait())
+            except queue.Empty:
+                break
+        self.raise_error()
+
+    def wait(self):
+        """
+
+        Notes
+        -----
+        阻塞等待后台进程的一个消息.
+        """
+        while True:
+            try:
+                self.handle(self.outq.get(timeout=1))
+                break
+            except queue.Empty:
+                if not self.process.is_alive():
+                    raise RuntimeError('the writer process died unexpectedly!')
+        self.raise_error()
+
+    def raise_error(self):
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise RuntimeError('the writer process failed:\n' + error)
+
+    def number_of_queued(self):
+        n = len(self.outstanding)
+        if self.pending is not None:
+            n -= 1
+        return n
+
+    def free_slot(self, key):
+        owner = self.owner[key]
+        while True:
+            for slot in range(self.nslots):
+                if (slot != self.latest.get(key)) and \
+                        (owner[slot] not in self.outstanding):
+                    return slot
+            self.wait()
+
+    def allocate(self, key, val):
+        shape = (self.nslots, ) + val.shape
+        nbytes = max(int(np.prod(shape))*val.dtype.itemsize, 1)
+        shm = shared_memory.SharedMemory(create=True, size=nbytes)
+        self.shms[key] = shm
+        self.rings[key] = np.ndarray(shape, dtype=val.dtype, buffer=shm.buf)
+        self.owner[key] = np.full(self.nslots, -1, dtype=np.int_)
+        self.new[key] = (shm.name, shape, val.dtype)
+
+    def drop_oldest(self):
+        try:
+            msg = self.inq.get_nowait()
+        except queue.Empty: # 后台进程正在复制
+            self.wait()
+            return
+        _, mid, fname, items, new = msg
+        self.outstanding.pop(mid, None)
+        self.new.update(new)
+        for key, slot in items.items():
+            if (self.latest[key] == slot) and (self.owner[key][slot] == mid):
+                self.dirty.add(key)
+        self.ndrop += 1
+
+    def changed(self, key, val):
+        old = self.rings[key][self.latest[key]]
+        # 先比较少量抽样的值, 变化了的数据通常在这里就能发现
+        stride = max(val.shape[0]//64, 1)
+        if not np.array_equal(old[::stride], val[::stride]):
+            return True
+        return not np.array_equal(old, val)
+
+    def write(self, fname, nodedata=None, celldata=None):
+        """
+
+        Parameters
+        ----------
+        fname : 文件名
+        nodedata, celldata : 名字到数组的字典
+        """
+        start = time.perf_counter()
+        self.poll()
+        self.nwrite += 1
+        if self.policy == 'block':
+            while self.number_of_queued() >= self.maxsize:
+                self.wait()
+        elif self.policy == 'drop-oldest':
+            while self.number_of_queued() >= self.maxsize:
+                self.drop_oldest()
+
+        mid = self.mid
+        self.mid += 1
+        items = {}
+        for kind, data in (('nodedata', nodedata), ('celldata', celldata)):
+            for name, val in (data or {}).items():
+                if val is None:
+                    continue
+                key = (kind, name)
+                val = np.asarray(val)
+                if key not in self.rings:
+                    self.allocate(key, val)
+                elif self.rings[key].shape[1:] != val.shape:
+                    raise ValueError('the shape of `{}` has changed!'.format(name))
+                elif self.check and (key in self.latest) and \
+                        (key not in self.dirty) and not self.changed(key, val):
+                    continue
+                slot = self.free_slot(key)
+                self.rings[key][slot] = val
+                self.latest[key] = slot
+                items[key] = slot
+                self.nbytes += val.nbytes
+        for key in self.dirty:
+            items.setdefault(key, self.latest[key])
+        self.dirty.clear()
+        if (self.policy == 'drop-oldest') and (self.number_of_queued() > 0):
+            # 排队中的时间层可能被丢掉, 这时后台进程收不到它们传出的数据,
+            # 所以不能省略没有变化的数据, 直接引用它们所在的槽 (不复制)
+            for key, slot in self.latest.items():
+                items.setdefault(key, slot)
+
+        if self.pending is not None: # 合并到本地等待的时间层中
+            pmid, pitems, _ = self.pending
+            self.outstanding.pop(pmid)
+            for key, slot in pitems.items():
+                items.setdefault(key, slot)
+            self.pending = None
+            self.ndrop += 1
+        for key, slot in items.items():
+            self.owner[key][slot] = mid
+        self.outstanding[mid] = items
+
+        if (self.policy == 'coalesce') and \
+                (self.number_of_queued() > self.maxsize):
+            self.pending = (mid, items, fname)
+        else:
+            self.inq.put(('write', mid, fname, items, self.new))
+            self.new = {}
+        self.time += time.perf_counter() - start
+
+    def flush(self):
+        """
+
+        Notes
+        -----
+        等待所有的时间层都写到文件中.
+        """
+        if self.pending is not None:
+            while self.number_of_queued() >= self.maxsize:
+                self.wait()
+            mid, items, fname = self.pending
+            self.pending = None
+            self.inq.put(('write', mid, fname, items, self.new))
+            self.new = {}
+        token = self.mid
+        self.mid += 1
+        self.inq.put(('flush', token))
+        while self.flushed != token:
+            self.wait()
+        self.poll()
+
+    def close(self):
+        error = None
+        if self.process.is_alive():
+            try:
+                self.flush()
+            except RuntimeError as e:
+                error = e
+            self.inq.put(None)
+            self.process.join()
+        self.rings = {}
+        for shm in self.shms.values():
+            shm.close()
+            shm.unlink()
+        self.shms = {}
+        if error is not None:
+            raise error
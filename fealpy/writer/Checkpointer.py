@@ -0,0 +1,164 @@
+import os
+import re
+import copy
+import glob
+import pickle
+import threading
+import traceback
+
+
+class Checkpointer:
+    """
+
+    Notes
+    -----
+    长时间模拟的检查点. 每 interval 步保存一次模拟程序的状态 (名字到数组或
+    者其它可以 pickle 的对象的字典), 只保留最新的 keep 个检查点.
+
+    保存是原子的: 先写到临时文件, fsync 之后再用 os.replace 换成正式的文件
+    名, 所以节点故障时最多丢掉正在写的那一个, 之前的检查点总是完整的.
+
+    asynchronous 为真时, save 只在调用的线程中复制一份状态, 序列化和写文件
+    在后台线程中进行, 不阻塞时间步. 同一时刻最多只有一个检查点在写, 上一个
+    还没有写完时 save 会等待. 后台线程中的异常在下一次调用 save, flush 或者
+    close 时以 RuntimeError 的形式抛出.
+
+    Examples
+    --------
+    ckpt = Checkpointer('output/run', interval=24)
+    simulator.run(ctx=ctx, writer=writer, checkpointer=ckpt)
+
+    # 节点故障之后, 用同样的参数重新创建模拟程序, 从最新的检查点继续
+    simulator.run(ctx=ctx, writer=writer, checkpointer=ckpt, restart=True)
+    """
+    def __init__(self, prefix, interval=1, keep=2, asynchronous=True):
+        """
+
+        Parameters
+        ----------
+        prefix : 检查点文件的前缀, 文件名为 prefix_<step>.ckpt
+        interval : 每隔多少步保存一次
+        keep : 保留的检查点个数
+        asynchronous : 是否在后台线程中写文件
+        """
+        self.prefix = prefix
+        self.interval = interval
+        self.keep = keep
+        self.asynchronous = asynchronous
+
+        self.thread = None
+        self.error = None
+        self.nsave = 0
+
+        path = os.path.dirname(prefix)
+        if path != '':
+            os.makedirs(path, exist_ok=True)
+
+    def __call__(self, step, state):
+        """
+
+        Notes
+        -----
+        step 是 interval 的倍数时保存检查点. state 可以是返回状态的函数, 这
+        样不需要保存的步就不用生成状态.
+        """
+        if step%self.interval == 0:
+            self.save(step, state() if callable(state) else state)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def fname(self, step):
+        return '{}_{:010d}.ckpt'.format(self.prefix, step)
+
+    def checkpoints(self):
+        """
+
+        Notes
+        -----
+        返回已经完整写出的检查点的 (步数, 文件名), 按步数从小到大排列.
+        """
+        pattern = re.compile(re.escape(os.path.basename(self.prefix)) + r'_(\d{10})\.ckpt$')
+        ckpts = []
+        for fname in glob.glob(self.prefix + '_*.ckpt'):
+            m = pattern.match(os.path.basename(fname))
+            if m is not None:
+                ckpts.append((int(m.group(1)), fname))
+        return sorted(ckpts)
+
+    def latest(self):
+        self.flush()
+        ckpts = self.checkpoints()
+        return ckpts[-1][1] if len(ckpts) > 0 else None
+
+    def save(self, step, state):
+        self.flush()
+        if self.asynchronous:
+            state = copy.deepcopy(state) # 后台线程写文件时状态可能已经改变
+            self.thread = threading.Thread(target=self.run, args=(step, state),
+                    daemon=True)
+            self.thread.start()
+        else:
+            self.write(step, state)
+        self.nsave += 1
+
+    def run(self, step, state):
+        try:
+            self.write(step, state)
+        except Exception:
+            self.error = traceback.format_exc()
+
+    def write(self, step, state):
+        fname = self.fname(step)
+        tmp = fname + '.tmp'
+        try:
+            with open(tmp, 'wb') as f:
+                pickle.dump({'step': step, 'state': state}, f,
+                        protocol=pickle.HIGHEST_PROTOCOL)
+                f.flush()
+                os.fsync(f.fileno())
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        os.replace(tmp, fname)
+
+        # 删掉多余的旧检查点
+        for s, name in self.checkpoints()[:-self.keep]:
+            os.remove(name)
+
+    def flush(self):
+        """
+
+        Notes
+        -----
+        等待正在写的检查点写完.
+        """
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise RuntimeError('writing the checkpoint failed:\n' + error)
+
+    def load(self, fname=None):
+        """
+
+        Notes
+        -----
+        读取检查点 (默认是最新的一个), 返回 (步数, 状态). 没有检查点时返回
+        (None, None).
+        """
+        if fname is None:
+            fname = self.latest()
+            if fname is None:
+                return None, None
+        with open(fname, 'rb') as f:
+            data = pickle.load(f)
+        return data['step'], data['state']
+
+    def close(self):
+        self.flush()
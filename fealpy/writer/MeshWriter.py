@@ -1,19 +1,41 @@
+import os
+
 import numpy as np
-import vtk
-import vtk.util.numpy_support as vnp
+try:
+    import vtk
+    import vtk.util.numpy_support as vnp
+except ImportError:
+    vtk = None
 
 import multiprocessing
 import time
 
+from .vtkxml import write_vtu, write_pvd
+
 class MeshWriter:
     """
 
     Notes
     -----
     用于在数值模拟过程中输出网格和数据到 vtk 文件中
+
+    backend 为 'vtk' 时把网格和数据复制到 vtkUnstructuredGrid 中, 用 vtk
+    模块写文件; 为 'native' 时用 vtkxml 直接从 to_vtk 返回的数组和 nodedata,
+    celldata 写文件, 不需要安装 vtk, 这时 compress 和 encoding 见
+    vtkxml.write_vtu; 为 'auto' 时安装了 vtk 就用 vtk, 否则用 native.
     """
     def __init__(self, mesh, simulation=None, args=None, etype='cell',
-            index=np.s_[:]):
+            index=np.s_[:], backend='auto', compress=False, encoding='raw'):
+
+        if backend == 'auto':
+            backend = 'native' if vtk is None else 'vtk'
+        if backend not in {'native', 'vtk'}:
+            raise ValueError("We don't support the backend `{}`! ".format(backend))
+        if (backend == 'vtk') and (vtk is None):
+            raise ImportError("The backend `vtk` needs the vtk package! ")
+        self.backend = backend
+        self.compress = compress
+        self.encoding = encoding
 
         GD = mesh.geo_dimension()
         TD = mesh.top_dimension()
@@ -22,30 +44,37 @@ class MeshWriter:
 
         node, cell, cellType, NC = mesh.to_vtk(etype=etype, index=index)
 
-        points = vtk.vtkPoints()
-        points.SetData(vnp.numpy_to_vtk(node))
+        if self.backend == 'native':
+            self.mesh = (node, cell, cellType, NC)
+            self.nodedata = {key: val for key, val in mesh.nodedata.items()
+                    if val is not None}
+            self.celldata = {key: val for key, val in mesh.celldata.items()
+                    if val is not None}
+        else:
+            points = vtk.vtkPoints()
+            points.SetData(vnp.numpy_to_vtk(node))
 
-        cells = vtk.vtkCellArray()
-        cells.SetCells(NC, vnp.numpy_to_vtkIdTypeArray(cell))
+            cells = vtk.vtkCellArray()
+            cells.SetCells(NC, vnp.numpy_to_vtkIdTypeArray(cell))
 
-        self.mesh =vtk.vtkUnstructuredGrid() 
-        self.mesh.SetPoints(points)
-        self.mesh.SetCells(cellType, cells)
+            self.mesh =vtk.vtkUnstructuredGrid()
+            self.mesh.SetPoints(points)
+            self.mesh.SetCells(cellType, cells)
 
-        pdata = self.mesh.GetPointData()
+            pdata = self.mesh.GetPointData()
 
-        for key, val in mesh.nodedata.items():
-            if val is not None:
-                d = vnp.numpy_to_vtk(val[:])
-                d.SetName(key)
-                pdata.AddArray(d)
+            for key, val in mesh.nodedata.items():
+                if val is not None:
+                    d = vnp.numpy_to_vtk(val[:])
+                    d.SetName(key)
+                    pdata.AddArray(d)
 
-        cdata = self.mesh.GetCellData()
-        for key, val in mesh.celldata.items():
-            if val is not None:
-                d = vnp.numpy_to_vtk(val[:])
-                d.SetName(key)
-                cdata.AddArray(d)
+            cdata = self.mesh.GetCellData()
+            for key, val in mesh.celldata.items():
+                if val is not None:
+                    d = vnp.numpy_to_vtk(val[:])
+                    d.SetName(key)
+                    cdata.AddArray(d)
 
         self.simulation = simulation
         if self.simulation is not None:
@@ -57,6 +86,12 @@ class MeshWriter:
             self.process = None
 
     def write(self, fname='test.vtu'):
+        if self.backend == 'native':
+            write_vtu(fname, *self.mesh, nodedata=self.nodedata,
+                    celldata=self.celldata, compress=self.compress,
+                    encoding=self.encoding)
+            return
+
         writer = vtk.vtkXMLUnstructuredGridWriter()
         writer.SetFileName(fname)
         writer.SetInputData(self.mesh)
@@ -70,6 +105,9 @@ class MeshWriter:
 
         动态写入时间有关的数据
         """
+        if self.backend == 'native':
+            return self.run_native(fname)
+
         writer = vtk.vtkXMLUnstructuredGridWriter()
         writer.SetFileName(fname)
         writer.SetInputData(self.mesh)
@@ -78,25 +116,59 @@ class MeshWriter:
         pdata = self.mesh.GetPointData()
         i = 0
         while True:
-            if not self.queue.empty():
-                data = self.queue.get()
-                if isinstance(data, dict):
-                    for key, val in data.items():
-                        datatype, data = val
-                        d = vnp.numpy_to_vtk(data)
-                        d.SetName(key)
-                        if datatype == 'celldata':
-                            cdata.AddArray(d)
-                        elif datatype == 'pointdata':
-                            pdata.AddArray(d)
-                    writer.WriteNextTime(i)    
-                    i += 1
-                elif isinstance(data, int):
-                    if data > 0: # 这里是总的时间层
-                        writer.SetNumberOfTimeSteps(data)
-                        writer.Start()
-                    elif data == -1:
-                        self.process.join()
-                        print('Simulation stop!')
-                        writer.Stop()
-                        break
+            data = self.queue.get() # 阻塞等待, 不占用 CPU
+            if isinstance(data, dict):
+                for key, val in data.items():
+                    datatype, data = val
+                    d = vnp.numpy_to_vtk(data)
+                    d.SetName(key)
+                    if datatype == 'celldata':
+                        cdata.AddArray(d)
+                    elif datatype == 'pointdata':
+                        pdata.AddArray(d)
+                writer.WriteNextTime(i)
+                i += 1
+            elif isinstance(data, int):
+                if data > 0: # 这里是总的时间层
+                    writer.SetNumberOfTimeSteps(data)
+                    writer.Start()
+                elif data == -1:
+                    self.process.join()
+                    print('Simulation stop!')
+                    writer.Stop()
+                    break
+
+    def run_native(self, fname='test.vtu'):
+        """
+
+        Notes
+        -----
+
+        动态写入时间有关的数据. vtk 模块把所有时间层写在同一个文件中, 这里
+        每个时间层写一个 fname_000000.vtu 这样的文件, 再用 .pvd 文件把它们
+        组成时间序列, 每写一个时间层就更新一次 .pvd 文件.
+        """
+        root, ext = os.path.splitext(fname)
+        path = os.path.dirname(root)
+        datasets = []
+        self.process.start()
+        i = 0
+        while True:
+            data = self.queue.get() # 阻塞等待, 不占用 CPU
+            if isinstance(data, dict):
+                for key, val in data.items():
+                    datatype, data = val
+                    if datatype == 'celldata':
+                        self.celldata[key] = data
+                    elif datatype == 'pointdata':
+                        self.nodedata[key] = data
+                name = '{}_{:06d}{}'.format(root, i, ext)
+                self.write(name)
+                datasets.append((i, os.path.relpath(name, path or os.curdir)))
+                write_pvd(root + '.pvd', datasets)
+                i += 1
+            elif isinstance(data, int):
+                if data == -1:
+                    self.process.join()
+                    print('Simulation stop!')
+                    break
@@ -0,0 +1,138 @@
+import os
+
+import numpy as np
+
+from .vtkxml import write_vtu, write_pvtu, write_pvd, VTK_DUPLICATECELL
+
+
+class PartitionedVTKWriter:
+    """
+
+    Notes
+    -----
+    分区并行输出: 每个进程 (或者工作进程) 只写自己子区域上的 .vtu 文件, 0 号
+    子区域另外写一个 .pvtu 文件把各个子区域组成整个网格, 并更新 .pvd 文件把
+    各个时间层组成时间序列. 数据不需要收集到一个进程上, 也不需要 vtk 模块.
+
+    文件名为 (fname 是不带后缀的前缀)
+
+        fname_000010_0003.vtu : 第 10 步 3 号子区域的数据
+        fname_000010.pvtu     : 第 10 步的整个网格
+        fname.pvd             : 时间序列
+
+    影子单元可以一起写出, 它们在 vtkGhostType 中被标记为重复单元, ParaView
+    显示和计算时会跳过它们.
+
+    Examples
+    --------
+    comm = MPI.COMM_WORLD
+    writer = PartitionedVTKWriter('output/heat', comm=comm, compress=True)
+    for i in range(NT):
+        ...
+        mesh.nodedata['uh'] = uh
+        writer.write(mesh, t=t)
+
+    在进程池中, 各个工作进程调用 write_piece, 主进程调用 write_index.
+    """
+    def __init__(self, fname, comm=None, nparts=None, compress=False):
+        """
+
+        Parameters
+        ----------
+        fname : 输出文件的前缀, 可以带目录, 目录不存在时自动创建
+        comm : MPI 通信子, 子区域的个数和编号由它给出
+        nparts : 不用 MPI 时子区域的个数
+        compress : 是否用 zlib 压缩数据
+        """
+        self.fname = fname
+        self.comm = comm
+        if comm is not None:
+            self.nparts = comm.Get_size()
+            self.rank = comm.Get_rank()
+        else:
+            self.nparts = 1 if nparts is None else nparts
+            self.rank = 0
+        self.compress = compress
+        self.step = 0
+        self.datasets = [] # 已经写出的 (时间, .pvtu 文件名)
+
+        path = os.path.dirname(fname)
+        if path != '':
+            os.makedirs(path, exist_ok=True)
+
+    def piece_name(self, step, rank):
+        return '{}_{:06d}_{:04d}.vtu'.format(self.fname, step, rank)
+
+    def index_name(self, step):
+        return '{}_{:06d}.pvtu'.format(self.fname, step)
+
+    def write(self, mesh, t=None, step=None, isGhostCell=None, nodedata=None,
+            celldata=None):
+        """
+
+        Parameters
+        ----------
+        mesh : 本进程子区域上的网格, 输出 mesh.nodedata 和 mesh.celldata
+        t : 时间, 默认用步数
+        step : 步数, 默认从 0 开始每次加 1
+        isGhostCell : 影子单元的标记
+        nodedata, celldata : 除了 mesh 上的数据以外要输出的数据
+        """
+        step = self.step if step is None else step
+        nodedata, celldata = self.mesh_data(mesh, isGhostCell, nodedata, celldata)
+        self.write_piece(mesh, self.rank, step=step, nodedata=nodedata,
+                celldata=celldata)
+        if self.rank == 0:
+            self.write_index(step, t=t, nodedata=nodedata, celldata=celldata,
+                    ptype=mesh.entity('node').dtype)
+        self.step = step + 1
+
+    def mesh_data(self, mesh, isGhostCell=None, nodedata=None, celldata=None):
+        nd = {k: v for k, v in mesh.nodedata.items() if v is not None}
+        nd.update(nodedata or {})
+        cd = {k: v for k, v in mesh.celldata.items() if v is not None}
+        cd.update(celldata or {})
+        if isGhostCell is not None:
+            cd['vtkGhostType'] = np.where(isGhostCell, VTK_DUPLICATECELL,
+                    0).astype(np.uint8)
+        return nd, cd
+
+    def write_piece(self, mesh, rank, step=0, isGhostCell=None,
+            nodedata=None, celldata=None):
+        """
+
+        Notes
+        -----
+        写出 rank 号子区域的 .vtu 文件, 可以在任何进程中调用.
+        """
+        nodedata, celldata = self.mesh_data(mesh, isGhostCell, nodedata, celldata)
+        node, cell, cellType, NC = mesh.to_vtk()
+        write_vtu(self.piece_name(step, rank), node, cell, cellType, NC,
+                nodedata=nodedata, celldata=celldata, compress=self.compress)
+
+    def write_index(self, step, t=None, mesh=None, ghost=False, nodedata=None,
+            celldata=None, ptype=np.float64):
+        """
+
+        Notes
+        -----
+        写出第 step 步的 .pvtu 文件, 并更新 .pvd 文件. 数据的名字和类型取自
+        mesh (任何一个子区域的网格) 上的数据或者 nodedata 和 celldata. 各个
+        子区域写出了影子单元时 ghost 为真.
+        """
+        if mesh is not None:
+            isGhostCell = np.zeros(0, dtype=np.bool_) if ghost else None
+            nodedata, celldata = self.mesh_data(mesh, isGhostCell, nodedata,
+                    celldata)
+            ptype = mesh.entity('node').dtype
+        path = os.path.dirname(self.fname)
+        pieces = [os.path.relpath(self.piece_name(step, r), path or '.')
+                for r in range(self.nparts)]
+        write_pvtu(self.index_name(step), pieces, nodedata=nodedata,
+                celldata=celldata, ptype=ptype)
+
+        name = os.path.relpath(self.index_name(step), path or '.')
+        t = step if t is None else t
+        self.datasets = [d for d in self.datasets if d[1] != name]
+        self.datasets.append((t, name))
+        write_pvd(self.fname + '.pvd', self.datasets)
@@ -1,18 +1,39 @@
 import numpy as np
-import vtk
-import vtk.util.numpy_support as vnp
+try:
+    import vtk
+    import vtk.util.numpy_support as vnp
+except ImportError:
+    vtk = None
 
 import multiprocessing
 import time
 
+from .vtkxml import write_vtu
+
 class VTKMeshWriter:
     """
 
     Notes
     -----
     用于在数值模拟过程中输出网格和数据到 vtk 数据文件中 
+
+    backend 为 'vtk' 时用 vtk 模块写文件; 为 'native' 时用 vtkxml 直接从
+    to_vtk 返回的数组和 nodedata, celldata 写文件, 不需要安装 vtk, 这时
+    compress 和 encoding 见 vtkxml.write_vtu; 为 'auto' 时安装了 vtk 就用
+    vtk, 否则用 native.
     """
-    def __init__(self, simulation=None, args=tuple()):
+    def __init__(self, simulation=None, args=tuple(), backend='auto',
+            compress=False, encoding='raw'):
+
+        if backend == 'auto':
+            backend = 'native' if vtk is None else 'vtk'
+        if backend not in {'native', 'vtk'}:
+            raise ValueError("We don't support the backend `{}`! ".format(backend))
+        if (backend == 'vtk') and (vtk is None):
+            raise ImportError("The backend `vtk` needs the vtk package! ")
+        self.backend = backend
+        self.compress = compress
+        self.encoding = encoding
 
         self.simulation = simulation
         if self.simulation is not None:
@@ -33,6 +54,12 @@ class VTKMeshWriter:
         -----
         """
         node, cell, cellType, NC = mesh.to_vtk()
+        if self.backend == 'native':
+            write_vtu(fname, node, cell, cellType, NC, nodedata=mesh.nodedata,
+                    celldata=mesh.celldata, compress=self.compress,
+                    encoding=self.encoding)
+            return
+
         points = vtk.vtkPoints()
         points.SetData(vnp.numpy_to_vtk(node))
 
@@ -72,15 +99,14 @@ class VTKMeshWriter:
         self.process.start()
         i = 0
         while True:
-            if not self.queue.empty():
-                data = self.queue.get()
-                if isinstance(data, dict):
-                    name = data['name']
-                    mesh = data['mesh']
-                    self.write_to_vtk(name, mesh)
-                elif data == -1:
-                    print('Simulation stop!')
-                    self.process.join()
-                    break
-                else:
-                    pass #TODO: 增加更多的接口协议
+            data = self.queue.get() # 阻塞等待, 不占用 CPU
+            if isinstance(data, dict):
+                name = data['name']
+                mesh = data['mesh']
+                self.write_to_vtk(name, mesh)
+            elif data == -1:
+                print('Simulation stop!')
+                self.process.join()
+                break
+            else:
+                pass #TODO: 增加更多的接口协议
@@ -0,0 +1,321 @@
+import os
+import re
+import xml.etree.ElementTree as ET
+
+import numpy as np
+
+from .vtkxml import vtk_cells
+
+try:
+    import h5py
+except ImportError:
+    h5py = None
+
+
+XDMF_TOPOLOGY = {
+        3: 'Polyline',
+        5: 'Triangle',
+        9: 'Quadrilateral',
+        10: 'Tetrahedron',
+        12: 'Hexahedron',
+        13: 'Wedge',
+        }
+
+XDMF_ATTRIBUTE = {1: 'Scalar', 3: 'Vector', 6: 'Tensor6', 9: 'Tensor'}
+
+XDMF_NUMBER = {'f': 'Float', 'i': 'Int', 'u': 'UInt'}
+
+XDMF_CENTER = {'nodedata': 'Node', 'celldata': 'Cell'}
+
+HEAD = '<?xml version="1.0"?>\n' \
+        '<Xdmf Version="3.0" xmlns:xi="http://www.w3.org/2001/XInclude">\n' \
+        '<Domain>\n'
+
+TAIL = '</Grid>\n</Domain>\n</Xdmf>\n'
+
+MESH = 'xpointer(//Grid[@Name=&quot;mesh&quot;]/*[self::Topology or self::Geometry])'
+
+
+def number_type(dtype):
+    dtype = np.dtype(dtype)
+    if dtype == np.bool_:
+        return 'UChar', 1
+    if dtype.kind not in XDMF_NUMBER:
+        raise ValueError("We don't support data type `{}`! ".format(dtype))
+    return XDMF_NUMBER[dtype.kind], dtype.itemsize
+
+
+def dtype_from(numbertype, precision):
+    kind = {v: k for k, v in XDMF_NUMBER.items()}.get(numbertype, 'u')
+    return np.dtype('<{}{}'.format(kind, precision))
+
+
+class XDMFWriter:
+    """
+
+    Notes
+    -----
+    时间序列输出: 网格的几何和拓扑只写一次, 每个时间层只追加 nodedata 和
+    celldata 中的数据, 并生成一个 ParaView 可以直接打开的 XDMF 文件.
+
+    有 h5py 时 (backend='hdf5'), 数据写在 fname.h5 中, 每个数据是一个按时
+    间层分块的可扩展数据集 /NodeData/<name> 或 /CellData/<name>, 第一维是时
+    间层; 没有 h5py 时 (backend='binary'), 数据依次追加到 fname.bin 中, XDMF
+    文件记录每个数组的偏移量.
+
+    XDMF 文件的每个时间层通过 xi:include 引用同一个网格. 追加时间层时只改写
+    文件末尾, 不重写整个文件, 所以可以随时被 ParaView 读取, 也可以用
+    mode='a' 重新打开, 在原来的基础上继续追加.
+
+    Examples
+    --------
+    writer = XDMFWriter('output/heat', mesh)
+    for i in range(NT):
+        ...
+        writer.write(t, nodedata={'uh': uh})
+    writer.close()
+
+    writer = XDMFWriter('output/heat', mode='a') # 续算
+    """
+    def __init__(self, fname, mesh=None, mode='w', backend='auto',
+            compress=False):
+        """
+
+        Parameters
+        ----------
+        fname : 输出文件的前缀, 生成 fname.xdmf 和 fname.h5 (或 fname.bin)
+        mesh : 网格, mode='w' 时必须给出
+        mode : 'w' 新建, 'a' 在已有的文件上追加
+        backend : 'auto', 'hdf5' 或者 'binary'
+        compress : 是否用 gzip 压缩 (只对 hdf5 有效)
+        """
+        if mode not in {'w', 'a'}:
+            raise ValueError("We don't support mode `{}`! ".format(mode))
+        self.fname = fname
+        self.xdmf = fname + '.xdmf'
+        self.mesh = mesh
+        self.compress = compress
+        if (mode == 'a') and not os.path.exists(self.xdmf):
+            mode = 'w'
+        self.mode = mode
+
+        if mode == 'a':
+            with open(self.xdmf) as f:
+                content = f.read()
+            backend = 'hdf5' if 'Format="HDF"' in content else 'binary'
+            self.times = [float(t) for t in re.findall(r'<Time Value="([^"]*)"/>', content)]
+        elif backend == 'auto':
+            backend = 'binary' if h5py is None else 'hdf5'
+        if backend not in {'hdf5', 'binary'}:
+            raise ValueError("We don't support backend `{}`! ".format(backend))
+        if (backend == 'hdf5') and (h5py is None):
+            raise ImportError('h5py is needed by the hdf5 backend!')
+        self.backend = backend
+        self.data = fname + ('.h5' if backend == 'hdf5' else '.bin')
+        self.dataname = os.path.basename(self.data)
+
+        path = os.path.dirname(fname)
+        if path != '':
+            os.makedirs(path, exist_ok=True)
+
+        if backend == 'hdf5':
+            self.h5 = h5py.File(self.data, mode)
+        else:
+            self.bin = open(self.data, 'wb' if mode == 'w' else 'ab')
+
+        if mode == 'w':
+            if mesh is None:
+                raise ValueError('the mesh is needed to create a new time series!')
+            self.times = []
+            self.file = open(self.xdmf, 'w')
+            self.file.write(HEAD + self.mesh_grid(mesh))
+            self.file.write('<Grid Name="TimeSeries" GridType="Collection" '
+                    'CollectionType="Temporal">\n')
+            self.file.write(TAIL)
+            self.file.flush()
+        else:
+            self.file = open(self.xdmf, 'r+')
+        self.file.seek(0, os.SEEK_END)
+        self.tail = self.file.tell() - len(TAIL)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def number_of_steps(self):
+        return len(self.times)
+
+    def data_item(self, a, path):
+        """
+
+        Notes
+        -----
+        把数组 a 写到数据文件中, 返回引用它的 DataItem.
+        """
+        a = np.ascontiguousarray(a)
+        if a.dtype == np.bool_:
+            a = a.astype(np.uint8)
+        ntype, precision = number_type(a.dtype)
+        dims = ' '.join(str(n) for n in a.shape)
+        if self.backend == 'hdf5':
+            self.h5.create_dataset(path, data=a)
+            return '<DataItem Dimensions="{}" NumberType="{}" Precision="{}" ' \
+                    'Format="HDF">{}:{}</DataItem>\n'.format(dims, ntype,
+                            precision, self.dataname, path)
+        seek = self.bin.tell()
+        self.bin.write(a.astype(a.dtype.newbyteorder('<')).tobytes())
+        return '<DataItem Dimensions="{}" NumberType="{}" Precision="{}" ' \
+                'Format="Binary" Endian="Little" Seek="{}">{}</DataItem>\n'.format(
+                        dims, ntype, precision, seek, self.dataname)
+
+    def mesh_grid(self, mesh):
+        node, cell, cellType, NC = mesh.to_vtk()
+        cellType = np.unique(cellType)
+        if (len(cellType) != 1) or (int(cellType[0]) not in XDMF_TOPOLOGY):
+            raise ValueError("We don't support the cell type `{}`! ".format(cellType))
+        connectivity, offsets, types = vtk_cells(cell, NC, cellType[0])
+        topology = connectivity.reshape(NC, -1)
+        node = np.asarray(node)
+        if node.shape[1] < 3:
+            node = np.c_[node, np.zeros((len(node), 3 - node.shape[1]), dtype=node.dtype)]
+
+        s = '<Grid Name="mesh" GridType="Uniform">\n'
+        s += '<Topology TopologyType="{}" NumberOfElements="{}" ' \
+                'NodesPerElement="{}">\n'.format(XDMF_TOPOLOGY[int(cellType[0])],
+                        NC, topology.shape[1])
+        s += self.data_item(topology, '/Mesh/Topology')
+        s += '</Topology>\n'
+        s += '<Geometry GeometryType="XYZ">\n'
+        s += self.data_item(node, '/Mesh/Geometry')
+        s += '</Geometry>\n'
+        s += '</Grid>\n'
+        return s
+
+    def append(self, kind, name, a):
+        """
+
+        Notes
+        -----
+        把一个时间层的数据追加到数据文件中, 返回引用它的 DataItem.
+        """
+        a = np.ascontiguousarray(a)
+        if a.dtype == np.bool_:
+            a = a.astype(np.uint8)
+        if self.backend == 'binary':
+            return self.data_item(a, None)
+
+        path = '/{}/{}'.format(XDMF_CENTER[kind] + 'Data', name)
+        if path not in self.h5:
+            options = {'compression': 'gzip'} if self.compress else {}
+            self.h5.create_dataset(path, shape=(0, ) + a.shape, dtype=a.dtype,
+                    maxshape=(None, ) + a.shape, chunks=(1, ) + a.shape,
+                    **options)
+        d = self.h5[path]
+        if d.shape[1:] != a.shape:
+            raise ValueError('the shape of `{}` has changed!'.format(name))
+        row = d.shape[0]
+        d.resize(row + 1, axis=0)
+        d[row] = a
+
+        ntype, precision = number_type(a.dtype)
+        shape = d.shape
+        dims = ' '.join(str(n) for n in a.shape)
+        ndim = len(shape)
+        start = ' '.join([str(row)] + ['0']*(ndim - 1))
+        stride = ' '.join(['1']*ndim)
+        count = ' '.join(str(n) for n in (1, ) + a.shape)
+        s = '<DataItem ItemType="HyperSlab" Dimensions="{}">\n'.format(dims)
+        s += '<DataItem Dimensions="3 {}" Format="XML">{} {} {}</DataItem>\n'.format(
+                ndim, start, stride, count)
+        s += '<DataItem Dimensions="{}" NumberType="{}" Precision="{}" ' \
+                'Format="HDF">{}:{}</DataItem>\n'.format(
+                        ' '.join(str(n) for n in shape), ntype, precision,
+                        self.dataname, path)
+        s += '</DataItem>\n'
+        return s
+
+    def write(self, t=None, nodedata=None, celldata=None):
+        """
+
+        Parameters
+        ----------
+        t : 时间, 默认用时间层的编号
+        nodedata, celldata : 名字到数组的字典, 都没有给出时输出 mesh 上的数据
+        """
+        if (nodedata is None) and (celldata is None) and (self.mesh is not None):
+            nodedata = self.mesh.nodedata
+            celldata = self.mesh.celldata
+        step = len(self.times)
+        t = step if t is None else t
+
+        s = '<Grid Name="step_{:06d}" GridType="Uniform">\n'.format(step)
+        s += '<xi:include xpointer="{}"/>\n'.format(MESH)
+        s += '<Time Value="{!r}"/>\n'.format(float(t))
+        for kind, data in (('nodedata', nodedata), ('celldata', celldata)):
+            for name, val in (data or {}).items():
+                if val is None:
+                    continue
+                val = np.asarray(val)
+                ncomp = 1 if val.ndim == 1 else int(np.prod(val.shape[1:]))
+                val = val.reshape(len(val), -1) if ncomp > 1 else val
+                atype = XDMF_ATTRIBUTE.get(ncomp, 'Matrix')
+                s += '<Attribute Name="{}" AttributeType="{}" Center="{}">\n'.format(
+                        name, atype, XDMF_CENTER[kind])
+                s += self.append(kind, name, val)
+                s += '</Attribute>\n'
+        s += '</Grid>\n'
+        self.flush_data()
+
+        # 只改写文件的末尾
+        self.file.seek(self.tail)
+        self.file.write(s)
+        self.tail = self.file.tell()
+        self.file.write(TAIL)
+        self.file.flush()
+        self.times.append(float(t))
+
+    def flush_data(self):
+        if self.backend == 'hdf5':
+            self.h5.flush()
+        else:
+            self.bin.flush()
+
+    def read(self, step, name):
+        """
+
+        Notes
+        -----
+        读取第 step 个时间层的数据 name.
+        """
+        self.flush_data()
+        root = ET.parse(self.xdmf).getroot()
+        grid = root.find(".//Grid[@Name='step_{:06d}']".format(step))
+        if grid is None:
+            raise ValueError('there is no time step {}!'.format(step))
+        attr = grid.find("Attribute[@Name='{}']".format(name))
+        if attr is None:
+            raise ValueError('there is no data `{}` in time step {}!'.format(name, step))
+        item = attr.find('DataItem')
+        shape = tuple(int(n) for n in item.attrib['Dimensions'].split())
+        if item.attrib.get('ItemType') == 'HyperSlab':
+            slab, ref = item.findall('DataItem')
+            row = int(slab.text.split()[0])
+            path = ref.text.split(':')[-1]
+            return self.h5[path][row]
+        dtype = dtype_from(item.attrib['NumberType'], int(item.attrib['Precision']))
+        with open(self.data, 'rb') as f:
+            f.seek(int(item.attrib['Seek']))
+            a = np.fromfile(f, dtype=dtype, count=int(np.prod(shape)))
+        return a.reshape(shape)
+
+    def close(self):
+        if self.file is None:
+            return
+        if self.backend == 'hdf5':
+            self.h5.close()
+        else:
+            self.bin.close()
+        self.file.close()
+        self.file = None
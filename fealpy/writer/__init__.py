@@ -1,2 +1,19 @@
-from .MeshWriter import MeshWriter
-from .VTKMeshWriter import VTKMeshWriter
+"""
+writer
+======
+
+输出程序在第一次使用时才导入 (见 fealpy.common.lazy). 所有的输出程序都
+可以用 vtkxml 直接写 VTK XML 文件, 不需要安装 vtk; MeshWriter 和
+VTKMeshWriter 在安装了 vtk 时默认仍然用 vtk 写文件 (见 backend 参数).
+"""
+
+from ..common.lazy import lazy_import
+
+__getattr__, __dir__ = lazy_import(__name__, {
+    'PartitionedVTKWriter': '.PartitionedVTKWriter',
+    'AsyncMeshWriter': '.AsyncMeshWriter',
+    'XDMFWriter': '.XDMFWriter',
+    'Checkpointer': '.Checkpointer',
+    'MeshWriter': '.MeshWriter',
+    'VTKMeshWriter': '.VTKMeshWriter',
+    })
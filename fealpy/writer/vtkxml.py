@@ -0,0 +1,464 @@
+"""
+
+Notes
+-----
+直接从 NumPy 数组写 VTK XML 文件, 不依赖 vtk 模块.
+
+数组有三种写法 (write_vtu 的 encoding 参数):
+
+    raw    : 二进制数据放在文件末尾的 AppendedData 中 (format="appended"),
+             这是默认的写法, 文件最小, 写得最快
+    base64 : 二进制数据用 base64 编码后写在 DataArray 中 (format="binary")
+    ascii  : 直接写数值 (format="ascii"), 便于查看和调试, 不能压缩
+
+二进制数据前面有一个 UInt64 的头. 不压缩时头就是数组的字节数; 用 zlib 压缩
+时数组被分成若干块, 头为
+
+    [块数, 块大小, 最后一块的大小, 第 1 块压缩后的大小, ...]
+
+后面紧跟各块压缩后的数据. 这是 vtkXMLWriter 的标准格式, ParaView 和 VisIt
+都可以直接读取.
+
+不压缩时数组直接从 to_vtk 返回的数组和 nodedata, celldata 的内存写入文件
+(base64 时分段编码后写入), 不需要先复制到 vtk 的对象中, 也不会先把整个文
+件拼在内存中.
+
+    .vtu  : 一个子区域 (piece) 的非结构网格和数据
+    .pvtu : 把各个子区域的 .vtu 文件组成一个网格
+    .pvd  : 把各个时间层的文件组成一个时间序列
+
+Examples
+--------
+node, cell, cellType, NC = mesh.to_vtk()
+write_vtu('test.vtu', node, cell, cellType, NC,
+        nodedata={'uh': uh}, compress=True)
+"""
+
+import os
+import sys
+import zlib
+import base64
+import xml.etree.ElementTree as ET
+
+import numpy as np
+
+
+VTK_TYPES = {
+        np.dtype(np.int8): 'Int8',
+        np.dtype(np.uint8): 'UInt8',
+        np.dtype(np.int16): 'Int16',
+        np.dtype(np.uint16): 'UInt16',
+        np.dtype(np.int32): 'Int32',
+        np.dtype(np.uint32): 'UInt32',
+        np.dtype(np.int64): 'Int64',
+        np.dtype(np.uint64): 'UInt64',
+        np.dtype(np.float32): 'Float32',
+        np.dtype(np.float64): 'Float64',
+        }
+
+VTK_DUPLICATECELL = 1 # vtkGhostType 中影子单元的标记
+
+VTK_POLYHEDRON = 42
+
+ENCODINGS = {'raw', 'base64', 'ascii'}
+
+BLOCKSIZE = 1 << 15 # zlib 压缩时每块的字节数
+
+CHUNKSIZE = 3 << 18 # base64 分段编码时每段的字节数, 是 3 的倍数
+
+
+def vtk_type(dtype):
+    dtype = np.dtype(dtype)
+    if dtype == np.bool_:
+        dtype = np.dtype(np.uint8)
+    return VTK_TYPES[dtype.newbyteorder('=')]
+
+
+def cell_stream(cell, NC):
+    """
+
+    Notes
+    -----
+    [n, x_0, ..., n, x_0, ...] 格式的数组中每一段数据的起始位置和长度. 段的
+    长度在段首, 只能顺序地找, 这里在 Python 的整数列表上循环.
+    """
+    start = np.zeros(NC, dtype=np.int_)
+    n = np.zeros(NC, dtype=np.int_)
+    c = cell.tolist()
+    k = 0
+    for i in range(NC):
+        start[i] = k + 1
+        n[i] = c[k]
+        k += c[k] + 1
+    return start, n
+
+
+def vtk_cells(cell, NC, cellType):
+    """
+
+    Notes
+    -----
+    把 to_vtk 返回的 [nv, v_0, ..., nv, v_0, ...] 格式的单元数组转化为 VTK
+    XML 格式的 connectivity, offsets 和 types 三个数组.
+    """
+    cell = np.asarray(cell)
+    if (cell.ndim == 1) and (len(cell) == NC*(cell[0] + 1)) and \
+            np.all(cell[::cell[0]+1] == cell[0]):
+        cell = cell.reshape(NC, -1)
+    if cell.ndim == 2: # 所有单元的顶点个数相同
+        NV = cell.shape[1] - 1
+        connectivity = cell[:, 1:].reshape(-1)
+        offsets = np.arange(1, NC+1)*NV
+    else: # 多边形等顶点个数不同的单元
+        start, NV = cell_stream(cell, NC)
+        offsets = np.cumsum(NV)
+        idx = np.repeat(start - offsets + NV, NV) + np.arange(offsets[-1])
+        connectivity = cell[idx]
+    types = np.broadcast_to(np.asarray(cellType, dtype=np.uint8), (NC, ))
+    return connectivity, offsets, types
+
+
+def vtk_polyhedron_cells(cell, NC):
+    """
+
+    Notes
+    -----
+    多面体单元. to_vtk 返回的单元数组和 vtkUnstructuredGrid 的
+    InsertNextCell 一样, 每个单元为
+
+        [n, nf, nv_0, v, ..., nv_1, v, ...]
+
+    n 是后面的数的个数, nf 是面的个数, 然后逐个给出每个面的顶点个数和顶点.
+    这里转化为 VTK XML 格式的 connectivity (每个单元不重复的顶点), offsets,
+    types, faces (去掉段首 n 的单元数组) 和 faceoffsets 五个数组.
+    """
+    cell = np.asarray(cell)
+    start, n = cell_stream(cell, NC)
+    faceoffsets = np.cumsum(n)
+    idx = np.repeat(start - faceoffsets + n, n) + np.arange(faceoffsets[-1])
+    faces = cell[idx]
+
+    # 去掉面的个数和每个面的顶点个数, 它们同样只能顺序地找
+    isVertex = np.ones(len(faces), dtype=np.bool_)
+    f = faces.tolist()
+    pos = []
+    for k in (faceoffsets - n).tolist():
+        pos.append(k)
+        k += 1
+        for i in range(f[k-1]):
+            pos.append(k)
+            k += f[k] + 1
+    isVertex[pos] = False
+
+    cellIdx = np.repeat(np.arange(NC), n)
+    key = np.unique(np.c_[cellIdx[isVertex], faces[isVertex]], axis=0)
+    connectivity = key[:, 1]
+    offsets = np.cumsum(np.bincount(key[:, 0], minlength=NC))
+    types = np.broadcast_to(np.uint8(VTK_POLYHEDRON), (NC, ))
+    return connectivity, offsets, types, faces, faceoffsets
+
+
+def little_endian(a):
+    a = np.ascontiguousarray(a)
+    if a.dtype == np.bool_:
+        a = a.astype(np.uint8)
+    if a.dtype.byteorder == '>' or (a.dtype.byteorder == '=' and sys.byteorder == 'big'):
+        a = a.astype(a.dtype.newbyteorder('<'))
+    return a
+
+
+def binary_blocks(a, compress=False):
+    """
+
+    Notes
+    -----
+    把 (小端, 连续的) 数组编码为二进制数据, 返回 [头, 数据, ...]. 不压缩时
+    数据是数组内存的视图, 不复制.
+    """
+    data = memoryview(a).cast('B') if a.nbytes > 0 else b''
+    if not compress:
+        return [np.array([a.nbytes], dtype='<u8').tobytes(), data]
+    blocks = [zlib.compress(data[i:i+BLOCKSIZE])
+            for i in range(0, a.nbytes, BLOCKSIZE)]
+    nblocks = len(blocks)
+    last = a.nbytes - (nblocks - 1)*BLOCKSIZE if nblocks > 0 else 0
+    header = [nblocks, BLOCKSIZE, last] + [len(b) for b in blocks]
+    return [np.array(header, dtype='<u8').tobytes()] + blocks
+
+
+def encode_array(a, compress=False):
+    """
+
+    Notes
+    -----
+    把数组编码为 AppendedData 中的一段二进制数据 (包括头).
+    """
+    return b''.join(binary_blocks(little_endian(a), compress=compress))
+
+
+def write_base64(f, buffers):
+    """
+
+    Notes
+    -----
+    把若干段二进制数据作为一个整体用 base64 编码后写入 f. 每次只编码
+    CHUNKSIZE 个字节, 不会生成整个数组的编码.
+    """
+    rest = b''
+    for b in buffers:
+        for i in range(0, len(b), CHUNKSIZE):
+            chunk = rest + b[i:i+CHUNKSIZE]
+            n = len(chunk) - len(chunk)%3
+            f.write(base64.b64encode(chunk[:n]))
+            rest = chunk[n:]
+    f.write(base64.b64encode(rest))
+
+
+def write_ascii(f, a):
+    """
+
+    Notes
+    -----
+    每行写一个点 (单元) 的数据. 每次把 CHUNKSIZE 个数一起格式化, 比
+    np.savetxt 逐行格式化快得多.
+    """
+    a = a.reshape(len(a), -1)
+    if a.dtype.kind == 'f':
+        fmt = '%.17g' if a.dtype.itemsize == 8 else '%.9g'
+    else:
+        fmt = '%d'
+    line = ' '.join([fmt]*a.shape[1]) + '\n'
+    n = max(CHUNKSIZE//max(a.shape[1], 1), 1)
+    for i in range(0, len(a), n):
+        b = a[i:i+n]
+        f.write(((line*len(b)) % tuple(b.ravel().tolist())).encode())
+
+
+def data_array_attrs(name, a):
+    a = np.asarray(a)
+    ncomp = 1 if a.ndim == 1 else int(np.prod(a.shape[1:]))
+    attrs = 'type="{}" Name="{}"'.format(vtk_type(a.dtype), name)
+    if ncomp > 1:
+        attrs += ' NumberOfComponents="{}"'.format(ncomp)
+    return attrs
+
+
+def file_header(vtype, compress):
+    s = '<?xml version="1.0"?>\n'
+    s += '<VTKFile type="{}" version="1.0" byte_order="LittleEndian" ' \
+            'header_type="UInt64"'.format(vtype)
+    if compress:
+        s += ' compressor="vtkZLibDataCompressor"'
+    return s + '>\n'
+
+
+def write_vtu(fname, node, cell, cellType, NC, nodedata=None, celldata=None,
+        compress=False, encoding='raw'):
+    """
+
+    Parameters
+    ----------
+    fname : 文件名
+    node, cell, cellType, NC : 与 mesh.to_vtk() 的返回值相同
+    nodedata, celldata : 名字到数组的字典, 数组的第一维是节点 (单元) 个数
+    compress : 是否用 zlib 压缩
+    encoding : 'raw', 'base64' 或者 'ascii', 见模块的说明
+    """
+    if encoding not in ENCODINGS:
+        raise ValueError("We don't support the encoding `{}`! ".format(encoding))
+    if compress and (encoding == 'ascii'):
+        raise ValueError("We don't support compressing ascii data! ")
+
+    node = np.asarray(node)
+    NN = node.shape[0]
+    if node.shape[1] < 3:
+        node = np.c_[node, np.zeros((NN, 3 - node.shape[1]), dtype=node.dtype)]
+    if cellType == VTK_POLYHEDRON:
+        connectivity, offsets, types, faces, faceoffsets = vtk_polyhedron_cells(
+                cell, NC)
+        polyhedron = [('faces', faces.astype(np.int64)),
+                ('faceoffsets', faceoffsets.astype(np.int64))]
+    else:
+        connectivity, offsets, types = vtk_cells(cell, NC, cellType)
+        polyhedron = []
+
+    sections = [
+        ('PointData', [(key, val) for key, val in (nodedata or {}).items()
+            if val is not None]),
+        ('CellData', [(key, val) for key, val in (celldata or {}).items()
+            if val is not None]),
+        ('Points', [('Points', node)]),
+        ('Cells', [('connectivity', connectivity.astype(np.int64)),
+            ('offsets', offsets.astype(np.int64)),
+            ('types', types)] + polyhedron)
+        ]
+
+    appended = [] # raw 格式的数据在写完 XML 之后才写入
+    offset = 0
+    with open(fname, 'wb') as f:
+        f.write(file_header('UnstructuredGrid', compress).encode())
+        f.write(b'<UnstructuredGrid>\n')
+        f.write('<Piece NumberOfPoints="{}" NumberOfCells="{}">\n'.format(
+            NN, NC).encode())
+        for tag, arrays in sections:
+            f.write('<{}>\n'.format(tag).encode())
+            for name, a in arrays:
+                a = little_endian(a)
+                attrs = data_array_attrs(name, a)
+                if encoding == 'raw':
+                    blocks = binary_blocks(a, compress=compress)
+                    f.write('<DataArray {} format="appended" offset="{}"/>\n'.format(
+                        attrs, offset).encode())
+                    appended.append(blocks)
+                    offset += sum(len(b) for b in blocks)
+                elif encoding == 'base64':
+                    blocks = binary_blocks(a, compress=compress)
+                    f.write('<DataArray {} format="binary">\n'.format(attrs).encode())
+                    if compress: # 压缩时头和数据分别编码
+                        write_base64(f, blocks[:1])
+                        write_base64(f, blocks[1:])
+                    else:
+                        write_base64(f, blocks)
+                    f.write(b'\n</DataArray>\n')
+                else:
+                    f.write('<DataArray {} format="ascii">\n'.format(attrs).encode())
+                    write_ascii(f, a)
+                    f.write(b'</DataArray>\n')
+            f.write('</{}>\n'.format(tag).encode())
+        f.write(b'</Piece>\n</UnstructuredGrid>\n')
+        if encoding == 'raw':
+            f.write(b'<AppendedData encoding="raw">\n_')
+            for blocks in appended:
+                for b in blocks:
+                    f.write(b)
+            f.write(b'\n</AppendedData>\n')
+        f.write(b'</VTKFile>\n')
+
+
+def write_pvtu(fname, pieces, nodedata=None, celldata=None, ptype=np.float64):
+    """
+
+    Parameters
+    ----------
+    fname : 文件名
+    pieces : 各个子区域的 .vtu 文件名, 写成相对于 fname 所在目录的路径
+    nodedata, celldata : 名字到数组 (或者 (dtype, 分量个数)) 的字典, 只用
+        来确定数据的类型, 与 .vtu 文件中的数据一致
+    ptype : 节点坐标的类型
+    """
+    def data_array(name, a):
+        if isinstance(a, tuple):
+            dtype, ncomp = a
+            a = np.zeros((0, ncomp) if ncomp > 1 else 0, dtype=dtype)
+        return '<PDataArray {}/>\n'.format(data_array_attrs(name, a))
+
+    s = file_header('PUnstructuredGrid', False)
+    s += '<PUnstructuredGrid GhostLevel="0">\n'
+    s += '<PPointData>\n'
+    for key, val in (nodedata or {}).items():
+        if val is not None:
+            s += data_array(key, val)
+    s += '</PPointData>\n'
+    s += '<PCellData>\n'
+    for key, val in (celldata or {}).items():
+        if val is not None:
+            s += data_array(key, val)
+    s += '</PCellData>\n'
+    s += '<PPoints>\n'
+    s += data_array('Points', (ptype, 3))
+    s += '</PPoints>\n'
+    for piece in pieces:
+        s += '<Piece Source="{}"/>\n'.format(piece)
+    s += '</PUnstructuredGrid>\n'
+    s += '</VTKFile>\n'
+    with open(fname, 'w') as f:
+        f.write(s)
+
+
+def write_pvd(fname, datasets):
+    """
+
+    Parameters
+    ----------
+    fname : 文件名
+    datasets : (时间, 文件名) 的列表, 文件名写成相对于 fname 所在目录的路径
+    """
+    s = '<?xml version="1.0"?>\n'
+    s += '<VTKFile type="Collection" version="1.0" byte_order="LittleEndian">\n'
+    s += '<Collection>\n'
+    for t, name in datasets:
+        s += '<DataSet timestep="{!r}" part="0" file="{}"/>\n'.format(float(t), name)
+    s += '</Collection>\n'
+    s += '</VTKFile>\n'
+    # 先写到临时文件再替换, 读取的程序不会看到写了一半的文件
+    tmp = fname + '.tmp'
+    with open(tmp, 'w') as f:
+        f.write(s)
+    os.replace(tmp, fname)
+
+
+def decode_blocks(content, offset, compress):
+    """
+
+    Notes
+    -----
+    从 content[offset:] 中解码一个数组的二进制数据 (包括头).
+    """
+    if compress:
+        nblocks = int(np.frombuffer(content, '<u8', 1, offset)[0])
+        header = np.frombuffer(content, '<u8', 3 + nblocks, offset)
+        offset += 8*len(header)
+        b = []
+        for size in header[3:]:
+            b.append(zlib.decompress(content[offset:offset+int(size)]))
+            offset += int(size)
+        return b''.join(b)
+    else:
+        size = int(np.frombuffer(content, '<u8', 1, offset)[0])
+        return content[offset+8:offset+8+size]
+
+
+def decode_base64(text, compress):
+    text = b''.join(text.encode().split())
+    if not compress:
+        return decode_blocks(base64.b64decode(text), 0, False)
+    # 头单独编码, 先从前 3 个数中得到块数, 再确定头的编码长度
+    nblocks = int(np.frombuffer(base64.b64decode(text[:32]), '<u8', 1)[0])
+    n = 4*((8*(3 + nblocks) + 2)//3)
+    return decode_blocks(base64.b64decode(text[:n]) + base64.b64decode(text[n:]),
+            0, True)
+
+
+def read_vtu(fname):
+    """
+
+    Notes
+    -----
+    读取 write_vtu 写出的文件, 返回名字到数组的字典, 包括节点坐标 Points
+    和单元的 connectivity, offsets, types (多面体还有 faces, faceoffsets).
+    """
+    with open(fname, 'rb') as f:
+        content = f.read()
+    end = content.find(b'<AppendedData')
+    if end == -1:
+        root = ET.fromstring(content)
+    else:
+        start = content.index(b'_', end) + 1
+        root = ET.fromstring(content[:end] + b'</VTKFile>')
+    compress = 'compressor' in root.attrib
+    types = {v: k for k, v in VTK_TYPES.items()}
+    data = {}
+    for e in root.iter('DataArray'):
+        dtype = np.dtype(types[e.attrib['type']])
+        fmt = e.attrib['format']
+        if fmt == 'appended':
+            b = decode_blocks(content, start + int(e.attrib['offset']), compress)
+        elif fmt == 'binary':
+            b = decode_base64(e.text or '', compress)
+        if fmt == 'ascii':
+            a = np.array((e.text or '').split(), dtype=dtype)
+        else:
+            a = np.frombuffer(b, dtype=dtype.newbyteorder('<'))
+        ncomp = int(e.attrib.get('NumberOfComponents', 1))
+        data[e.attrib['Name']] = a.reshape(-1, ncomp) if ncomp > 1 else a
+    return data
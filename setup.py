@@ -39,5 +39,5 @@ setup(
         "dev": ["pytest>=3.6", "pytest-cov", "codecov", "bump2version"],
     },
     include_package_data=True,
-    python_requires=">=3.6",
+    python_requires=">=3.7",
 )
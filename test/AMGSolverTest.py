@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# 
+import sys
+import time
+
+import numpy as np
+from scipy.sparse.linalg import spsolve
+
+from fealpy.pde.poisson_2d import CosCosData
+from fealpy.functionspace import LagrangeFiniteElementSpace
+from fealpy.boundarycondition import DirichletBC
+from fealpy.solver import AMGSolver
+
+
+class AMGSolverTest():
+    def __init__(self):
+        pass
+
+    def get_system(self, n=6, p=1):
+        pde = CosCosData()
+        mesh = pde.init_mesh(n=n)
+        space = LagrangeFiniteElementSpace(mesh, p=p)
+        A = space.stiff_matrix()
+        F = space.source_vector(pde.source)
+        uh = space.function()
+        bc = DirichletBC(space, pde.dirichlet)
+        A, F = bc.apply(A, F, uh)
+        return A, F
+
+    def poisson(self, n=6, p=1):
+        A, F = self.get_system(n=n, p=p)
+        x0 = spsolve(A, F)
+        for itype in ['direct', 'standard']:
+            for ctype in ['V', 'W', 'F']:
+                for smoother in ['gs', 'jacobi']:
+                    solver = AMGSolver(itype=itype, ctype=ctype,
+                            smoother=smoother, seed=0)
+                    start = time.time()
+                    solver.setup(A)
+                    end = time.time()
+                    x = solver.solve(F, tol=1e-10, maxit=200)
+                    print(itype, ctype, smoother, 'setup:', end - start,
+                            'iter:', len(solver.residuals) - 1)
+                    assert np.max(np.abs(x - x0)) < 1e-6
+                    x = solver.solve(F, tol=1e-10, accel='cg')
+                    assert np.max(np.abs(x - x0)) < 1e-6
+        print(solver)
+
+    def update(self, n=6, p=1):
+        """
+        结构不变, 只改变矩阵的值时复用插值算子
+        """
+        A, F = self.get_system(n=n, p=p)
+        solver = AMGSolver(seed=0)
+        solver.setup(A)
+        P = solver.P
+        for c in [1.0, 2.0, 10.0]:
+            solver.update(c*A)
+            assert solver.P is P
+            x = solver.solve(F, tol=1e-10, accel='cg')
+            print(c, len(solver.residuals) - 1)
+            assert np.max(np.abs(c*A@x - F)) < 1e-8
+
+
+test = AMGSolverTest()
+
+if sys.argv[1] == 'poisson':
+    test.poisson(n=int(sys.argv[2]), p=int(sys.argv[3]))
+
+if sys.argv[1] == 'update':
+    test.update(n=int(sys.argv[2]))
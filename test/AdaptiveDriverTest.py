@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# 
+import sys
+import json
+
+import numpy as np
+from scipy.sparse.linalg import spsolve
+
+from fealpy.pde.poisson_2d import LShapeRSinData
+from fealpy.functionspace import LagrangeFiniteElementSpace
+from fealpy.boundarycondition import DirichletBC
+from fealpy.mesh.adaptive_tools import mark, AdaptiveDriver
+
+
+class AdaptiveDriverTest():
+    def __init__(self):
+        pass
+
+    def poisson_afem(self, maxit=10, maxdof=None, logfile=None, marker=None):
+        pde = LShapeRSinData()
+        mesh = pde.init_mesh(n=3, meshtype='tri')
+
+        def space_factory(mesh):
+            return LagrangeFiniteElementSpace(mesh, p=1)
+
+        def assembler(space):
+            A = space.stiff_matrix()
+            F = space.source_vector(pde.source)
+            return A, F
+
+        def solver(space, system):
+            A, F = system
+            uh = space.function()
+            bc = DirichletBC(space, pde.dirichlet)
+            A, F = bc.apply(A, F, uh)
+            uh[:] = spsolve(A, F)
+            return uh
+
+        def error(uh):
+            return uh.space.integralalg.error(pde.solution, uh.value)
+
+        if marker is None:
+            marker = lambda eta: mark(eta, theta=0.2)
+
+        driver = AdaptiveDriver(space_factory, assembler, solver,
+                lambda uh: uh.space.residual_estimate(uh), marker,
+                error=error, maxit=maxit, maxdof=maxdof, logfile=logfile,
+                disp=True)
+        driver.run(mesh)
+        print('stop reason:', driver.stopreason)
+        print('dominant phase:', driver.dominant_phase())
+
+        if maxdof is not None:
+            assert driver.stopreason == 'maxdof'
+            assert driver.stats[-1]['gdof'] <= maxdof
+
+        if logfile is not None:
+            with open(logfile) as f:
+                lines = [json.loads(l) for l in f]
+            assert len(lines) == len(driver.stats)
+        return driver
+
+    def index_marker(self, maxit=4):
+        """
+        标记函数返回编号数组, 只标记第 0 个单元时也要继续加密
+        """
+        driver = self.poisson_afem(maxit=maxit, marker=lambda eta: np.array([0]))
+        assert driver.stopreason == 'maxit'
+        assert len(driver.stats) == maxit
+        NC = [s['NC'] for s in driver.stats]
+        assert np.all(np.diff(NC) > 0)
+
+
+test = AdaptiveDriverTest()
+
+if sys.argv[1] == 'afem':
+    test.poisson_afem(maxit=int(sys.argv[2]))
+
+if sys.argv[1] == 'budget':
+    test.poisson_afem(maxit=100, maxdof=int(sys.argv[2]))
+
+if sys.argv[1] == 'index':
+    test.index_marker()
+
+if sys.argv[1] == 'log':
+    # 同一个日志文件运行两次, 第二次不追加到第一次的记录后面
+    test.poisson_afem(maxit=5, logfile=sys.argv[2])
+    test.poisson_afem(maxit=3, logfile=sys.argv[2])
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+#
+import os
+import sys
+import time
+import tempfile
+
+import numpy as np
+
+from fealpy.mesh import MeshFactory
+from fealpy.writer import AsyncMeshWriter
+from fealpy.writer.vtkxml import read_vtu
+
+
+class AsyncMeshWriterTest():
+    def __init__(self):
+        self.mf = MeshFactory()
+
+    def snapshots(self, writer, path, NT, mesh):
+        """
+        每一步 u 都变化, k 只在第一步给出, 之后保持不变
+        """
+        node = mesh.entity('node')
+        NC = mesh.number_of_cells()
+        k = np.arange(NC, dtype=np.float64)
+        for i in range(NT):
+            mesh.nodedata['u'] = node[:, 0] + i
+            mesh.celldata['k'] = k
+            writer(os.path.join(path, 'test{:04d}.vtu'.format(i)), mesh)
+        return k
+
+    def policy(self, n=64, NT=20, maxsize=1):
+        mesh = self.mf.boxmesh2d([0, 1, 0, 1], nx=n, ny=n, meshtype='tri')
+        node = mesh.entity('node')
+        for policy in ['block', 'drop-oldest', 'coalesce']:
+            with tempfile.TemporaryDirectory() as path:
+                with AsyncMeshWriter(mesh, maxsize=maxsize, policy=policy) as writer:
+                    k = self.snapshots(writer, path, NT, mesh)
+                print(policy, writer)
+                names = sorted(os.listdir(path))
+                if policy == 'block':
+                    assert len(names) == NT
+                assert names[-1] == 'test{:04d}.vtu'.format(NT-1)
+                assert len(names) == writer.nwrite - writer.ndrop
+                for name in names:
+                    i = int(name[4:8])
+                    data = read_vtu(os.path.join(path, name))
+                    assert np.all(data['u'] == node[:, 0] + i)
+                    assert np.all(data['k'] == k)
+                    assert np.all(data['Points'][:, :2] == node)
+                # k 只复制了一次
+                assert writer.nbytes == k.nbytes + NT*node[:, 0].nbytes
+
+    def elided(self, n=128, NT=30, maxsize=2, m=3):
+        """
+        b 每 m 步才变化一次, 中间没有变化的步不复制 b, 丢掉时间层后写出的
+        b 仍然是正确的值
+        """
+        mesh = self.mf.boxmesh2d([0, 1, 0, 1], nx=n, ny=n, meshtype='tri')
+        node = mesh.entity('node')
+        NC = mesh.number_of_cells()
+        for policy in ['block', 'drop-oldest', 'coalesce']:
+            with tempfile.TemporaryDirectory() as path:
+                with AsyncMeshWriter(mesh, maxsize=maxsize, policy=policy) as writer:
+                    for i in range(NT):
+                        mesh.nodedata['u'] = node[:, 0] + i
+                        mesh.celldata['b'] = np.full(NC, float(i//m))
+                        writer(os.path.join(path, 'test{:04d}.vtu'.format(i)), mesh)
+                print(policy, 'dropped:', writer.ndrop)
+                names = sorted(os.listdir(path))
+                assert len(names) == writer.nwrite - writer.ndrop
+                for name in names:
+                    i = int(name[4:8])
+                    data = read_vtu(os.path.join(path, name))
+                    assert np.all(data['u'] == node[:, 0] + i), (policy, name)
+                    assert np.all(data['b'] == i//m), (policy, name)
+
+    def error(self, n=4):
+        mesh = self.mf.boxmesh2d([0, 1, 0, 1], nx=n, ny=n, meshtype='tri')
+        writer = AsyncMeshWriter(mesh)
+        mesh.nodedata['u'] = mesh.entity('node')[:, 0]
+        writer('/nonexistent/directory/test.vtu', mesh)
+        try:
+            writer.flush()
+        except RuntimeError as e:
+            print(str(e).splitlines()[-1])
+        else:
+            raise AssertionError('the error was not propagated!')
+        writer.close()
+
+    def overhead(self, n=256, NT=20, work=0.05):
+        """
+        模拟程序每一步计算 work 秒, 输出的开销占计算时间的比例
+        """
+        mesh = self.mf.boxmesh2d([0, 1, 0, 1], nx=n, ny=n, meshtype='tri')
+        with tempfile.TemporaryDirectory() as path:
+            with AsyncMeshWriter(mesh) as writer:
+                start = time.perf_counter()
+                node = mesh.entity('node')
+                for i in range(NT):
+                    time.sleep(work)
+                    mesh.nodedata['u'] = node[:, 0] + i
+                    mesh.nodedata['v'] = node.copy()
+                    writer(os.path.join(path, 'test{:04d}.vtu'.format(i)), mesh)
+                total = time.perf_counter() - start
+        print(writer)
+        print('overhead: {:.2%}'.format(writer.time/total))
+
+
+test = AsyncMeshWriterTest()
+
+if sys.argv[1] == 'policy':
+    test.policy()
+
+if sys.argv[1] == 'elided':
+    test.elided()
+
+if sys.argv[1] == 'error':
+    test.error()
+
+if sys.argv[1] == 'overhead':
+    test.overhead()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+#
+import sys
+import time
+
+import numpy as np
+from scipy.sparse.linalg import spsolve
+
+from fealpy.decorator import cartesian, barycentric
+from fealpy.pde.poisson_2d import CosCosData
+from fealpy.functionspace import LagrangeFiniteElementSpace
+from fealpy.boundarycondition import eliminate_dirichlet_dof
+from fealpy.solver import LinearSolver, SolverTelemetry, FactorizationCache
+from fealpy.solver.linear_solver import block_cg
+
+
+class BlockCGTest():
+    def __init__(self):
+        pass
+
+    def sources(self, nrhs):
+        fs = []
+        for k in range(nrhs):
+            @cartesian
+            def f(p, k=k):
+                x = p[..., 0]
+                y = p[..., 1]
+                return np.sin((k+1)*np.pi*x)*np.sin(np.pi*y)
+            fs.append(f)
+        return fs
+
+    def assembly(self, n=6, p=2, nrhs=16):
+        pde = CosCosData()
+        mesh = pde.init_mesh(n=n)
+        space = LagrangeFiniteElementSpace(mesh, p=p)
+        fs = self.sources(nrhs)
+
+        NC = mesh.number_of_cells()
+        @barycentric
+        def g(bc):
+            return np.repeat(bc[..., [0]], NC, axis=-1)
+        fs[-1] = g
+        fs[-2] = 1.0
+
+        @cartesian
+        def one(p):
+            return np.ones(p.shape[:-1])
+
+        start = time.time()
+        F0 = np.column_stack([space.source_vector(one if np.isscalar(f) else f)
+            for f in fs])
+        t0 = time.time() - start
+
+        start = time.time()
+        F1 = space.source_vector(fs)
+        t1 = time.time() - start
+        print('gdof:', space.number_of_global_dofs(), 'nrhs:', nrhs)
+        print('one by one: {:.4f}s, batched: {:.4f}s'.format(t0, t1))
+        assert F1.shape == (space.number_of_global_dofs(), nrhs)
+        assert np.max(np.abs(F0 - F1)) < 1e-12
+
+    def solve(self, n=6, p=1, nrhs=8):
+        pde = CosCosData()
+        mesh = pde.init_mesh(n=n)
+        space = LagrangeFiniteElementSpace(mesh, p=p)
+        A = space.stiff_matrix()
+        isBdDof = space.is_boundary_dof()
+        A = eliminate_dirichlet_dof(A, isBdDof)
+        F = space.source_vector(self.sources(nrhs))
+        F[isBdDof] = 0.0
+        # 加上一个与第一列线性相关的右端
+        F = np.column_stack([F, 2*F[:, 0]])
+
+        X0 = spsolve(A.tocsc(), F)
+        X0 = X0.toarray() if hasattr(X0, 'toarray') else X0
+
+        t = SolverTelemetry()
+        solver = LinearSolver(method='cg_amg', tol=1e-10, telemetry=t)
+        start = time.time()
+        X = solver.solve(A, F)
+        t0 = time.time() - start
+        print('block cg: iter', solver.stats['niter'], 'residual',
+                solver.stats['residual'], 'time {:.4f}s'.format(t0))
+        assert solver.stats['converged']
+        assert np.max(np.abs(X - X0)) < 1e-8
+
+        start = time.time()
+        niter = 0
+        for i in range(F.shape[1]):
+            solver.solve(A, F[:, i])
+            niter += solver.stats['niter']
+        t1 = time.time() - start
+        print('cg column by column: iter', niter, 'time {:.4f}s'.format(t1))
+        print(t)
+
+        cache = FactorizationCache()
+        X = cache.solve_many(A, F)
+        assert np.max(np.abs(X - X0)) < 1e-10
+        assert cache.misses == 1
+
+        solver = LinearSolver(method='gmres_ilu', tol=1e-10)
+        X = solver.solve(A, F)
+        assert solver.stats['converged']
+        assert np.max(np.abs(X - X0)) < 1e-8
+
+        X, info = block_cg(A, np.zeros_like(F))
+        assert info == 0
+        assert np.all(X == 0.0)
+
+
+test = BlockCGTest()
+
+if sys.argv[1] == 'assembly':
+    test.assembly()
+
+if sys.argv[1] == 'solve':
+    test.solve()
@@ -4,14 +4,15 @@ import sys
 
 import numpy as np
 from scipy.sparse.linalg import spsolve
-from scipy.sparse import bmat
+from scipy.sparse import bmat, spdiags
 
 import matplotlib.pyplot as plt
 
 
 from fealpy.pde.poisson_2d import CosCosData
 from fealpy.functionspace import LagrangeFiniteElementSpace
-from fealpy.boundarycondition import BoundaryCondition
+from fealpy.boundarycondition import BoundaryCondition, DirichletBC
+from fealpy.boundarycondition import eliminate_dirichlet_dof
 
 class BoundaryConditionTest:
     def __init__(self):
@@ -26,7 +27,10 @@ class BoundaryConditionTest:
             b = space.source_vector(pde.source)
             uh = space.function()
             bc = BoundaryCondition(space, dirichlet=pde.dirichlet)
-            A, b = bc.apply_dirichlet_bc(A, b, uh)
+            A0 = A.copy()
+            AD, b = bc.apply_dirichlet_bc(A, b, uh)
+            assert abs(A - A0).max() == 0
+            A = AD
             uh[:] = spsolve(A, b).reshape(-1)
             error = space.integralalg.L2_error(pde.solution, uh)
             print(error)
@@ -57,12 +61,63 @@ class BoundaryConditionTest:
             print(error)
             mesh.uniform_refine()
 
+    def dirichlet_elimination(self, p=1, n=4, dim=1):
+        """
+        原地消去与 T@A@T + Tbd 的结果一致
+        """
+        pde = CosCosData()
+        mesh = pde.init_mesh(n=n)
+        space = LagrangeFiniteElementSpace(mesh, p=p)
+        A = space.stiff_matrix()
+        if dim > 1:
+            A = bmat([[A if i == j else None for j in range(dim)]
+                for i in range(dim)], format='csr')
+        gdof = space.number_of_global_dofs()
+        isDDof = np.tile(space.is_boundary_dof(), dim)
+
+        bdIdx = isDDof.astype(np.int_)
+        Tbd = spdiags(bdIdx, 0, A.shape[0], A.shape[0])
+        T = spdiags(1-bdIdx, 0, A.shape[0], A.shape[0])
+        A0 = (T@A@T + Tbd).toarray()
+        for fmt in ['csr', 'csc']:
+            A1 = eliminate_dirichlet_dof(A.asformat(fmt), isDDof, copy=True)
+            assert A1.format == fmt
+            assert np.all(A1.toarray() == A0)
+        A2 = eliminate_dirichlet_dof(A, isDDof, symmetric=False, copy=True)
+        A0 = (T@A + Tbd).toarray()
+        assert np.all(A2.toarray() == A0)
+
+        # 对称和只处理行的两种方式得到相同的解
+        F = space.source_vector(pde.source)
+        gD = pde.dirichlet
+        if dim > 1:
+            F = np.tile(F[:, None], (1, dim))
+            gD = lambda p: np.tile(pde.dirichlet(p)[..., None], dim)
+        bc = DirichletBC(space, gD)
+        uh0 = space.function(dim=dim) if dim > 1 else space.function()
+        A00 = A.copy()
+        A0, F0 = bc.apply(A, F.copy(), uh0)
+        # 默认不修改输入的矩阵
+        assert A0 is not A
+        assert abs(A - A00).max() == 0
+        uh1 = space.function(dim=dim) if dim > 1 else space.function()
+        A1, F1 = bc.apply(A, F, uh1, symmetric=False, copy=False)
+        assert A1 is A
+        x0 = spsolve(A0, F0)
+        x1 = spsolve(A1, F1)
+        print(np.max(np.abs(x0 - x1)))
+        assert np.max(np.abs(x0 - x1)) < 1e-10
+
 
 test = BoundaryConditionTest()
 p = int(sys.argv[2])
 if sys.argv[1] == 'dirichlet':
     test.poisson_fem_2d_dirichlet(p=p)
 
+if sys.argv[1] == 'elimination':
+    for dim in [1, 2]:
+        test.dirichlet_elimination(p=p, dim=dim)
+
 if sys.argv[1] == 'neumann':
     test.poisson_fem_2d_neuman(p=p)
 
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+#
+import os
+import sys
+import tempfile
+
+import numpy as np
+
+from fealpy.pde.poisson_2d import CosCosData
+from fealpy.functionspace import LagrangeFiniteElementSpace
+from fealpy.timeintegratoralg.timeline import UniformTimeLine
+from fealpy.solver import FactorizationCache
+from fealpy.writer import Checkpointer
+
+
+class HeatSimulator():
+    """
+    向后 Euler 格式求解带随机源项的热方程
+    """
+    def __init__(self, n=4, NT=20):
+        pde = CosCosData()
+        mesh = pde.init_mesh(n=n)
+        self.space = LagrangeFiniteElementSpace(mesh, p=1)
+        self.timeline = UniformTimeLine(0, 1, NT)
+        dt = self.timeline.current_time_step_length()
+        self.M = self.space.mass_matrix()
+        self.A = self.M + dt*self.space.stiff_matrix()
+        self.u = self.space.interpolation(pde.solution)
+        self.cache = FactorizationCache()
+
+    def checkpoint_state(self):
+        return {'u': np.asarray(self.u),
+                'timeline': self.timeline.checkpoint_state(),
+                'random': np.random.get_state()}
+
+    def restore_state(self, state):
+        self.u[:] = state['u']
+        self.timeline.restore_state(state['timeline'])
+        np.random.set_state(state['random'])
+
+    def run(self, checkpointer=None, restart=False, stop=None):
+        timeline = self.timeline
+        if restart and (checkpointer is not None):
+            step, state = checkpointer.load()
+            if state is not None:
+                self.restore_state(state)
+        while not timeline.stop():
+            F = self.M@(self.u + 0.01*np.random.rand(len(self.u)))
+            self.u[:] = self.cache.solve(self.A, F)
+            timeline.current += 1
+            if checkpointer is not None:
+                checkpointer(timeline.current, self.checkpoint_state)
+            if timeline.current == stop: # 模拟节点故障
+                break
+        if checkpointer is not None:
+            checkpointer.flush()
+
+
+class CheckpointerTest():
+    def __init__(self):
+        pass
+
+    def restart(self, NT=20, stop=13, interval=5):
+        """
+        中途停止以后从最新的检查点继续计算, 结果与不停止的计算完全一致
+        """
+        np.random.seed(0)
+        simulator = HeatSimulator(NT=NT)
+        simulator.run()
+        u0 = simulator.u.copy()
+
+        for asynchronous in [True, False]:
+            with tempfile.TemporaryDirectory() as path:
+                ckpt = Checkpointer(os.path.join(path, 'heat'),
+                        interval=interval, keep=2, asynchronous=asynchronous)
+                np.random.seed(0)
+                simulator = HeatSimulator(NT=NT)
+                simulator.run(checkpointer=ckpt, stop=stop)
+                steps = [s for s, fname in ckpt.checkpoints()]
+                assert steps == [5, 10]
+
+                # 写了一半的检查点不会被读取
+                with open(ckpt.fname(15) + '.tmp', 'wb') as f:
+                    f.write(b'broken')
+
+                np.random.seed(1)
+                simulator = HeatSimulator(NT=NT)
+                simulator.run(checkpointer=ckpt, restart=True)
+                assert np.array_equal(simulator.u, u0)
+                steps = [s for s, fname in ckpt.checkpoints()]
+                assert steps == [15, 20]
+                print(asynchronous, steps)
+
+    def error(self):
+        with tempfile.TemporaryDirectory() as path:
+            ckpt = Checkpointer(os.path.join(path, 'heat'))
+            ckpt.save(0, {'f': np.random.rand(3), 'g': lambda x: x}) # 不能 pickle
+            try:
+                ckpt.flush()
+            except RuntimeError as e:
+                print(str(e).splitlines()[-1])
+            else:
+                raise AssertionError('the error was not propagated!')
+            assert os.listdir(path) == []
+
+
+test = CheckpointerTest()
+
+if sys.argv[1] == 'restart':
+    test.restart()
+
+if sys.argv[1] == 'error':
+    test.error()
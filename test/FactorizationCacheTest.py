@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+# 
+import sys
+import time
+
+import numpy as np
+from scipy.sparse import coo_matrix
+from scipy.sparse.linalg import spsolve
+
+from fealpy.pde.poisson_2d import CosCosData
+from fealpy.functionspace import LagrangeFiniteElementSpace
+from fealpy.solver import FactorizationCache
+from fealpy.solver.factorization_cache import matrix_key
+
+
+class FactorizationCacheTest():
+    def __init__(self):
+        pass
+
+    def heat(self, n=6, p=1, NT=100):
+        """
+        向后 Euler 格式求解热方程, 每步重新组装左端矩阵
+        """
+        pde = CosCosData()
+        mesh = pde.init_mesh(n=n)
+        space = LagrangeFiniteElementSpace(mesh, p=p)
+        S = space.stiff_matrix()
+        M = space.mass_matrix()
+        dt = 1/NT
+        u0 = space.interpolation(pde.solution)
+
+        cache = FactorizationCache()
+        u = u0.copy()
+        start = time.time()
+        for i in range(NT):
+            A = M + dt*S
+            u = cache.solve(A, M@u)
+        end = time.time()
+        print('cache:', end - start, cache)
+        assert cache.misses == 1
+        assert cache.hits == NT - 1
+
+        v = u0.copy()
+        start = time.time()
+        for i in range(NT):
+            v = spsolve((M + dt*S).tocsc(), M@v)
+        end = time.time()
+        print('spsolve:', end - start)
+        assert np.max(np.abs(u - v)) < 1e-10
+
+    def many(self, n=6, nrhs=10):
+        pde = CosCosData()
+        mesh = pde.init_mesh(n=n)
+        space = LagrangeFiniteElementSpace(mesh, p=1)
+        A = space.stiff_matrix() + space.mass_matrix()
+        B = np.random.default_rng(0).random((A.shape[0], nrhs))
+        cache = FactorizationCache()
+        X = cache.solve_many(A, B)
+        assert X.shape == B.shape
+        assert np.max(np.abs(A@X - B)) < 1e-10
+        X = cache.solve_many(A, list(B.T))
+        assert cache.misses == 1
+        assert np.max(np.abs(A@X - B)) < 1e-10
+
+        # 原地改变矩阵的数值之后要重新分解
+        A = A.tocsr()
+        cache.solve(A, B[:, 0])
+        A.data *= 2
+        x = cache.solve(A, B[:, 0])
+        assert np.max(np.abs(A@x - B[:, 0])) < 1e-10
+        print(cache)
+
+    def evict(self, n=5):
+        pde = CosCosData()
+        mesh = pde.init_mesh(n=n)
+        space = LagrangeFiniteElementSpace(mesh, p=1)
+        A = space.stiff_matrix() + space.mass_matrix()
+        b = np.ones(A.shape[0])
+        cache = FactorizationCache(maxmem=0)
+        for c in [1.0, 2.0, 3.0]:
+            x = cache.solve(c*A, b)
+            assert len(cache) == 1
+        cache.solve(3.0*A, b)
+        assert cache.hits == 1
+        cache = FactorizationCache()
+        for c in [1.0, 2.0, 3.0]:
+            cache.solve(c*A, b)
+        assert len(cache) == 3
+        print(cache)
+
+    def key(self, n=4):
+        """
+        存储方式不同 (重复元素, 列号没有排序, coo 格式) 的相等矩阵有相同的
+        键, matrix_key 与 FactorizationCache.key 一致
+        """
+        pde = CosCosData()
+        mesh = pde.init_mesh(n=n)
+        space = LagrangeFiniteElementSpace(mesh, p=1)
+        A = space.stiff_matrix().tocsr()
+        A.sort_indices()
+        C = A.tocoo()
+        # 每个元素拆成两个重复元素, 并打乱顺序
+        perm = np.random.permutation(2*C.nnz)
+        I = np.r_[C.row, C.row][perm]
+        J = np.r_[C.col, C.col][perm]
+        V = np.r_[0.5*C.data, 0.5*C.data][perm]
+        B = coo_matrix((V, (I, J)), shape=A.shape)
+        assert matrix_key(B) == matrix_key(A)
+        assert matrix_key(B.tocsr()) == matrix_key(A)
+
+        cache = FactorizationCache()
+        assert cache.key(cache.canonical(B)) == matrix_key(A.tocsc())
+        cache.solve(B, np.ones(A.shape[0]))
+        assert A.tocsc() in cache
+        print(cache)
+
+test = FactorizationCacheTest()
+
+if sys.argv[1] == 'heat':
+    test.heat(n=int(sys.argv[2]), p=int(sys.argv[3]))
+
+if sys.argv[1] == 'many':
+    test.many(n=int(sys.argv[2]))
+
+if sys.argv[1] == 'key':
+    test.key()
+
+if sys.argv[1] == 'evict':
+    test.evict()
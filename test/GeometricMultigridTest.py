@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# 
+import sys
+
+import numpy as np
+
+from fealpy.pde.poisson_2d import CosCosData
+from fealpy.pde.poisson_3d import CosCosCosData
+from fealpy.pde.linear_elasticity_model import BoxDomainData3d 
+from fealpy.mesh import MeshFactory
+from fealpy.functionspace import LagrangeFiniteElementSpace
+from fealpy.boundarycondition import DirichletBC
+from fealpy.solver import GeometricMultigrid, MeshHierarchy
+
+
+class GeometricMultigridTest():
+    def __init__(self):
+        pass
+
+    def poisson(self, p=1, n=4, dim=2, smoother='mcgs'):
+        if dim == 2:
+            pde = CosCosData()
+            mesh = pde.init_mesh(n=1)
+        else:
+            pde = CosCosCosData()
+            mf = MeshFactory()
+            mesh = mf.boxmesh3d([0, 1, 0, 1, 0, 1], nx=2, ny=2, nz=2, meshtype='tet')
+
+        mh = MeshHierarchy(mesh)
+        for i in range(n):
+            mh.uniform_refine()
+            space = LagrangeFiniteElementSpace(mesh, p=p)
+            A = space.stiff_matrix()
+            F = space.source_vector(pde.source)
+            uh = space.function()
+            bc = DirichletBC(space, pde.dirichlet)
+            A, F = bc.apply(A, F, uh)
+
+            solver = GeometricMultigrid(mh.prolongations(p=p), smoother=smoother)
+            solver.setup(A)
+            uh[:] = solver.solve(F, tol=1e-10, accel='cg')
+            error = space.integralalg.L2_error(pde.solution, uh)
+            print('gdof:', space.number_of_global_dofs(), 'iter:',
+                    len(solver.residuals) - 1, 'error:', error)
+
+    def adaptive(self, p=1, n=4, smoother='mcgs'):
+        pde = CosCosData()
+        mesh = pde.init_mesh(n=3)
+        mh = MeshHierarchy(mesh)
+        for i in range(n):
+            NC = mesh.number_of_cells()
+            isMarkedCell = np.zeros(NC, dtype=np.bool_)
+            isMarkedCell[:NC//3] = True
+            mh.bisect(isMarkedCell)
+
+        space = LagrangeFiniteElementSpace(mesh, p=p)
+        A = space.stiff_matrix()
+        F = space.source_vector(pde.source)
+        uh = space.function()
+        bc = DirichletBC(space, pde.dirichlet)
+        A, F = bc.apply(A, F, uh)
+        solver = GeometricMultigrid(mh.prolongations(p=p), smoother=smoother)
+        solver.setup(A)
+        uh[:] = solver.solve(F, tol=1e-10, accel='cg')
+        print(solver)
+        print('iter:', len(solver.residuals) - 1)
+        assert np.max(np.abs(A@uh - F)) < 1e-8
+
+    def elasticity(self, p=1, n=2, smoother='mcgs'):
+        pde = BoxDomainData3d()
+        mesh = pde.init_mesh(n=1)
+        mh = MeshHierarchy(mesh)
+        mh.uniform_refine(n=n)
+        space = LagrangeFiniteElementSpace(mesh, p=p)
+        A = space.linear_elasticity_matrix(pde.lam, pde.mu)
+        F = space.source_vector(pde.source, dim=3)
+        uh = space.function(dim=3)
+        bc = DirichletBC(space, pde.dirichlet, threshold=pde.is_dirichlet_boundary)
+        A, F = bc.apply(A, F, uh)
+
+        P = mh.prolongations(p=p, dim=3, threshold=pde.is_dirichlet_boundary)
+        solver = GeometricMultigrid(P, smoother=smoother)
+        solver.setup(A)
+        x = solver.solve(F, tol=1e-8, accel='cg', maxit=500)
+        print('gdof:', A.shape[0], 'iter:', len(solver.residuals) - 1)
+
+
+test = GeometricMultigridTest()
+
+if sys.argv[1] == 'poisson':
+    test.poisson(p=int(sys.argv[2]), n=int(sys.argv[3]), dim=int(sys.argv[4]))
+
+if sys.argv[1] == 'adaptive':
+    test.adaptive(p=int(sys.argv[2]))
+
+if sys.argv[1] == 'elasticity':
+    test.elasticity(p=int(sys.argv[2]))
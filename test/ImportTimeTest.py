@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+#
+import sys
+import subprocess
+
+# 不应该在 import fealpy.mesh 等时导入的可选或者很重的依赖
+OPTIONAL = ['matplotlib', 'mpl_toolkits', 'pyfftw', 'pyamg', 'sympy', 'vtk',
+        'tvtk', 'paraview', 'petsc4py', 'mumps', 'mayavi']
+
+SCRIPT = """
+import sys, time
+start = time.perf_counter()
+{}
+t = time.perf_counter() - start
+print(t)
+print(' '.join(m for m in {} if m in sys.modules))
+"""
+
+
+class ImportTimeTest():
+    def __init__(self):
+        pass
+
+    def run(self, statement, nrepeat=3):
+        """
+        在新的进程中运行导入语句 statement, 返回最短的导入时间和导入的可选
+        依赖
+        """
+        ts = []
+        for i in range(nrepeat):
+            out = subprocess.run([sys.executable, '-c', SCRIPT.format(statement, OPTIONAL)],
+                    stdout=subprocess.PIPE, check=True, universal_newlines=True).stdout
+            t, loaded = out.split('\n')[:2]
+            ts.append(float(t))
+        return min(ts), loaded.split()
+
+    def mesh(self, threshold=1.0):
+        # 有的安装会在启动时通过 .pth 文件导入 mpl_toolkits, 不算在内
+        base, preloaded = self.run('import numpy, scipy.sparse, scipy.spatial')
+        t, loaded = self.run('import fealpy.mesh')
+        print('numpy + scipy: {:.3f}s, fealpy.mesh: {:.3f}s'.format(base, t))
+        loaded = set(loaded) - set(preloaded)
+        assert len(loaded) == 0, loaded
+        assert t < threshold, t
+
+    def solver(self):
+        """
+        不依赖可选包的求解器在导入时不导入 pyamg 等可选依赖
+        """
+        base, preloaded = self.run('import numpy, scipy.sparse, scipy.spatial')
+        for name in ['LOBPCGSolver', 'AMGSolver', 'FactorizationCache']:
+            t, loaded = self.run('from fealpy.solver import {}'.format(name))
+            print('{}: {:.3f}s'.format(name, t))
+            loaded = set(loaded) - set(preloaded)
+            assert len(loaded) == 0, (name, loaded)
+
+    def lazy(self):
+        """
+        延迟导入的名字和直接导入子模块得到的是同一个类
+        """
+        import fealpy.functionspace.LagrangeFiniteElementSpace
+        from fealpy.functionspace import LagrangeFiniteElementSpace
+        from fealpy.functionspace.LagrangeFiniteElementSpace import LagrangeFiniteElementSpace as S
+        assert isinstance(LagrangeFiniteElementSpace, type)
+        assert LagrangeFiniteElementSpace is S
+
+        from fealpy.solver import FactorizationCache, linear_solve
+        assert callable(linear_solve)
+
+        import fealpy.writer
+        assert 'MeshWriter' in dir(fealpy.writer)
+        try:
+            from fealpy.writer import VTKMeshWriter
+        except ImportError as e: # 没有安装 vtk, 使用时才报错
+            print(e)
+        try:
+            from fealpy.writer import NoWriter
+        except ImportError:
+            pass
+        else:
+            raise AssertionError('unknown names should raise ImportError!')
+
+
+test = ImportTimeTest()
+
+if sys.argv[1] == 'mesh':
+    test.mesh()
+
+if sys.argv[1] == 'solver':
+    test.solver()
+
+if sys.argv[1] == 'lazy':
+    test.lazy()
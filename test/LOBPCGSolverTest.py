@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+# 
+import sys
+import time
+
+import numpy as np
+from scipy.sparse.linalg import eigsh
+
+from fealpy.pde.poisson_2d import CosCosData
+from fealpy.functionspace import LagrangeFiniteElementSpace
+from fealpy.solver import LOBPCGSolver, MeshHierarchy
+
+
+class LOBPCGSolverTest():
+    def __init__(self):
+        pass
+
+    def get_system(self, mesh, p=1):
+        space = LagrangeFiniteElementSpace(mesh, p=p)
+        isFreeDof = ~space.is_boundary_dof()
+        A = space.stiff_matrix()[isFreeDof][:, isFreeDof].tocsr()
+        M = space.mass_matrix()[isFreeDof][:, isFreeDof].tocsr()
+        return A, M, isFreeDof
+
+    def eig(self, n=4, p=1, k=6):
+        mesh = CosCosData().init_mesh(n=n)
+        A, M, _ = self.get_system(mesh, p=p)
+        solver = LOBPCGSolver(k=k, tol=1e-10)
+        vals, X = solver.solve(A, M)
+        e = np.sort(eigsh(A, k=k, M=M, sigma=0, which='LM')[0])
+        print('iter:', solver.niter, 'eigenvalues/pi^2:', vals/np.pi**2)
+        assert np.max(np.abs(vals - e)/e) < 1e-10
+        assert np.max(np.abs(X.T@M@X - np.eye(k))) < 1e-10
+        assert solver.residuals.shape == (solver.niter + 1, k)
+
+        # 同一个矩阵上再次求解不再重新生成 AMG
+        amg = solver.preconditioner(A, M)
+        solver.solve(A, M, X0=X)
+        assert solver.preconditioner(A, M) is amg
+        print('iter with converged initial guess:', solver.niter)
+        assert solver.niter == 0
+
+    def warm(self, n=3, nrefine=4, k=4):
+        """
+        粗网格上的特征向量延拓到细网格上做为初值
+        """
+        mesh = CosCosData().init_mesh(n=n)
+        mh = MeshHierarchy(mesh)
+        solver = LOBPCGSolver(k=k)
+        isFreeDof0 = None
+        for i in range(nrefine):
+            A, M, isFreeDof = self.get_system(mesh)
+            X0 = None
+            if isFreeDof0 is not None:
+                X0 = solver.prolongate(mh.IM[-1][isFreeDof][:, isFreeDof0])
+            vals, X = solver.solve(A, M, X0=X0)
+            nwarm = solver.niter
+            solver.solve(A, M)
+            ncold = solver.niter
+            print(A.shape[0], 'warm:', nwarm, 'cold:', ncold)
+            isFreeDof0 = isFreeDof
+            mh.uniform_refine()
+        assert nwarm < ncold
+
+
+test = LOBPCGSolverTest()
+
+if sys.argv[1] == 'eig':
+    test.eig(n=int(sys.argv[2]), p=int(sys.argv[3]))
+
+if sys.argv[1] == 'warm':
+    test.warm()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# 
+import sys
+
+import numpy as np
+from scipy.sparse import bmat, spdiags
+from scipy.sparse.linalg import spsolve
+
+from fealpy.pde.poisson_2d import CosCosData
+from fealpy.functionspace import LagrangeFiniteElementSpace
+from fealpy.boundarycondition import DirichletBC
+from fealpy.solver import LinearSolver, linear_solve, MeshHierarchy
+from fealpy.solver.linear_solver import solvers
+from fealpy.solver.solve import solve
+from fealpy.solver.telemetry import SolverTelemetry
+
+
+class LinearSolverTest():
+    def __init__(self):
+        pass
+
+    def get_poisson_system(self, n=5, p=1):
+        pde = CosCosData()
+        mesh = pde.init_mesh(n=n)
+        space = LagrangeFiniteElementSpace(mesh, p=p)
+        A = space.stiff_matrix()
+        F = space.source_vector(pde.source)
+        uh = space.function()
+        bc = DirichletBC(space, pde.dirichlet)
+        A, F = bc.apply(A, F, uh)
+        return A, F
+
+    def poisson(self, n=5):
+        A, F = self.get_poisson_system(n=n)
+        x0 = spsolve(A, F)
+        for method in solvers:
+            if not solvers[method].available():
+                print(method, 'is not available')
+                continue
+            x, stats = linear_solve(A, F, method=method, tol=1e-12)
+            print(method, stats['niter'], stats['residual'], stats['converged'])
+            assert stats['converged']
+            assert np.max(np.abs(x - x0)) < 1e-8
+
+    def auto(self):
+        A, F = self.get_poisson_system(n=5)
+        solver = LinearSolver(tol=1e-10)
+        solver.solve(A, F)
+        print(solver.stats['method'], solver.stats['size'])
+        assert solver.stats['method'] in {'lu', 'cholesky'}
+
+        solver = LinearSolver(tol=1e-10, direct_size=100)
+        solver.solve(A, F)
+        print(solver.stats['method'], solver.stats['niter'])
+        assert solver.stats['method'] == 'cg_amg'
+
+        # 非对称矩阵
+        N = A.shape[0]
+        C = A + 0.1*spdiags([np.ones(N), -np.ones(N)], [1, -1], N, N)
+        x = solver.solve(C.tocsr(), F)
+        print(solver.stats['method'], solver.stats['niter'])
+        assert solver.stats['method'] == 'gmres_ilu'
+        assert solver.stats['residual'] < 1e-8
+
+    def saddle(self, n=3):
+        """
+        带 Lagrange 乘子的鞍点问题 [[A, B^T], [B, 0]], B 是细网格上的质量矩阵
+        限制到粗网格线性元空间上
+        """
+        pde = CosCosData()
+        mesh = pde.init_mesh(n=n)
+        mh = MeshHierarchy(mesh)
+        mh.uniform_refine(2)
+        space = LagrangeFiniteElementSpace(mesh, p=1)
+        A = space.stiff_matrix() + space.mass_matrix()
+        M = space.mass_matrix()
+        I = mh.IM[1]@mh.IM[0]
+        B = (I.T@M).tocsr()
+        K = bmat([[A, B.T], [B, None]], format='csr')
+        b = np.r_[space.source_vector(pde.source), np.ones(B.shape[0])]
+        solver = LinearSolver(tol=1e-10, direct_size=100, symmetric=True,
+                spd=False, blocks=[A.shape[0], B.shape[0]], maxit=500)
+        x = solver.solve(K, b)
+        print(solver.stats['method'], solver.stats['niter'], solver.stats['residual'])
+        assert solver.stats['method'] == 'minres_block'
+        assert solver.stats['converged']
+        assert solver.stats['residual'] < 1e-6
+
+    def model(self, n=4):
+        """
+        solve 从注册表中选择解法器时不输出, 统计信息记录在 telemetry 中
+        """
+        pde = CosCosData()
+        mesh = pde.init_mesh(n=n)
+        space = LagrangeFiniteElementSpace(mesh, p=1)
+
+        class Model():
+            def get_left_matrix(self):
+                return space.stiff_matrix()
+            def get_right_vector(self):
+                return space.source_vector(pde.source)
+
+        uh = space.function()
+        bc = DirichletBC(space, pde.dirichlet)
+        telemetry = SolverTelemetry()
+        AD, b = solve(Model(), uh, dirichlet=bc, solver='auto', telemetry=telemetry)
+        assert len(telemetry.records) == 1
+        assert np.max(np.abs(AD@uh - b)) < 1e-8
+
+
+test = LinearSolverTest()
+
+if sys.argv[1] == 'poisson':
+    test.poisson(n=int(sys.argv[2]))
+
+if sys.argv[1] == 'auto':
+    test.auto()
+
+if sys.argv[1] == 'model':
+    test.model()
+
+if sys.argv[1] == 'saddle':
+    test.saddle()
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+#
+import os
+import sys
+import time
+import tempfile
+
+import numpy as np
+
+from fealpy.mesh import MeshFactory
+from fealpy.mesh import PolyFileReader, InpFileReader, CCGMeshReader, FABFileReader
+
+
+def savetxt(f, a, fmt):
+    np.savetxt(f, a, fmt=fmt)
+
+
+class MeshFileReaderTest():
+    def __init__(self):
+        self.mf = MeshFactory()
+
+    def poly(self, NV=1000):
+        node = np.random.rand(NV, 2)
+        marker = np.random.randint(0, 3, NV)
+        seg = np.c_[np.arange(1, NV+1), np.roll(np.arange(1, NV+1), -1)]
+        with tempfile.TemporaryDirectory() as path:
+            fname = os.path.join(path, 'test.poly')
+            with open(fname, 'w') as f:
+                f.write('# vertices\n{} 2 0 1\n'.format(NV))
+                savetxt(f, np.c_[np.arange(1, NV+1), node, marker], '%d %.17g %.17g %d')
+                f.write('{} 0 # segments\n'.format(NV))
+                savetxt(f, np.c_[np.arange(1, NV+1), seg], '%d')
+                f.write('1\n1 0.5 0.5\n')
+                f.write('2\n1 0.1 0.1 1 0.01\n2 0.9 0.9 2 0.02\n')
+            for cache in [False, True, True]:
+                data = PolyFileReader(fname, cache=cache).read()
+                assert np.all(data['vertices']['xy'] == node)
+                assert np.all(data['vertices']['bdmarker'][:, 0] == marker)
+                assert np.all(data['segments']['endpoint'] == seg - 1)
+                assert np.all(data['holes']['xy'] == [[0.5, 0.5]])
+                assert np.all(data['regions']['maxarea'] == [0.01, 0.02])
+            assert os.path.exists(fname + '.npz')
+
+            # 顶点在同名的 .node 文件中, Triangle 写出的头信息为 `0 2 0 1`
+            fname = os.path.join(path, 'sep.poly')
+            with open(os.path.join(path, 'sep.node'), 'w') as f:
+                f.write('{} 2 0 1\n'.format(NV))
+                savetxt(f, np.c_[np.arange(1, NV+1), node, marker], '%d %.17g %.17g %d')
+            with open(fname, 'w') as f:
+                f.write('0 2 0 1\n{} 0\n'.format(NV))
+                savetxt(f, np.c_[np.arange(1, NV+1), seg], '%d')
+                f.write('0\n')
+            data = PolyFileReader(fname).read()
+            assert np.all(data['vertices']['xy'] == node)
+            assert np.all(data['vertices']['bdmarker'][:, 0] == marker)
+            assert np.all(data['segments']['endpoint'] == seg - 1)
+            assert data['holes'] is None
+
+    def inp(self, n=4, meshtype='tet'):
+        mesh = self.mf.boxmesh3d([0, 1, 0, 1, 0, 1], nx=n, ny=n, nz=n,
+                meshtype=meshtype)
+        etype = {'tet': 'C3D4', 'hex': 'C3D8'}[meshtype]
+        node = mesh.entity('node')
+        cell = mesh.entity('cell')
+        NN = len(node)
+        NC = len(cell)
+        with tempfile.TemporaryDirectory() as path:
+            fname = os.path.join(path, 'test.inp')
+            with open(fname, 'w') as f:
+                f.write('*Heading\n** comment line\n*NODE\n')
+                savetxt(f, np.c_[np.arange(1, NN+1), node], '%d, %.17g, %.17g, %.17g')
+                f.write('*ELEMENT, TYPE={}, ELSET=solid\n'.format(etype))
+                for i, c in enumerate(cell + 1): # 每条记录分成两行
+                    f.write('{}, {},\n{}\n'.format(i+1, ', '.join(map(str, c[:2])),
+                        ', '.join(map(str, c[2:]))))
+                f.write('*NSET, NSET=bottom, GENERATE\n1, 10, 3\n')
+                f.write('*NSET, NSET=top\n1, 2, 3,\n4\n')
+            for cache in [False, True, True]:
+                reader = InpFileReader(fname, cache=cache)
+                m = reader.read()
+                assert np.all(m.entity('node') == node)
+                assert np.all(m.entity('cell') == cell)
+                assert np.all(reader.data['elset']['solid'] == np.arange(1, NC+1))
+                assert np.all(reader.data['nset']['bottom'] == [1, 4, 7, 10])
+                assert np.all(reader.data['nset']['top'] == [1, 2, 3, 4])
+
+    def ccg(self, n=10):
+        mesh = self.mf.boxmesh2d([0, 1, 0, 1], nx=n, ny=n, meshtype='tri')
+        node = mesh.entity('node')
+        cell = mesh.entity('cell')
+        NN = len(node)
+        with tempfile.TemporaryDirectory() as path:
+            fname = os.path.join(path, 'test.m')
+            with open(fname, 'w') as f:
+                for i, (x, y) in enumerate(node):
+                    f.write('Vertex {} {!r} {!r} 0 {{uv=({!r} {!r}) rgb=(1 0 0)}}\n'.format(
+                        i+1, x, y, x, y))
+                for i, c in enumerate(cell + 1):
+                    f.write('Face {} {} {} {}\n'.format(i+1, *c))
+                f.write('Edge 1 2 {sharp}\n')
+            for cache in [False, True, True]:
+                m = CCGMeshReader(fname, cache=cache).read()
+                assert np.all(m.entity('node')[:, :2] == node)
+                assert np.all(m.entity('cell') == cell)
+                assert np.all(m.nodedata['uv'] == node)
+                assert np.all(m.nodedata['rgb'] == [1, 0, 0])
+
+    def fab(self, NF=100000, NV=6):
+        """
+        NF 个裂缝, 每个裂缝 NV 个顶点和一行法向
+        """
+        node = np.random.rand(NF*NV, 3)
+        normal = np.random.rand(NF, 3)
+        with tempfile.TemporaryDirectory() as path:
+            fname = os.path.join(path, 'test.fab')
+            idx = np.arange(1, NV+1)
+            with open(fname, 'w') as f:
+                f.write('BEGIN FORMAT\n  Format = Ascii\n  No_Fractures = {}\n'
+                        '  No_Nodes = {}\n  No_Properties = 3\nEND FORMAT\n\n'.format(
+                            NF, NF*NV))
+                f.write('BEGIN PROPERTIES\n  Prop1 = (Real*4) "Transmissivity"\n'
+                        'END PROPERTIES\n\nBEGIN FRACTURE\n')
+                for i in range(NF):
+                    f.write('{} {} 1 1.0 2.0 {}\n'.format(i+1, NV, i))
+                    savetxt(f, np.c_[idx, node[i*NV:(i+1)*NV]], '%d %.17g %.17g %.17g')
+                    f.write('0 {!r} {!r} {!r}\n'.format(*normal[i]))
+                f.write('END FRACTURE\n\nBEGIN ROCKBLOCK\nEND ROCKBLOCK\n')
+
+            for cache in [False, True, True]:
+                start = time.perf_counter()
+                reader = FABFileReader(fname, cache=cache)
+                reader.read()
+                print('cache:', cache, 'time: {:.3f}'.format(time.perf_counter() - start))
+                assert np.all(reader.node == node)
+                assert np.all(reader.fractureLocation == np.arange(NF+1)*NV)
+                assert np.all(reader.unknown[:, 2] == np.arange(NF))
+                assert np.all(reader.prop[-1] == normal[-1])
+                assert reader.format['No_Fractures'] == str(NF)
+
+
+test = MeshFileReaderTest()
+
+if sys.argv[1] == 'poly':
+    test.poly()
+
+if sys.argv[1] == 'inp':
+    test.inp(meshtype=sys.argv[2])
+
+if sys.argv[1] == 'ccg':
+    test.ccg()
+
+if sys.argv[1] == 'fab':
+    test.fab()
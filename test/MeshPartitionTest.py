@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+#
+import sys
+
+import numpy as np
+
+from fealpy.mesh import MeshFactory, MeshPartition
+from fealpy.mesh.partition import morton_partition
+from fealpy.functionspace import LagrangeFiniteElementSpace
+
+
+class MeshPartitionTest():
+    def __init__(self):
+        self.mf = MeshFactory()
+
+    def get_mesh(self, meshtype, n=8):
+        if meshtype in {'tri', 'quad'}:
+            return self.mf.boxmesh2d([0, 1, 0, 1], nx=n, ny=n, meshtype=meshtype)
+        else:
+            return self.mf.boxmesh3d([0, 1, 0, 1, 0, 1], nx=n//2, ny=n//2,
+                    nz=n//2, meshtype=meshtype)
+
+    def partition(self, nparts=4, nghost=1):
+        for meshtype in ['tri', 'quad', 'tet', 'hex']:
+            mesh = self.get_mesh(meshtype)
+            mp = MeshPartition(mesh, nparts, nghost=nghost)
+            print(meshtype, mp)
+            NC = mesh.number_of_cells()
+            NN = mesh.number_of_nodes()
+            count = np.bincount(mp.part, minlength=nparts)
+            assert count.max() - count.min() <= 1
+
+            node = mesh.entity('node')
+            isOwnedNode = np.zeros(NN, dtype=np.int_)
+            isOwnedCell = np.zeros(NC, dtype=np.int_)
+            for sd in mp:
+                lmesh = sd.mesh
+                assert type(lmesh) is type(mesh)
+                assert np.all(mp.part[sd.cell[:sd.NO]] == sd.rank)
+                assert np.all(mp.part[sd.cell[sd.NO:]] != sd.rank)
+                assert np.all(np.diff(sd.layer) >= 0)
+                # 局部网格和全局网格的单元完全重合
+                lcell = lmesh.entity('cell')
+                gcell = mesh.entity('cell')[sd.cell]
+                assert np.all(sd.node[lcell] == gcell)
+                assert np.all(lmesh.entity('node') == node[sd.node])
+                assert np.allclose(lmesh.entity_barycenter('cell'),
+                        mesh.entity_barycenter('cell')[sd.cell])
+                isOwnedNode[sd.node[sd.isOwnedNode]] += 1
+                isOwnedCell[sd.cell[:sd.NO]] += 1
+
+                # 子区域的节点所在的所有单元都在局部网格中
+                isNode = np.zeros(NN, dtype=np.bool_)
+                isNode[np.unique(gcell[:sd.NO])] = True
+                isCell = np.any(isNode[mesh.entity('cell')], axis=-1)
+                assert np.all(np.isin(np.nonzero(isCell)[0], sd.cell))
+            # 每个节点和单元恰好属于一个子区域
+            assert np.all(isOwnedNode == 1)
+            assert np.all(isOwnedCell == 1)
+
+    def layers(self, nparts=4):
+        mesh = self.get_mesh('tri', n=16)
+        ncell = []
+        for nghost in range(4):
+            mp = MeshPartition(mesh, nparts, nghost=nghost)
+            sd = mp.subdomain(0)
+            assert sd.layer.max() == nghost
+            ncell.append(len(sd.cell))
+        print(ncell)
+        assert np.all(np.diff(ncell) > 0)
+
+    def dof(self, nparts=3, p=3):
+        for meshtype in ['tri', 'tet']:
+            mesh = self.get_mesh(meshtype)
+            gspace = LagrangeFiniteElementSpace(mesh, p=p)
+            gdof = gspace.number_of_global_dofs()
+            gps = gspace.interpolation_points()
+            mp = MeshPartition(mesh, nparts)
+            isOwned = np.zeros(gdof, dtype=np.int_)
+            for sd in mp:
+                lspace = LagrangeFiniteElementSpace(sd.mesh, p=p)
+                l2g, isOwnedDof = sd.dof_map(gspace, lspace)
+                lps = lspace.interpolation_points()
+                assert np.allclose(lps, gps[l2g])
+                isOwned[l2g[isOwnedDof]] += 1
+            assert np.all(isOwned == 1)
+
+    def morton(self, nparts=8):
+        mesh = self.get_mesh('quad', n=16)
+        part = morton_partition(mesh, nparts)
+        mp = MeshPartition(mesh, nparts, part=part)
+        # 在 16x16 的四边形网格上, Z 序剖分出 2x4 个 8x4 的矩形块, 界面是 1 条
+        # 竖线和 3 条横线
+        print('edge cut:', mp.edgecut())
+        assert mp.edgecut() == 4*16
+        mp = MeshPartition(mesh, nparts, method='auto')
+        assert np.all(mp.part == part) or (mp.edgecut() <= 4*16)
+
+
+test = MeshPartitionTest()
+
+if sys.argv[1] == 'partition':
+    test.partition()
+
+if sys.argv[1] == 'layers':
+    test.layers()
+
+if sys.argv[1] == 'dof':
+    test.dof()
+
+if sys.argv[1] == 'morton':
+    test.morton()
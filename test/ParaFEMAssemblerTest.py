@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+#
+"""
+mpirun -n 4 python3 ParaFEMAssemblerTest.py assembly
+mpirun -n 4 python3 ParaFEMAssemblerTest.py halo
+mpirun -n 4 python3 ParaFEMAssemblerTest.py solve
+"""
+import sys
+
+import numpy as np
+from mpi4py import MPI
+
+from fealpy.pde.poisson_2d import CosCosData
+from fealpy.mesh import MeshFactory
+from fealpy.functionspace import LagrangeFiniteElementSpace
+from fealpy.boundarycondition import DirichletBC
+from fealpy.parallel import ParaFEMAssembler, ParaAlgorithm, NumCompComponent
+
+
+class ParaFEMAssemblerTest():
+    def __init__(self):
+        self.comm = MPI.COMM_WORLD
+        self.mf = MeshFactory()
+
+    def assembly(self, n=16, p=2):
+        pde = CosCosData()
+        mesh = self.mf.boxmesh2d(pde.domain(), nx=n, ny=n, meshtype='tri')
+        assembler = ParaFEMAssembler(self.comm, mesh, p=p)
+        A = assembler.stiff_matrix()
+        F = assembler.source_vector(pde.source)
+
+        # 与串行组装的结果比较
+        space = LagrangeFiniteElementSpace(mesh, p=p)
+        perm = assembler.perm
+        start, end = assembler.owned_range()
+        A0 = space.stiff_matrix()[perm][:, perm][start:end]
+        F0 = space.source_vector(pde.source)[perm][start:end]
+        assert abs(A - A0).max() < 1e-12
+        assert np.max(np.abs(F - F0)) < 1e-12
+        nrow = self.comm.allreduce(A.shape[0])
+        assert nrow == space.number_of_global_dofs()
+
+    def halo(self, n=16, p=2):
+        pde = CosCosData()
+        mesh = self.mf.boxmesh2d(pde.domain(), nx=n, ny=n, meshtype='tri')
+        assembler = ParaFEMAssembler(self.comm, mesh, p=p)
+        A = assembler.stiff_matrix()
+        ct = assembler.commtop
+        N = assembler.number_of_global_dofs()
+        start, end = assembler.owned_range()
+        isGhost = np.zeros(N, dtype=np.bool_)
+        isGhost[A.indices] = True
+        isGhost[start:end] = False
+
+        # 多列数组的交换, 并多次复用同一个持久通信请求
+        component = NumCompComponent(ct)
+        for k in range(3):
+            x = np.zeros((N, 2))
+            x[start:end, 0] = np.arange(start, end) + k
+            x[start:end, 1] = -np.arange(start, end)
+            component.communicating(x)
+            assert np.all(x[isGhost, 0] == np.nonzero(isGhost)[0] + k)
+            assert np.all(x[isGhost, 1] == -np.nonzero(isGhost)[0])
+        assert len(component.plans) == 1
+
+        # 矩阵向量乘与通信重叠, 与串行的结果比较
+        space = LagrangeFiniteElementSpace(mesh, p=p)
+        perm = assembler.perm
+        A0 = space.stiff_matrix()[perm][:, perm]
+        x = np.sin(np.arange(N))
+        X = np.c_[x, np.cos(np.arange(N))]
+        alg = ParaAlgorithm(A, ct)
+        for i in range(2):
+            y = alg.matvec(x[start:end])
+            assert np.max(np.abs(y - (A0@x)[start:end])) < 1e-12
+            Y = alg.matvec(X[start:end])
+            assert np.max(np.abs(Y - (A0@X)[start:end])) < 1e-12
+
+    def solve(self, n=32, p=1):
+        pde = CosCosData()
+        mesh = self.mf.boxmesh2d(pde.domain(), nx=n, ny=n, meshtype='tri')
+        space = LagrangeFiniteElementSpace(mesh, p=p)
+        A0 = space.stiff_matrix()
+        F0 = space.source_vector(pde.source)
+        uh0 = space.function()
+        bc = DirichletBC(space, pde.dirichlet)
+        A0, F0 = bc.apply(A0, F0, uh0)
+        from scipy.sparse.linalg import spsolve
+        x0 = spsolve(A0.tocsc(), F0)
+
+        assembler = ParaFEMAssembler(self.comm, mesh, p=p)
+        A = assembler.stiff_matrix()
+        F = assembler.source_vector(pde.source)
+        A1 = A.copy()
+        AD, F = assembler.apply_dirichlet_bc(A, F, pde.dirichlet)
+        assert abs(A - A1).max() == 0
+        A = AD
+        alg = ParaAlgorithm(A, assembler.commtop)
+        for method in ['jacobi', 'ilu', 'lu', 'amg']:
+            M = alg.preconditioner(method)
+            x, info = alg.cg(F, tol=1e-10, M=M)
+            assert info == 0
+            x = assembler.gather(x)
+            if self.comm.Get_rank() == 0:
+                print('cg', method, alg.niter)
+                assert np.max(np.abs(x - x0)) < 1e-8
+            x, info = alg.gmres(F, tol=1e-10, M=M, restart=20)
+            assert info == 0
+            x = assembler.gather(x)
+            if self.comm.Get_rank() == 0:
+                print('gmres', method, alg.niter)
+                assert np.max(np.abs(x - x0)) < 1e-8
+
+
+test = ParaFEMAssemblerTest()
+
+if sys.argv[1] == 'assembly':
+    test.assembly()
+
+if sys.argv[1] == 'halo':
+    test.halo()
+
+if sys.argv[1] == 'solve':
+    test.solve()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+#
+"""
+python3 PartitionedVTKWriterTest.py pieces
+mpirun -n 4 python3 PartitionedVTKWriterTest.py mpi
+"""
+import os
+import sys
+import tempfile
+import xml.etree.ElementTree as ET
+
+import numpy as np
+
+from fealpy.mesh import MeshFactory
+from fealpy.mesh.partition import MeshPartition
+from fealpy.writer import PartitionedVTKWriter
+from fealpy.writer.vtkxml import read_vtu
+
+
+class PartitionedVTKWriterTest():
+    def __init__(self):
+        self.mf = MeshFactory()
+
+    def pieces(self, n=8, nparts=4, NT=3):
+        mesh = self.mf.boxmesh2d([0, 1, 0, 1], nx=n, ny=n, meshtype='tri')
+        mp = MeshPartition(mesh, nparts, nghost=1)
+        with tempfile.TemporaryDirectory() as path:
+            for compress in [False, True]:
+                fname = os.path.join(path, 'out{}'.format(int(compress)), 'u')
+                writer = PartitionedVTKWriter(fname, nparts=nparts,
+                        compress=compress)
+                for i in range(NT):
+                    for sd in mp:
+                        node = sd.mesh.entity('node')
+                        sd.mesh.nodedata['u'] = np.sin(node[:, 0] + i)
+                        sd.mesh.nodedata['grad'] = node.copy()
+                        sd.mesh.celldata['part'] = np.full(
+                                sd.mesh.number_of_cells(), sd.rank, dtype=np.int32)
+                        writer.write_piece(sd.mesh, sd.rank, step=i,
+                                isGhostCell=sd.is_ghost_cell())
+                    writer.write_index(i, t=0.1*i, mesh=mp.subdomain(0).mesh,
+                            ghost=True)
+
+                # 每个子区域的数据与局部网格一致
+                for sd in mp:
+                    data = read_vtu(writer.piece_name(NT-1, sd.rank))
+                    node = sd.mesh.entity('node')
+                    assert np.all(data['Points'][:, :2] == node)
+                    assert np.all(data['u'] == np.sin(node[:, 0] + NT - 1))
+                    assert np.all(data['grad'] == node)
+                    assert np.all(data['connectivity'] ==
+                            sd.mesh.entity('cell').reshape(-1))
+                    assert np.all(data['types'] == 5)
+                    assert np.sum(data['vtkGhostType'] == 0) == sd.NO
+
+                root = ET.parse(writer.index_name(NT-1)).getroot()
+                pieces = [e.attrib['Source'] for e in root.iter('Piece')]
+                assert pieces == [os.path.basename(writer.piece_name(NT-1, r))
+                        for r in range(nparts)]
+                names = [e.attrib['Name'] for e in root.iter('PDataArray')]
+                assert set(names) == {'u', 'grad', 'part', 'vtkGhostType', 'Points'}
+
+                root = ET.parse(fname + '.pvd').getroot()
+                ds = [(float(e.attrib['timestep']), e.attrib['file'])
+                        for e in root.iter('DataSet')]
+                assert ds == [(0.1*i, os.path.basename(writer.index_name(i)))
+                        for i in range(NT)]
+                print(compress, sorted(os.listdir(os.path.dirname(fname))))
+
+    def mpi(self, n=16):
+        from mpi4py import MPI
+        from fealpy.parallel import ParaFEMAssembler
+        comm = MPI.COMM_WORLD
+        mesh = self.mf.boxmesh2d([0, 1, 0, 1], nx=n, ny=n, meshtype='tri')
+        assembler = ParaFEMAssembler(comm, mesh, p=1)
+        lmesh = assembler.subdomain.mesh
+        writer = PartitionedVTKWriter('output/mpi', comm=comm, compress=True)
+        for i in range(3):
+            lmesh.nodedata['u'] = lmesh.entity('node')[:, 0]*i
+            writer.write(lmesh, t=0.1*i)
+        comm.Barrier()
+        if comm.Get_rank() == 0:
+            print(os.listdir('output'))
+
+
+test = PartitionedVTKWriterTest()
+
+if sys.argv[1] == 'pieces':
+    test.pieces()
+
+if sys.argv[1] == 'mpi':
+    test.mpi()
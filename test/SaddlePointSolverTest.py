@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+#
+import sys
+
+import numpy as np
+from scipy.sparse import bmat
+from scipy.sparse.linalg import spsolve
+
+from fealpy.mesh import MeshFactory
+from fealpy.pde.poisson_2d import CosCosData
+from fealpy.functionspace import LagrangeFiniteElementSpace
+from fealpy.functionspace import RaviartThomasFiniteElementSpace2d
+from fealpy.solver import SaddlePointSolver
+from fealpy.solver.block_preconditioner import stokes_blocks, darcy_blocks
+
+
+class SaddlePointSolverTest():
+    def __init__(self):
+        self.mf = MeshFactory()
+
+    def get_stokes_system(self, n):
+        mesh = self.mf.boxmesh2d([0, 1, 0, 1], nx=n, ny=n, meshtype='tri')
+        uspace = LagrangeFiniteElementSpace(mesh, p=2)
+        pspace = LagrangeFiniteElementSpace(mesh, p=1)
+        isBdDof = uspace.is_boundary_dof()
+        A, B, Mp = stokes_blocks(uspace, pspace, nu=1.0, isBdDof=isBdDof)
+        ps = uspace.interpolation_points()
+        f = np.r_[np.sin(np.pi*ps[:, 0]), np.cos(np.pi*ps[:, 1])]
+        F0 = (A@f)*np.tile(~isBdDof, 2)
+        F1 = np.zeros(B.shape[1])
+        return A, B, Mp, F0, F1
+
+    def stokes(self, maxit=4):
+        """
+        Taylor-Hood 元的 Stokes 问题, 除了 BFBt 以外, 各种预条件子的迭代步数
+        不随网格加密而增长
+        """
+        for ptype, schur, ublock in [('diag', 'mass', 'amg'),
+                ('tri', 'mass', 'amg'), ('al', 'mass', 'lu'),
+                ('tri', 'bfbt', 'amg')]:
+            n = 4
+            niter = []
+            for i in range(maxit):
+                A, B, Mp, F0, F1 = self.get_stokes_system(n)
+                solver = SaddlePointSolver(ptype=ptype, schur=schur,
+                        ublock=ublock, tol=1e-8)
+                u, p = solver.solve(A, B, F0, F1, Mp=Mp)
+                K = bmat([[A, B], [B.T, None]], format='csr')
+                F = np.r_[F0, F1]
+                r = np.linalg.norm(F - K@np.r_[u, p])/np.linalg.norm(F)
+                assert r < 1e-6
+                niter.append(solver.niter)
+                n *= 2
+            print(ptype, schur, ublock, niter)
+            if schur != 'bfbt':
+                assert niter[-1] <= niter[-2] + 5
+
+    def darcy(self, maxit=4):
+        """
+        混合元求解 Poisson 方程, 与直接法比较
+        """
+        pde = CosCosData()
+        n = 4
+        niter = []
+        for i in range(maxit):
+            mesh = self.mf.boxmesh2d(pde.domain(), nx=n, ny=n, meshtype='tri')
+            space = RaviartThomasFiniteElementSpace2d(mesh, p=0)
+            A, B, Mp = darcy_blocks(space)
+            F0 = -space.set_neumann_bc(pde.dirichlet)
+            F1 = -space.smspace.source_vector(pde.source)
+            solver = SaddlePointSolver(ptype='diag', schur='diag',
+                    ublock='jacobi', tol=1e-10)
+            u, p = solver.solve(A, B, F0, F1)
+            K = bmat([[A, B], [B.T, None]], format='csc')
+            x = spsolve(K, np.r_[F0, F1])
+            assert np.max(np.abs(np.r_[u, p] - x)) < 1e-6
+            niter.append(solver.niter)
+            n *= 2
+        print('darcy', niter)
+        assert niter[-1] <= niter[-2] + 5
+
+    def reuse(self, n=16):
+        """
+        Picard 迭代中只有速度块变化, AMG 的插值算子和压力块的近似逆都被复用
+        """
+        A, B, Mp, F0, F1 = self.get_stokes_system(n)
+        solver = SaddlePointSolver(ptype='tri', schur='mass', tol=1e-8)
+        u, p = solver.solve(A, B, F0, F1, Mp=Mp)
+        P = solver.preconditioner
+        assert P.nbuild == 1
+        for i in range(3):
+            A0 = (1.0 + 0.1*(i+1))*A
+            u, p = solver.solve(A0, B, F0, F1, Mp=Mp)
+            print(solver.niter)
+        print(P)
+        assert P.nbuild == 1
+        assert P.nupdate == 3
+
+
+test = SaddlePointSolverTest()
+
+if sys.argv[1] == 'stokes':
+    test.stokes()
+
+if sys.argv[1] == 'darcy':
+    test.darcy()
+
+if sys.argv[1] == 'reuse':
+    test.reuse()
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+#
+import sys
+
+import numpy as np
+from scipy.sparse.linalg import cg, gmres, spsolve
+
+from fealpy.pde.poisson_2d import CosCosData
+from fealpy.pde.linear_elasticity_model import BoxDomainData3d
+from fealpy.functionspace import LagrangeFiniteElementSpace
+from fealpy.boundarycondition import DirichletBC
+from fealpy.solver import SchwarzPreconditioner, MeshHierarchy
+
+
+class SchwarzPreconditionerTest():
+    def __init__(self):
+        pass
+
+    def get_poisson_system(self, mesh, p=1):
+        pde = CosCosData()
+        space = LagrangeFiniteElementSpace(mesh, p=p)
+        A = space.stiff_matrix()
+        F = space.source_vector(pde.source)
+        uh = space.function()
+        bc = DirichletBC(space, pde.dirichlet)
+        A, F = bc.apply(A, F, uh)
+        return space, A, F
+
+    def solve(self, A, F, M, method):
+        niter = [0]
+        def callback(x):
+            niter[0] += 1
+        if method == 'as':
+            x, info = cg(A, F, M=M, tol=1e-8, callback=callback)
+        else:
+            x, info = gmres(A, F, M=M, tol=1e-8, restart=200,
+                    callback=callback, callback_type='legacy')
+        assert info == 0
+        return x, niter[0]
+
+    def poisson(self, n=5, nparts=8, nworkers=1):
+        """
+        AS 配合 CG, RAS 配合 GMRES, 都与直接法的结果比较
+        """
+        pde = CosCosData()
+        mesh = pde.init_mesh(n=n)
+        space, A, F = self.get_poisson_system(mesh)
+        x0 = spsolve(A.tocsc(), F)
+        for method in ['as', 'ras']:
+            niter = {}
+            for coarse in [None, 'aggregation']:
+                with SchwarzPreconditioner(space=space, nparts=nparts,
+                        overlap=1, method=method, coarse=coarse,
+                        nworkers=nworkers) as M:
+                    M.setup(A)
+                    x, niter[coarse] = self.solve(A, F, M.aspreconditioner(), method)
+                    print(M)
+                assert np.max(np.abs(x - x0)) < 1e-6
+            print(method, niter)
+
+    def condition(self, n=4, nparts=16):
+        """
+        加上粗空间之后 AS 预条件系统的条件数变小
+        """
+        pde = CosCosData()
+        mesh = pde.init_mesh(n=n)
+        space, A, F = self.get_poisson_system(mesh)
+        isFree = np.asarray(abs(A).sum(axis=1)).flat > np.abs(A.diagonal())
+        A0 = A.toarray()[isFree][:, isFree]
+        I = np.eye(A.shape[0])
+        kappa = {}
+        for coarse in [None, 'aggregation']:
+            with SchwarzPreconditioner(space=space, nparts=nparts,
+                    coarse=coarse) as M:
+                M.setup(A)
+                B = np.array([M.matvec(e) for e in I]).T[isFree][:, isFree]
+            ev = np.linalg.eigvals(B@A0).real
+            kappa[coarse] = ev.max()/ev.min()
+        print(kappa)
+        assert kappa['aggregation'] < kappa[None]
+
+    def algebraic(self, n=5, nparts=4):
+        """
+        不给出空间时按矩阵的图划分子区域
+        """
+        pde = CosCosData()
+        mesh = pde.init_mesh(n=n)
+        space, A, F = self.get_poisson_system(mesh)
+        x0 = spsolve(A.tocsc(), F)
+        for overlap in [1, 2]:
+            M = SchwarzPreconditioner(nparts=nparts, overlap=overlap).setup(A)
+            x, niter = self.solve(A, F, M.aspreconditioner(), 'as')
+            print(overlap, niter)
+            assert np.max(np.abs(x - x0)) < 1e-6
+            M.close()
+
+    def reuse(self, n=5, nworkers=2):
+        """
+        局部矩阵不变时不重新分解, 串行与并行的结果一致
+        """
+        pde = CosCosData()
+        mesh = pde.init_mesh(n=n)
+        space, A, F = self.get_poisson_system(mesh)
+        ys = []
+        for nw in [1, nworkers]:
+            with SchwarzPreconditioner(space=space, nparts=4,
+                    nworkers=nw) as M:
+                M.setup(A)
+                M.setup(A)
+                assert M.nfactor == 4
+                ys.append(M.matvec(F))
+        assert np.max(np.abs(ys[0] - ys[1])) < 1e-12
+
+    def coarse_mesh(self, n=4, nparts=8):
+        """
+        用粗网格的延拓矩阵作为粗空间
+        """
+        pde = CosCosData()
+        mesh = pde.init_mesh(n=1)
+        mh = MeshHierarchy(mesh)
+        mh.uniform_refine(n=n)
+        space, A, F = self.get_poisson_system(mesh)
+        x0 = spsolve(A.tocsc(), F)
+        Ps = mh.prolongations()
+        with SchwarzPreconditioner(space=space, nparts=nparts,
+                coarse=Ps[:n-2]) as M:
+            M.setup(A)
+            x, niter = self.solve(A, F, M.aspreconditioner(), 'as')
+            print(M, niter)
+        assert np.max(np.abs(x - x0)) < 1e-6
+
+    def elasticity(self, n=2, nparts=8):
+        """
+        线弹性问题, 自由度按分量排列
+        """
+        pde = BoxDomainData3d()
+        mesh = pde.init_mesh(n=n)
+        space = LagrangeFiniteElementSpace(mesh, p=1)
+        A = space.linear_elasticity_matrix(pde.lam, pde.mu)
+        F = space.source_vector(pde.source, dim=3)
+        uh = space.function(dim=3)
+        bc = DirichletBC(space, pde.dirichlet, threshold=pde.is_dirichlet_boundary)
+        A, F = bc.apply(A, F, uh)
+        x0 = spsolve(A.tocsc(), F)
+        with SchwarzPreconditioner(space=space, nparts=nparts,
+                coarse='aggregation') as M:
+            M.setup(A)
+            x, niter = self.solve(A, F, M.aspreconditioner(), 'as')
+            print(M, niter)
+        assert np.max(np.abs(x - x0)) < 1e-6
+
+
+test = SchwarzPreconditionerTest()
+
+if sys.argv[1] == 'poisson':
+    test.poisson(n=int(sys.argv[2]), nworkers=int(sys.argv[3]))
+
+if sys.argv[1] == 'condition':
+    test.condition()
+
+if sys.argv[1] == 'algebraic':
+    test.algebraic()
+
+if sys.argv[1] == 'reuse':
+    test.reuse()
+
+if sys.argv[1] == 'coarse':
+    test.coarse_mesh()
+
+if sys.argv[1] == 'elasticity':
+    test.elasticity()
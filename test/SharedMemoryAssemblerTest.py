@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+#
+import sys
+import time
+
+import numpy as np
+
+from fealpy.decorator import cartesian
+from fealpy.mesh import MeshFactory
+from fealpy.mesh.coloring import cell_coloring
+from fealpy.functionspace import LagrangeFiniteElementSpace
+from fealpy.quadrature import SharedMemoryAssembler
+
+
+class SharedMemoryAssemblerTest():
+    def __init__(self):
+        self.mf = MeshFactory()
+
+    def coloring(self):
+        mesh = self.mf.boxmesh3d([0, 1, 0, 1, 0, 1], nx=8, ny=8, nz=8,
+                meshtype='tet')
+        for p in [1, 2]:
+            space = LagrangeFiniteElementSpace(mesh, p=p)
+            cell2dof = space.cell_to_dof()
+            c = cell_coloring(cell2dof)
+            print('p =', p, 'number of colors:', c.max()+1)
+            for i in range(c.max()+1):
+                dof = cell2dof[c == i].flat
+                assert len(np.unique(dof)) == len(dof)
+            assert np.all(c == cell_coloring(cell2dof))
+
+    def assembly(self, n=32, p=2):
+        @cartesian
+        def kappa(p):
+            x = p[..., 0]
+            y = p[..., 1]
+            return 1 + x**2 + y**2
+
+        mesh = self.mf.boxmesh2d([0, 1, 0, 1], nx=n, ny=n, meshtype='tri')
+        NC = mesh.number_of_cells()
+        space = LagrangeFiniteElementSpace(mesh, p=p)
+        cs = [None, 2.0, np.arange(1, NC+1, dtype=np.float64),
+                np.array([[2.0, 1.0], [1.0, 2.0]]), kappa]
+
+        A0 = [space.stiff_matrix(c=c) for c in cs[1:2] + cs[3:]]
+        M0 = space.mass_matrix()
+        S = space.stiff_matrix()
+        # 分片常数系数
+        NQ = len(space.integrator.get_quadrature_points_and_weights()[1])
+        S2 = space.stiff_matrix(c=np.broadcast_to(cs[2], (NQ, NC)))
+
+        data = None
+        for nworkers in [1, 2, 4]:
+            with SharedMemoryAssembler(space, nworkers=nworkers) as assembler:
+                start = time.time()
+                A = [assembler.stiff_matrix(c=c) for c in cs]
+                M = assembler.mass_matrix()
+                print('nworkers:', nworkers, 'colors:',
+                        assembler.number_of_colors(),
+                        'time: {:.4f}s'.format(time.time() - start))
+
+            assert abs(A[1] - A0[0]).max() < 1e-12
+            assert abs(A[3] - A0[1]).max() < 1e-12
+            assert abs(A[4] - A0[2]).max() < 1e-12
+            assert abs(M - M0).max() < 1e-14
+            assert abs(A[0] - S).max() < 1e-12
+            assert abs(A[2] - S2).max() < 1e-12*abs(S2).max()
+
+            # 与工作进程的个数无关, 每一位都相同
+            if data is None:
+                data = [B.data.copy() for B in A + [M]]
+            else:
+                for d, B in zip(data, A + [M]):
+                    assert np.array_equal(d, B.data)
+
+
+test = SharedMemoryAssemblerTest()
+
+if sys.argv[1] == 'coloring':
+    test.coloring()
+
+if sys.argv[1] == 'assembly':
+    test.assembly()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# 
+import sys
+import time
+
+import numpy as np
+from scipy.sparse.linalg import spsolve
+
+from fealpy.pde.poisson_2d import CosCosData
+from fealpy.mesh import MeshFactory
+from fealpy.mesh.coloring import coloring
+from fealpy.functionspace import LagrangeFiniteElementSpace
+from fealpy.boundarycondition import DirichletBC
+from fealpy.solver import AMGSolver, HighOrderLagrangeFEMFastSolver
+from fealpy.solver.smoother import smoothers, get_smoother
+
+
+class SmootherTest():
+    def __init__(self):
+        pass
+
+    def get_system(self, n=6, p=1):
+        pde = CosCosData()
+        mesh = pde.init_mesh(n=n)
+        space = LagrangeFiniteElementSpace(mesh, p=p)
+        A = space.stiff_matrix()
+        F = space.source_vector(pde.source)
+        uh = space.function()
+        bc = DirichletBC(space, pde.dirichlet)
+        A, F = bc.apply(A, F, uh)
+        return mesh, A.tocsr(), F
+
+    def amg(self, n=6, p=1):
+        mesh, A, F = self.get_system(n=n, p=p)
+        x0 = spsolve(A, F)
+        for smoother in smoothers:
+            solver = AMGSolver(smoother=smoother, seed=0)
+            solver.setup(A)
+            start = time.time()
+            x = solver.solve(F, tol=1e-10, accel='cg')
+            end = time.time()
+            print(smoother, 'iter:', len(solver.residuals) - 1, 'time:', end - start)
+            assert np.max(np.abs(x - x0)) < 1e-6
+
+    def coloring(self, n=6):
+        """
+        线性元的自由度就是网格节点, 网格节点的着色可以直接用于多色 Gauss-Seidel
+        """
+        mesh, A, F = self.get_system(n=n, p=1)
+        c = coloring(mesh, method='random2')
+        s = get_smoother(('mcgs', {'color': c}), A)
+        print('number of colors:', s.number_of_colors())
+        solver = AMGSolver(smoother=('mcgs', {'color': c}), seed=0)
+        solver.setup(A)
+        x = solver.solve(F, tol=1e-10, accel='cg')
+        print('mcgs with mesh coloring, iter:', len(solver.residuals) - 1)
+        assert np.max(np.abs(A@x - F)) < 1e-8
+
+    def fast(self, n=32, p=2):
+        pde = CosCosData()
+        mf = MeshFactory()
+        mesh = mf.boxmesh2d([0, 1, 0, 1], nx=n, ny=n, meshtype='tri')
+        space = LagrangeFiniteElementSpace(mesh, p=p)
+        A = space.stiff_matrix()
+        P = mesh.linear_stiff_matrix()
+        I = space.linear_interpolation_matrix()
+        for smoother in smoothers:
+            uh = space.function()
+            isBdDof = space.set_dirichlet_bc(uh, pde.dirichlet)
+            F = space.source_vector(pde.source)
+            solver = HighOrderLagrangeFEMFastSolver(A, F, P, I, isBdDof,
+                    smoother=smoother)
+            uh = solver.solve(uh, F)
+            error = space.integralalg.error(pde.solution, uh)
+            print(smoother, error)
+            assert error < 1e-3
+
+
+test = SmootherTest()
+
+if sys.argv[1] == 'amg':
+    test.amg(n=int(sys.argv[2]), p=int(sys.argv[3]))
+
+if sys.argv[1] == 'coloring':
+    test.coloring(n=int(sys.argv[2]))
+
+if sys.argv[1] == 'fast':
+    test.fast(n=int(sys.argv[2]), p=int(sys.argv[3]))
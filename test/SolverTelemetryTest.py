@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+#
+import sys
+import os
+import json
+import tempfile
+
+import numpy as np
+
+from fealpy.pde.poisson_2d import CosCosData
+from fealpy.mesh import MeshFactory
+from fealpy.functionspace import LagrangeFiniteElementSpace
+from fealpy.boundarycondition import DirichletBC
+from fealpy.solver import AMGSolver, LinearSolver, SolverTelemetry
+from fealpy.solver import HighOrderLagrangeFEMFastSolver
+
+
+class SolverTelemetryTest():
+    def __init__(self):
+        pass
+
+    def get_poisson_system(self, n=5, p=1):
+        pde = CosCosData()
+        mesh = pde.init_mesh(n=n)
+        space = LagrangeFiniteElementSpace(mesh, p=p)
+        A = space.stiff_matrix()
+        F = space.source_vector(pde.source)
+        uh = space.function()
+        bc = DirichletBC(space, pde.dirichlet)
+        A, F = bc.apply(A, F, uh)
+        return A, F
+
+    def amg(self, n=6):
+        A, F = self.get_poisson_system(n=n)
+        t = SolverTelemetry()
+        solver = AMGSolver(smoother='gs')
+        solver.setup(A)
+        solver.attach(t)
+        x = solver.solve(F, tol=1e-10, accel='cg')
+        x = solver.solve(F, tol=1e-10)
+        print(t)
+        assert len(t) == 2
+        rec = t.records[0]
+        assert rec['solver'] == 'cg_AMGSolver'
+        assert rec['status'] == 'converged'
+        assert rec['size'] == A.shape[0]
+        assert rec['nnz'] == A.nnz
+        assert rec['niter'] == len(rec['residuals']) == len(rec['iterations'])
+        assert rec['residuals'][-1] < 1e-10
+        for k in t.categories:
+            assert rec['time'][k] > 0.0
+        # 各部分的用时是互斥的
+        assert sum(rec['time'][k] for k in t.categories) <= rec['time']['wall']
+        assert t.records[1]['solver'] == 'AMGSolver'
+        assert t.records[1]['status'] == 'converged'
+
+    def linear(self, n=5):
+        A, F = self.get_poisson_system(n=n)
+        t = SolverTelemetry(history=False)
+        solver = LinearSolver(method='cg_amg', tol=1e-10, telemetry=t)
+        for i in range(3):
+            solver.solve(A, F)
+        solver = LinearSolver(method='lu', telemetry=t)
+        solver.solve(A, F)
+        solver = LinearSolver(method='gmres_ilu', tol=1e-10, maxit=1,
+                restart=2, telemetry=t)
+        solver.solve(A, F)
+        print(t)
+        s = t.summary()
+        assert s['cg_amg']['ncalls'] == 3
+        assert s['cg_amg']['nfailed'] == 0
+        assert s['lu']['ncalls'] == 1
+        assert s['gmres_ilu']['nfailed'] == 1
+        assert t.records[-1]['status'] == 'maxit'
+        assert s['total']['ncalls'] == 5
+        assert t.records[0]['residuals'] == []
+
+        with tempfile.TemporaryDirectory() as d:
+            fname = os.path.join(d, 'telemetry.json')
+            t.to_json(fname)
+            with open(fname) as f:
+                data = json.load(f)
+            assert len(data['records']) == 5
+            fname = os.path.join(d, 'telemetry.csv')
+            t.to_csv(fname)
+            with open(fname) as f:
+                lines = f.readlines()
+            assert len(lines) == 6
+
+    def fast(self, n=16, p=2):
+        pde = CosCosData()
+        mf = MeshFactory()
+        mesh = mf.boxmesh2d([0, 1, 0, 1], nx=n, ny=n, meshtype='tri')
+        space = LagrangeFiniteElementSpace(mesh, p=p)
+        A = space.stiff_matrix()
+        P = mesh.linear_stiff_matrix()
+        I = space.linear_interpolation_matrix()
+        uh = space.function()
+        isBdDof = space.set_dirichlet_bc(uh, pde.dirichlet)
+        F = space.source_vector(pde.source)
+        solver = HighOrderLagrangeFEMFastSolver(A, F, P, I, isBdDof)
+        uh = solver.solve(uh, F)
+        t = solver.telemetry
+        print(t)
+        rec = t.records[-1]
+        assert rec['status'] == 'converged'
+        assert rec['time']['smoother'] > 0.0
+        it = rec['iterations'][-1]
+        print(it)
+        assert it['time'] >= it['smoother']
+
+
+test = SolverTelemetryTest()
+
+if sys.argv[1] == 'amg':
+    test.amg()
+
+if sys.argv[1] == 'linear':
+    test.linear()
+
+if sys.argv[1] == 'fast':
+    test.fast()
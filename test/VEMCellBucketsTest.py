@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+#
+import sys
+import time
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+from fealpy.mesh import MeshFactory
+from fealpy.functionspace import CellBuckets
+from fealpy.functionspace import ConformingVirtualElementSpace2d
+from fealpy.functionspace import NonConformingVirtualElementSpace2d
+from fealpy.functionspace import DivFreeNonConformingVirtualElementSpace2d
+
+
+class VEMCellBucketsTest():
+    def __init__(self):
+        # 多边形网格, 有 4, 5, 6 边形单元
+        self.mesh = MeshFactory().boxmesh2d([0, 1, 0, 1], nx=4, ny=4, meshtype='poly')
+
+    def buckets(self):
+        """
+        分组的单元矩阵和逐个单元计算的结果相同
+        """
+        mesh = self.mesh
+        cell, cellLocation = mesh.entity('cell')
+        NV = mesh.number_of_vertices_of_cells()
+        NC = mesh.number_of_cells()
+        buckets = CellBuckets(cellLocation)
+        assert len(buckets) == len(np.unique(NV)) > 1
+        assert np.all(np.sort(np.concatenate(buckets.cells)) == np.arange(NC))
+
+        # 第 i 个单元的矩阵是 i*ones((NV_i, NV_i))
+        K = buckets.matrices([c[:, None, None]*np.ones((len(c), n, n))
+            for c, n in zip(buckets.cells, buckets.ldofs)])
+        assert len(K) == NC
+        for i in range(NC):
+            assert np.all(K[i] == i) and K[i].shape == (NV[i], NV[i])
+        assert np.all(K[-1] == NC - 1)
+
+        NN = mesh.number_of_nodes()
+        A = buckets.assemble(K, cell, NN)
+        I = np.concatenate([np.repeat(cell[cellLocation[i]:cellLocation[i+1]], NV[i])
+            for i in range(NC)])
+        J = np.concatenate([np.tile(cell[cellLocation[i]:cellLocation[i+1]], NV[i])
+            for i in range(NC)])
+        val = np.repeat(np.arange(NC), NV**2)
+        B = csr_matrix((val, (I, J)), shape=(NN, NN))
+        assert abs(A - B).max() == 0
+
+        b = [c[:, None]*np.ones((len(c), n)) for c, n in zip(buckets.cells, buckets.ldofs)]
+        b = buckets.assemble_vector(b, cell, NN)
+        assert np.allclose(b, np.bincount(cell, weights=np.repeat(np.arange(NC), NV),
+            minlength=NN))
+
+    def projection(self, maxp=3):
+        """
+        投影算子作用在缩放单项式上是恒等算子, 投影矩阵和逐个单元用 inv 算
+        的结果相同
+        """
+        mesh = self.mesh
+        for Space in [ConformingVirtualElementSpace2d, NonConformingVirtualElementSpace2d]:
+            for p in range(1, maxp+1):
+                space = Space(mesh, p=p)
+                cell2dof, cell2dofLocation = space.cell_to_dof()
+                smldof = space.smspace.number_of_local_dofs()
+                DD = space.D.toarray()
+                BB = space.B.toarray()
+                assert DD.shape == (len(cell2dof), smldof)
+                assert BB.shape == (smldof, len(cell2dof))
+                for i in range(mesh.number_of_cells()):
+                    s = slice(cell2dofLocation[i], cell2dofLocation[i+1])
+                    D = DD[s]
+                    B = BB[:, s]
+                    assert np.all(space.D[i] == D) and np.all(space.B[i] == B)
+                    assert np.allclose(space.PI1[i]@D, np.eye(smldof))
+                    assert np.allclose(space.PI0[i]@D, np.eye(smldof))
+                    if (p > 1) or (Space is NonConformingVirtualElementSpace2d):
+                        G = B@D
+                        assert np.allclose(space.G[i], G)
+                        assert np.allclose(space.PI1[i], np.linalg.inv(G)@B)
+                    C = space.C[i]
+                    assert np.allclose(space.PI0[i], np.linalg.inv(space.H[i])@C)
+
+                # 常数函数的刚度矩阵作用为零
+                A = space.stiff_matrix()
+                uI = space.interpolation(lambda x: np.ones(x.shape[:-1]))
+                assert np.allclose(A@uI, 0)
+                print(Space.__name__, p, 'ok')
+
+        space = ConformingVirtualElementSpace2d(mesh, p=1)
+        uI = space.interpolation(lambda x: np.ones(x.shape[:-1]))
+        assert np.isclose(space.integral(uI), 1)
+
+        space = DivFreeNonConformingVirtualElementSpace2d(mesh, 2)
+        A = space.stiff_matrix(celltype=True)
+        assert len(A) == mesh.number_of_cells()
+        assert np.allclose(A[0], A[0].T)
+
+    def storage(self, m=3):
+        """
+        分组存储的 B 和 D 的 set 和 add 与稠密矩阵上的操作相同, 各组是同一个
+        一维数组的视图
+        """
+        mesh = self.mesh
+        cell, cellLocation = mesh.entity('cell')
+        L = len(cell)
+        buckets = CellBuckets(cellLocation)
+        rng = np.random.RandomState(0)
+
+        for layout in ['cols', 'rows']:
+            A = buckets.zeros(m, layout=layout)
+            assert A.data.size == m*L
+            assert all(np.shares_memory(a, A.data) for a in A.stacks)
+            dense = np.zeros((m, L))
+
+            loc = np.arange(L)
+            A.set(loc, np.arange(m).reshape(-1, 1), 1.0)
+            dense[:] = 1.0
+
+            # 有重复的位置
+            loc = rng.randint(0, L, size=(50, 4))
+            r = rng.randint(0, m, size=(50, 1))
+            val = rng.rand(50, 4)
+            A.add(loc, r, val)
+            np.add.at(dense, (r, loc), val)
+
+            loc = rng.choice(L, 10, replace=False)
+            A.set(loc, 0, -1.0)
+            dense[0, loc] = -1.0
+
+            if layout == 'rows':
+                dense = dense.T
+            assert np.allclose(A.toarray(), dense)
+            for i in range(mesh.number_of_cells()):
+                s = slice(cellLocation[i], cellLocation[i+1])
+                a = dense[:, s] if layout == 'cols' else dense[s]
+                assert np.allclose(A[i], a)
+
+        # B 和 D 的各组直接用于 G = B@D, 不再复制
+        space = ConformingVirtualElementSpace2d(mesh, p=2)
+        assert space.buckets.cols(space.B) is space.B.stacks
+        assert space.buckets.rows(space.D) is space.D.stacks
+
+    def speed(self, n=100):
+        """
+        多边形单元个数较多时的计算时间
+        """
+        mf = MeshFactory()
+        mesh = mf.boxmesh2d([0, 1, 0, 1], nx=n, ny=n, meshtype='poly')
+        print('NC:', mesh.number_of_cells())
+        for p in [1, 2, 3]:
+            start = time.perf_counter()
+            space = ConformingVirtualElementSpace2d(mesh, p=p)
+            t0 = time.perf_counter()
+            A = space.stiff_matrix()
+            M = space.mass_matrix()
+            t1 = time.perf_counter()
+            print('p = {}: projections {:.3f}s, stiff + mass {:.3f}s'.format(
+                p, t0 - start, t1 - t0))
+
+
+test = VEMCellBucketsTest()
+
+if sys.argv[1] == 'buckets':
+    test.buckets()
+
+if sys.argv[1] == 'projection':
+    test.projection()
+
+if sys.argv[1] == 'storage':
+    test.storage()
+
+if sys.argv[1] == 'speed':
+    test.speed()
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+#
+import os
+import sys
+import time
+import tempfile
+
+import numpy as np
+
+from fealpy.mesh import MeshFactory
+from fealpy.mesh.IntervalMesh import IntervalMesh
+from fealpy.mesh.PolyhedronMesh import PolyhedronMesh
+from fealpy.mesh.LagrangeTriangleMesh import LagrangeTriangleMesh
+from fealpy.mesh.LagrangeQuadrangleMesh import LagrangeQuadrangleMesh
+from fealpy.mesh.core import multi_index_matrix
+from fealpy.mesh.vtk_extent import vtk_cell_index
+from fealpy.mesh.vtkCellTypes import *
+from fealpy.writer.vtkxml import write_vtu, read_vtu, vtk_cells, vtk_polyhedron_cells
+from fealpy.writer import MeshWriter, VTKMeshWriter
+from fealpy.writer.VTKMeshWriter import vtk
+
+
+def polyhedron_mesh(mesh):
+    """
+    把六面体网格看成多面体网格
+    """
+    face = mesh.entity('face')
+    NF = len(face)
+    faceLocation = np.arange(0, 4*NF+1, 4)
+    return PolyhedronMesh(mesh.entity('node'), face.reshape(-1), faceLocation,
+            mesh.ds.face_to_cell(), NC=mesh.number_of_cells())
+
+
+def simulation(queue):
+    queue.put(3)
+    for i in range(3):
+        queue.put({'uh': ('pointdata', np.full(9, i, dtype=np.float64))})
+    queue.put(-1)
+
+
+class VTKXMLWriterTest():
+    def __init__(self):
+        self.mf = MeshFactory()
+
+    def meshes(self):
+        mf = self.mf
+        meshes = {}
+        for meshtype in ['tri', 'quad', 'poly']:
+            meshes[meshtype] = mf.boxmesh2d([0, 1, 0, 1], nx=3, ny=3, meshtype=meshtype)
+        for meshtype in ['tet', 'hex']:
+            meshes[meshtype] = mf.boxmesh3d([0, 1, 0, 1, 0, 1], nx=2, ny=2, nz=2,
+                    meshtype=meshtype)
+        meshes['interval'] = IntervalMesh(np.linspace(0, 1, 6).reshape(-1, 1),
+                np.c_[np.arange(5), np.arange(1, 6)])
+        meshes['polyhedron'] = polyhedron_mesh(meshes['hex'])
+        tmesh = meshes['tri']
+        meshes['ltri'] = LagrangeTriangleMesh(tmesh.entity('node'), tmesh.entity('cell'), p=4)
+        qmesh = meshes['quad']
+        meshes['lquad'] = LagrangeQuadrangleMesh(qmesh.entity('node'), qmesh.entity('cell'), p=3)
+        return meshes
+
+    def roundtrip(self):
+        """
+        各种网格在各种编码下写入再读出, 数据不变
+        """
+        with tempfile.TemporaryDirectory() as path:
+            fname = os.path.join(path, 'test.vtu')
+            for name, mesh in self.meshes().items():
+                node, cell, cellType, NC = mesh.to_vtk()
+                NN = len(node)
+                nodedata = {'u': np.random.rand(NN), 'grad': np.random.rand(NN, 3)}
+                celldata = {'flag': np.arange(NC) % 2 == 0,
+                        'idx': np.arange(NC, dtype=np.int32)}
+                if cellType == VTK_POLYHEDRON:
+                    cells = vtk_polyhedron_cells(cell, NC)
+                else:
+                    cells = vtk_cells(cell, NC, cellType)
+                for encoding in ['raw', 'base64', 'ascii']:
+                    for compress in [False, True]:
+                        if compress and encoding == 'ascii':
+                            continue
+                        write_vtu(fname, node, cell, cellType, NC, nodedata=nodedata,
+                                celldata=celldata, compress=compress, encoding=encoding)
+                        data = read_vtu(fname)
+                        assert np.all(data['Points'][:, :node.shape[1]] == node), name
+                        assert np.all(data['u'] == nodedata['u'])
+                        assert np.all(data['grad'] == nodedata['grad'])
+                        assert np.all(data['flag'] == celldata['flag'])
+                        assert np.all(data['idx'] == celldata['idx'])
+                        assert np.all(data['connectivity'] == cells[0])
+                        assert np.all(data['offsets'] == cells[1])
+                        assert np.all(data['types'] == cellType)
+                        if cellType == VTK_POLYHEDRON:
+                            assert np.all(data['faces'] == cells[3])
+                            assert np.all(data['faceoffsets'] == cells[4])
+                print(name, cellType, 'ok')
+
+            try:
+                write_vtu(fname, node, cell, cellType, NC, compress=True,
+                        encoding='ascii')
+            except ValueError as e:
+                print(e)
+            else:
+                raise AssertionError('compressing ascii data should raise ValueError!')
+
+    def polyhedron(self):
+        """
+        多面体单元的面要是外法向, 用散度定理算出的体积是正的
+        """
+        mesh = self.mf.boxmesh3d([0, 1, 0, 1, 0, 1], nx=3, ny=3, nz=3, meshtype='hex')
+        node, cell, cellType, NC = polyhedron_mesh(mesh).to_vtk()
+        connectivity, offsets, types, faces, faceoffsets = vtk_polyhedron_cells(cell, NC)
+        vol = np.zeros(NC)
+        start = np.r_[0, faceoffsets[:-1]]
+        for i in range(NC):
+            f = faces[start[i]:faceoffsets[i]]
+            k = 1
+            for j in range(f[0]):
+                v = node[f[k+1:k+1+f[k]]]
+                for m in range(1, len(v)-1): # 以 v[0] 为公共点把面分成三角形
+                    vol[i] += np.linalg.det(np.array([v[0], v[m], v[m+1]]))/6
+                k += f[k] + 1
+        assert np.allclose(vol, 1/27), vol
+        assert np.all(offsets == np.arange(1, NC+1)*8)
+
+    def order(self, p=5):
+        """
+        Lagrange 单元的点按 VTK 的顺序排列: 顶点, 边, 面, 内部
+        """
+        # 三角形
+        index = vtk_cell_index(p, VTK_LAGRANGE_TRIANGLE)
+        bc = multi_index_matrix[2](p)[index]/p
+        ldof = (p+1)*(p+2)//2
+        assert np.all(np.sort(index) == np.arange(ldof))
+        assert np.all(bc[:3] == np.eye(3))
+        for k, (i, j) in enumerate([(0, 1), (1, 2), (2, 0)]):
+            b = bc[3+k*(p-1):3+(k+1)*(p-1)]
+            assert np.allclose(b[:, j], np.arange(1, p)/p) # 从 v_i 到 v_j
+            assert np.allclose(b[:, i] + b[:, j], 1)
+        assert np.all(bc[3*p:] > 0)
+
+        # 四面体
+        index = vtk_cell_index(p, VTK_LAGRANGE_TETRAHEDRON)
+        bc = multi_index_matrix[3](p)[index]/p
+        ldof = (p+1)*(p+2)*(p+3)//6
+        assert np.all(np.sort(index) == np.arange(ldof))
+        assert np.all(bc[:4] == np.eye(4))
+        edge = [(0, 1), (1, 2), (2, 0), (0, 3), (1, 3), (2, 3)]
+        for k, (i, j) in enumerate(edge):
+            b = bc[4+k*(p-1):4+(k+1)*(p-1)]
+            assert np.allclose(b[:, j], np.arange(1, p)/p)
+        start = 4 + 6*(p-1)
+        nf = (p-1)*(p-2)//2
+        for k, face in enumerate([(0, 1, 3), (2, 3, 1), (0, 3, 2), (0, 2, 1)]):
+            b = bc[start+k*nf:start+(k+1)*nf]
+            assert np.allclose(b[:, list(face)].sum(axis=-1), 1)
+            assert np.all(b[:, list(face)] > 0)
+            assert np.allclose(b[0, list(face)], [(p-2)/p, 1/p, 1/p]) # 从第一个顶点开始
+        assert np.all(bc[start+4*nf:] > 0)
+
+        # 四边形
+        index = vtk_cell_index(p, VTK_LAGRANGE_QUADRILATERAL)
+        ij = np.array(list(np.ndindex((p+1, p+1))))[index]
+        assert np.all(ij[:4] == [(0, 0), (p, 0), (p, p), (0, p)])
+        k = np.arange(1, p)
+        assert np.all(ij[4:p+3] == np.c_[k, np.zeros_like(k)])
+        assert np.all(ij[p+3:2*p+2] == np.c_[np.full_like(k, p), k])
+        assert np.all(ij[2*p+2:3*p+1] == np.c_[k, np.full_like(k, p)])
+        assert np.all(ij[3*p+1:4*p] == np.c_[np.zeros_like(k), k])
+        assert np.all(ij[4*p:, 0] == np.tile(k, p-1))
+
+        # 曲线
+        assert np.all(vtk_cell_index(p, VTK_LAGRANGE_CURVE) == np.r_[0, p, 1:p])
+
+    def writer(self):
+        mesh = self.mf.boxmesh2d([0, 1, 0, 1], nx=2, ny=2, meshtype='quad')
+        mesh.nodedata['u'] = np.arange(9, dtype=np.float64)
+        with tempfile.TemporaryDirectory() as path:
+            fname = os.path.join(path, 'test.vtu')
+            VTKMeshWriter(backend='native', compress=True)(fname, mesh)
+            assert np.all(read_vtu(fname)['u'] == mesh.nodedata['u'])
+
+            writer = MeshWriter(mesh, backend='native', encoding='base64')
+            writer.write(fname)
+            assert np.all(read_vtu(fname)['u'] == mesh.nodedata['u'])
+
+            writer = MeshWriter(mesh, simulation=simulation, args=(), backend='native')
+            writer.run(fname)
+            for i in range(3):
+                data = read_vtu(os.path.join(path, 'test_{:06d}.vtu'.format(i)))
+                assert np.all(data['uh'] == i)
+            with open(os.path.join(path, 'test.pvd')) as f:
+                assert f.read().count('<DataSet') == 3
+
+    def speed(self, n=40):
+        """
+        写文件的速度 (MB/s 按节点坐标, 单元和数据数组的字节数计算)
+        """
+        mesh = self.mf.boxmesh3d([0, 1, 0, 1, 0, 1], nx=n, ny=n, nz=n, meshtype='tet')
+        node, cell, cellType, NC = mesh.to_vtk()
+        NN = len(node)
+        mesh.nodedata['u'] = np.random.rand(NN)
+        mesh.nodedata['grad'] = np.random.rand(NN, 3)
+        mesh.celldata['rho'] = np.random.rand(NC)
+        nbytes = node.nbytes + cell.nbytes + sum(v.nbytes for v in mesh.nodedata.values()) + \
+                sum(v.nbytes for v in mesh.celldata.values())
+        print('NN: {}, NC: {}, {:.1f} MB'.format(NN, NC, nbytes/2**20))
+
+        with tempfile.TemporaryDirectory() as path:
+            fname = os.path.join(path, 'test.vtu')
+            backends = [('native', 'raw', False), ('native', 'raw', True),
+                    ('native', 'base64', False), ('native', 'base64', True),
+                    ('native', 'ascii', False)]
+            if vtk is not None:
+                backends.append(('vtk', None, None))
+            else:
+                print('vtk is not installed, only the native writer is timed.')
+            for backend, encoding, compress in backends:
+                if backend == 'vtk':
+                    writer = VTKMeshWriter(backend='vtk')
+                else:
+                    writer = VTKMeshWriter(backend='native', encoding=encoding,
+                            compress=compress)
+                start = time.perf_counter()
+                writer(fname, mesh)
+                t = time.perf_counter() - start
+                print('{:6s} {:6s} compress={!s:5s}: {:.3f}s, {:7.1f} MB/s, file {:.1f} MB'.format(
+                    backend, str(encoding), str(compress), t, nbytes/2**20/t,
+                    os.path.getsize(fname)/2**20))
+
+
+test = VTKXMLWriterTest()
+
+if sys.argv[1] == 'roundtrip':
+    test.roundtrip()
+
+if sys.argv[1] == 'polyhedron':
+    test.polyhedron()
+
+if sys.argv[1] == 'order':
+    test.order()
+
+if sys.argv[1] == 'writer':
+    test.writer()
+
+if sys.argv[1] == 'speed':
+    test.speed()
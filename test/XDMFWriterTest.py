@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+#
+import os
+import sys
+import tempfile
+import xml.etree.ElementTree as ET
+
+import numpy as np
+
+from fealpy.mesh import MeshFactory
+from fealpy.writer import XDMFWriter
+from fealpy.writer.vtkxml import write_vtu
+
+
+class XDMFWriterTest():
+    def __init__(self):
+        self.mf = MeshFactory()
+
+    def fields(self, mesh, i):
+        node = mesh.entity('node')
+        bc = mesh.entity_barycenter('cell')
+        nodedata = {'u': np.sin(node[:, 0] + i), 'v': node*i}
+        celldata = {'p': bc[:, 1]*i, 'part': np.full(len(bc), i, dtype=np.int32)}
+        return nodedata, celldata
+
+    def series(self, n=16, NT=10, meshtype='tri'):
+        """
+        写若干个时间层, 关闭以后重新打开继续追加, 读回来与原来的数据比较
+        """
+        if meshtype == 'tri':
+            mesh = self.mf.boxmesh2d([0, 1, 0, 1], nx=n, ny=n, meshtype='tri')
+        else:
+            mesh = self.mf.boxmesh3d([0, 1, 0, 1, 0, 1], nx=4, ny=4, nz=4,
+                    meshtype='tet')
+        for backend in ['hdf5', 'binary']:
+            with tempfile.TemporaryDirectory() as path:
+                fname = os.path.join(path, 'out', 'heat')
+                with XDMFWriter(fname, mesh, backend=backend) as writer:
+                    for i in range(NT//2):
+                        nodedata, celldata = self.fields(mesh, i)
+                        writer.write(0.1*i, nodedata=nodedata, celldata=celldata)
+                with XDMFWriter(fname, mode='a') as writer:
+                    assert writer.backend == backend
+                    assert writer.number_of_steps() == NT//2
+                    for i in range(NT//2, NT):
+                        nodedata, celldata = self.fields(mesh, i)
+                        writer.write(0.1*i, nodedata=nodedata, celldata=celldata)
+
+                    for i in range(NT):
+                        nodedata, celldata = self.fields(mesh, i)
+                        for name, val in {**nodedata, **celldata}.items():
+                            a = writer.read(i, name)
+                            assert a.dtype == val.dtype
+                            assert np.all(a == val)
+
+                root = ET.parse(fname + '.xdmf').getroot()
+                times = [float(e.attrib['Value']) for e in root.iter('Time')]
+                assert times == [0.1*i for i in range(NT)]
+
+                size = sum(os.path.getsize(os.path.join(path, 'out', f))
+                        for f in os.listdir(os.path.join(path, 'out')))
+                node, cell, cellType, NC = mesh.to_vtk()
+                vtu = os.path.join(path, 'test.vtu')
+                write_vtu(vtu, node, cell, cellType, NC, nodedata=nodedata,
+                        celldata=celldata)
+                print(backend, 'xdmf:', size, 'vtu:', NT*os.path.getsize(vtu))
+                assert size < NT*os.path.getsize(vtu)
+
+
+test = XDMFWriterTest()
+
+if sys.argv[1] == 'series':
+    test.series(meshtype=sys.argv[2])
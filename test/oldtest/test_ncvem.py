@@ -46,9 +46,9 @@ qf = mesh.integrator(7)
 space = ConformingVirtualElementSpace2d(mesh, p=2)
 print("Interpolation points:\n", space.interpolation_points())
 print("H:\n", space.H)
-print("D:\n", space.D)
-print("G:\n", space.G)
-print("B:\n", space.B)
+print("D:\n", space.D.toarray())
+print("G:\n", list(space.G))
+print("B:\n", space.B.toarray())
 
 fig = plt.figure()
 axes = fig.gca()